@@ -19,7 +19,7 @@ from django.contrib.auth.models import User
 from django.http import HttpResponse
 from django.utils.html import format_html
 import csv
-from .models import UserProfile
+from .models import UserProfile, UserStats
 
 
 # Reusable fieldset helper for DRY admin configuration
@@ -303,6 +303,22 @@ class UserProfileReadOnlyInline(admin.StackedInline):
         return False
 
 
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    """
+    Read-only view of the per-user dashboard rollups
+    """
+    list_display = ('user', 'payments_total', 'alerts_total', 'alerts_active',
+                    'savings_this_month', 'reconciled_at', 'updated_at')
+    search_fields = ('user__username', 'user__email')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Re-register UserAdmin with enhanced functionality
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
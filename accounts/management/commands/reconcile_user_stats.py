@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.user_stats import user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount every user\'s dashboard stats (payments, alerts, notifications today, savings this month).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users recounted per transaction')
+
+    def handle(self, *args, **options):
+        result = user_stats.reconcile(batch_size=options['batch_size'])
+        style = self.style.SUCCESS if not result['corrected'] else self.style.WARNING
+        self.stdout.write(style(
+            f"Reconciled {result['users']} users: {result['created']} rows created, {result['corrected']} corrected"
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_remove_userprofile_state_remove_userprofile_zip_code_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payments_total', models.PositiveIntegerField(default=0)),
+                ('payments_succeeded', models.PositiveIntegerField(default=0)),
+                ('payments_pending', models.PositiveIntegerField(default=0)),
+                ('payments_failed', models.PositiveIntegerField(default=0)),
+                ('alerts_total', models.PositiveIntegerField(default=0)),
+                ('alerts_active', models.PositiveIntegerField(default=0)),
+                ('alerts_triggered', models.PositiveIntegerField(default=0)),
+                ('alerts_paused', models.PositiveIntegerField(default=0)),
+                ('alerts_expired', models.PositiveIntegerField(default=0)),
+                ('alerts_url', models.PositiveIntegerField(default=0)),
+                ('alerts_product', models.PositiveIntegerField(default=0)),
+                ('alerts_keyword', models.PositiveIntegerField(default=0)),
+                ('notifications_date', models.DateField(blank=True, null=True)),
+                ('notifications_today', models.PositiveIntegerField(default=0)),
+                ('savings_month', models.DateField(blank=True, help_text='First day of the month savings_this_month covers', null=True)),
+                ('savings_this_month', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Stats',
+                'verbose_name_plural': 'User Stats',
+            },
+        ),
+    ]
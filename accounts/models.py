@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 
 class UserProfile(models.Model):
@@ -63,6 +64,54 @@ class UserProfile(models.Model):
         return bool(self.phone_number and self.sms_notifications_enabled)
 
 
+class UserStats(models.Model):
+    """
+    Per-user dashboard counters, kept current from payment, alert and
+    notification saves and rebuilt nightly (accounts.user_stats)
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats')
+
+    # Payments by status
+    payments_total = models.PositiveIntegerField(default=0)
+    payments_succeeded = models.PositiveIntegerField(default=0)
+    payments_pending = models.PositiveIntegerField(default=0)
+    payments_failed = models.PositiveIntegerField(default=0)
+
+    # Price alerts by status and kind
+    alerts_total = models.PositiveIntegerField(default=0)
+    alerts_active = models.PositiveIntegerField(default=0)
+    alerts_triggered = models.PositiveIntegerField(default=0)
+    alerts_paused = models.PositiveIntegerField(default=0)
+    alerts_expired = models.PositiveIntegerField(default=0)
+    alerts_url = models.PositiveIntegerField(default=0)
+    alerts_product = models.PositiveIntegerField(default=0)
+    alerts_keyword = models.PositiveIntegerField(default=0)
+
+    # Period counters - stale once their date rolls over
+    notifications_date = models.DateField(null=True, blank=True)
+    notifications_today = models.PositiveIntegerField(default=0)
+    savings_month = models.DateField(null=True, blank=True, help_text="First day of the month savings_this_month covers")
+    savings_this_month = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'User Stats'
+        verbose_name_plural = 'User Stats'
+
+    def __str__(self):
+        return f"{self.user.username}'s stats"
+
+    @property
+    def triggered_today(self):
+        return self.notifications_today if self.notifications_date == timezone.localdate() else 0
+
+    @property
+    def savings_month_to_date(self):
+        return self.savings_this_month if self.savings_month == timezone.localdate().replace(day=1) else 0
+
+
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     """
@@ -81,3 +130,29 @@ def save_user_profile(sender, instance, **kwargs):
         instance.profile.save()
     else:
         UserProfile.objects.create(user=instance)
+
+
+# Dashboard rollups: other apps' models, connected lazily by label
+
+@receiver(post_init, sender='payments.Payment')
+@receiver(post_init, sender='scraping.PriceAlert')
+def remember_stats_state(sender, instance, **kwargs):
+    from .user_stats import user_stats
+    user_stats.remember(instance)
+
+
+@receiver(post_save, sender='payments.Payment')
+@receiver(post_save, sender='scraping.PriceAlert')
+@receiver(post_save, sender='scraping.AlertNotification')
+def count_saved_for_stats(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from .user_stats import user_stats
+    user_stats.saved(instance, created)
+
+
+@receiver(post_delete, sender='payments.Payment')
+@receiver(post_delete, sender='scraping.PriceAlert')
+def count_deleted_for_stats(sender, instance, **kwargs):
+    from .user_stats import user_stats
+    user_stats.deleted(instance)
@@ -0,0 +1,26 @@
+"""
+Express Deals - Account Tasks
+Celery tasks for per-user dashboard stats
+"""
+
+from celery import shared_task
+import logging
+
+from .user_stats import user_stats
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def reconcile_user_stats():
+    """
+    Recount every user's dashboard stats from the source tables
+    """
+    try:
+        result = user_stats.reconcile()
+        if result['corrected']:
+            logger.warning(f"Corrected dashboard stats for {result['corrected']} of {result['users']} users")
+        return result
+    except Exception as e:
+        logger.error(f"Error reconciling user stats: {e}")
+        return {'error': str(e)}
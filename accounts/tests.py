@@ -1,8 +1,17 @@
 
 
+from decimal import Decimal
+
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from payments.models import Payment
+from products.models import Category, Product
+from scraping.models import AlertNotification, PriceAlert
 from .models import UserProfile
+from .user_stats import user_stats
 from django.urls import reverse
 
 class UserProfileModelTest(TestCase):
@@ -30,3 +39,58 @@ class RegisterViewTest(TestCase):
         # If 200, check template; if redirect, check final URL
         if response.status_code == 200:
             self.assertTemplateUsed(response, 'accounts/register.html')
+
+
+class UserStatsTest(TestCase):
+    """Dashboard rollups follow model changes and reconcile to the source tables"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='statsuser')
+        category = Category.objects.create(name='Stats', slug='stats')
+        self.product = Product.objects.create(
+            name='Stats', slug='stats', category=category, description='desc', price=Decimal('30.00'), stock_quantity=5
+        )
+
+    def test_payment_status_changes_move_the_counters(self):
+        payment = Payment.objects.create(user=self.user, amount=Decimal('5.00'))
+        Payment.objects.create(user=self.user, amount=Decimal('5.00'), status='failed')
+        payment.mark_as_completed()
+
+        stats = user_stats.for_user(self.user)
+        self.assertEqual(
+            (stats.payments_total, stats.payments_succeeded, stats.payments_pending, stats.payments_failed),
+            (2, 1, 0, 1)
+        )
+        payment.delete()
+        stats.refresh_from_db()
+        self.assertEqual((stats.payments_total, stats.payments_succeeded), (1, 0))
+
+    def test_triggered_alert_and_notification_counted(self):
+        alert = PriceAlert.objects.create(
+            user=self.user, product=self.product, alert_type='below', target_price=Decimal('20.00')
+        )
+        alert.status = 'triggered'
+        alert.last_triggered = timezone.now()
+        alert.save()
+        AlertNotification.objects.create(alert=alert, channel='email', status='sent', message='m', recipient='r')
+
+        stats = user_stats.for_user(self.user)
+        self.assertEqual((stats.alerts_total, stats.alerts_active, stats.alerts_triggered, stats.alerts_product), (1, 0, 1, 1))
+        self.assertEqual(stats.triggered_today, 1)
+        self.assertEqual(stats.savings_month_to_date, Decimal('10.00'))
+
+        # A re-save that changes nothing counted costs no stats query
+        alert = PriceAlert.objects.get(pk=alert.pk)
+        with CaptureQueriesContext(connection) as queries:
+            alert.save()
+        self.assertFalse(any('accounts_userstats' in q['sql'] for q in queries.captured_queries))
+
+    def test_reconcile_corrects_drift_from_bulk_updates(self):
+        Payment.objects.create(user=self.user, amount=Decimal('5.00'))
+        Payment.objects.filter(user=self.user).update(status='succeeded')  # no signals
+        self.assertEqual(user_stats.for_user(self.user).payments_succeeded, 0)
+
+        result = user_stats.reconcile()
+        self.assertEqual(result['corrected'], 1)
+        stats = user_stats.for_user(self.user)
+        self.assertEqual((stats.payments_pending, stats.payments_succeeded), (0, 1))
@@ -0,0 +1,305 @@
+"""
+Express Deals - User Dashboard Stats
+The payment and alert dashboards read one UserStats row per user. Saves
+adjust its counters with a single UPDATE inside the same transaction;
+a nightly job recomputes every row from the source tables, catching
+anything signals can't see (queryset.update(), raw SQL, cascades).
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime, time as dt_time
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from payments.models import Payment
+from products.models import Product
+from scraping.models import AlertNotification, PriceAlert
+from .models import UserStats
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_STATUS_FIELDS = {
+    'succeeded': 'payments_succeeded',
+    'pending': 'payments_pending',
+    'failed': 'payments_failed',
+}
+ALERT_STATUS_FIELDS = {
+    'active': 'alerts_active',
+    'triggered': 'alerts_triggered',
+    'paused': 'alerts_paused',
+    'expired': 'alerts_expired',
+}
+COUNTER_FIELDS = (
+    ['payments_total', *PAYMENT_STATUS_FIELDS.values()]
+    + ['alerts_total', *ALERT_STATUS_FIELDS.values(), 'alerts_url', 'alerts_product', 'alerts_keyword']
+)
+SNAPSHOT_FIELDS = {
+    Payment: ('user_id', 'status'),
+    PriceAlert: ('user_id', 'status', 'product_id', 'product_url', 'search_keywords', 'target_price', 'last_triggered'),
+}
+RECONCILE_BATCH_SIZE = 500
+ZERO = Decimal('0.00')
+
+
+def month_start():
+    return timezone.localdate().replace(day=1)
+
+
+def alert_savings_expression():
+    """What a triggered alert saves: current product price over the target, floored at zero"""
+    return Greatest(
+        F('product__price') - F('target_price'), Value(ZERO),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    )
+
+
+class UserStatsService:
+    """Keep UserStats rows current incrementally and reconcile them in bulk"""
+
+    def __init__(self):
+        self.stats = {'increments': 0, 'rebuilds': 0, 'reconciled': 0, 'corrected': 0}
+
+    # Reads
+
+    def for_user(self, user) -> UserStats:
+        """The user's stats row, built on first use"""
+        stats = UserStats.objects.filter(user=user).first()
+        return stats if stats is not None else self.rebuild(user.pk)
+
+    # Incremental maintenance - called from the signal receivers in accounts.models
+
+    def remember(self, instance):
+        """Snapshot the counted fields as loaded, so a later save can be diffed without a query"""
+        fields = SNAPSHOT_FIELDS[type(instance)]
+        if instance.pk is None or instance.get_deferred_fields().intersection(fields):
+            instance._stats_snapshot = None
+        else:
+            instance._stats_snapshot = self._snapshot(instance)
+
+    def saved(self, instance, created: bool):
+        if isinstance(instance, AlertNotification):
+            if created:
+                self._apply(instance.alert.user_id, notifications=1)
+            return
+
+        new = self._snapshot(instance)
+        old = None if created else getattr(instance, '_stats_snapshot', None)
+        instance._stats_snapshot = new
+        if not created and old is None:
+            # Loaded with counted fields deferred - recount this user
+            self.rebuild(new['user_id'])
+            return
+        if old == new:
+            return  # Nothing the dashboards count changed - no query
+
+        old_counters = self._counters(old) if old is not None else Counter()
+        old_savings = self._savings(old) if old is not None else ZERO
+        new_counters, new_savings = self._counters(new), self._savings(new, instance)
+        if old is not None and old['user_id'] != new['user_id']:
+            self._apply(old['user_id'], {name: -count for name, count in old_counters.items()}, -old_savings)
+            old_counters, old_savings = Counter(), ZERO
+        deltas = {name: new_counters[name] - old_counters[name] for name in new_counters | old_counters}
+        self._apply(new['user_id'], deltas, new_savings - old_savings)
+
+    def deleted(self, instance):
+        old = getattr(instance, '_stats_snapshot', None) or self._snapshot(instance)
+        # Never recreate a row here: the user itself may be mid-delete
+        self._apply(
+            old['user_id'], {name: -count for name, count in self._counters(old).items()},
+            -self._savings(old, instance), create_missing=False
+        )
+
+    # Reconciliation
+
+    def rebuild(self, user_id: int) -> UserStats:
+        """Recount one user from the source tables"""
+        self.stats['rebuilds'] += 1
+        values = self.compute([user_id])[user_id]
+        try:
+            with transaction.atomic():
+                stats, _ = UserStats.objects.update_or_create(
+                    user_id=user_id, defaults={**values, 'reconciled_at': timezone.now()}
+                )
+        except IntegrityError:
+            # Another request created the row first
+            stats = UserStats.objects.get(user_id=user_id)
+        return stats
+
+    def reconcile(self, batch_size: int = RECONCILE_BATCH_SIZE) -> Dict:
+        """Recompute every user's row, a batch of users at a time; returns what changed"""
+        result = {'users': 0, 'created': 0, 'corrected': 0}
+        last_pk = 0
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+            with transaction.atomic():
+                # Hold the rows so increments made during the recount wait rather than get overwritten
+                existing = {
+                    stats.user_id: stats
+                    for stats in UserStats.objects.select_for_update().filter(user_id__in=user_ids)
+                }
+                computed = self.compute(user_ids)
+                now = timezone.now()
+
+                to_create, to_update = [], []
+                for user_id, values in computed.items():
+                    stats = existing.get(user_id)
+                    if stats is None:
+                        to_create.append(UserStats(user_id=user_id, reconciled_at=now, **values))
+                        continue
+                    drift = {name: value for name, value in values.items() if getattr(stats, name) != value}
+                    if any(name in drift for name in COUNTER_FIELDS + ['savings_this_month', 'notifications_today']):
+                        logger.info(f"User {user_id} stats corrected: {drift}")
+                        result['corrected'] += 1
+                    for name, value in values.items():
+                        setattr(stats, name, value)
+                    stats.reconciled_at = now
+                    to_update.append(stats)
+
+                UserStats.objects.bulk_create(to_create)
+                if to_update:
+                    UserStats.objects.bulk_update(to_update, [*values, 'reconciled_at'])
+            result['users'] += len(user_ids)
+            result['created'] += len(to_create)
+
+        self.stats['reconciled'] += result['users']
+        self.stats['corrected'] += result['corrected']
+        return result
+
+    def compute(self, user_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Every counter for these users, from grouped aggregate queries"""
+        user_ids = list(user_ids)
+        today, this_month = timezone.localdate(), month_start()
+        rows = {
+            user_id: {
+                **{name: 0 for name in COUNTER_FIELDS},
+                'notifications_date': today, 'notifications_today': 0,
+                'savings_month': this_month, 'savings_this_month': ZERO,
+            }
+            for user_id in user_ids
+        }
+
+        payments = (
+            Payment.objects.filter(user_id__in=user_ids).values('user_id').order_by()
+            .annotate(
+                payments_total=Count('id'),
+                **{name: Count('id', filter=Q(status=status)) for status, name in PAYMENT_STATUS_FIELDS.items()}
+            )
+        )
+        triggered_this_month = Q(
+            status='triggered', last_triggered__gte=self._start_of(this_month),
+            product__isnull=False, target_price__isnull=False,
+        )
+        alerts = (
+            PriceAlert.objects.filter(user_id__in=user_ids).values('user_id').order_by()
+            .annotate(
+                alerts_total=Count('id'),
+                **{name: Count('id', filter=Q(status=status)) for status, name in ALERT_STATUS_FIELDS.items()},
+                alerts_url=Count('id', filter=Q(product_url__isnull=False) & ~Q(product_url='')),
+                alerts_product=Count('id', filter=Q(product__isnull=False)),
+                alerts_keyword=Count('id', filter=Q(search_keywords__isnull=False) & ~Q(search_keywords='')),
+                savings_this_month=Sum(alert_savings_expression(), filter=triggered_this_month),
+            )
+        )
+        notifications = (
+            AlertNotification.objects.filter(alert__user_id__in=user_ids, sent_at__date=today)
+            .values('alert__user_id').order_by().annotate(notifications_today=Count('id'))
+        )
+
+        for row in [*payments, *alerts]:
+            user_id = row.pop('user_id')
+            rows[user_id].update({name: value for name, value in row.items() if value is not None})
+        for row in notifications:
+            rows[row['alert__user_id']]['notifications_today'] = row['notifications_today']
+        for values in rows.values():
+            values['savings_this_month'] = Decimal(values['savings_this_month']).quantize(ZERO)
+        return rows
+
+    def get_stats(self) -> Dict:
+        """Maintenance counts for this process"""
+        return {**self.stats, 'rows': UserStats.objects.count()}
+
+    # Internals
+
+    def _snapshot(self, instance) -> Dict:
+        return {name: getattr(instance, name) for name in SNAPSHOT_FIELDS[type(instance)]}
+
+    def _counters(self, snapshot: Dict) -> Counter:
+        counters = Counter()
+        if 'product_url' in snapshot:
+            counters['alerts_total'] = 1
+            status_field = ALERT_STATUS_FIELDS.get(snapshot['status'])
+            counters['alerts_url'] = int(bool(snapshot['product_url']))
+            counters['alerts_product'] = int(snapshot['product_id'] is not None)
+            counters['alerts_keyword'] = int(bool(snapshot['search_keywords']))
+        else:
+            counters['payments_total'] = 1
+            status_field = PAYMENT_STATUS_FIELDS.get(snapshot['status'])
+        if status_field:
+            counters[status_field] = 1
+        return counters
+
+    def _savings(self, snapshot: Dict, instance=None) -> Decimal:
+        """This month's saving an alert in this state contributes (product price looked up only if it counts)"""
+        if (
+            snapshot.get('status') != 'triggered' or snapshot['product_id'] is None
+            or snapshot['target_price'] is None or snapshot['last_triggered'] is None
+            or snapshot['last_triggered'] < self._start_of(month_start())
+        ):
+            return ZERO
+        product = getattr(instance, 'product', None) if instance is not None and instance.product_id == snapshot['product_id'] else None
+        price = product.price if product is not None else (
+            Product.objects.filter(pk=snapshot['product_id']).values_list('price', flat=True).first()
+        )
+        if price is None:
+            return ZERO
+        return max(Decimal(price) - Decimal(snapshot['target_price']), ZERO)
+
+    def _apply(self, user_id: int, deltas: Optional[Dict[str, int]] = None, savings: Decimal = ZERO,
+               notifications: int = 0, create_missing: bool = True):
+        """One UPDATE of the user's row; decrements floor at zero so drift can't break the save"""
+        updates = {}
+        for name, delta in (deltas or {}).items():
+            if delta > 0:
+                updates[name] = F(name) + delta
+            elif delta < 0:
+                updates[name] = Greatest(F(name) + delta, Value(0))
+        if savings:
+            this_month = month_start()
+            updates['savings_this_month'] = Case(
+                When(savings_month=this_month, then=Greatest(F('savings_this_month') + savings, Value(ZERO))),
+                default=Value(max(savings, ZERO)),
+            )
+            updates['savings_month'] = Value(this_month)
+        if notifications:
+            today = timezone.localdate()
+            updates['notifications_today'] = Case(
+                When(notifications_date=today, then=F('notifications_today') + notifications),
+                default=Value(notifications),
+            )
+            updates['notifications_date'] = Value(today)
+        if not updates:
+            return
+
+        self.stats['increments'] += 1
+        if not UserStats.objects.filter(user_id=user_id).update(**updates, updated_at=timezone.now()) and create_missing:
+            # First activity since the row was last built - count it all from scratch
+            self.rebuild(user_id)
+
+    def _start_of(self, day) -> datetime:
+        return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+# Global user stats instance
+user_stats = UserStatsService()
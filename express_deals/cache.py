@@ -0,0 +1,317 @@
+"""
+Express Deals - Tiered Cache
+A bounded in-process LRU (with TTL) in front of the shared cache (Redis or
+the database cache), so hot keys stop costing a network/SQL round trip.
+Keys are namespaced per subsystem ("namespace:key") and counted per
+namespace; get_or_set() recomputes a missing value once, not once per caller.
+"""
+
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+try:
+    from prometheus_client import Counter
+except ImportError:  # prometheus_client not installed - counters stay in-process only
+    Counter = None
+
+logger = logging.getLogger(__name__)
+
+if Counter is not None:
+    CACHE_LOOKUPS = Counter(
+        'express_deals_cache_lookups_total',
+        'Tiered cache lookups by namespace and the tier that answered',
+        ['namespace', 'result']
+    )
+    CACHE_EVICTIONS = Counter(
+        'express_deals_cache_evictions_total',
+        'Entries evicted from the in-process cache tier to stay under its size bound',
+        ['namespace']
+    )
+
+# The local tier is shared by every thread in the process, keyed by cache alias
+# (Django builds one backend instance per thread)
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+_MISSING = object()
+
+
+def key_namespace(key) -> str:
+    key = str(key)
+    return key.split(':', 1)[0] if ':' in key else 'default'
+
+
+class LocalTier:
+    """Thread-safe LRU of pickled values with per-entry expiry, plus per-namespace counters"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (expires_at, pickled, namespace)
+        self.lock = threading.Lock()
+        self.stats = defaultdict(lambda: {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0})
+        self.flights = {}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(entry[1])
+
+    def set(self, key, value, timeout: float, namespace: str):
+        if timeout <= 0:
+            self.delete(key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        evicted = []
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, pickled, namespace)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                evicted.append(self.entries.popitem(last=False)[1][2])
+        for evicted_namespace in evicted:
+            self.count(evicted_namespace, 'evictions')
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, namespace: str, result: str):
+        self.stats[namespace][result] += 1
+        if Counter is not None:
+            if result == 'evictions':
+                CACHE_EVICTIONS.labels(namespace=namespace).inc()
+            else:
+                CACHE_LOOKUPS.labels(namespace=namespace, result=result).inc()
+
+    def flight(self, key) -> threading.Lock:
+        with self.lock:
+            return self.flights.setdefault(key, threading.Lock())
+
+    def land(self, key):
+        with self.lock:
+            self.flights.pop(key, None)
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend reading through an in-process tier to a shared cache alias.
+    Writes go to both tiers; the local copy lives at most LOCAL_TIMEOUT
+    seconds, which bounds how stale another process's write can look here.
+    Counters (incr/decr) always go to the shared tier.
+
+    OPTIONS: SHARED_ALIAS (default 'default'), LOCAL_MAX_ENTRIES (1024),
+    LOCAL_TIMEOUT (30 seconds), LOCK_TIMEOUT (30 seconds, single-flight lease).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED_ALIAS', 'default')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        name = location or self.shared_alias
+        with _tiers_lock:
+            self.local = _tiers.setdefault(name, LocalTier(options.get('LOCAL_MAX_ENTRIES', 1024)))
+
+    @property
+    def shared(self) -> BaseCache:
+        return caches[self.shared_alias]
+
+    def _local_timeout(self, timeout) -> float:
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return min(self.local_timeout, timeout - time.time())
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        namespace = key_namespace(key)
+        value = self.local.get(local_key)
+        if value is not _MISSING:
+            self.local.count(namespace, 'local_hits')
+            return value
+
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self.local.count(namespace, 'misses')
+            return default
+        self.local.count(namespace, 'shared_hits')
+        self.local.set(local_key, value, self.local_timeout, namespace)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self.local.set(local_key, value, self._local_timeout(timeout), key_namespace(key))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # add() is how locks and counters start, so only the shared tier decides
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.add(key, value, timeout=timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self.make_and_validate_key(key, version=version))
+        return self.shared.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def get_many(self, keys, version=None):
+        found, remote = {}, []
+        for key in keys:
+            value = self.local.get(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                self.local.count(key_namespace(key), 'local_hits')
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            for key in remote:
+                namespace = key_namespace(key)
+                if key in fetched:
+                    self.local.count(namespace, 'shared_hits')
+                    self.local.set(self.make_key(key, version=version), fetched[key], self.local_timeout, namespace)
+                    found[key] = fetched[key]
+                else:
+                    self.local.count(namespace, 'misses')
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        local_timeout = self._local_timeout(timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self.local.set(self.make_and_validate_key(key, version=version), value, local_timeout, key_namespace(key))
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.local.delete(self.make_and_validate_key(key, version=version))
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Drop this process's copies only"""
+        self.local.clear()
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Single-flight read-through: threads in this process queue on a lock and
+        other processes wait on a shared lease key, so only one caller runs
+        ``default()`` for a missing key.
+        """
+        value = self.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        if not callable(default):
+            self.add(key, default, timeout=timeout, version=version)
+            return self.get(key, default, version=version)
+
+        local_key = self.make_and_validate_key(key, version=version)
+        with self.local.flight(local_key):
+            value = self.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                return value
+            try:
+                return self._compute_once(key, default, timeout, version)
+            finally:
+                self.local.land(local_key)
+
+    def _compute_once(self, key, compute, timeout, version):
+        lease = f"{key}:lease"
+        if not self.shared.add(lease, 1, timeout=self.lock_timeout, version=version):
+            # Another process is computing it - wait for its result, then give up and compute
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = self.shared.get(key, _MISSING, version=version)
+                if value is not _MISSING:
+                    self.local.set(self.make_key(key, version=version), value, self.local_timeout, key_namespace(key))
+                    return value
+            logger.warning(f"Single-flight lease for {key} expired, recomputing")
+        try:
+            value = compute()
+            self.set(key, value, timeout=timeout, version=version)
+            return value
+        finally:
+            self.shared.delete(lease, version=version)
+
+    def get_stats(self) -> dict:
+        """Per-namespace counters for this process, with hit rates"""
+        stats = {}
+        for namespace, counts in list(self.local.stats.items()):
+            counts = dict(counts)
+            lookups = counts['local_hits'] + counts['shared_hits'] + counts['misses']
+            counts['hit_rate'] = round((counts['local_hits'] + counts['shared_hits']) / lookups, 3) if lookups else 0.0
+            stats[namespace] = counts
+        stats['_local'] = {'entries': len(self.local.entries), 'max_entries': self.local.max_entries}
+        return stats
+
+
+class CacheNamespace:
+    """
+    Key-prefixing view of a cache for one subsystem, e.g. CacheNamespace('selectors').get(site_id).
+    Values other processes must see immediately (rate counters) should use the shared alias.
+    """
+
+    def __init__(self, namespace: str, alias: str = 'tiered'):
+        self.namespace = namespace
+        self.alias = alias
+
+    @property
+    def cache(self) -> BaseCache:
+        return caches[self.alias]
+
+    def key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key, default=None):
+        return self.cache.get(self.key(key), default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.cache.set(self.key(key), value, timeout=timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        return self.cache.add(self.key(key), value, timeout=timeout)
+
+    def delete(self, key):
+        return self.cache.delete(self.key(key))
+
+    def incr(self, key, delta: int = 1, timeout=DEFAULT_TIMEOUT) -> int:
+        """Shared counter; created at ``delta`` with ``timeout`` if missing"""
+        if self.cache.add(self.key(key), delta, timeout=timeout):
+            return delta
+        try:
+            return self.cache.incr(self.key(key), delta)
+        except ValueError:  # Expired between add() and incr()
+            self.cache.set(self.key(key), delta, timeout=timeout)
+            return delta
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT):
+        return self.cache.get_or_set(self.key(key), default, timeout=timeout)
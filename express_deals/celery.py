@@ -6,6 +6,7 @@ Background task processing for scraping and price monitoring
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -44,6 +45,11 @@ app.conf.beat_schedule = {
         'task': 'scraping.tasks.cleanup_old_data',
         'schedule': crontab(hour=2, minute=0),
     },
+    # Create upcoming ScrapedProduct partitions daily, ahead of the 2 AM retention run
+    'maintain-partitions': {
+        'task': 'scraping.tasks.maintain_partitions',
+        'schedule': crontab(hour=1, minute=30),
+    },
     # Update trending deals every 30 minutes
     'update-trending-deals': {
         'task': 'scraping.tasks.update_trending_deals',
@@ -54,6 +60,21 @@ app.conf.beat_schedule = {
         'task': 'scraping.tasks.monitor_scrape_jobs',
         'schedule': 900.0,  # 15 minutes
     },
+    # Apply Stripe webhook events whose task was lost or gave up
+    'process-pending-stripe-events': {
+        'task': 'payments.tasks.process_pending_stripe_events',
+        'schedule': 60.0,  # 1 minute
+    },
+    # Return stock held by unpaid checkouts every minute
+    'release-expired-reservations': {
+        'task': 'orders.tasks.release_expired_reservations',
+        'schedule': 60.0,  # 1 minute
+    },
+    # Recount per-user dashboard stats nightly at 3 AM
+    'reconcile-user-stats': {
+        'task': 'accounts.tasks.reconcile_user_stats',
+        'schedule': crontab(hour=3, minute=0),
+    },
 }
 
 # Enhanced Celery Configuration
@@ -94,6 +115,13 @@ app.conf.update(
     },
 )
 
+@worker_process_shutdown.connect
+def cleanup_worker_metrics(pid=None, **kwargs):
+    """Let the multiprocess metrics collector forget prefork children that exit"""
+    from .metrics import mark_process_dead
+    mark_process_dead(pid or os.getpid())
+
+
 @app.task(bind=True)
 def debug_task(self):
     """Debug task to test Celery functionality."""
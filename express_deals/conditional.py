@@ -0,0 +1,69 @@
+"""
+Express Deals - Conditional GET
+ETag / Last-Modified validators for read-heavy views. Validators come from
+cheap aggregate queries, so an unchanged page answers 304 before the
+listing, pagination and facet queries run.
+"""
+
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag over JSON-serializable validator parts"""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(',', ':'))
+    return f'"{hashlib.md5(payload.encode("utf-8")).hexdigest()}"'
+
+
+def viewer_state(request):
+    """
+    The per-visitor parts of a rendered page (header cart count, CSRF secret).
+    Returns None when flash messages are pending, since a 304 would hide them.
+    """
+    storage = getattr(request, '_messages', None)
+    if storage is not None and len(storage):
+        return None
+    from .context_processors import cart_processor
+    cart_items = cart_processor(request)['cart_total_items']
+    if request.user.is_authenticated:
+        return ['user', request.user.pk, cart_items]
+    return ['anon', request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''), cart_items]
+
+
+def latest(*timestamps):
+    """Most recent of the given datetimes, ignoring None"""
+    timestamps = [ts for ts in timestamps if ts is not None]
+    return max(timestamps) if timestamps else None
+
+
+def conditional_view(validators):
+    """
+    Decorator answering If-None-Match / If-Modified-Since for a view.
+    ``validators(request, *args, **kwargs)`` returns (etag, last_modified),
+    either of which may be None; it runs once per request.
+
+    Pages served by FetchFromCacheMiddleware never reach the view; they are
+    revalidated by ConditionalGetMiddleware against the stored ETag.
+    """
+    def decorator(view_func):
+        def resolve(request, *args, **kwargs):
+            if not hasattr(request, '_conditional_validators'):
+                try:
+                    request._conditional_validators = validators(request, *args, **kwargs) or (None, None)
+                except Exception as e:
+                    # Validators are an optimisation - fall back to a full render
+                    logger.warning(f"Conditional GET validators failed for {request.path}: {e}")
+                    request._conditional_validators = (None, None)
+            return request._conditional_validators
+
+        return condition(
+            etag_func=lambda request, *args, **kwargs: resolve(request, *args, **kwargs)[0],
+            last_modified_func=lambda request, *args, **kwargs: resolve(request, *args, **kwargs)[1],
+        )(view_func)
+    return decorator
@@ -1,7 +1,7 @@
 """
 Context processors for Express Deals
 """
-from orders.models import Cart
+from orders.summary import get_cart_item_count
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,15 +12,12 @@ def cart_processor(request):
     cart_total_items = 0
     
     try:
-        if request.user.is_authenticated:
-            try:
-                cart = Cart.objects.get(user=request.user)
-                cart_total_items = cart.total_items
-            except Cart.DoesNotExist:
-                cart_total_items = 0
-            except Exception as e:
-                logger.error(f"Database error in cart_processor for user {request.user.id}: {e}")
-                cart_total_items = 0
+        try:
+            # Cached per user (or read from the cookie cart); free on cache hits
+            cart_total_items = get_cart_item_count(request)
+        except Exception as e:
+            logger.error(f"Database error in cart_processor for user {request.user.id}: {e}")
+            cart_total_items = 0
     except Exception as e:
         logger.error(f"Context processor error: {e}")
         cart_total_items = 0
@@ -1,9 +1,13 @@
 """
 Simple health check views for debugging
 """
+from django.conf import settings
 from django.http import HttpResponse
 from django.db import connection
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
 from products.models import Product, Category
+from .metrics import export_metrics
 
 def health_check(request):
     """Basic health check"""
@@ -29,3 +33,19 @@ def health_check(request):
         <h1>Health Check</h1>
         <p>❌ Error: {str(e)}</p>
         """, content_type="text/html", status=500)
+
+
+@never_cache
+def metrics_view(request):
+    """Prometheus scrape endpoint, protected by METRICS_AUTH_TOKEN (open without one only when DEBUG)"""
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if not token and not settings.DEBUG:
+        # Fail closed: metrics expose retailer, job, queue and cache internals
+        return HttpResponse('Not Found', status=404, content_type='text/plain')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not constant_time_compare(supplied, token):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+
+    payload, content_type = export_metrics()
+    return HttpResponse(payload, content_type=content_type)
@@ -0,0 +1,190 @@
+"""
+Express Deals - Pipeline Instrumentation
+Latency histograms and counters per pipeline stage, exported as
+Prometheus text. Set PROMETHEUS_MULTIPROC_DIR (before the process
+starts) to aggregate across gunicorn workers and Celery prefork children.
+"""
+
+import functools
+import inspect
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from django.utils.text import slugify
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+    )
+except ImportError:  # prometheus_client not installed - hooks become no-ops
+    CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+    Counter = Histogram = None
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('fetch', 'parse', 'extract', 'transform', 'load', 'notify')
+STAGE_LABELS = ('stage', 'retailer', 'job', 'proxy_tier')
+
+# Scraping stages range from sub-millisecond parses to multi-second fetches
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+if Histogram is not None:
+    STAGE_SECONDS = Histogram(
+        'express_deals_stage_duration_seconds',
+        'Time spent in a pipeline stage',
+        STAGE_LABELS,
+        buckets=LATENCY_BUCKETS
+    )
+    STAGE_CALLS = Counter(
+        'express_deals_stage_calls_total',
+        'Pipeline stage executions by outcome',
+        STAGE_LABELS + ('outcome',)
+    )
+    STAGE_ITEMS = Counter(
+        'express_deals_stage_items_total',
+        'Items (pages, products, notifications) handled by a pipeline stage',
+        STAGE_LABELS + ('outcome',)
+    )
+else:
+    STAGE_SECONDS = STAGE_CALLS = STAGE_ITEMS = None
+
+
+def retailer_label(name) -> str:
+    """Label value for a retailer: its slugified name ('Argos Electronics' -> 'argos-electronics')"""
+    return slugify(name or '') or 'unknown'
+
+
+def proxy_tier_for(proxy, premium=False) -> str:
+    """Label value for the proxy a request went through (provider name keeps cardinality bounded)"""
+    if not proxy:
+        return 'direct'
+    if premium:
+        return 'premium'
+    return getattr(proxy, 'provider', None) or 'proxy'
+
+
+class StageTimer:
+    """Handle yielded by stage_timer(); set ``outcome`` or add items while the stage runs"""
+
+    def __init__(self, stage, retailer='', job='', proxy_tier='direct'):
+        self.labels = {
+            'stage': stage,
+            'retailer': retailer or 'unknown',
+            'job': job or 'unknown',
+            'proxy_tier': proxy_tier or 'direct',
+        }
+        self.outcome = 'success'
+        self.items = {}
+        self.started = time.perf_counter()
+
+    def set_label(self, **labels):
+        for name, value in labels.items():
+            if name in self.labels and value:
+                self.labels[name] = str(value)
+
+    def add_items(self, count=1, outcome='success'):
+        self.items[outcome] = self.items.get(outcome, 0) + count
+
+    def observe(self):
+        if STAGE_SECONDS is None:
+            return
+        try:
+            STAGE_SECONDS.labels(**self.labels).observe(time.perf_counter() - self.started)
+            STAGE_CALLS.labels(outcome=self.outcome, **self.labels).inc()
+            for outcome, count in self.items.items():
+                if count:
+                    STAGE_ITEMS.labels(outcome=outcome, **self.labels).inc(count)
+        except Exception as e:
+            # Metrics must never break scraping
+            logger.debug(f"Failed to record stage metrics: {e}")
+
+
+@contextmanager
+def stage_timer(stage, retailer='', job='', proxy_tier='direct'):
+    """
+    Time a block as one pipeline stage:
+
+        with stage_timer('parse', retailer=retailer_label(target.name), job='world_class') as timer:
+            soup = BeautifulSoup(html, 'html.parser')
+            timer.add_items(len(products))
+    """
+    timer = StageTimer(stage, retailer, job, proxy_tier)
+    try:
+        yield timer
+    except Exception:
+        timer.outcome = 'error'
+        raise
+    finally:
+        timer.observe()
+
+
+def instrument(stage, job='', labels=None, none_is_failure=False):
+    """
+    Decorator form of stage_timer for sync and async callables. ``labels``
+    maps the call's arguments to extra label values, e.g.
+    ``labels=lambda self, target, *a, **kw: {'retailer': retailer_label(target.name)}``.
+    A False result, a result with ``success = False`` (or None, if
+    none_is_failure) counts as a failure.
+    """
+    def decorator(func):
+        def start(args, kwargs):
+            timer = StageTimer(stage, job=job)
+            if labels:
+                try:
+                    timer.set_label(**labels(*args, **kwargs))
+                except Exception as e:
+                    logger.debug(f"Failed to build metric labels for {func.__qualname__}: {e}")
+            return timer
+
+        def finish(timer, result):
+            if result is False or (result is None and none_is_failure) or getattr(result, 'success', True) is False:
+                timer.outcome = 'failure'
+            return result
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                timer = start(args, kwargs)
+                try:
+                    return finish(timer, await func(*args, **kwargs))
+                except Exception:
+                    timer.outcome = 'error'
+                    raise
+                finally:
+                    timer.observe()
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            timer = start(args, kwargs)
+            try:
+                return finish(timer, func(*args, **kwargs))
+            except Exception:
+                timer.outcome = 'error'
+                raise
+            finally:
+                timer.observe()
+        return wrapper
+
+    return decorator
+
+
+def export_metrics():
+    """Return (payload, content_type) in Prometheus text format"""
+    if Histogram is None:
+        return b'# prometheus_client is not installed\n', CONTENT_TYPE_LATEST
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges (gunicorn child_exit / Celery worker shutdown hook)"""
+    if Histogram is not None and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
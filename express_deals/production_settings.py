@@ -123,13 +123,11 @@ LOGGING = {
 
 # Cache configuration for production (using Redis if available)
 if os.getenv('REDIS_URL'):
-    CACHES = {
-        'default': {
-            'BACKEND': 'django_redis.cache.RedisCache',
-            'LOCATION': os.getenv('REDIS_URL'),
-            'OPTIONS': {
-                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-            }
+    CACHES['default'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
         }
     }
 
@@ -140,6 +138,8 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 # Production-specific middleware
 MIDDLEWARE.insert(1, 'django.middleware.cache.UpdateCacheMiddleware')
 MIDDLEWARE.append('django.middleware.cache.FetchFromCacheMiddleware')
+# Outside the cache middleware, so pages served from the cache still answer If-None-Match with a 304
+MIDDLEWARE.insert(1, 'django.middleware.http.ConditionalGetMiddleware')
 
 # Database connection settings for production
 DATABASES['default']['CONN_MAX_AGE'] = 60
@@ -90,6 +90,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'orders.middleware.AnonymousCartMiddleware',
 ]
 
 ROOT_URLCONF = 'express_deals.urls'
@@ -205,6 +206,9 @@ STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', 'pk_test_place
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', 'sk_test_placeholder_key')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', 'whsec_placeholder_key')
 
+# Checkout holds stock for this long (seconds) while the customer pays
+STOCK_RESERVATION_TIMEOUT = int(os.environ.get('STOCK_RESERVATION_TIMEOUT', 15 * 60))
+
 # Email Configuration
 # Development: Console backend for testing
 # Production: SMTP backend with Yahoo Mail
@@ -381,6 +385,33 @@ SCRAPING_RATE_LIMIT = 1  # Seconds between requests
 SCRAPING_MAX_RETRIES = 3
 SCRAPING_TIMEOUT = 30  # Seconds
 
+# Raw page archive (zstd blobs, deduplicated by content hash) used by `manage.py reextract`
+# Off unless SCRAPING_ARCHIVE_ENABLED=true; the raw_pages retention policy prunes rows and blobs.
+# Point SCRAPING_ARCHIVE_STORAGE at any Django storage backend for object storage
+SCRAPING_ARCHIVE_ENABLED = os.environ.get('SCRAPING_ARCHIVE_ENABLED', 'False').lower() == 'true'
+SCRAPING_ARCHIVE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+SCRAPING_ARCHIVE_OPTIONS = {'location': os.environ.get('SCRAPING_ARCHIVE_ROOT', BASE_DIR / 'scraping_archive')}
+SCRAPING_ARCHIVE_LEVEL = 10  # zstd compression level
+
+# Retention (`cleanup_old_data`, `manage.py apply_retention`) - per-policy overrides of
+# scraping.services.retention_service.DEFAULT_POLICIES, e.g. {'scraped_products': {'keep_days': 90}}
+SCRAPING_RETENTION_POLICIES = {}
+
+# PostgreSQL range partitions of ScrapedProduct by scraped_at ('month' or 'week'), created this
+# many intervals ahead by the daily maintain_partitions task. SQLite keeps a plain table.
+SCRAPING_PARTITION_INTERVAL = os.environ.get('SCRAPING_PARTITION_INTERVAL', 'month')
+SCRAPING_PARTITIONS_AHEAD = 3
+
+# Offline scraping benchmarks (`manage.py benchmark_scraping`, `manage.py fixture_server`)
+SCRAPING_BENCHMARK_FIXTURES = BASE_DIR / 'benchmarks' / 'fixtures'
+SCRAPING_BENCHMARK_RESULTS = BASE_DIR / 'benchmarks' / 'scraping_results.jsonl'
+
+# Pipeline metrics (/metrics/, Prometheus text format)
+# Multi-process servers: export PROMETHEUS_MULTIPROC_DIR (an empty, writable directory)
+# for gunicorn and Celery before they start so all workers are aggregated.
+# Prometheus sends "Authorization: Bearer <token>"; without a token /metrics/ is 404 unless DEBUG
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN', '')
+
 # Chrome/Selenium Configuration (Development)
 CHROME_DRIVER_PATH = None  # Use system PATH
 SELENIUM_HEADLESS = True
@@ -401,10 +432,19 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'cache_table',
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'MAX_ENTRIES': 10000,
             'CULL_PERCENTAGE': 25,
         }
-    }
+    },
+    # Per-process LRU in front of 'default' for hot, namespaced keys (see express_deals/cache.py)
+    'tiered': {
+        'BACKEND': 'express_deals.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'default',
+            'LOCAL_MAX_ENTRIES': 1024,
+            'LOCAL_TIMEOUT': 30,
+        }
+    },
 }
 
 # Session Configuration (Database sessions for stability, Redis for caching)
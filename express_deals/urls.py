@@ -6,11 +6,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from .health_views import health_check
+from .health_views import health_check, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('health/', health_check, name='health_check'),  # Debug endpoint
+    path('metrics/', metrics_view, name='metrics'),  # Prometheus scrape endpoint
     path('', include('products.urls')),
     path('accounts/', include('accounts.urls')),
     path('orders/', include('orders.urls')),
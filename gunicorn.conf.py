@@ -0,0 +1,9 @@
+"""
+Gunicorn configuration - picked up automatically from the project root
+"""
+
+
+def child_exit(server, worker):
+    """Let the multiprocess metrics collector forget workers that exit"""
+    from express_deals.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
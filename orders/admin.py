@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import Cart, CartItem, Order, OrderItem, WishlistItem
+from .models import Cart, CartItem, Order, OrderItem, StockReservation, WishlistItem
 
 admin.site.register(Cart)
 admin.site.register(CartItem)
 admin.site.register(Order)
 admin.site.register(OrderItem)
+admin.site.register(StockReservation)
 admin.site.register(WishlistItem)
@@ -0,0 +1,173 @@
+"""
+Express Deals - Anonymous Carts
+Signed-out visitors keep their cart in a signed cookie, so browsing and
+filling a cart writes nothing to the database. The cookie cart is merged
+into the user's database cart with one upsert when they sign in.
+"""
+
+import json
+import logging
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from products.models import Product
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+COOKIE_NAME = getattr(settings, 'ANONYMOUS_CART_COOKIE_NAME', 'cart')
+COOKIE_SALT = 'orders.anonymous_cart'
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+MAX_LINES = 50  # Keeps the signed cookie well under the 4KB browser limit
+MAX_QUANTITY = 100
+
+
+class AnonymousCart:
+    """
+    Cookie-backed stand-in for Cart with the same read interface
+    (items, total_items, subtotal, tax_amount, shipping_cost, total, clear).
+    Lines are {product_id: quantity}; transient CartItems use the product id
+    as their id, which is what the update/remove views receive back.
+    """
+
+    user = None
+    session_key = None
+
+    def __init__(self, lines: Optional[Dict[int, int]] = None):
+        self.lines = dict(lines or {})
+        self.modified = False
+
+    @classmethod
+    def from_request(cls, request) -> 'AnonymousCart':
+        value = request.get_signed_cookie(COOKIE_NAME, default=None, salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE)
+        if not value:
+            return cls()
+        try:
+            lines = {int(product_id): int(quantity) for product_id, quantity in json.loads(value).items()}
+        except (ValueError, AttributeError, TypeError):
+            logger.warning("Discarding malformed anonymous cart cookie")
+            return cls()
+        return cls({pid: min(qty, MAX_QUANTITY) for pid, qty in lines.items() if qty > 0})
+
+    def __str__(self):
+        return "Anonymous cart"
+
+    def __bool__(self):
+        return bool(self.lines)
+
+    # Mutations - only the cookie changes
+
+    def add(self, product, quantity: int = 1):
+        if product.pk not in self.lines and len(self.lines) >= MAX_LINES:
+            raise ValueError(f"A cart can hold at most {MAX_LINES} different products")
+        self.set_quantity(product.pk, self.lines.get(product.pk, 0) + quantity)
+
+    def set_quantity(self, product_id: int, quantity: int):
+        self.lines[int(product_id)] = min(quantity, MAX_QUANTITY)
+        self._changed()
+
+    def remove(self, product_id: int) -> bool:
+        removed = self.lines.pop(int(product_id), None) is not None
+        if removed:
+            self._changed()
+        return removed
+
+    def clear(self):
+        if self.lines:
+            self.lines = {}
+            self._changed()
+
+    def _changed(self):
+        self.modified = True
+        self.__dict__.pop('items', None)
+
+    # Cart interface
+
+    @property
+    def total_items(self) -> int:
+        return sum(self.lines.values())
+
+    @cached_property
+    def items(self) -> List[CartItem]:
+        """Unsaved CartItems for the active products in the cookie, loaded in one query"""
+        if not self.lines:
+            return []
+        products = Product.objects.filter(pk__in=self.lines, is_active=True).select_related('category').in_bulk()
+        # Newest line first, like CartItem's -added_at ordering
+        return [
+            CartItem(id=pid, product=products[pid], quantity=quantity)
+            for pid, quantity in reversed(self.lines.items()) if pid in products
+        ]
+
+    def summary(self):
+        from .summary import CartSummary
+        return CartSummary.from_items(self.items, self)
+
+    @property
+    def subtotal(self):
+        return self.summary().subtotal
+
+    @property
+    def tax_amount(self):
+        return self.summary().tax_amount
+
+    @property
+    def shipping_cost(self):
+        return self.summary().shipping_cost
+
+    @property
+    def total(self):
+        return self.summary().total
+
+    # Persistence
+
+    def save(self, response):
+        """Write the cookie back if the cart changed during this request"""
+        if not self.modified:
+            return
+        if self.lines:
+            response.set_signed_cookie(
+                COOKIE_NAME, json.dumps(self.lines, separators=(',', ':')), salt=COOKIE_SALT,
+                max_age=COOKIE_MAX_AGE, secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax'
+            )
+        else:
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
+        self.modified = False
+
+    def merge_into(self, user) -> Optional[Cart]:
+        """
+        Add these lines to the user's database cart with a single upsert
+        (quantities add up, capped at MAX_QUANTITY), then empty the cookie.
+        """
+        if not self.lines:
+            return None
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user=user)
+            existing = dict(
+                CartItem.objects.filter(cart=cart, product_id__in=self.lines).values_list('product_id', 'quantity')
+            )
+            active = Product.objects.filter(pk__in=self.lines, is_active=True).values_list('pk', flat=True)
+            merged = [
+                CartItem(cart=cart, product_id=pid, quantity=min(existing.get(pid, 0) + self.lines[pid], MAX_QUANTITY))
+                for pid in active
+            ]
+            CartItem.objects.bulk_create(
+                merged, update_conflicts=True, unique_fields=['cart', 'product'], update_fields=['quantity']
+            )
+
+        # bulk_create skips CartItem signals, so drop the badge count here
+        from .summary import cart_item_counts
+        cart_item_counts.invalidate(user.pk)
+        logger.info(f"Merged {len(merged)} anonymous cart lines into cart for user {user.pk}")
+        self.clear()
+        return cart
+
+
+def get_anonymous_cart(request) -> AnonymousCart:
+    """The visitor's cookie cart, parsed at most once per request"""
+    if not hasattr(request, '_anonymous_cart'):
+        request._anonymous_cart = AnonymousCart.from_request(request)
+    return request._anonymous_cart
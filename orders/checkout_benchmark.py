@@ -0,0 +1,141 @@
+"""
+Express Deals - Flash Sale Checkout Benchmark
+Many threads check out the same limited-stock product at once through
+place_order(); the result shows orders/sec and proves stock never oversells
+"""
+
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict
+
+from django.contrib.auth.models import User
+from django.db import OperationalError, connections
+
+from products.models import Category, Product
+from .models import CartItem, OrderItem, StockReservation
+from .reservations import InsufficientStock, place_order
+from .summary import CartSummary
+
+SHIPPING = {
+    'shipping_name': 'Benchmark Shopper',
+    'shipping_email': 'benchmark@example.com',
+    'shipping_address_line1': '1 Flash Sale Street',
+    'shipping_city': 'London',
+    'shipping_state': 'London',
+    'shipping_postal_code': 'EC1A 1AA',
+}
+
+
+@dataclass
+class CheckoutBenchmarkResult:
+    """Outcome counts for one flash-sale run"""
+    threads: int
+    checkouts: int
+    stock: int
+    quantity: int
+    elapsed_s: float = 0.0
+    outcomes: Dict[str, int] = field(default_factory=dict)
+    lock_retries: int = 0
+    final_stock: int = 0
+    units_ordered: int = 0
+    units_reserved: int = 0
+
+    @property
+    def orders_per_sec(self) -> float:
+        return round(self.outcomes.get('placed', 0) / self.elapsed_s, 1) if self.elapsed_s else 0.0
+
+    @property
+    def oversold(self) -> bool:
+        return self.units_reserved > self.stock or self.final_stock != self.stock - self.units_reserved
+
+    @property
+    def sold_out_correctly(self) -> bool:
+        """Every unit sold if demand exceeded stock, and nobody was turned away while stock remained"""
+        demand = self.checkouts * self.quantity
+        return self.units_reserved == min(self.stock - self.stock % self.quantity, demand)
+
+
+class CheckoutBenchmark:
+    """Concurrent checkouts of one product, each shopper buying ``quantity`` units"""
+
+    MAX_ATTEMPTS = 200
+
+    def __init__(self, threads: int = 16, checkouts: int = 200, stock: int = 100, quantity: int = 1):
+        self.threads = threads
+        self.checkouts = checkouts
+        self.stock = stock
+        self.quantity = quantity
+
+    def seed(self):
+        category, _ = Category.objects.get_or_create(name='Flash Sale', defaults={'slug': 'flash-sale'})
+        product = Product.objects.create(
+            name='Flash Sale Deal', slug=f"flash-sale-deal-{time.time_ns()}", category=category,
+            description='Limited stock flash deal', price=Decimal('9.99'), stock_quantity=self.stock,
+        )
+        prefix = f"flash-{time.time_ns()}"
+        User.objects.bulk_create([User(username=f"{prefix}-{number}") for number in range(self.checkouts)])
+        shoppers = list(User.objects.filter(username__startswith=prefix))
+        return product, shoppers
+
+    def run(self) -> CheckoutBenchmarkResult:
+        product, shoppers = self.seed()
+        summary = CartSummary.from_items([CartItem(product=product, quantity=self.quantity)])
+        outcomes, lock = Counter(), threading.Lock()
+        retries = [0]
+        queue = iter(shoppers)
+        start = threading.Barrier(self.threads)
+
+        def worker():
+            start.wait()
+            try:
+                while True:
+                    with lock:
+                        shopper = next(queue, None)
+                    if shopper is None:
+                        return
+                    outcome, attempts = self.checkout(shopper, summary)
+                    with lock:
+                        outcomes[outcome] += 1
+                        retries[0] += attempts - 1
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        reservations = StockReservation.objects.filter(product=product)
+        return CheckoutBenchmarkResult(
+            threads=self.threads,
+            checkouts=self.checkouts,
+            stock=self.stock,
+            quantity=self.quantity,
+            elapsed_s=round(elapsed, 3),
+            outcomes=dict(outcomes),
+            lock_retries=retries[0],
+            final_stock=product.stock_quantity,
+            units_ordered=sum(OrderItem.objects.filter(product=product).values_list('quantity', flat=True)),
+            units_reserved=sum(reservations.values_list('quantity', flat=True)),
+        )
+
+    def checkout(self, shopper, summary):
+        """(outcome, attempts) for one shopper"""
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                place_order(shopper, summary, SHIPPING)
+                return 'placed', attempt
+            except InsufficientStock:
+                return 'sold_out', attempt
+            except OperationalError:
+                # SQLite refuses concurrent writers instead of queueing them; PostgreSQL waits on the row lock
+                time.sleep(random.uniform(0, 0.001 * 2 ** min(attempt, 6)))
+        return 'failed', self.MAX_ATTEMPTS
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from orders.checkout_benchmark import CheckoutBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks concurrent flash-sale checkouts of one product in a throwaway test database and checks for overselling.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent checkout threads')
+        parser.add_argument('--checkouts', type=int, default=200, help='Shoppers trying to check out')
+        parser.add_argument('--stock', type=int, default=100, help='Units of the flash deal in stock')
+        parser.add_argument('--quantity', type=int, default=1, help='Units each shopper buys')
+
+    def handle(self, *args, **options):
+        benchmark = CheckoutBenchmark(
+            threads=options['threads'], checkouts=options['checkouts'],
+            stock=options['stock'], quantity=options['quantity'],
+        )
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            result = benchmark.run()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        outcomes = result.outcomes
+        self.stdout.write(self.style.SUCCESS(
+            f"{result.checkouts} checkouts x {result.quantity} on {result.threads} threads, {result.stock} in stock"
+        ))
+        self.stdout.write(f"  Placed        {outcomes.get('placed', 0)}")
+        self.stdout.write(f"  Sold out      {outcomes.get('sold_out', 0)}")
+        self.stdout.write(f"  Failed        {outcomes.get('failed', 0)}  ({result.lock_retries} lock retries)")
+        self.stdout.write(f"  Units         {result.units_reserved} reserved, {result.units_ordered} ordered, {result.final_stock} left")
+        self.stdout.write(f"  Throughput    {result.orders_per_sec} orders/sec over {result.elapsed_s}s")
+
+        if result.oversold:
+            self.stdout.write(self.style.ERROR('  OVERSOLD: reserved units exceed the stock taken'))
+        elif not result.sold_out_correctly:
+            self.stdout.write(self.style.WARNING('  Stock left unsold while shoppers were turned away'))
+        else:
+            self.stdout.write(self.style.SUCCESS('  No overselling'))
@@ -0,0 +1,17 @@
+"""
+Express Deals - Order Middleware
+"""
+
+
+class AnonymousCartMiddleware:
+    """Writes the anonymous cookie cart back to the response when a view changed it"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        cart = getattr(request, '_anonymous_cart', None)
+        if cart is not None:
+            cart.save(response)
+        return response
@@ -1,9 +1,17 @@
-from django.db import models
+import logging
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Least
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
 from django.core.exceptions import ValidationError
-from decimal import Decimal
 from products.models import Product
 
+logger = logging.getLogger(__name__)
+
 
 class Cart(models.Model):
     """Shopping cart for users"""
@@ -26,30 +34,54 @@ class Cart(models.Model):
             return f"Cart for {self.user.username}"
         return f"Cart for session {self.session_key}"
     
+    def summary(self):
+        """Items and totals priced from a single query (see orders.summary)"""
+        from .summary import CartSummary
+        return CartSummary.for_cart(self)
+    
     @property
     def total_items(self):
         """Get total number of items in cart"""
-        return sum(item.quantity for item in self.items.all())
+        return self.summary().total_items
     
     @property
     def subtotal(self):
         """Calculate subtotal of all items"""
-        return sum(item.get_total_price() for item in self.items.all())
+        return self.summary().subtotal
     
     @property
     def tax_amount(self):
         """Calculate tax amount (20% VAT)"""
-        return self.subtotal * Decimal('0.20')
+        return self.summary().tax_amount
     
     @property
     def shipping_cost(self):
         """Calculate shipping cost (free if over £50)"""
-        return Decimal('0.00') if self.subtotal >= 50 else Decimal('4.99')
+        return self.summary().shipping_cost
     
     @property
     def total(self):
         """Calculate total including tax and shipping"""
-        return self.subtotal + self.tax_amount + self.shipping_cost
+        return self.summary().total
+    
+    def add_product(self, product, quantity=1):
+        """
+        Add to the product's line with one UPDATE (capped at 100), creating
+        the line if there isn't one, so two tabs adding at once can't lose a
+        quantity to a read-modify-write race
+        """
+        added = Least(F('quantity') + quantity, 100)
+        if self.items.filter(product=product).update(quantity=added):
+            # QuerySet.update() skips the CartItem signals
+            from .summary import cart_item_counts
+            cart_item_counts.invalidate(self.user_id)
+            return
+        try:
+            with transaction.atomic():
+                CartItem.objects.create(cart=self, product=product, quantity=min(quantity, 100))
+        except IntegrityError:
+            # Another request created the line first
+            self.add_product(product, quantity)
     
     def clear(self):
         """Clear all items from cart"""
@@ -189,6 +221,41 @@ class OrderItem(models.Model):
         return self.price * self.quantity
 
 
+class StockReservation(models.Model):
+    """Stock held for an order during the payment window (see orders.reservations)"""
+    STATUS_CHOICES = [
+        ('held', 'Held'),
+        ('committed', 'Committed'),
+        ('released', 'Released'),
+    ]
+    
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name='reservations'
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='reservations'
+    )
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default='held'
+    )
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The expiry sweep scans held reservations past their deadline
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return (
+            f"{self.quantity} x {self.product_id} {self.status} for "
+            f"order {self.order_id}"
+        )
+
+
 class WishlistItem(models.Model):
     """User wishlist items"""
     user = models.ForeignKey(
@@ -203,3 +270,44 @@ class WishlistItem(models.Model):
     
     def __str__(self):
         return f"{self.product.name} in {self.user.username}'s wishlist"
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_count(sender, instance, raw=False, **kwargs):
+    """Adds, quantity changes and removals all change the header badge count"""
+    if raw:
+        return
+    from .summary import cart_item_counts
+    if CartItem.cart.is_cached(instance):
+        user_id = instance.cart.user_id
+    else:
+        user_id = Cart.objects.filter(pk=instance.cart_id).values_list('user_id', flat=True).first()
+    cart_item_counts.invalidate(user_id)
+
+
+@receiver(post_delete, sender=Cart)
+def invalidate_deleted_cart_count(sender, instance, **kwargs):
+    from .summary import cart_item_counts
+    cart_item_counts.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender=StockReservation)
+def return_deleted_reservation(sender, instance, **kwargs):
+    """Deleting an unpaid order hands its held stock back"""
+    if instance.status == 'held':
+        from .reservations import stock_reservations
+        stock_reservations.return_stock(instance.product_id, instance.quantity)
+
+
+@receiver(user_logged_in)
+def merge_anonymous_cart(sender, request, user, **kwargs):
+    """Fold the signed-out cookie cart into the user's cart at login"""
+    if request is None:
+        return
+    from .anonymous_cart import get_anonymous_cart
+    try:
+        get_anonymous_cart(request).merge_into(user)
+    except Exception as e:
+        # Never block a login over the cart
+        logger.error(f"Failed to merge anonymous cart for user {user.pk}: {e}")
@@ -0,0 +1,175 @@
+"""
+Express Deals - Stock Reservations
+Checkout holds stock for the payment window. Stock is taken with one
+conditional UPDATE per product (stock_quantity >= n), so concurrent
+checkouts can never oversell; unpaid reservations expire and hand their
+stock back.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from products.models import Product
+from .models import Order, OrderItem, StockReservation
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TIMEOUT = getattr(settings, 'STOCK_RESERVATION_TIMEOUT', 15 * 60)
+LOW_STOCK_THRESHOLD = 5
+EXPIRY_BATCH_SIZE = 500
+
+
+class InsufficientStock(Exception):
+    """Raised by reserve() when a product can't cover the requested quantity"""
+
+    def __init__(self, product, requested: int):
+        self.product = product
+        self.requested = requested
+        super().__init__(f"Sorry, there isn't enough stock left for {product.name}")
+
+
+def stock_status_after(delta: int) -> Case:
+    """
+    stock_status for an UPDATE that adds ``delta`` to stock_quantity. The
+    conditions read the pre-update quantity, as UPDATE ... SET does.
+    """
+    return Case(
+        When(stock_quantity__lte=-delta, then=Value('out_of_stock')),
+        When(stock_quantity__lte=LOW_STOCK_THRESHOLD - delta, then=Value('low_stock')),
+        default=Value('in_stock'),
+    )
+
+
+class StockReservationService:
+    """Reserve, commit and release product stock for orders"""
+
+    def __init__(self):
+        self.timeout = RESERVATION_TIMEOUT
+        self.stats = {'reserved': 0, 'rejected': 0, 'committed': 0, 'released': 0, 'expired': 0}
+
+    def take_stock(self, product_id: int, quantity: int) -> bool:
+        """Decrement stock only if it covers ``quantity``; the row lock makes this the arbiter"""
+        return Product.objects.filter(pk=product_id, stock_quantity__gte=quantity).update(
+            stock_quantity=F('stock_quantity') - quantity,
+            stock_status=stock_status_after(-quantity),
+            # Cards and conditional GETs are keyed on updated_at
+            updated_at=timezone.now(),
+        ) == 1
+
+    def return_stock(self, product_id: int, quantity: int):
+        Product.objects.filter(pk=product_id).update(
+            stock_quantity=F('stock_quantity') + quantity,
+            stock_status=stock_status_after(quantity),
+            updated_at=timezone.now(),
+        )
+
+    def reserve(self, order: Order, items: Iterable) -> List[StockReservation]:
+        """
+        Hold stock for the order's cart items until the payment window closes.
+        Raises InsufficientStock with nothing taken; call it inside the
+        transaction that creates the order so the order rolls back too.
+        """
+        quantities: Dict[int, int] = defaultdict(int)
+        products = {}
+        for item in items:
+            quantities[item.product.pk] += item.quantity
+            products[item.product.pk] = item.product
+
+        expires_at = timezone.now() + timedelta(seconds=self.timeout)
+        with transaction.atomic():
+            # Take product rows in id order so multi-product checkouts can't deadlock
+            for product_id in sorted(quantities):
+                if not self.take_stock(product_id, quantities[product_id]):
+                    self.stats['rejected'] += 1
+                    raise InsufficientStock(products[product_id], quantities[product_id])
+            reservations = StockReservation.objects.bulk_create([
+                StockReservation(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+                for product_id, quantity in quantities.items()
+            ])
+
+        self.stats['reserved'] += 1
+        return reservations
+
+    def commit(self, order: Order) -> int:
+        """
+        Payment succeeded: the held stock is sold. Reservations that already
+        expired try to take their stock again.
+        """
+        committed = StockReservation.objects.filter(order=order, status='held').update(status='committed')
+        for reservation in StockReservation.objects.filter(order=order, status='released'):
+            with transaction.atomic():
+                if not StockReservation.objects.filter(pk=reservation.pk, status='released').update(status='committed'):
+                    continue
+                if self.take_stock(reservation.product_id, reservation.quantity):
+                    committed += 1
+                else:
+                    logger.error(
+                        f"Order {order.order_number} was paid after its reservation expired and product "
+                        f"{reservation.product_id} no longer has {reservation.quantity} in stock"
+                    )
+        self.stats['committed'] += committed
+        return committed
+
+    def release(self, order: Order) -> int:
+        """Hand back stock held for an order that won't be paid"""
+        released = self._release(StockReservation.objects.filter(order=order, status='held'))
+        self.stats['released'] += released
+        return released
+
+    def release_expired(self, batch_size: int = EXPIRY_BATCH_SIZE) -> int:
+        """Release reservations whose payment window has closed"""
+        expired = StockReservation.objects.filter(status='held', expires_at__lte=timezone.now())
+        released = self._release(expired.order_by('expires_at')[:batch_size])
+        if released:
+            logger.info(f"Released {released} expired stock reservations")
+        self.stats['expired'] += released
+        return released
+
+    def _release(self, reservations) -> int:
+        released = 0
+        for reservation in reservations:
+            with transaction.atomic():
+                # The status flip decides between racing release/commit calls
+                if StockReservation.objects.filter(pk=reservation.pk, status='held').update(status='released'):
+                    self.return_stock(reservation.product_id, reservation.quantity)
+                    released += 1
+        return released
+
+    def get_stats(self) -> Dict:
+        """Get reservation statistics for this process"""
+        stats = dict(self.stats)
+        stats['held'] = StockReservation.objects.filter(status='held').count()
+        return stats
+
+
+# Global stock reservation service instance
+stock_reservations = StockReservationService()
+
+
+def place_order(user, summary, shipping: Dict) -> Order:
+    """
+    Checkout writes: the order, its items in one INSERT and the stock
+    reservation, in one transaction. Raises InsufficientStock.
+    """
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=user,
+            subtotal=summary.subtotal,
+            tax_amount=summary.tax_amount,
+            shipping_cost=summary.shipping_cost,
+            total=summary.total,
+            **shipping,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
+            for item in summary.items
+        ])
+        stock_reservations.reserve(order, summary.items)
+    return order
@@ -0,0 +1,139 @@
+"""
+Express Deals - Cart Summary
+Loads a cart's items with their products in one query and prices the cart
+once: subtotal, VAT, shipping and total. The header badge reads a cached
+per-user item count instead.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import List, Optional
+
+from django.db import transaction
+from django.db.models import Sum
+
+from express_deals.cache import CacheNamespace
+from .anonymous_cart import get_anonymous_cart
+from .models import Cart, CartItem
+
+logger = logging.getLogger(__name__)
+
+VAT_RATE = Decimal('0.20')
+FREE_SHIPPING_THRESHOLD = Decimal('50')
+STANDARD_SHIPPING = Decimal('4.99')
+CART_COUNT_TIMEOUT = 60 * 60 * 24
+
+
+@dataclass
+class CartSummary:
+    """Priced snapshot of a cart; every figure is computed once from the same item rows"""
+    cart: Optional[Cart] = None
+    items: List[CartItem] = field(default_factory=list)
+    total_items: int = 0
+    subtotal: Decimal = Decimal('0.00')
+    tax_amount: Decimal = Decimal('0.00')
+    shipping_cost: Decimal = Decimal('0.00')
+    total: Decimal = Decimal('0.00')
+
+    @classmethod
+    def from_items(cls, items: List[CartItem], cart: Optional[Cart] = None) -> 'CartSummary':
+        subtotal = sum((item.get_total_price() for item in items), Decimal('0.00'))
+        tax_amount = subtotal * VAT_RATE
+        shipping_cost = Decimal('0.00') if not items or subtotal >= FREE_SHIPPING_THRESHOLD else STANDARD_SHIPPING
+        return cls(
+            cart=cart,
+            items=items,
+            total_items=sum(item.quantity for item in items),
+            subtotal=subtotal,
+            tax_amount=tax_amount,
+            shipping_cost=shipping_cost,
+            total=subtotal + tax_amount + shipping_cost,
+        )
+
+    @classmethod
+    def for_cart(cls, cart: Cart) -> 'CartSummary':
+        """One query: the cart's items joined to their products and categories"""
+        items = list(CartItem.objects.filter(cart=cart).select_related('product__category'))
+        for item in items:
+            item.cart = cart
+        return cls.from_items(items, cart)
+
+    @classmethod
+    def for_user(cls, user) -> 'CartSummary':
+        """One query, without fetching the cart row first; empty if the user has no cart"""
+        items = list(CartItem.objects.filter(cart__user=user).select_related('cart', 'product__category'))
+        return cls.from_items(items, items[0].cart if items else None)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.items
+
+    @property
+    def free_shipping(self) -> bool:
+        return self.shipping_cost == 0
+
+
+class CartItemCounts:
+    """
+    Per-user cart item counts for the header badge. Kept in the shared cache
+    (not the in-process tier) so every worker sees a change immediately;
+    CartItem/Cart signals drop the entry and the next read recounts it.
+    """
+
+    def __init__(self):
+        self.cache = CacheNamespace('cart_count', alias='default')
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, user_id: int) -> int:
+        count = self.cache.get(user_id)
+        if count is not None:
+            self.stats['hits'] += 1
+            return count
+        self.stats['misses'] += 1
+        count = CartItem.objects.filter(cart__user_id=user_id).aggregate(count=Sum('quantity'))['count'] or 0
+        self.prime(user_id, count)
+        return count
+
+    def prime(self, user_id: int, count: int):
+        try:
+            self.cache.set(user_id, count, timeout=CART_COUNT_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Failed to cache cart count for user {user_id}: {e}")
+
+    def invalidate(self, user_id: Optional[int]):
+        """Drop the count now and again on commit, so a read racing the write can't re-cache the old value"""
+        if user_id is None:
+            return
+        self._delete(user_id)
+        transaction.on_commit(lambda: self._delete(user_id))
+
+    def _delete(self, user_id: int):
+        try:
+            self.cache.delete(user_id)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate cart count for user {user_id}: {e}")
+
+
+# Global cart item count cache instance
+cart_item_counts = CartItemCounts()
+
+
+def get_cart_item_count(request) -> int:
+    """Badge count: the request's cart summary if one was already built, else the cached count"""
+    if not request.user.is_authenticated:
+        return get_anonymous_cart(request).total_items
+    summary = getattr(request, '_cart_summary', None)
+    if summary is not None:
+        return summary.total_items
+    return cart_item_counts.get(request.user.pk)
+
+
+def get_cart_summary(request) -> CartSummary:
+    """The visitor's cart summary (database cart or cookie cart), computed at most once per request"""
+    if not hasattr(request, '_cart_summary'):
+        if request.user.is_authenticated:
+            request._cart_summary = CartSummary.for_user(request.user)
+        else:
+            request._cart_summary = get_anonymous_cart(request).summary()
+    return request._cart_summary
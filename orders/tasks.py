@@ -0,0 +1,24 @@
+"""
+Express Deals - Order Tasks
+Celery tasks for checkout housekeeping
+"""
+
+from celery import shared_task
+import logging
+
+from .reservations import stock_reservations
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def release_expired_reservations():
+    """
+    Hand back stock held by checkouts whose payment window has closed
+    """
+    try:
+        released = stock_reservations.release_expired()
+        return {'released': released}
+    except Exception as e:
+        logger.error(f"Error releasing expired stock reservations: {e}")
+        return {'error': str(e)}
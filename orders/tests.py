@@ -1,9 +1,18 @@
+from decimal import Decimal
+from unittest import mock
 
-
-from django.test import TestCase
+import cloudinary
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.db import connection
+from django.urls import include, path, reverse
+from express_deals.context_processors import cart_processor
 from products.models import Product, Category
-from .models import Cart, CartItem, Order, OrderItem, WishlistItem
+from .models import Cart, CartItem, Order, OrderItem, StockReservation, WishlistItem
+from .reservations import InsufficientStock, place_order, stock_reservations
+from .summary import CartSummary
 
 class CartModelTest(TestCase):
     def setUp(self):
@@ -49,3 +58,223 @@ class WishlistItemModelTest(TestCase):
         prod = Product.objects.create(name='WishProd', slug='wishprod', category=cat, description='desc', price=5)
         wish = WishlistItem.objects.create(user=user, product=prod)
         self.assertIn('wishuser', str(wish))
+
+
+# The signed-in header links to the alert URLs, which aren't mounted in the project urlconf yet
+urlpatterns = [
+    path('alerts/', include('scraping.urls')),
+    path('', include('express_deals.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF='orders.tests')
+@mock.patch.object(cloudinary.config(), 'cloud_name', 'express-deals-test', create=True)
+class CartSummaryTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='summaryuser')
+        self.client.force_login(self.user)
+        self.cat = Category.objects.create(name='Summary', slug='summary')
+        self.cart = Cart.objects.create(user=self.user)
+
+    def add_items(self, count, price=10):
+        for n in range(count):
+            product = Product.objects.create(
+                name=f'Item {n}', slug=f'item-{self.cart.items.count()}-{n}', category=self.cat,
+                description='desc', price=price, stock_quantity=5
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+    def test_totals_are_priced_once(self):
+        self.add_items(2)
+        with self.assertNumQueries(1):
+            summary = CartSummary.for_cart(self.cart)
+        self.assertEqual((summary.total_items, summary.subtotal), (4, Decimal('40')))
+        self.assertEqual(summary.tax_amount, Decimal('8.00'))
+        self.assertEqual(summary.shipping_cost, Decimal('4.99'))
+        self.assertEqual(summary.total, Decimal('52.99'))
+
+        self.add_items(1, price=30)
+        summary = CartSummary.for_user(self.user)
+        self.assertTrue(summary.free_shipping)
+        self.assertEqual(summary.cart, self.cart)
+        self.assertTrue(CartSummary.for_user(User.objects.create_user(username='nocart')).is_empty)
+
+    def assertConstantQueries(self, url):
+        self.add_items(1)
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url, secure=True).status_code, 200)
+        self.add_items(8)
+        with self.assertNumQueries(len(small)):
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.context['cart_total_items'], 18)
+
+    def test_cart_page_query_count_is_independent_of_size(self):
+        self.assertConstantQueries(reverse('orders:cart'))
+
+    def test_checkout_page_query_count_is_independent_of_size(self):
+        self.assertConstantQueries(reverse('orders:checkout'))
+
+    def test_checkout_records_summary_totals(self):
+        self.add_items(2)
+        response = self.client.post(reverse('orders:checkout'), {
+            'shipping_name': 'Name', 'shipping_email': 'a@b.com', 'shipping_address_line1': 'Addr',
+            'shipping_city': 'City', 'shipping_state': 'State', 'shipping_postal_code': '12345',
+        }, secure=True)
+        self.assertEqual(response.status_code, 302)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual((order.subtotal, order.shipping_cost, order.total), (Decimal('40'), Decimal('4.99'), Decimal('52.99')))
+        self.assertEqual(order.items.count(), 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cart-count-test'}})
+class CartItemCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='badgeuser')
+        self.client.force_login(self.user)
+        cat = Category.objects.create(name='Badge', slug='badge')
+        self.products = [
+            Product.objects.create(name=f'Badge {n}', slug=f'badge-{n}', category=cat, description='desc', price=5, stock_quantity=10)
+            for n in range(2)
+        ]
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def badge(self):
+        return cart_processor(self.request)['cart_total_items']
+
+    def test_badge_is_free_on_cache_hits(self):
+        self.assertEqual(self.badge(), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.badge(), 0)
+
+    def test_add_update_remove_and_clear_refresh_the_count(self):
+        self.assertEqual(self.badge(), 0)
+        self.client.post(reverse('orders:add_to_cart'), {'product_id': self.products[0].id, 'quantity': 2}, secure=True)
+        self.client.post(reverse('orders:add_to_cart'), {'product_id': self.products[1].id}, secure=True)
+        self.assertEqual(self.badge(), 3)
+
+        item = CartItem.objects.get(product=self.products[0])
+        self.client.post(reverse('orders:update_cart'), {'cart_item_id': item.id, 'quantity': 5}, secure=True)
+        self.assertEqual(self.badge(), 6)
+
+        self.client.post(reverse('orders:remove_from_cart'), {'cart_item_id': item.id}, secure=True)
+        self.assertEqual(self.badge(), 1)
+
+        # The payment success paths clear the cart through Cart.clear()
+        Cart.objects.get(user=self.user).clear()
+        self.assertEqual(self.badge(), 0)
+
+
+@override_settings(ROOT_URLCONF='orders.tests')
+class AnonymousCartTest(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(cloudinary.config(), 'cloud_name', 'express-deals-test', create=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cat = Category.objects.create(name='Guest', slug='guest')
+        self.products = [
+            Product.objects.create(name=f'Guest {n}', slug=f'guest-{n}', category=cat, description='desc', price=10, stock_quantity=10)
+            for n in range(2)
+        ]
+        self.user = User.objects.create_user(username='guestuser', password='pass12345')
+
+    def add(self, product, quantity=1):
+        return self.client.post(
+            reverse('orders:add_to_cart'), {'product_id': product.id, 'quantity': quantity},
+            secure=True, HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+    def test_guest_cart_lives_in_a_signed_cookie(self):
+        response = self.add(self.products[0], 2)
+        self.assertEqual(response.json()['cart_total_items'], 2)
+        self.add(self.products[1])
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartItem.objects.exists())
+
+        response = self.client.get(reverse('orders:cart'), secure=True)
+        self.assertEqual(response.context['summary'].subtotal, Decimal('30'))
+        self.assertEqual(response.context['cart_total_items'], 3)
+
+        self.client.post(reverse('orders:update_cart'), {'cart_item_id': self.products[0].id, 'quantity': 4}, secure=True)
+        self.client.post(reverse('orders:remove_from_cart'), {'cart_item_id': self.products[1].id}, secure=True)
+        self.assertEqual(self.client.get(reverse('orders:cart'), secure=True).context['cart_total_items'], 4)
+
+        # A tampered cookie is ignored rather than trusted
+        self.client.cookies['cart'] = '{"%d": 99}' % self.products[1].id
+        self.assertEqual(self.client.get(reverse('orders:cart'), secure=True).context['cart_total_items'], 0)
+
+    def test_products_without_stock_are_not_added(self):
+        Product.objects.filter(pk=self.products[0].pk).update(stock_quantity=0)
+        response = self.add(self.products[0])
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(self.client.get(reverse('orders:cart'), secure=True).context['cart_total_items'], 0)
+
+    def test_login_merges_the_guest_cart(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=1)
+        self.add(self.products[0], 2)
+        self.add(self.products[1])
+
+        response = self.client.post(reverse('accounts:login'), {'username': 'guestuser', 'password': 'pass12345'}, secure=True)
+        self.assertEqual(response.cookies['cart'].value, '')
+        quantities = dict(cart.items.values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.products[0].id: 3, self.products[1].id: 1})
+
+        response = self.client.get(reverse('orders:cart'), secure=True)
+        self.assertEqual(response.context['cart_total_items'], 4)
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='flashuser')
+        cat = Category.objects.create(name='Flash', slug='flash')
+        self.product = Product.objects.create(
+            name='Flash', slug='flash', category=cat, description='desc', price=10, stock_quantity=3
+        )
+        self.shipping = {'shipping_name': 'Name', 'shipping_email': 'a@b.com', 'shipping_city': 'City'}
+
+    def order(self, quantity):
+        summary = CartSummary.from_items([CartItem(product=self.product, quantity=quantity)])
+        return place_order(self.user, summary, self.shipping)
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock_quantity, self.product.stock_status
+
+    def test_checkout_takes_stock_and_never_oversells(self):
+        order = self.order(2)
+        self.assertEqual(self.stock(), (1, 'low_stock'))
+        self.assertEqual(order.items.get().quantity, 2)
+        self.assertEqual(order.reservations.get().status, 'held')
+
+        with self.assertRaises(InsufficientStock):
+            self.order(2)
+        # The rejected checkout rolled back its order and items too
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.stock(), (1, 'low_stock'))
+
+        self.order(1)
+        self.assertEqual(self.stock(), (0, 'out_of_stock'))
+
+    def test_expired_reservations_hand_stock_back(self):
+        order = self.order(3)
+        self.assertEqual(stock_reservations.release_expired(), 0)
+        StockReservation.objects.update(expires_at=order.created_at)
+        self.assertEqual(stock_reservations.release_expired(), 1)
+        self.assertEqual(self.stock(), (3, 'low_stock'))
+
+        # Paying after expiry takes the stock again if it is still there
+        self.assertEqual(stock_reservations.commit(order), 1)
+        self.assertEqual(self.stock(), (0, 'out_of_stock'))
+        self.assertEqual(stock_reservations.release(order), 0)
+
+    def test_deleting_an_unpaid_order_returns_its_stock(self):
+        self.order(3).delete()
+        self.assertEqual(self.stock()[0], 3)
+
+    def test_adding_to_cart_accumulates_atomically(self):
+        cart = Cart.objects.create(user=self.user)
+        cart.add_product(self.product, 60)
+        cart.add_product(self.product, 60)
+        self.assertEqual(cart.items.get().quantity, 100)
@@ -5,25 +5,28 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db import transaction
 from django.core.exceptions import ValidationError
 import json
 
-from .models import Cart, CartItem, Order, OrderItem, WishlistItem
+from .anonymous_cart import get_anonymous_cart
+from .models import Cart, CartItem, Order, WishlistItem
+from .reservations import InsufficientStock, place_order
+from .summary import CartSummary, get_cart_summary
 from products.models import Product
 
 
-class CartView(LoginRequiredMixin, View):
+class CartView(View):
     """
-    Display shopping cart contents
+    Display shopping cart contents (the cookie cart for signed-out visitors)
     """
     template_name = 'orders/cart.html'
     
     def get(self, request):
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        summary = get_cart_summary(request)
         context = {
-            'cart': cart,
-            'cart_items': cart.items.select_related('product').all(),
+            'cart': summary.cart,
+            'cart_items': summary.items,
+            'summary': summary,
         }
         return render(request, self.template_name, context)
 
@@ -34,18 +37,6 @@ class AddToCartView(View):
     """
     
     def post(self, request):
-        # Check if user is authenticated
-        if not request.user.is_authenticated:
-            error_message = "Please sign in to add items to your cart"
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({
-                    'success': False, 
-                    'message': error_message,
-                    'redirect_to_login': True
-                })
-            messages.error(request, error_message)
-            return redirect('accounts:login')
-        
         try:
             product_id = request.POST.get('product_id')
             quantity = int(request.POST.get('quantity', 1))
@@ -54,44 +45,43 @@ class AddToCartView(View):
                 raise ValidationError("Quantity must be between 1 and 100")
             
             product = get_object_or_404(Product, id=product_id, is_active=True)
-            cart, created = Cart.objects.get_or_create(user=request.user)
-            
-            # Check if item already exists in cart
-            cart_item, item_created = CartItem.objects.get_or_create(
-                cart=cart,
-                product=product,
-                defaults={'quantity': quantity}
-            )
-            
-            if not item_created:
-                # Update quantity if item already exists
-                cart_item.quantity += quantity
-                if cart_item.quantity > 100:
-                    cart_item.quantity = 100
-                cart_item.save()
+            if product.stock_quantity < quantity:
+                raise ValidationError(str(InsufficientStock(product, quantity)))
             
-            success_message = f"Added {product.name} to your cart!"
-            messages.success(request, success_message)
+            # Signed-out visitors get a cookie cart - no database writes until they sign in
+            if not request.user.is_authenticated:
+                cart = get_anonymous_cart(request)
+                cart.add(product, quantity)
+                return self.added(request, product, cart.summary())
             
-            # Return JSON response for AJAX requests
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({
-                    'success': True,
-                    'message': success_message,
-                    'cart_total_items': cart.total_items,
-                    'cart_subtotal': str(cart.subtotal),
-                })
+            cart, created = Cart.objects.get_or_create(user=request.user)
+            cart.add_product(product, quantity)
             
-            return redirect('orders:cart')
+            return self.added(request, product, CartSummary.for_cart(cart))
             
         except (ValueError, ValidationError) as e:
             messages.error(request, str(e))
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'success': False, 'message': str(e)})
             return redirect(request.META.get('HTTP_REFERER', 'products:product_list'))
+    
+    def added(self, request, product, summary):
+        success_message = f"Added {product.name} to your cart!"
+        messages.success(request, success_message)
+        
+        # Return JSON response for AJAX requests
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'success': True,
+                'message': success_message,
+                'cart_total_items': summary.total_items,
+                'cart_subtotal': str(summary.subtotal),
+            })
+        
+        return redirect('orders:cart')
 
 
-class UpdateCartView(LoginRequiredMixin, View):
+class UpdateCartView(View):
     """
     Update cart item quantity
     """
@@ -104,6 +94,14 @@ class UpdateCartView(LoginRequiredMixin, View):
             if quantity < 1 or quantity > 100:
                 raise ValidationError("Quantity must be between 1 and 100")
             
+            if not request.user.is_authenticated:
+                # Cookie cart items are identified by product id
+                cart = get_anonymous_cart(request)
+                if int(cart_item_id) not in cart.lines:
+                    raise ValidationError("That item is not in your cart")
+                cart.set_quantity(cart_item_id, quantity)
+                return self.updated(request, cart.summary(), int(cart_item_id))
+            
             cart_item = get_object_or_404(
                 CartItem, 
                 id=cart_item_id, 
@@ -113,27 +111,31 @@ class UpdateCartView(LoginRequiredMixin, View):
             cart_item.quantity = quantity
             cart_item.save()
             
-            messages.success(request, "Cart updated successfully!")
-            
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({
-                    'success': True,
-                    'message': "Cart updated successfully!",
-                    'item_total': str(cart_item.get_total_price()),
-                    'cart_subtotal': str(cart_item.cart.subtotal),
-                    'cart_total': str(cart_item.cart.total),
-                })
-            
-            return redirect('orders:cart')
+            return self.updated(request, CartSummary.for_cart(cart_item.cart), cart_item.id)
             
         except (ValueError, ValidationError) as e:
             messages.error(request, str(e))
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'success': False, 'message': str(e)})
             return redirect('orders:cart')
+    
+    def updated(self, request, summary, item_id):
+        messages.success(request, "Cart updated successfully!")
+        
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            item = next((item for item in summary.items if item.id == item_id), None)
+            return JsonResponse({
+                'success': True,
+                'message': "Cart updated successfully!",
+                'item_total': str(item.get_total_price() if item else 0),
+                'cart_subtotal': str(summary.subtotal),
+                'cart_total': str(summary.total),
+            })
+        
+        return redirect('orders:cart')
 
 
-class RemoveFromCartView(LoginRequiredMixin, View):
+class RemoveFromCartView(View):
     """
     Remove item from shopping cart
     """
@@ -141,6 +143,13 @@ class RemoveFromCartView(LoginRequiredMixin, View):
     def post(self, request):
         try:
             cart_item_id = request.POST.get('cart_item_id')
+            
+            if not request.user.is_authenticated:
+                cart = get_anonymous_cart(request)
+                if not cart.remove(cart_item_id):
+                    raise CartItem.DoesNotExist("That item is not in your cart")
+                return self.removed(request, "Removed item from your cart!", cart.summary())
+            
             cart_item = get_object_or_404(
                 CartItem, 
                 id=cart_item_id, 
@@ -150,25 +159,27 @@ class RemoveFromCartView(LoginRequiredMixin, View):
             product_name = cart_item.product.name
             cart_item.delete()
             
-            messages.success(request, f"Removed {product_name} from your cart!")
-            
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                cart = Cart.objects.get(user=request.user)
-                return JsonResponse({
-                    'success': True,
-                    'message': f"Removed {product_name} from your cart!",
-                    'cart_total_items': cart.total_items,
-                    'cart_subtotal': str(cart.subtotal),
-                    'cart_total': str(cart.total),
-                })
-            
-            return redirect('orders:cart')
+            return self.removed(request, f"Removed {product_name} from your cart!", CartSummary.for_user(request.user))
             
         except Exception as e:
             messages.error(request, "Error removing item from cart")
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'success': False, 'message': str(e)})
             return redirect('orders:cart')
+    
+    def removed(self, request, message, summary):
+        messages.success(request, message)
+        
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({
+                'success': True,
+                'message': message,
+                'cart_total_items': summary.total_items,
+                'cart_subtotal': str(summary.subtotal),
+                'cart_total': str(summary.total),
+            })
+        
+        return redirect('orders:cart')
 
 
 class CheckoutView(LoginRequiredMixin, View):
@@ -178,60 +189,49 @@ class CheckoutView(LoginRequiredMixin, View):
     template_name = 'orders/checkout.html'
     
     def get(self, request):
-        cart = get_object_or_404(Cart, user=request.user)
+        summary = get_cart_summary(request)
         
-        if not cart.items.exists():
+        if summary.is_empty:
             messages.warning(request, "Your cart is empty!")
             return redirect('orders:cart')
         
         context = {
-            'cart': cart,
-            'cart_items': cart.items.select_related('product').all(),
+            'cart': summary.cart,
+            'cart_items': summary.items,
+            'summary': summary,
         }
         return render(request, self.template_name, context)
     
     def post(self, request):
-        cart = get_object_or_404(Cart, user=request.user)
+        summary = get_cart_summary(request)
         
-        if not cart.items.exists():
+        if summary.is_empty:
             messages.warning(request, "Your cart is empty!")
             return redirect('orders:cart')
         
         try:
-            with transaction.atomic():
-                # Create order
-                order = Order.objects.create(
-                    user=request.user,
-                    subtotal=cart.subtotal,
-                    tax_amount=cart.tax_amount,
-                    shipping_cost=0,  # Free shipping for now
-                    total=cart.total,
-                    shipping_name=request.POST.get('shipping_name'),
-                    shipping_email=request.POST.get('shipping_email'),
-                    shipping_phone=request.POST.get('shipping_phone', ''),
-                    shipping_address_line1=request.POST.get('shipping_address_line1'),
-                    shipping_address_line2=request.POST.get('shipping_address_line2', ''),
-                    shipping_city=request.POST.get('shipping_city'),
-                    shipping_state=request.POST.get('shipping_state'),
-                    shipping_postal_code=request.POST.get('shipping_postal_code'),
-                    shipping_country=request.POST.get('shipping_country', 'United States'),
-                )
-                
-                # Create order items from cart items
-                for cart_item in cart.items.all():
-                    OrderItem.objects.create(
-                        order=order,
-                        product=cart_item.product,
-                        quantity=cart_item.quantity,
-                        price=cart_item.product.price,
-                    )
-                
-                # Don't clear cart here - only clear after successful payment
-                # Cart will be cleared in payment success webhook or after payment completion
-                
-                messages.success(request, f"Order {order.order_number} created successfully!")
-                return redirect('payments:payment', order_id=order.id)
-                
+            # Creates the order and its items and holds their stock for the payment window
+            order = place_order(request.user, summary, {
+                'shipping_name': request.POST.get('shipping_name'),
+                'shipping_email': request.POST.get('shipping_email'),
+                'shipping_phone': request.POST.get('shipping_phone', ''),
+                'shipping_address_line1': request.POST.get('shipping_address_line1'),
+                'shipping_address_line2': request.POST.get('shipping_address_line2', ''),
+                'shipping_city': request.POST.get('shipping_city'),
+                'shipping_state': request.POST.get('shipping_state'),
+                'shipping_postal_code': request.POST.get('shipping_postal_code'),
+                'shipping_country': request.POST.get('shipping_country', 'United States'),
+            })
+            
+            # Don't clear cart here - only clear after successful payment
+            # Cart will be cleared in payment success webhook or after payment completion
+            
+            messages.success(request, f"Order {order.order_number} created successfully!")
+            return redirect('payments:payment', order_id=order.id)
+            
+        except InsufficientStock as e:
+            messages.error(request, str(e))
+            return redirect('orders:cart')
         except Exception as e:
             messages.error(request, f"Error creating order: {str(e)}")
             return redirect('orders:checkout')
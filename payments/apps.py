@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payments'
+
+    def ready(self):
+        # Each app's webhooks module registers its Stripe event handlers with the queue
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('webhooks')
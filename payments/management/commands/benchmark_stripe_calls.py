@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from payments.stripe_harness import StripeCallHarness
+
+
+class Command(BaseCommand):
+    help = ('Counts Stripe calls and latency for payment page reloads and customer lookups, mirror off vs on, '
+            'against stripe-mock (--api-base) or an in-process stand-in, in a throwaway test database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--api-base', help='stripe-mock URL, e.g. http://localhost:12111')
+        parser.add_argument('--latency-ms', type=float, default=300, help='Simulated Stripe latency for the in-process stand-in')
+        parser.add_argument('--repeats', type=int, default=10, help='Lookups per scenario (median reported)')
+
+    def handle(self, *args, **options):
+        harness = StripeCallHarness(
+            repeats=options['repeats'], api_base=options['api_base'], latency_ms=options['latency_ms']
+        )
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            result = harness.run()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(self.style.SUCCESS(f"Stripe target: {result.target}, {result.repeats} lookups per scenario"))
+        for scenario, modes in result.scenarios.items():
+            self.stdout.write(f"  {scenario}")
+            for mode, timing in modes.items():
+                self.stdout.write(f"    {mode:<11} {timing.calls_per_request} Stripe calls/request, {timing.median_ms} ms median")
@@ -1,51 +1,44 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from payments.models import Payment
 from django.db.models import Q
-import uuid
-from datetime import datetime
+
+from payments.models import Payment
+from payments.utils import generate_payment_transaction_id, is_ulid_transaction_id
 
 
 class Command(BaseCommand):
-    help = 'Fix duplicate transaction IDs in payments'
+    help = ('Backfill payment transaction IDs: give blank IDs a ULID (dated from the payment\'s created_at), '
+            'optionally re-issuing legacy PAY-YYYYMMDD-HHMMSS-uuid IDs too. Updates in bulk, batch by batch.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--legacy', action='store_true', help='Also re-issue IDs that are not ULIDs')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk update')
+        parser.add_argument('--dry-run', action='store_true', help='Count the rows without changing them')
 
     def handle(self, *args, **options):
-        self.stdout.write('🔧 Fixing transaction ID duplicates...')
-        
-        try:
-            with transaction.atomic():
-                # Find payments with problematic transaction IDs
-                problematic = Payment.objects.filter(
-                    Q(transaction_id__isnull=True) | 
-                    Q(transaction_id='')
-                )
-                
-                count = problematic.count()
-                self.stdout.write(f'Found {count} problematic payments')
-                
-                if count == 0:
-                    self.stdout.write(
-                        self.style.SUCCESS('No problematic transaction IDs found')
-                    )
-                    return
-                
-                # Fix each one with a unique ID
-                fixed = 0
-                for payment in problematic:
-                    timestamp = int(datetime.now().timestamp())
-                    unique_id = f"TXN_{payment.id}_{timestamp}_{fixed}"
-                    payment.transaction_id = unique_id
-                    payment.save()
-                    fixed += 1
-                    
-                    if fixed % 10 == 0:
-                        self.stdout.write(f'Fixed {fixed} payments...')
-                
-                self.stdout.write(
-                    self.style.SUCCESS(f'Successfully fixed {fixed} transaction IDs!')
-                )
-                
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f'Error fixing transaction IDs: {e}')
+        batch_size = options['batch_size']
+        blank = Payment.objects.filter(Q(transaction_id__isnull=True) | Q(transaction_id=''))
+        candidates = Payment.objects.all() if options['legacy'] else blank
+
+        last_pk, scanned, fixed = 0, 0, 0
+        while True:
+            # Walk the primary key so each batch is one indexed range read
+            batch = list(
+                candidates.filter(pk__gt=last_pk).order_by('pk')
+                .only('pk', 'transaction_id', 'created_at')[:batch_size]
             )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            scanned += len(batch)
+
+            stale = [payment for payment in batch if not is_ulid_transaction_id(payment.transaction_id)]
+            for payment in stale:
+                payment.transaction_id = generate_payment_transaction_id(payment.created_at.timestamp() * 1000)
+            if stale and not options['dry_run']:
+                with transaction.atomic():
+                    Payment.objects.bulk_update(stale, ['transaction_id'])
+            fixed += len(stale)
+
+        verb = 'Would re-issue' if options['dry_run'] else 'Re-issued'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {fixed} transaction IDs ({scanned} payments scanned)"))
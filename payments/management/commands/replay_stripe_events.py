@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payments.models import StripeWebhookEvent
+from payments.webhooks import stripe_webhook_queue
+
+
+class Command(BaseCommand):
+    help = 'Re-apply stored Stripe webhook events (by id, type, age or failure), or show the queue stats.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='Stripe event ids (evt_...) to replay')
+        parser.add_argument('--type', dest='event_type', help='Replay events of this type, e.g. payment_intent.succeeded')
+        parser.add_argument('--hours', type=float, help='Only events received in the last N hours')
+        parser.add_argument('--failed', action='store_true', help='Replay unprocessed events whose handlers failed')
+        parser.add_argument('--pending', action='store_true', help='Apply every unprocessed event now (what the sweep does)')
+        parser.add_argument('--dry-run', action='store_true', help='List the events without replaying them')
+        parser.add_argument('--stats', action='store_true', help='Show queue depth and throughput, then exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for name, value in stripe_webhook_queue.get_stats().items():
+                self.stdout.write(f"  {name:<24} {value}")
+            return
+
+        if options['pending']:
+            result = stripe_webhook_queue.process_pending()
+            self.stdout.write(self.style.SUCCESS(
+                f"Applied {result['processed']} pending events across {result['objects']} objects "
+                f"({result['failed']} objects still failing)"
+            ))
+            return
+
+        events = StripeWebhookEvent.objects.all()
+        if options['event_ids']:
+            events = events.filter(stripe_event_id__in=options['event_ids'])
+        if options['event_type']:
+            events = events.filter(event_type=options['event_type'])
+        if options['hours']:
+            events = events.filter(created_at__gte=timezone.now() - timedelta(hours=options['hours']))
+        if options['failed']:
+            events = events.filter(processed=False, attempts__gt=0)
+        if not any([options['event_ids'], options['event_type'], options['hours'], options['failed']]):
+            raise CommandError('Choose events to replay: event ids, --type, --hours or --failed')
+
+        count = events.count()
+        self.stdout.write(f"{count} events selected")
+        if options['dry_run']:
+            for event in events.order_by('stripe_created', 'id')[:50]:
+                state = 'processed' if event.processed else f"pending ({event.attempts} attempts)"
+                self.stdout.write(f"  {event.stripe_event_id}  {event.event_type:<32} {event.object_id}  {state}")
+            return
+        if not count:
+            return
+
+        result = stripe_webhook_queue.replay(events)
+        style = self.style.SUCCESS if not result['failed'] else self.style.WARNING
+        self.stdout.write(style(
+            f"Replayed {result['processed']} of {result['events']} events ({result['failed']} objects failed)"
+        ))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_webhook_event_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MirroredStripeObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stripe_id', models.CharField(max_length=100, unique=True)),
+                ('object_type', models.CharField(choices=[('customer', 'Customer'), ('price', 'Price'), ('payment_intent', 'Payment Intent')], max_length=20)),
+                ('lookup_key', models.CharField(blank=True, max_length=150)),
+                ('data', models.JSONField(default=dict)),
+                ('synced_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['object_type', 'lookup_key'], name='payments_mi_object__0a1284_idx')],
+            },
+        ),
+    ]
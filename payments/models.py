@@ -10,7 +10,6 @@ from .utils import generate_payment_transaction_id
 
 def generate_transaction_id():
     """Generate unique transaction ID"""
-    from .utils import generate_payment_transaction_id
     return generate_payment_transaction_id()
 
 
@@ -99,14 +98,6 @@ class Payment(models.Model):
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
-@receiver(pre_save, sender=Payment)
-def ensure_unique_transaction_id(sender, instance, **kwargs):
-    if not instance.transaction_id or Payment.objects.filter(transaction_id=instance.transaction_id).exclude(pk=instance.pk).exists():
-        new_id = generate_payment_transaction_id()
-        while Payment.objects.filter(transaction_id=new_id).exists():
-            new_id = generate_payment_transaction_id()
-        instance.transaction_id = new_id
     completed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
@@ -122,6 +113,17 @@ def ensure_unique_transaction_id(sender, instance, **kwargs):
         self.save()
 
 
+@receiver(pre_save, sender=Payment)
+def assign_transaction_id(sender, instance, **kwargs):
+    """
+    Fill in a blanked transaction ID. IDs are ULIDs generated once at
+    creation and the unique constraint backs them, so no save queries for
+    clashes - status updates cost a single UPDATE.
+    """
+    if not instance.transaction_id:
+        instance.transaction_id = generate_payment_transaction_id()
+
+
 class RecurringPayment(models.Model):
     """Recurring payment schedules"""
     FREQUENCY_CHOICES = [
@@ -232,16 +234,49 @@ class DemoCard(models.Model):
 
 
 class StripeWebhookEvent(models.Model):
-    """Track Stripe webhook events"""
+    """Track Stripe webhook events (queued and applied by payments.webhooks)"""
     stripe_event_id = models.CharField(max_length=100, unique=True)
     event_type = models.CharField(max_length=50)
     data = models.JSONField()
+    # The Stripe object the event is about; its events are applied in stripe_created order
+    object_id = models.CharField(max_length=100, blank=True)
+    stripe_created = models.DateTimeField(null=True, blank=True)
     processed = models.BooleanField(default=False)
     processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Workers pick up an object's pending events oldest first
+            models.Index(fields=['processed', 'object_id', 'stripe_created']),
+        ]
     
     def __str__(self):
         return f"Webhook {self.event_type} - {self.stripe_event_id}"
+
+
+class MirroredStripeObject(models.Model):
+    """Local copy of a Stripe customer, price or payment intent (see payments.stripe_mirror)"""
+    OBJECT_TYPES = [
+        ('customer', 'Customer'),
+        ('price', 'Price'),
+        ('payment_intent', 'Payment Intent'),
+    ]
+    
+    stripe_id = models.CharField(max_length=100, unique=True)
+    object_type = models.CharField(max_length=20, choices=OBJECT_TYPES)
+    # How the site looks the object up: "user:<id>" for customers, the price lookup_key for prices
+    lookup_key = models.CharField(max_length=150, blank=True)
+    data = models.JSONField(default=dict)
+    synced_at = models.DateTimeField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['object_type', 'lookup_key']),
+        ]
+    
+    def __str__(self):
+        return f"{self.object_type} {self.stripe_id}"
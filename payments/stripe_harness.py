@@ -0,0 +1,177 @@
+"""
+Express Deals - Stripe Call Harness
+Routes the Stripe library through a recording HTTP client, either to a
+stripe-mock server (https://github.com/stripe/stripe-mock) or to a small
+in-process stand-in with simulated API latency, and measures the Stripe
+calls and time each user-facing lookup costs with the mirror off and on
+"""
+
+import itertools
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import stripe
+from django.contrib.auth.models import User
+
+from orders.models import Order
+from .models import MirroredStripeObject, Payment
+from .stripe_mirror import stripe_mirror
+from .stripe_service import stripe_service
+
+
+class StripeStandIn:
+    """Answers the handful of endpoints the harness exercises, shaped like stripe-mock's fixtures"""
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.objects: Dict[str, Dict] = {}
+
+    def respond(self, method: str, url: str, post_data) -> Dict:
+        parsed = urlparse(url)
+        parts = parsed.path.strip('/').split('/')[1:]  # drop the "v1" prefix
+        params = parse_qs(post_data if method == 'post' else parsed.query)
+        params = {key: values[0] for key, values in params.items()}
+        resource = parts[0]
+
+        if len(parts) == 2:
+            return self.objects.get(parts[1]) or {'error': {'type': 'invalid_request_error', 'message': 'No such object'}}
+        if method == 'post':
+            return self.create(resource, params)
+        # List endpoints: filter by email for customers, lookup key for prices
+        data = [
+            obj for obj in self.objects.values()
+            if obj['object'] == resource.rstrip('s')
+            and obj.get('email', params.get('email')) == params.get('email')
+            and obj.get('lookup_key', params.get('lookup_keys[0]')) == params.get('lookup_keys[0]')
+        ]
+        return {'object': 'list', 'data': data[:1], 'has_more': False, 'url': parsed.path}
+
+    def create(self, resource: str, params: Dict) -> Dict:
+        number = next(self.ids)
+        if resource == 'customers':
+            obj = {'id': f"cus_{number}", 'object': 'customer', 'email': params.get('email'), 'name': params.get('name'), 'metadata': {}}
+        elif resource == 'payment_intents':
+            obj = {
+                'id': f"pi_{number}", 'object': 'payment_intent', 'amount': int(params.get('amount', 0)),
+                'currency': params.get('currency', 'gbp'), 'status': 'requires_payment_method',
+                'client_secret': f"pi_{number}_secret_{number}", 'metadata': {},
+            }
+        else:
+            obj = {'id': f"{resource[:5]}_{number}", 'object': resource.rstrip('s')}
+        self.objects[obj['id']] = obj
+        return obj
+
+
+class RecordingHTTPClient(stripe.HTTPClient):
+    """Counts every Stripe API request; forwards to ``inner`` or answers from a StripeStandIn"""
+
+    name = 'recording'
+
+    def __init__(self, inner: Optional[stripe.HTTPClient] = None, latency: float = 0.3):
+        super().__init__()
+        self.inner = inner
+        self.latency = latency
+        self.stand_in = StripeStandIn()
+        self.requests: List[str] = []
+
+    def request(self, method, url, headers, post_data=None, *, _usage=None):
+        self.requests.append(f"{method.upper()} {urlparse(url).path}")
+        if self.inner is not None:
+            return self.inner.request(method, url, headers, post_data)
+        time.sleep(self.latency)
+        body = self.stand_in.respond(method, url, post_data)
+        return json.dumps(body), 404 if 'error' in body else 200, {}
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+@dataclass
+class LookupTiming:
+    """Stripe requests and median milliseconds per lookup"""
+    calls_per_request: float = 0.0
+    median_ms: float = 0.0
+
+
+@dataclass
+class StripeHarnessResult:
+    """Timings per scenario, mirror off vs on"""
+    repeats: int
+    target: str
+    scenarios: Dict[str, Dict[str, LookupTiming]] = field(default_factory=dict)
+
+
+class StripeCallHarness:
+    """Payment page reloads and subscription customer lookups with the mirror disabled and enabled"""
+
+    def __init__(self, repeats: int = 10, api_base: Optional[str] = None, latency_ms: float = 300):
+        self.repeats = repeats
+        self.api_base = api_base
+        self.latency = latency_ms / 1000
+
+    @contextmanager
+    def stripe_client(self):
+        client = RecordingHTTPClient(
+            inner=stripe.new_default_http_client() if self.api_base else None, latency=self.latency
+        )
+        saved = (stripe.default_http_client, stripe.api_base, stripe.api_key, stripe.max_network_retries)
+        stripe.default_http_client = client
+        stripe.api_key = 'sk_test_123'  # stripe-mock accepts any test key
+        stripe.max_network_retries = 0
+        if self.api_base:
+            stripe.api_base = self.api_base
+        try:
+            yield client
+        finally:
+            stripe.default_http_client, stripe.api_base, stripe.api_key, stripe.max_network_retries = saved
+
+    def run(self) -> StripeHarnessResult:
+        result = StripeHarnessResult(repeats=self.repeats, target=self.api_base or f"in-process stand-in ({self.latency * 1000:.0f} ms)")
+        enabled = stripe_mirror.enabled
+        try:
+            with self.stripe_client() as client:
+                for mode in ('mirror_off', 'mirror_on'):
+                    stripe_mirror.enabled = mode == 'mirror_on'
+                    MirroredStripeObject.objects.all().delete()
+                    user = User.objects.create_user(username=f"stripe-harness-{mode}", email=f"{mode}@example.com")
+                    payment = self.seed_payment(user)
+                    result.scenarios.setdefault('payment_page_reload', {})[mode] = self.measure(
+                        client, lambda: stripe_mirror.payment_intent(payment.stripe_payment_intent_id)
+                    )
+                    result.scenarios.setdefault('subscription_customer_lookup', {})[mode] = self.measure(
+                        client, lambda: stripe_service.get_or_create_customer(user)
+                    )
+        finally:
+            stripe_mirror.enabled = enabled
+        return result
+
+    def seed_payment(self, user) -> Payment:
+        """What the first payment page view does: create the intent (and mirror it when enabled)"""
+        order = Order.objects.create(
+            user=user, subtotal=Decimal('20'), tax_amount=Decimal('4'), total=Decimal('28.99'),
+            shipping_name='Harness', shipping_email=user.email, shipping_address_line1='1 Mock Street',
+            shipping_city='London', shipping_state='London', shipping_postal_code='EC1A 1AA',
+        )
+        intent = stripe.PaymentIntent.create(amount=2899, currency='gbp', automatic_payment_methods={'enabled': True})
+        stripe_mirror.store(intent)
+        return Payment.objects.create(order=order, user=user, amount=order.total, stripe_payment_intent_id=intent.id)
+
+    def measure(self, client: RecordingHTTPClient, lookup) -> LookupTiming:
+        lookup()  # First lookup may legitimately reach Stripe
+        before = len(client.requests)
+        samples = []
+        for _ in range(self.repeats):
+            started = time.perf_counter()
+            lookup()
+            samples.append((time.perf_counter() - started) * 1000)
+        return LookupTiming(
+            calls_per_request=round((len(client.requests) - before) / self.repeats, 2),
+            median_ms=round(statistics.median(samples), 2),
+        )
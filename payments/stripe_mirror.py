@@ -0,0 +1,166 @@
+"""
+Express Deals - Stripe Object Mirror
+Keeps a local copy of the Stripe objects user-facing pages need: each
+user's customer, prices by lookup key and payment intents (client secret
+and status). Webhooks keep copies current; a copy older than its TTL is
+re-read from Stripe, so pages normally make zero Stripe calls.
+"""
+
+import json
+import logging
+from datetime import timedelta
+from typing import Dict, Optional
+
+import stripe
+from django.conf import settings
+from django.utils import timezone
+
+from .models import MirroredStripeObject
+
+logger = logging.getLogger(__name__)
+
+# Fallback re-read intervals; webhooks normally refresh copies long before these
+MIRROR_TTL = {
+    'customer': timedelta(hours=24),
+    'price': timedelta(hours=24),
+    'payment_intent': timedelta(minutes=10),
+}
+
+# Only what pages read is kept - no card or address details
+MIRRORED_FIELDS = {
+    'customer': ('id', 'object', 'email', 'name', 'metadata'),
+    'price': ('id', 'object', 'active', 'currency', 'unit_amount', 'recurring', 'lookup_key', 'product'),
+    'payment_intent': ('id', 'object', 'amount', 'currency', 'status', 'client_secret', 'customer', 'metadata'),
+}
+
+STRIPE_CLASSES = {
+    'customer': stripe.Customer,
+    'price': stripe.Price,
+    'payment_intent': stripe.PaymentIntent,
+}
+
+
+class StripeMirror:
+    """Read-through local copies of Stripe objects, refreshed by webhooks"""
+
+    def __init__(self):
+        self.enabled = getattr(settings, 'STRIPE_MIRROR_ENABLED', True)
+        self.stats = {'hits': 0, 'stale': 0, 'misses': 0, 'stripe_calls': 0, 'webhook_refreshes': 0}
+
+    # Lookups
+
+    def customer_for(self, user, create=None):
+        """
+        The user's Stripe customer: the local copy, else found by email, else
+        ``create()`` (when given). Returns None if there is none.
+        """
+        key = f"user:{user.pk}"
+        entry = self._entry('customer', lookup_key=key)
+        if entry is not None and self._fresh(entry):
+            return self._hit(entry)
+        if entry is not None:
+            self.stats['stale'] += 1
+            try:
+                customer = self._call(stripe.Customer.retrieve, entry.stripe_id)
+                if not customer.get('deleted'):
+                    return self.store(customer, key)
+            except stripe.error.InvalidRequestError:
+                pass
+            # Deleted in Stripe - look it up again
+            entry.delete()
+        else:
+            self.stats['misses'] += 1
+
+        customers = self._call(stripe.Customer.list, email=user.email, limit=1) if user.email else None
+        if customers and customers.data:
+            return self.store(customers.data[0], key)
+        if create is not None:
+            return self.store(create(), key)
+        return None
+
+    def price(self, lookup_key: str):
+        """The active price with this Stripe lookup_key, or None"""
+        entry = self._entry('price', lookup_key=lookup_key)
+        if entry is not None and self._fresh(entry):
+            return self._hit(entry)
+        self.stats['stale' if entry is not None else 'misses'] += 1
+        prices = self._call(stripe.Price.list, lookup_keys=[lookup_key], active=True, limit=1)
+        if not prices.data:
+            return None
+        return self.store(prices.data[0], lookup_key)
+
+    def payment_intent(self, intent_id: str):
+        """A payment intent's client secret and status, re-read from Stripe only when stale"""
+        entry = self._entry('payment_intent', stripe_id=intent_id)
+        if entry is not None and self._fresh(entry):
+            return self._hit(entry)
+        self.stats['stale' if entry is not None else 'misses'] += 1
+        return self.store(self._call(stripe.PaymentIntent.retrieve, intent_id))
+
+    # Writes
+
+    def store(self, obj, lookup_key: str = ''):
+        """Save (or refresh) the local copy of a Stripe object; returns the object"""
+        if not self.enabled:
+            return obj
+        data = self._plain(obj)
+        object_type = data.get('object')
+        if object_type not in MIRRORED_FIELDS:
+            return obj
+        fields = {name: data.get(name) for name in MIRRORED_FIELDS[object_type]}
+        defaults = {'object_type': object_type, 'data': fields, 'synced_at': timezone.now()}
+        if lookup_key:
+            defaults['lookup_key'] = lookup_key
+        elif object_type == 'customer' and (data.get('metadata') or {}).get('user_id'):
+            defaults['lookup_key'] = f"user:{data['metadata']['user_id']}"
+        elif object_type == 'price' and data.get('lookup_key'):
+            defaults['lookup_key'] = data['lookup_key']
+        try:
+            MirroredStripeObject.objects.update_or_create(stripe_id=data['id'], defaults=defaults)
+        except Exception as e:
+            # The mirror is an optimisation - never fail the page over it
+            logger.warning(f"Failed to mirror Stripe {object_type} {data.get('id')}: {e}")
+        return obj
+
+    def forget(self, stripe_id: str):
+        MirroredStripeObject.objects.filter(stripe_id=stripe_id).delete()
+
+    def refresh_from_webhook(self, obj):
+        """Webhook payloads are the object as of the event - keep the copy current"""
+        self.stats['webhook_refreshes'] += 1
+        self.store(obj)
+
+    def get_stats(self) -> Dict:
+        """Get mirror statistics for this process"""
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['stale'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    # Internals
+
+    def _entry(self, object_type: str, **lookup) -> Optional[MirroredStripeObject]:
+        if not self.enabled:
+            return None
+        return MirroredStripeObject.objects.filter(object_type=object_type, **lookup).first()
+
+    def _fresh(self, entry: MirroredStripeObject) -> bool:
+        return timezone.now() - entry.synced_at < MIRROR_TTL[entry.object_type]
+
+    def _hit(self, entry: MirroredStripeObject):
+        self.stats['hits'] += 1
+        return STRIPE_CLASSES[entry.object_type].construct_from(entry.data, stripe.api_key)
+
+    def _call(self, method, *args, **kwargs):
+        self.stats['stripe_calls'] += 1
+        return method(*args, **kwargs)
+
+    def _plain(self, obj) -> Dict:
+        if isinstance(obj, stripe.StripeObject):
+            return json.loads(str(obj))
+        return dict(obj)
+
+
+# Global Stripe mirror instance
+stripe_mirror = StripeMirror()
+
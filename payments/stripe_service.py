@@ -11,6 +11,8 @@ from django.utils import timezone
 from decimal import Decimal
 import logging
 
+from .stripe_mirror import stripe_mirror
+
 # Configure Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -46,28 +48,8 @@ class StripePaymentService:
             raise e
     
     def get_or_create_customer(self, user):
-        """Get existing customer or create new one"""
-        # Check if user already has a customer ID stored
-        if hasattr(user, 'stripe_customer_id') and user.stripe_customer_id:
-            try:
-                customer = stripe.Customer.retrieve(user.stripe_customer_id)
-                return customer
-            except stripe.error.InvalidRequestError:
-                # Customer doesn't exist, create new one
-                pass
-        
-        # Search for existing customer by email
-        customers = stripe.Customer.list(email=user.email, limit=1)
-        if customers.data:
-            customer = customers.data[0]
-            # Store customer ID for future use
-            if hasattr(user, 'stripe_customer_id'):
-                user.stripe_customer_id = customer.id
-                user.save()
-            return customer
-        
-        # Create new customer
-        return self.create_customer(user)
+        """Get existing customer or create new one (the local mirror answers repeat lookups)"""
+        return stripe_mirror.customer_for(user, create=lambda: self.create_customer(user))
     
     # ===== MANUAL PAYMENTS =====
     
@@ -128,18 +110,23 @@ class StripePaymentService:
             logger.error(f"Failed to create product: {e}")
             raise e
     
-    def create_price(self, product_id, amount, currency='gbp', interval='month', interval_count=1):
+    def create_price(self, product_id, amount, currency='gbp', interval='month', interval_count=1, lookup_key=None):
         """Create a recurring price for subscriptions"""
         try:
-            price = stripe.Price.create(
-                product=product_id,
-                unit_amount=int(amount * 100),  # Convert to cents
-                currency=currency,
-                recurring={
+            price_data = {
+                'product': product_id,
+                'unit_amount': int(amount * 100),  # Convert to cents
+                'currency': currency,
+                'recurring': {
                     'interval': interval,
                     'interval_count': interval_count
                 }
-            )
+            }
+            if lookup_key:
+                price_data['lookup_key'] = lookup_key
+            
+            price = stripe.Price.create(**price_data)
+            stripe_mirror.store(price)
             
             logger.info(f"Created price {price.id} for product {product_id}: {amount} {currency}/{interval}")
             return price
@@ -148,6 +135,10 @@ class StripePaymentService:
             logger.error(f"Failed to create price: {e}")
             raise e
     
+    def get_price(self, lookup_key):
+        """Active price for a plan's lookup key, from the local mirror when fresh"""
+        return stripe_mirror.price(lookup_key)
+    
     def create_subscription(self, customer, price_id, trial_period_days=None, metadata=None):
         """Create a subscription for a customer"""
         try:
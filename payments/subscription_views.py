@@ -6,18 +6,18 @@ Handle subscription creation, management, and billing
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.conf import settings
-import stripe
 import json
 import logging
 
 from .models import SubscriptionPlan, Subscription, StripeCustomer, Payment
 from .stripe_service import stripe_service
+from .webhooks import receive_stripe_webhook, stripe_webhook_queue
 
 logger = logging.getLogger(__name__)
 
@@ -338,33 +338,10 @@ def recurring_payments_dashboard(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 def stripe_webhook(request):
-    """Handle Stripe webhooks"""
-    payload = request.body
-    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
-    
-    try:
-        event = stripe_service.construct_webhook_event(payload, sig_header)
-    except ValueError:
-        logger.error("Invalid payload in webhook")
-        return HttpResponse(status=400)
-    except stripe.error.SignatureVerificationError:
-        logger.error("Invalid signature in webhook")
-        return HttpResponse(status=400)
-    
-    # Handle the event
-    if event['type'] == 'invoice.payment_succeeded':
-        handle_successful_payment(event['data']['object'])
-    elif event['type'] == 'invoice.payment_failed':
-        handle_failed_payment(event['data']['object'])
-    elif event['type'] == 'customer.subscription.updated':
-        handle_subscription_updated(event['data']['object'])
-    elif event['type'] == 'customer.subscription.deleted':
-        handle_subscription_deleted(event['data']['object'])
-    else:
-        logger.info(f"Unhandled event type: {event['type']}")
-    
-    return HttpResponse(status=200)
+    """Handle Stripe webhooks: stored and answered at once, applied by the webhook queue"""
+    return receive_stripe_webhook(request)
 
+@stripe_webhook_queue.register('invoice.payment_succeeded')
 def handle_successful_payment(invoice):
     """Handle successful payment webhook"""
     try:
@@ -384,7 +361,9 @@ def handle_successful_payment(invoice):
         
     except Exception as e:
         logger.error(f"Error handling successful payment: {e}")
+        raise  # The webhook queue retries the event
 
+@stripe_webhook_queue.register('invoice.payment_failed')
 def handle_failed_payment(invoice):
     """Handle failed payment webhook"""
     try:
@@ -404,7 +383,9 @@ def handle_failed_payment(invoice):
         
     except Exception as e:
         logger.error(f"Error handling failed payment: {e}")
+        raise  # The webhook queue retries the event
 
+@stripe_webhook_queue.register('customer.subscription.updated')
 def handle_subscription_updated(subscription):
     """Handle subscription updated webhook"""
     try:
@@ -423,7 +404,9 @@ def handle_subscription_updated(subscription):
         
     except Exception as e:
         logger.error(f"Error handling subscription update: {e}")
+        raise  # The webhook queue retries the event
 
+@stripe_webhook_queue.register('customer.subscription.deleted')
 def handle_subscription_deleted(subscription):
     """Handle subscription deleted webhook"""
     try:
@@ -440,3 +423,4 @@ def handle_subscription_deleted(subscription):
         
     except Exception as e:
         logger.error(f"Error handling subscription deletion: {e}")
+        raise  # The webhook queue retries the event
@@ -0,0 +1,35 @@
+"""
+Express Deals - Payment Tasks
+Celery tasks applying queued Stripe webhook events
+"""
+
+from celery import shared_task
+import logging
+
+from .webhooks import MAX_ATTEMPTS, WebhookProcessingError, stripe_webhook_queue
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=MAX_ATTEMPTS)
+def process_stripe_events(self, object_id):
+    """
+    Apply the pending webhook events for one Stripe object, in order
+    """
+    try:
+        return {'object_id': object_id, 'processed': stripe_webhook_queue.process_object(object_id)}
+    except WebhookProcessingError as e:
+        # Back off 10s, 20s, 40s... - later events for the object wait behind the failed one
+        raise self.retry(exc=e, countdown=10 * 2 ** self.request.retries)
+
+
+@shared_task
+def process_pending_stripe_events():
+    """
+    Sweep up stored events whose task was never queued or gave up
+    """
+    try:
+        return stripe_webhook_queue.process_pending()
+    except Exception as e:
+        logger.error(f"Error sweeping pending Stripe webhook events: {e}")
+        return {'error': str(e)}
@@ -1,9 +1,25 @@
 
 
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
-from orders.models import Order
-from .models import Payment, Refund, StripeWebhookEvent
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from orders.models import Cart, CartItem, Order
+from orders.reservations import place_order
+from orders.summary import CartSummary
+from products.models import Category, Product
+from .models import MirroredStripeObject, Payment, StripeWebhookEvent
+from .stripe_mirror import stripe_mirror
+from .utils import generate_payment_transaction_id, is_ulid_transaction_id
+from .webhooks import WebhookProcessingError, stripe_webhook_queue
 
 class PaymentModelTest(TestCase):
     def setUp(self):
@@ -12,23 +28,147 @@ class PaymentModelTest(TestCase):
         self.payment = Payment.objects.create(order=self.order, user=self.user, amount=13, currency='USD')
 
     def test_str(self):
-        # The __str__ does not include username, just payment id, order number, and status
-        expected = f"Payment {self.payment.id} - {self.order.order_number} - {self.payment.status}"
+        # Transaction id, amount and status - no username or order number
+        expected = f"Payment {self.payment.transaction_id} - £{self.payment.amount} ({self.payment.status})"
         self.assertEqual(str(self.payment), expected)
 
-class RefundModelTest(TestCase):
-    def setUp(self):
-        self.user = User.objects.create_user(username='refunduser')
-        self.order = Order.objects.create(user=self.user, subtotal=10, tax_amount=1, shipping_cost=2, total=13, shipping_name='Name', shipping_email='a@b.com', shipping_address_line1='Addr', shipping_city='City', shipping_state='State', shipping_postal_code='12345')
-        self.payment = Payment.objects.create(order=self.order, user=self.user, amount=13, currency='USD')
-        self.refund = Refund.objects.create(payment=self.payment, order=self.order, user=self.user, amount=5, reason='requested_by_customer')
-
-    def test_str(self):
-        # The __str__ does not include username, just refund id, order number, and amount
-        expected = f"Refund {self.refund.id} - {self.order.order_number} - ${self.refund.amount}"
-        self.assertEqual(str(self.refund), expected)
-
 class StripeWebhookEventModelTest(TestCase):
     def test_str(self):
         event = StripeWebhookEvent.objects.create(stripe_event_id='evt_123', event_type='payment_intent.succeeded', data={})
         self.assertIn('evt_123', str(event))
+
+
+class PaymentWebhookTest(TestCase):
+    """Stripe webhooks are stored and acknowledged, then settle the order from the queue"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='paiduser')
+        cat = Category.objects.create(name='Paid', slug='paid')
+        self.product = Product.objects.create(
+            name='Paid', slug='paid', category=cat, description='desc', price=10, stock_quantity=5
+        )
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        self.order = place_order(self.user, CartSummary.for_cart(cart), {'shipping_name': 'Name'})
+        Payment.objects.create(order=self.order, user=self.user, amount=self.order.total, stripe_payment_intent_id='pi_1')
+
+    def post_event(self, event_id, event_type, created, obj=None):
+        event = {'id': event_id, 'type': event_type, 'created': created, 'data': {'object': obj or {'id': 'pi_1'}}}
+        with mock.patch('stripe.Webhook.construct_event', return_value=event), \
+                mock.patch('payments.tasks.process_stripe_events.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('payments:stripe_webhook'), b'{}', content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return delay
+
+    def test_webhook_only_stores_and_queues_the_event(self):
+        delay = self.post_event('evt_1', 'payment_intent.succeeded', 1700000000)
+        delay.assert_called_once_with('pi_1')
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'pending')
+
+        self.assertEqual(stripe_webhook_queue.process_object('pi_1'), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'paid')
+        self.assertEqual(self.order.reservations.get().status, 'committed')
+        self.assertFalse(CartItem.objects.exists())
+
+        # Stripe retrying a processed event is acknowledged without queueing work
+        self.post_event('evt_1', 'payment_intent.succeeded', 1700000000).assert_not_called()
+
+    def test_events_for_an_object_apply_in_stripe_order(self):
+        # Delivered out of order: the failure happened before the successful retry
+        self.post_event('evt_ok', 'payment_intent.succeeded', 1700000100)
+        self.post_event('evt_fail', 'payment_intent.payment_failed', 1700000000)
+        self.assertEqual(stripe_webhook_queue.process_object('pi_1'), 2)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.payment_status, 'paid')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+
+    def test_failed_handler_holds_back_later_events_until_replayed(self):
+        self.post_event('evt_1', 'payment_intent.succeeded', 1700000000)
+        with mock.patch('orders.reservations.stock_reservations.commit', side_effect=RuntimeError('db down')):
+            with self.assertRaises(WebhookProcessingError):
+                stripe_webhook_queue.process_object('pi_1')
+        event = StripeWebhookEvent.objects.get(stripe_event_id='evt_1')
+        self.assertEqual((event.processed, event.attempts, event.last_error), (False, 1, 'db down'))
+        self.assertEqual(Payment.objects.get().status, 'pending')
+
+        result = stripe_webhook_queue.replay(StripeWebhookEvent.objects.filter(processed=False, attempts__gt=0))
+        self.assertEqual((result['processed'], result['failed']), (1, 0))
+        self.assertEqual(Payment.objects.get().status, 'succeeded')
+
+
+class TransactionIdTest(TestCase):
+    """Payment transaction IDs are ULIDs assigned once, without clash queries"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='payer')
+
+    def test_ids_are_sortable_and_unique(self):
+        ids = [generate_payment_transaction_id() for _ in range(1000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertTrue(all(is_ulid_transaction_id(i) for i in ids))
+
+    def test_status_update_does_not_query_for_clashes(self):
+        payment = Payment.objects.create(user=self.user, amount=Decimal('5.00'))
+        transaction_id = payment.transaction_id
+        with CaptureQueriesContext(connection) as queries:
+            payment.mark_as_completed()
+        # Only UPDATEs (the payment and its user's stats row), no clash probing
+        self.assertTrue(all(q['sql'].startswith('UPDATE') for q in queries.captured_queries))
+        payment.refresh_from_db()
+        self.assertEqual(payment.transaction_id, transaction_id)
+        self.assertIsNotNone(payment.completed_at)
+
+    def test_backfill_reissues_blank_and_legacy_ids(self):
+        blank = Payment.objects.create(user=self.user, amount=Decimal('5.00'))
+        legacy = Payment.objects.create(user=self.user, amount=Decimal('5.00'))
+        current = Payment.objects.create(user=self.user, amount=Decimal('5.00'))
+        Payment.objects.filter(pk=blank.pk).update(transaction_id='')
+        Payment.objects.filter(pk=legacy.pk).update(transaction_id='PAY-20250718-143021-a1b2c3d4')
+
+        call_command('fix_transaction_ids', batch_size=1, stdout=StringIO())
+        self.assertTrue(is_ulid_transaction_id(Payment.objects.get(pk=blank.pk).transaction_id))
+        self.assertEqual(Payment.objects.get(pk=legacy.pk).transaction_id, 'PAY-20250718-143021-a1b2c3d4')
+
+        call_command('fix_transaction_ids', legacy=True, stdout=StringIO())
+        self.assertTrue(is_ulid_transaction_id(Payment.objects.get(pk=legacy.pk).transaction_id))
+        self.assertEqual(Payment.objects.get(pk=current.pk).transaction_id, current.transaction_id)
+
+
+class StripeMirrorTest(TestCase):
+    """Stripe objects are read from the local mirror unless stale"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='mirrored', email='mirrored@example.com')
+        self.intent = {'id': 'pi_m', 'object': 'payment_intent', 'status': 'requires_payment_method', 'client_secret': 'pi_m_secret'}
+
+    def test_fresh_copy_needs_no_stripe_call(self):
+        stripe_mirror.store(self.intent)
+        with mock.patch('stripe.PaymentIntent.retrieve') as retrieve:
+            intent = stripe_mirror.payment_intent('pi_m')
+        retrieve.assert_not_called()
+        self.assertEqual(intent.client_secret, 'pi_m_secret')
+
+    def test_stale_copy_is_read_once_from_stripe(self):
+        stripe_mirror.store({'id': 'cus_m', 'object': 'customer', 'email': 'mirrored@example.com'}, f"user:{self.user.pk}")
+        MirroredStripeObject.objects.update(synced_at=timezone.now() - timedelta(days=2))
+        fresh = {'id': 'cus_m', 'object': 'customer', 'email': 'mirrored@example.com', 'name': 'Renamed'}
+        with mock.patch('stripe.Customer.retrieve', return_value=fresh) as retrieve:
+            self.assertEqual(stripe_mirror.customer_for(self.user)['name'], 'Renamed')
+            self.assertEqual(stripe_mirror.customer_for(self.user)['name'], 'Renamed')
+        retrieve.assert_called_once_with('cus_m')
+
+    def test_webhook_refreshes_the_copy(self):
+        stripe_mirror.store(self.intent)
+        event = {'id': 'evt_m', 'type': 'payment_intent.processing', 'created': 1700000000,
+                 'data': {'object': dict(self.intent, status='processing')}}
+        with mock.patch('stripe.Webhook.construct_event', return_value=event), \
+                mock.patch('payments.tasks.process_stripe_events.delay'), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('payments:stripe_webhook'), b'{}', content_type='application/json', secure=True)
+        stripe_webhook_queue.process_object('pi_m')
+        self.assertEqual(MirroredStripeObject.objects.get(stripe_id='pi_m').data['status'], 'processing')
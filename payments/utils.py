@@ -1,31 +1,63 @@
 """
 Express Deals - Transaction ID Generator
-Ensures unique transaction IDs for payments
+Sortable, collision-free transaction IDs for payments
 """
 
-import uuid
+import secrets
+import threading
 import time
-from datetime import datetime
-from django.utils import timezone
 
+# Crockford base32, as used by ULIDs (no I, L, O or U)
+ULID_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ULID_RANDOM_BITS = 80
 
-def generate_unique_transaction_id(prefix='TXN'):
+_ulid_lock = threading.Lock()
+_last_ulid = {'ms': 0, 'random': 0}
+
+
+def generate_ulid(timestamp_ms=None):
+    """
+    Generate a ULID: 48-bit millisecond timestamp + 80 random bits, as 26
+    Crockford base32 characters. IDs sort by creation time; within one
+    millisecond a process increments the random part, so its IDs never
+    repeat. Across processes a clash needs the same 80 random bits.
+    Pass ``timestamp_ms`` to date an ID (backfills) - those skip the
+    per-process ordering.
+    """
+    if timestamp_ms is not None:
+        ms, random_part = int(timestamp_ms), secrets.randbits(ULID_RANDOM_BITS)
+    else:
+        with _ulid_lock:
+            ms = time.time_ns() // 1_000_000
+            if ms <= _last_ulid['ms']:
+                ms = _last_ulid['ms']
+                random_part = _last_ulid['random'] + 1
+                if random_part >> ULID_RANDOM_BITS:
+                    ms, random_part = ms + 1, secrets.randbits(ULID_RANDOM_BITS)
+            else:
+                random_part = secrets.randbits(ULID_RANDOM_BITS)
+            _last_ulid['ms'], _last_ulid['random'] = ms, random_part
+
+    value = (ms << ULID_RANDOM_BITS) | random_part
+    chars = []
+    for _ in range(26):
+        value, index = divmod(value, 32)
+        chars.append(ULID_ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+def generate_unique_transaction_id(prefix='TXN', timestamp_ms=None):
     """
     Generate a unique transaction ID
-    Format: PREFIX-YYYYMMDD-HHMMSS-UUID4
-    Example: TXN-20250718-143021-a1b2c3d4
+    Format: PREFIX-ULID
+    Example: PAY-01J3F8ZQ4V9X2M7K5N0B6C8D1E
     """
-    timestamp = timezone.now()
-    date_part = timestamp.strftime('%Y%m%d')
-    time_part = timestamp.strftime('%H%M%S')
-    uuid_part = str(uuid.uuid4())[:8]
-    
-    return f"{prefix}-{date_part}-{time_part}-{uuid_part}"
+    return f"{prefix}-{generate_ulid(timestamp_ms)}"
 
 
-def generate_payment_transaction_id():
+def generate_payment_transaction_id(timestamp_ms=None):
     """Generate transaction ID specifically for payments"""
-    return generate_unique_transaction_id('PAY')
+    return generate_unique_transaction_id('PAY', timestamp_ms)
 
 
 def generate_subscription_transaction_id():
@@ -36,3 +68,9 @@ def generate_subscription_transaction_id():
 def generate_refund_transaction_id():
     """Generate transaction ID for refunds"""
     return generate_unique_transaction_id('REF')
+
+
+def is_ulid_transaction_id(transaction_id):
+    """True for PREFIX-ULID ids; older ids were PREFIX-YYYYMMDD-HHMMSS-uuid"""
+    prefix, _, ulid = (transaction_id or '').partition('-')
+    return bool(prefix) and len(ulid) == 26 and all(c in ULID_ALPHABET for c in ulid)
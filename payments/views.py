@@ -1,19 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.views.generic import View, TemplateView
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.db import transaction
-from django.utils import timezone
 import stripe
 import json
 import logging
 
+from accounts.user_stats import user_stats
 from orders.models import Order, Cart
-from .models import Payment, StripeWebhookEvent
+from .models import Payment
+from .stripe_mirror import stripe_mirror
+from .webhooks import receive_stripe_webhook
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -65,9 +66,10 @@ class PaymentView(LoginRequiredMixin, View):
                 
                 payment.stripe_payment_intent_id = intent.id
                 payment.save()
+                stripe_mirror.store(intent)
             else:
-                # Retrieve existing payment intent
-                intent = stripe.PaymentIntent.retrieve(payment.stripe_payment_intent_id)
+                # Reloads read the mirrored client secret - no Stripe call unless it is stale
+                intent = stripe_mirror.payment_intent(payment.stripe_payment_intent_id)
             
             context = {
                 'order': order,
@@ -113,7 +115,7 @@ class PaymentSuccessView(LoginRequiredMixin, TemplateView):
                 if payment.status == 'succeeded':
                     try:
                         cart = Cart.objects.get(user=self.request.user)
-                        cart.items.all().delete()
+                        cart.clear()
                         logger.info(
                             f"Cart cleared for user {self.request.user.username} "
                             f"on payment success page"
@@ -156,143 +158,12 @@ class PaymentCancelView(LoginRequiredMixin, TemplateView):
 @method_decorator(csrf_exempt, name='dispatch')
 class StripeWebhookView(View):
     """
-    Handle Stripe webhook events
+    Handle Stripe webhook events: verify and store them, then answer at once.
+    payments.webhooks applies them in a Celery worker.
     """
     
     def post(self, request):
-        payload = request.body
-        sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
-        endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
-        
-        try:
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, endpoint_secret
-            )
-        except ValueError:
-            logger.error("Invalid payload in Stripe webhook")
-            return HttpResponse(status=400)
-        except stripe.error.SignatureVerificationError:
-            logger.error("Invalid signature in Stripe webhook")
-            return HttpResponse(status=400)
-        
-        # Store webhook event
-        webhook_event, created = StripeWebhookEvent.objects.get_or_create(
-            stripe_event_id=event['id'],
-            defaults={
-                'event_type': event['type'],
-                'data': event['data'],
-            }
-        )
-        
-        if not created and webhook_event.processed:
-            return HttpResponse(status=200)
-        
-        # Handle the event
-        try:
-            if event['type'] == 'payment_intent.succeeded':
-                self._handle_payment_succeeded(event['data']['object'])
-            elif event['type'] == 'payment_intent.payment_failed':
-                self._handle_payment_failed(event['data']['object'])
-            elif event['type'] == 'charge.dispute.created':
-                self._handle_dispute_created(event['data']['object'])
-            else:
-                logger.info(f"Unhandled event type: {event['type']}")
-            
-            # Mark webhook as processed
-            webhook_event.processed = True
-            webhook_event.save()
-            
-        except Exception as e:
-            logger.error(f"Error processing webhook {event['id']}: {str(e)}")
-            return HttpResponse(status=500)
-        
-        return HttpResponse(status=200)
-    
-    def _handle_payment_succeeded(self, payment_intent):
-        """Handle successful payment"""
-        try:
-            with transaction.atomic():
-                payment = Payment.objects.get(
-                    stripe_payment_intent_id=payment_intent['id']
-                )
-                
-                # Update payment status
-                payment.status = 'succeeded'
-                payment.completed_at = timezone.now()
-                payment.gateway_response = payment_intent
-                payment.save()
-                
-                # Update order status
-                order = payment.order
-                order.payment_status = 'paid'
-                order.status = 'processing'
-                order.stripe_payment_intent_id = payment_intent['id']
-                order.save()
-                
-                # Clear user's cart after successful payment
-                try:
-                    cart = Cart.objects.get(user=order.user)
-                    cart.items.all().delete()
-                    logger.info(
-                        f"Cart cleared for user {order.user.username} "
-                        f"after successful payment"
-                    )
-                except Cart.DoesNotExist:
-                    logger.info(f"No cart found for user {order.user.username}")
-                
-                logger.info(
-                    f"Payment succeeded for order {order.order_number}"
-                )
-                
-        except Payment.DoesNotExist:
-            logger.error(f"Payment not found for payment_intent {payment_intent['id']}")
-        except Exception as e:
-            logger.error(f"Error handling payment success: {str(e)}")
-    
-    def _handle_payment_failed(self, payment_intent):
-        """Handle failed payment"""
-        try:
-            payment = Payment.objects.get(
-                stripe_payment_intent_id=payment_intent['id']
-            )
-            
-            payment.status = 'failed'
-            payment.gateway_response = payment_intent
-            payment.save()
-            
-            # Update order status
-            order = payment.order
-            order.payment_status = 'failed'
-            order.save()
-            
-            logger.info(f"Payment failed for order {order.order_number}")
-            
-        except Payment.DoesNotExist:
-            logger.error(f"Payment not found for payment_intent {payment_intent['id']}")
-        except Exception as e:
-            logger.error(f"Error handling payment failure: {str(e)}")
-    
-    def _handle_dispute_created(self, charge):
-        """Handle dispute/chargeback creation"""
-        try:
-            # Find payment by charge ID
-            payment_intent_id = charge.get('payment_intent')
-            if payment_intent_id:
-                payment = Payment.objects.get(
-                    stripe_payment_intent_id=payment_intent_id
-                )
-                
-                # Update order status
-                order = payment.order
-                order.status = 'disputed'
-                order.save()
-                
-                logger.warning(f"Dispute created for order {order.order_number}")
-                
-        except Payment.DoesNotExist:
-            logger.error(f"Payment not found for disputed charge {charge['id']}")
-        except Exception as e:
-            logger.error(f"Error handling dispute: {str(e)}")
+        return receive_stripe_webhook(request)
 
 
 class RefundView(LoginRequiredMixin, View):
@@ -378,23 +249,13 @@ class PaymentDashboardView(LoginRequiredMixin, TemplateView):
             user=self.request.user
         ).order_by('-created_at')[:10]
         
-        # Payment status stats
+        # Payment status stats, from the user's stats rollup
+        stats = user_stats.for_user(self.request.user)
         payment_stats = {
-            'total_payments': Payment.objects.filter(
-                user=self.request.user
-            ).count(),
-            'successful_payments': Payment.objects.filter(
-                user=self.request.user,
-                status='succeeded'
-            ).count(),
-            'pending_payments': Payment.objects.filter(
-                user=self.request.user,
-                status='pending'
-            ).count(),
-            'failed_payments': Payment.objects.filter(
-                user=self.request.user,
-                status='failed'
-            ).count(),
+            'total_payments': stats.payments_total,
+            'successful_payments': stats.payments_succeeded,
+            'pending_payments': stats.payments_pending,
+            'failed_payments': stats.payments_failed,
         }
         
         context.update({
@@ -0,0 +1,342 @@
+"""
+Express Deals - Stripe Webhook Queue
+Webhook endpoints only verify the signature and store the event, then
+return 200. A Celery task applies stored events: one Stripe object's events
+run in the order Stripe created them, under row locks, and each event is
+applied at most once however often Stripe retries it.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Callable, Dict, List
+
+import stripe
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from orders.models import Cart
+from orders.reservations import stock_reservations
+from .models import Payment, StripeWebhookEvent
+from .stripe_mirror import stripe_mirror
+
+try:
+    from prometheus_client import Counter, Histogram
+except ImportError:  # prometheus_client not installed - counters stay in-process only
+    Counter = Histogram = None
+
+logger = logging.getLogger(__name__)
+
+if Counter is not None:
+    WEBHOOK_EVENTS = Counter(
+        'express_deals_stripe_webhook_events_total',
+        'Stripe webhook events by type and outcome (received, duplicate, processed, failed)',
+        ['event_type', 'outcome']
+    )
+    WEBHOOK_LAG = Histogram(
+        'express_deals_stripe_webhook_lag_seconds',
+        'Time from an event being received to it being applied',
+        buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+    )
+
+MAX_ATTEMPTS = 8
+SWEEP_GRACE = timedelta(seconds=30)
+SWEEP_BATCH_SIZE = 200
+
+
+class WebhookProcessingError(Exception):
+    """An event handler failed; the object's remaining events wait for a retry"""
+
+
+def event_object_id(event) -> str:
+    """
+    Ordering key for an event: charges, invoices and disputes are grouped
+    with the payment intent they belong to, so their events can't overtake it.
+    """
+    obj = event['data']['object']
+    for key in ('payment_intent', 'subscription', 'id'):
+        value = obj.get(key)
+        if isinstance(value, str) and value:
+            return value
+    return ''
+
+
+class StripeWebhookQueue:
+    """Persist, order and apply Stripe webhook events"""
+
+    def __init__(self):
+        self.handlers: Dict[str, List[Callable]] = defaultdict(list)
+        self.stats = {'received': 0, 'duplicates': 0, 'processed': 0, 'failed': 0}
+        self.started = time.monotonic()
+
+    def register(self, *event_types):
+        """Decorator adding a handler ``handler(stripe_object)`` for the given event types"""
+        def decorator(handler):
+            for event_type in event_types:
+                self.handlers[event_type].append(handler)
+            return handler
+        return decorator
+
+    # Intake - runs inside the webhook request
+
+    def receive(self, event) -> StripeWebhookEvent:
+        """Store a verified event and queue its object; Stripe retries of a stored event are no-ops"""
+        webhook_event, created = StripeWebhookEvent.objects.get_or_create(
+            stripe_event_id=event['id'],
+            defaults={
+                'event_type': event['type'],
+                'data': event['data'],
+                'object_id': event_object_id(event),
+                'stripe_created': datetime.fromtimestamp(event['created'], tz=dt_timezone.utc) if event.get('created') else None,
+            }
+        )
+        if not created and webhook_event.processed:
+            self._count(webhook_event.event_type, 'duplicate')
+            return webhook_event
+
+        self._count(webhook_event.event_type, 'received')
+        object_id = webhook_event.object_id
+        transaction.on_commit(lambda: self.enqueue(object_id))
+        return webhook_event
+
+    def enqueue(self, object_id: str):
+        from .tasks import process_stripe_events
+        try:
+            process_stripe_events.delay(object_id)
+        except Exception as e:
+            # The event is stored; the periodic sweep will pick it up
+            logger.warning(f"Failed to queue Stripe events for {object_id or 'unknown object'}: {e}")
+
+    # Processing - runs in the Celery worker
+
+    def process_object(self, object_id: str) -> int:
+        """
+        Apply an object's pending events oldest first. The row locks make a
+        second worker for the same object wait, then find nothing to do.
+        Raises WebhookProcessingError if an event fails; later events wait.
+        """
+        applied, failure = 0, None
+        with transaction.atomic():
+            pending = list(
+                StripeWebhookEvent.objects.select_for_update()
+                .filter(object_id=object_id, processed=False)
+                .order_by('stripe_created', 'id')
+            )
+            for webhook_event in pending:
+                try:
+                    with transaction.atomic():
+                        self.dispatch(webhook_event)
+                except Exception as e:
+                    webhook_event.attempts += 1
+                    webhook_event.last_error = str(e)[:2000]
+                    webhook_event.save(update_fields=['attempts', 'last_error'])
+                    self._count(webhook_event.event_type, 'failed')
+                    logger.error(f"Error processing webhook {webhook_event.stripe_event_id}: {e}")
+                    failure = WebhookProcessingError(f"{webhook_event.stripe_event_id}: {e}")
+                    break
+
+                webhook_event.processed = True
+                webhook_event.processed_at = timezone.now()
+                webhook_event.attempts += 1
+                webhook_event.last_error = ''
+                webhook_event.save(update_fields=['processed', 'processed_at', 'attempts', 'last_error'])
+                self._count(webhook_event.event_type, 'processed')
+                if Histogram is not None:
+                    WEBHOOK_LAG.observe((webhook_event.processed_at - webhook_event.created_at).total_seconds())
+                applied += 1
+
+        if failure is not None:
+            raise failure
+        return applied
+
+    def dispatch(self, webhook_event: StripeWebhookEvent):
+        handlers = self.handlers.get(webhook_event.event_type)
+        if not handlers:
+            logger.info(f"Unhandled event type: {webhook_event.event_type}")
+            return
+        for handler in handlers:
+            handler(webhook_event.data['object'])
+
+    def process_pending(self, batch_size: int = SWEEP_BATCH_SIZE) -> Dict:
+        """Apply events whose task never ran (broker outage) or ran out of retries"""
+        cutoff = timezone.now() - SWEEP_GRACE
+        object_ids = list(
+            StripeWebhookEvent.objects.filter(processed=False, created_at__lte=cutoff, attempts__lt=MAX_ATTEMPTS)
+            .order_by('object_id').values_list('object_id', flat=True).distinct()[:batch_size]
+        )
+        result = {'objects': len(object_ids), 'processed': 0, 'failed': 0}
+        for object_id in object_ids:
+            try:
+                result['processed'] += self.process_object(object_id)
+            except WebhookProcessingError:
+                result['failed'] += 1
+        return result
+
+    def replay(self, events) -> Dict:
+        """Re-apply stored events (handlers are idempotent), oldest first per object"""
+        object_ids = set(events.values_list('object_id', flat=True))
+        reset = events.update(processed=False, processed_at=None, attempts=0, last_error='')
+        result = {'events': reset, 'processed': 0, 'failed': 0}
+        for object_id in sorted(object_ids):
+            try:
+                result['processed'] += self.process_object(object_id)
+            except WebhookProcessingError as e:
+                logger.error(f"Replay stopped for {object_id}: {e}")
+                result['failed'] += 1
+        return result
+
+    def get_stats(self) -> Dict:
+        """Queue depth, failures and throughput"""
+        pending = StripeWebhookEvent.objects.filter(processed=False)
+        oldest = pending.order_by('created_at').values_list('created_at', flat=True).first()
+        last_hour = StripeWebhookEvent.objects.filter(
+            processed=True, processed_at__gte=timezone.now() - timedelta(hours=1)
+        ).count()
+        uptime = time.monotonic() - self.started
+        return {
+            **self.stats,
+            'pending': pending.count(),
+            'failing': pending.filter(attempts__gt=0).count(),
+            'oldest_pending_seconds': round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0.0,
+            'processed_last_hour': last_hour,
+            'events_per_second': round(self.stats['processed'] / uptime, 2) if uptime else 0.0,
+        }
+
+    def _count(self, event_type: str, outcome: str):
+        key = 'duplicates' if outcome == 'duplicate' else outcome
+        self.stats[key] += 1
+        if Counter is not None:
+            WEBHOOK_EVENTS.labels(event_type=event_type, outcome=outcome).inc()
+
+
+# Global Stripe webhook queue instance
+stripe_webhook_queue = StripeWebhookQueue()
+
+
+def receive_stripe_webhook(request, endpoint_secret=None) -> HttpResponse:
+    """Shared webhook endpoint body: verify, persist, answer 200"""
+    payload = request.body
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
+
+    try:
+        event = stripe.Webhook.construct_event(
+            payload, sig_header, endpoint_secret or settings.STRIPE_WEBHOOK_SECRET
+        )
+    except ValueError:
+        logger.error("Invalid payload in Stripe webhook")
+        return HttpResponse(status=400)
+    except stripe.error.SignatureVerificationError:
+        logger.error("Invalid signature in Stripe webhook")
+        return HttpResponse(status=400)
+
+    stripe_webhook_queue.receive(event)
+    return HttpResponse(status=200)
+
+
+# ===== ORDER PAYMENT HANDLERS =====
+
+@stripe_webhook_queue.register('payment_intent.succeeded')
+def handle_payment_succeeded(payment_intent):
+    """Mark the payment and order paid, sell the reserved stock and clear the cart"""
+    payment = (
+        Payment.objects.select_for_update().select_related('order__user')
+        .filter(stripe_payment_intent_id=payment_intent['id']).first()
+    )
+    if payment is None:
+        logger.error(f"Payment not found for payment_intent {payment_intent['id']}")
+        return
+    if payment.status == 'succeeded':
+        logger.info(f"Payment for payment_intent {payment_intent['id']} already recorded")
+        return
+
+    payment.status = 'succeeded'
+    payment.completed_at = timezone.now()
+    payment.gateway_response = payment_intent
+    payment.save()
+
+    # Update order status
+    order = payment.order
+    order.payment_status = 'paid'
+    order.status = 'processing'
+    order.stripe_payment_intent_id = payment_intent['id']
+    order.save()
+
+    # The stock held at checkout is now sold
+    stock_reservations.commit(order)
+
+    # Clear user's cart after successful payment
+    cart = Cart.objects.filter(user=order.user).first()
+    if cart is not None:
+        cart.clear()
+        logger.info(f"Cart cleared for user {order.user.username} after successful payment")
+
+    logger.info(f"Payment succeeded for order {order.order_number}")
+
+
+@stripe_webhook_queue.register('payment_intent.payment_failed')
+def handle_payment_failed(payment_intent):
+    """Mark the payment failed and hand the held stock back"""
+    payment = (
+        Payment.objects.select_for_update().select_related('order')
+        .filter(stripe_payment_intent_id=payment_intent['id']).first()
+    )
+    if payment is None:
+        logger.error(f"Payment not found for payment_intent {payment_intent['id']}")
+        return
+    if payment.status == 'succeeded':
+        # A late failure for an attempt that a retry already paid
+        return
+
+    payment.status = 'failed'
+    payment.gateway_response = payment_intent
+    payment.save()
+
+    # Update order status
+    order = payment.order
+    order.payment_status = 'failed'
+    order.save()
+
+    # Hand the held stock back; a retried payment takes it again on success
+    stock_reservations.release(order)
+
+    logger.info(f"Payment failed for order {order.order_number}")
+
+
+@stripe_webhook_queue.register('charge.dispute.created')
+def handle_dispute_created(charge):
+    """Flag the order of a disputed charge"""
+    payment_intent_id = charge.get('payment_intent')
+    if not payment_intent_id:
+        return
+    payment = Payment.objects.select_related('order').filter(stripe_payment_intent_id=payment_intent_id).first()
+    if payment is None:
+        logger.error(f"Payment not found for disputed charge {charge['id']}")
+        return
+
+    order = payment.order
+    order.status = 'disputed'
+    order.save()
+
+    logger.warning(f"Dispute created for order {order.order_number}")
+
+
+# ===== STRIPE MIRROR HANDLERS =====
+
+@stripe_webhook_queue.register(
+    'customer.created', 'customer.updated',
+    'price.created', 'price.updated',
+    'payment_intent.created', 'payment_intent.processing', 'payment_intent.requires_action',
+    'payment_intent.succeeded', 'payment_intent.payment_failed', 'payment_intent.canceled',
+    'payment_intent.amount_capturable_updated',
+)
+def refresh_mirrored_object(obj):
+    """The event payload is the object as of the event - keep the local copy current"""
+    stripe_mirror.refresh_from_webhook(obj)
+
+
+@stripe_webhook_queue.register('customer.deleted', 'price.deleted')
+def forget_mirrored_object(obj):
+    stripe_mirror.forget(obj['id'])
@@ -1,10 +1,12 @@
 from django.contrib import admin
-from .models import Category, Product, ProductImage, ProductReview
+from .models import Category, PriceObservation, Product, ProductImage, ProductRatingSummary, ProductReview
 
 admin.site.register(Category)
 admin.site.register(Product)
 admin.site.register(ProductImage)
 admin.site.register(ProductReview)
+admin.site.register(ProductRatingSummary)
+admin.site.register(PriceObservation)
 from django.contrib import admin
 
 # Register your models here.
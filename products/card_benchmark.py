@@ -0,0 +1,97 @@
+"""
+Express Deals - Product Card Render Benchmark
+Times a 48-card listing page rendered directly, through a cold fragment
+cache and through a warm one
+"""
+
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from django.template import engines
+from django.utils.text import slugify
+
+from .card_cache import CARD_TEMPLATES, product_card_renderer
+from .models import Category, Product
+
+
+@dataclass
+class CardBenchmarkResult:
+    """Median page render time (ms) per mode"""
+    products: int
+    uncached_ms: float = 0.0
+    cold_ms: float = 0.0
+    warm_ms: float = 0.0
+    samples: Dict[str, List[float]] = field(default_factory=dict)
+
+    @property
+    def warm_speedup(self) -> float:
+        return round(self.uncached_ms / self.warm_ms, 1) if self.warm_ms else 0.0
+
+
+class CardRenderBenchmark:
+    """Render the same page of product cards repeatedly in each cache mode"""
+
+    PAGE_TEMPLATE = "{% load product_cards %}{% product_cards products variant %}"
+    UNCACHED_TEMPLATE = "{% for product in products %}{% include card_template %}{% endfor %}"
+
+    def __init__(self, products: int = 48, repeats: int = 20, variant: str = 'grid'):
+        self.products = products
+        self.repeats = repeats
+        self.variant = variant
+
+    def seed(self) -> List[Product]:
+        category, _ = Category.objects.get_or_create(name='Benchmark', defaults={'slug': 'benchmark'})
+        existing = Product.objects.filter(category=category).count()
+        Product.objects.bulk_create([
+            Product(
+                name=f"Benchmark Product {number}",
+                slug=slugify(f"benchmark-product-{number}"),
+                category=category,
+                description='Card render benchmark product with a reasonably long description ' * 3,
+                price=10 + number,
+                original_price=(10 + number) * 1.25 if number % 2 else None,
+                image=f"products/benchmark_{number}",
+                stock_quantity=number % 4,
+                stock_status=['in_stock', 'low_stock', 'out_of_stock'][number % 3],
+                is_featured=number % 7 == 0,
+            )
+            for number in range(existing, self.products)
+        ])
+        return list(
+            Product.objects.filter(category=category)
+            .select_related('category', 'rating_summary')
+            .order_by('id')[:self.products]
+        )
+
+    def run(self) -> CardBenchmarkResult:
+        products = self.seed()
+        engine = engines['django']
+        page = engine.from_string(self.PAGE_TEMPLATE)
+        uncached = engine.from_string(self.UNCACHED_TEMPLATE)
+        context = {'products': products, 'variant': self.variant, 'card_template': CARD_TEMPLATES[self.variant]}
+
+        result = CardBenchmarkResult(products=len(products))
+        result.samples['uncached'] = [self._time(lambda: uncached.render(context)) for _ in range(self.repeats)]
+
+        cold = []
+        for _ in range(self.repeats):
+            product_card_renderer.cache.delete_many([
+                product_card_renderer.cache_key(product, self.variant, 'GBP') for product in products
+            ])
+            cold.append(self._time(lambda: page.render(context)))
+        result.samples['cold'] = cold
+
+        page.render(context)
+        result.samples['warm'] = [self._time(lambda: page.render(context)) for _ in range(self.repeats)]
+
+        result.uncached_ms = round(statistics.median(result.samples['uncached']), 2)
+        result.cold_ms = round(statistics.median(result.samples['cold']), 2)
+        result.warm_ms = round(statistics.median(result.samples['warm']), 2)
+        return result
+
+    def _time(self, render) -> float:
+        started = time.perf_counter()
+        render()
+        return (time.perf_counter() - started) * 1000
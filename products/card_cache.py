@@ -0,0 +1,90 @@
+"""
+Express Deals - Product Card Fragment Cache
+Renders product cards through the cache: one get_many per page, only
+the misses are rendered (Cloudinary URLs, price and discount formatting)
+"""
+
+import logging
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+
+logger = logging.getLogger(__name__)
+
+CARD_TEMPLATES = {
+    'grid': 'products/cards/grid.html',
+    'related': 'products/cards/related.html',
+}
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class ProductCardRenderer:
+    """Fragment cache for product cards keyed on (variant, currency, product.id, product.updated_at)"""
+
+    def __init__(self):
+        self.cache_alias = getattr(settings, 'PRODUCT_CARD_CACHE', 'default')
+        self.enabled = getattr(settings, 'PRODUCT_CARD_CACHE_ENABLED', True)
+        self.render_stats = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def cache_key(self, product, variant: str, currency: str) -> str:
+        # updated_at is bumped by product saves and review changes, so stale cards are never read
+        version = int(product.updated_at.timestamp() * 1_000_000) if product.updated_at else 0
+        return f"product_card:{variant}:{currency}:{product.pk}:{version}"
+
+    def render_many(self, products: Iterable, variant: str = 'grid', currency: str = None) -> List[str]:
+        """Rendered card HTML for each product, in order"""
+        products = list(products)
+        if not products:
+            return []
+        currency = currency or getattr(settings, 'DEFAULT_CURRENCY', 'GBP')
+        template = get_template(CARD_TEMPLATES[variant])
+
+        keys = [self.cache_key(product, variant, currency) for product in products]
+        cached = self._get_many(keys) if self.enabled else {}
+
+        rendered, missed = [], {}
+        for key, product in zip(keys, products):
+            html = cached.get(key)
+            if html is None:
+                html = template.render({'product': product, 'currency': currency})
+                missed[key] = html
+            rendered.append(html)
+
+        self.render_stats['hits'] += len(products) - len(missed)
+        self.render_stats['misses'] += len(missed)
+        if missed and self.enabled:
+            self._set_many(missed)
+        return rendered
+
+    def get_render_stats(self) -> Dict:
+        """Get card cache statistics for this process"""
+        stats = dict(self.render_stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+    def _get_many(self, keys: List[str]) -> Dict[str, str]:
+        try:
+            return self.cache.get_many(keys)
+        except Exception as e:
+            # A cache outage degrades to rendering every card
+            self.render_stats['errors'] += 1
+            logger.warning(f"Product card cache read failed: {e}")
+            return {}
+
+    def _set_many(self, entries: Dict[str, str]):
+        try:
+            self.cache.set_many(entries, timeout=CARD_CACHE_TIMEOUT)
+        except Exception as e:
+            self.render_stats['errors'] += 1
+            logger.warning(f"Product card cache write failed: {e}")
+
+
+# Global product card renderer instance
+product_card_renderer = ProductCardRenderer()
@@ -0,0 +1,180 @@
+"""
+Express Deals - Faceted Navigation
+Per-category counts and price-range buckets for the current listing
+filters, computed in one grouped query and cached per filter set
+"""
+
+import logging
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from .models import Category, Product
+from .pagination import count_cache_key
+
+logger = logging.getLogger(__name__)
+
+# (min, max) in pounds, both inclusive to match the min_price/max_price filters; None is open-ended
+PRICE_BUCKETS = [
+    (Decimal('0'), Decimal('9.99')),
+    (Decimal('10'), Decimal('24.99')),
+    (Decimal('25'), Decimal('49.99')),
+    (Decimal('50'), Decimal('99.99')),
+    (Decimal('100'), Decimal('249.99')),
+    (Decimal('250'), None),
+]
+
+FACET_FILTERS = ('search', 'category', 'min_price', 'max_price')
+FACET_CACHE_TIMEOUT = 600
+VERSION_KEY = 'product_facets_version'
+CHANGED_KEY = 'product_facets_changed_at'
+FEATURED_LIMIT = 6
+
+
+def parse_price(value) -> Optional[Decimal]:
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+class FacetService:
+    """Facet counts for product listings, invalidated whenever a product or category changes"""
+
+    def cache_version(self) -> int:
+        """Current generation of listing caches; bumping it orphans every cached facet/count"""
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, 1, timeout=None)
+            version = cache.get(VERSION_KEY, 1)
+        return version
+
+    def invalidate(self):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, timeout=None)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate product facets: {e}")
+        try:
+            cache.set(CHANGED_KEY, timezone.now(), timeout=None)
+        except Exception as e:
+            logger.warning(f"Failed to record catalogue change time: {e}")
+
+    def catalogue_state(self):
+        """
+        (version, changed_at) in one cache round trip; changed_at covers catalogue
+        changes updated_at can't show, like deletes and deactivations
+        """
+        state = cache.get_many([VERSION_KEY, CHANGED_KEY])
+        version = state.get(VERSION_KEY) or self.cache_version()
+        return version, state.get(CHANGED_KEY)
+
+    def cache_key(self, prefix: str, filters: Dict) -> str:
+        return count_cache_key(f"{prefix}:v{self.cache_version()}", filters)
+
+    def get_facets(self, params) -> Dict:
+        """Category and price facets for the given listing parameters (cached)"""
+        filters = {name: (params.get(name) or '').strip() for name in FACET_FILTERS}
+        key = self.cache_key('product_facets', filters)
+        facets = cache.get(key)
+        if facets is None:
+            facets = self.compute_facets(filters)
+            cache.set(key, facets, timeout=FACET_CACHE_TIMEOUT)
+        return facets
+
+    def compute_facets(self, filters: Dict) -> Dict:
+        """
+        One grouped query over the search results, bucketed by (category,
+        price bucket, inside the price filter). Each facet then ignores its own
+        filter, so the counts show what choosing that option would return.
+        """
+        queryset = Product.objects.filter(is_active=True)
+        if filters.get('search'):
+            queryset = queryset.search(filters['search'])
+
+        min_price, max_price = parse_price(filters.get('min_price')), parse_price(filters.get('max_price'))
+        price_filter = Q()
+        if min_price is not None:
+            price_filter &= Q(price__gte=min_price)
+        if max_price is not None:
+            price_filter &= Q(price__lte=max_price)
+
+        rows = (
+            queryset.order_by()
+            .annotate(
+                price_bucket=self._bucket_expression(),
+                in_price_range=Case(When(price_filter, then=Value(1)), default=Value(0), output_field=IntegerField())
+                if price_filter else Value(1, output_field=IntegerField())
+            )
+            .values('category_id', 'price_bucket', 'in_price_range')
+            .annotate(count=Count('id'))
+        )
+
+        categories = list(Category.objects.values('id', 'name', 'slug'))
+        selected = self._selected_category(filters.get('category'), categories)
+
+        category_counts, bucket_counts, total = {}, [0] * len(PRICE_BUCKETS), 0
+        for row in rows:
+            in_category = selected is None or row['category_id'] == selected
+            if row['in_price_range']:
+                category_counts[row['category_id']] = category_counts.get(row['category_id'], 0) + row['count']
+                if in_category:
+                    total += row['count']
+            if in_category:
+                bucket_counts[row['price_bucket']] += row['count']
+
+        return {
+            'total': total,
+            'categories': [
+                dict(category, count=category_counts.get(category['id'], 0), selected=category['id'] == selected)
+                for category in categories
+            ],
+            'price_buckets': [
+                {
+                    'min': low,
+                    'max': high,
+                    'label': f"£{low}+" if high is None else f"£{low} - £{high}",
+                    'count': bucket_counts[index],
+                    'selected': min_price == low and max_price == high,
+                }
+                for index, (low, high) in enumerate(PRICE_BUCKETS)
+            ],
+        }
+
+    def featured_products(self) -> List[Product]:
+        """Sidebar featured products, cached until the next product change"""
+        key = f"featured_products:v{self.cache_version()}"
+        products = cache.get(key)
+        if products is None:
+            products = list(
+                Product.objects.filter(is_featured=True, is_active=True)
+                .select_related('category')[:FEATURED_LIMIT]
+            )
+            cache.set(key, products, timeout=FACET_CACHE_TIMEOUT)
+        return products
+
+    def _bucket_expression(self):
+        # Buckets are ascending, so the first upper bound a price fits under wins
+        whens = [
+            When(price__lte=high, then=Value(index))
+            for index, (low, high) in enumerate(PRICE_BUCKETS) if high is not None
+        ]
+        return Case(*whens, default=Value(len(PRICE_BUCKETS) - 1), output_field=IntegerField())
+
+    def _selected_category(self, value, categories) -> Optional[int]:
+        if not value:
+            return None
+        for category in categories:
+            if value == category['slug'] or value == str(category['id']):
+                return category['id']
+        return -1  # Unknown category matches nothing
+
+
+# Global facet service instance
+product_facets = FacetService()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from products.models import ProductRatingSummary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized product rating summaries from ProductReview'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', help='Only rebuild this product id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = ProductRatingSummary.rebuild(product_ids=options['product'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rating summaries for {written} products"))
@@ -0,0 +1,39 @@
+from contextlib import ExitStack
+from unittest import mock
+
+import cloudinary
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from products.card_benchmark import CardRenderBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks product card rendering (uncached, cold and warm fragment cache) in a throwaway test database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=48, help='Cards on the page')
+        parser.add_argument('--repeats', type=int, default=20, help='Renders per mode (median reported)')
+        parser.add_argument('--variant', default='grid', choices=['grid', 'related'])
+
+    def handle(self, *args, **options):
+        benchmark = CardRenderBenchmark(
+            products=options['products'], repeats=options['repeats'], variant=options['variant']
+        )
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with ExitStack() as stack:
+                if not cloudinary.config().cloud_name:
+                    # Image URLs are built locally, so any cloud name exercises the same code
+                    stack.enter_context(mock.patch.object(cloudinary.config(), 'cloud_name', 'benchmark', create=True))
+                result = benchmark.run()
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(self.style.SUCCESS(f"{result.products} {options['variant']} cards, median of {options['repeats']}"))
+        self.stdout.write(f"  Uncached      {result.uncached_ms} ms")
+        self.stdout.write(f"  Cold cache    {result.cold_ms} ms")
+        self.stdout.write(f"  Warm cache    {result.warm_ms} ms  ({result.warm_speedup}x faster than uncached)")
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from products.search_benchmark import SearchBenchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks product search (legacy icontains scan vs the full-text index) '
+        'against a synthetic catalogue in a throwaway test database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000, help='Catalogue size to seed')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeats', type=int, default=5, help='Timed runs per query (median reported)')
+        parser.add_argument('--query', action='append', help='Query to time (repeatable)')
+
+    def handle(self, *args, **options):
+        benchmark = SearchBenchmark(
+            products=options['products'],
+            batch_size=options['batch_size'],
+            repeats=options['repeats']
+        )
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stdout.write(f"Seeding {options['products']:,} products...")
+            seconds = benchmark.seed(progress=self._progress)
+            self.stdout.write(self.style.SUCCESS(f"Seeded and indexed in {seconds:.1f}s ({benchmark.backend})"))
+            results = benchmark.run(options['query'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"\n{'Query':<22} {'Matches':>9} {'icontains ms':>13} {'full-text ms':>13} {'Speedup':>8}")
+        for result in results:
+            self.stdout.write(
+                f"{result.query:<22} {result.matches:>9,} {result.icontains_ms:>13} "
+                f"{result.fulltext_ms:>13} {result.speedup:>7}x"
+            )
+
+    def _progress(self, created):
+        if created % 100_000 == 0:
+            self.stdout.write(f"  {created:,} products")
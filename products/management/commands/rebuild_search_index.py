@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from products.search import product_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index (after bulk imports or raw SQL updates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to reindex')
+
+    def handle(self, *args, **options):
+        backend = product_search_index.backend(options['database'])
+        self.stdout.write(f"Rebuilding {backend.vendor} search index...")
+        indexed = product_search_index.rebuild(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products"))
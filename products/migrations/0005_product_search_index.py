@@ -0,0 +1,62 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:23
+
+import django.contrib.postgres.search
+from django.db import migrations, OperationalError
+
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(p.name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(c.name, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(p.description, '')), 'C')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS products_product_search_gin "
+            "ON products_product USING gin (search_vector)"
+        )
+        schema_editor.execute(
+            f"UPDATE products_product p SET search_vector = {POSTGRES_VECTOR} "
+            "FROM products_category c WHERE c.id = p.category_id"
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS products_product_fts "
+                "USING fts5(name, category, description, tokenize = 'porter unicode61')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5 - search falls back to substring matching
+            return
+        schema_editor.execute(
+            "INSERT INTO products_product_fts (rowid, name, category, description) "
+            "SELECT p.id, p.name, c.name, p.description FROM products_product p "
+            "JOIN products_category c ON c.id = p.category_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS products_product_search_gin")
+    elif vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS products_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_alter_product_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
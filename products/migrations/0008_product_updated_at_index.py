@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'updated_at'], name='products_pr_is_acti_e08c8b_idx'),
+        ),
+    ]
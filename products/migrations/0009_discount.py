@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:25
+
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.math
+import products.models
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='discount',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(original_price__gt=models.F('price'), then=django.db.models.functions.math.Round(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(products.models.NumericCast(django.db.models.expressions.CombinedExpression(models.F('original_price'), '-', models.F('price')), models.DecimalField(decimal_places=4, max_digits=12)), '*', models.Value(100)), '/', django.db.models.functions.comparison.NullIf(products.models.NumericCast(models.F('original_price'), models.DecimalField(decimal_places=4, max_digits=12)), models.Value(0, output_field=models.DecimalField(decimal_places=4, max_digits=12)))), 2)), default=models.Value(Decimal('0')), output_field=models.DecimalField(decimal_places=2, max_digits=5)), output_field=models.DecimalField(decimal_places=2, max_digits=5)),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'discount'], name='products_pr_is_acti_2f48c0_idx'),
+        ),
+    ]
@@ -1,9 +1,50 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, Count, DecimalField, Exists, F, OuterRef, Q, Sum, Value, When
+from django.db.models.functions import Cast, NullIf, Round
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from PIL import Image
 from cloudinary.models import CloudinaryField
 
+
+class NumericCast(Cast):
+    """
+    Cast to DECIMAL for exact division. SQLite's NUMERIC affinity would turn
+    whole numbers back into integers (and integer-divide them), so there it
+    casts to REAL instead.
+    """
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='CAST(%(expressions)s AS REAL)', **extra_context)
+
+
+def discount_expression():
+    """
+    Percentage off original_price to 2dp (0 when not discounted), for
+    GeneratedField columns. Divides in numeric: PostgreSQL only has
+    round(numeric, int), not round(double precision, int).
+    """
+    numeric = DecimalField(max_digits=12, decimal_places=4)
+    return Case(
+        When(
+            original_price__gt=F('price'),
+            then=Round(
+                NumericCast(F('original_price') - F('price'), numeric) * 100
+                / NullIf(NumericCast(F('original_price'), numeric), Value(0, output_field=numeric)),
+                2
+            ),
+        ),
+        default=Value(Decimal('0')),
+        output_field=DecimalField(max_digits=5, decimal_places=2),
+    )
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True)
@@ -21,6 +62,13 @@ class Category(models.Model):
     def get_absolute_url(self):
         return reverse('products:category_list', kwargs={'slug': self.slug})
 
+class ProductQuerySet(models.QuerySet):
+    def search(self, query):
+        """Ranked full-text search; results carry a ``search_rank`` annotation, best first"""
+        from .search import product_search_index
+        return product_search_index.search(self, query)
+
+
 class Product(models.Model):
     STOCK_STATUS_CHOICES = [
         ('in_stock', 'In Stock'),
@@ -46,12 +94,28 @@ class Product(models.Model):
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by products.search on PostgreSQL (GIN-indexed); unused on SQLite
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Computed by the database on every write, so deal queries filter and sort on it
+    discount = models.GeneratedField(
+        expression=discount_expression(),
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        db_persist=True,
+    )
+    
+    objects = ProductQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['is_featured', 'is_active']),
+            # Keyset pagination seeks on (sort key, id) within active products
+            models.Index(fields=['is_active', 'created_at', 'id']),
+            models.Index(fields=['is_active', 'price', 'id']),
+            # Conditional GET validators take MAX(updated_at) over active products
+            models.Index(fields=['is_active', 'updated_at']),
+            models.Index(fields=['is_active', 'discount']),
         ]
     
     def __str__(self):
@@ -69,6 +133,14 @@ class Product(models.Model):
         if self.is_on_sale:
             return int(((self.original_price - self.price) / self.original_price) * 100)
         return 0
+    
+    @property
+    def rating(self):
+        """Denormalized review stats; select_related('rating_summary') to read them without a query"""
+        try:
+            return self.rating_summary
+        except ProductRatingSummary.DoesNotExist:
+            return ProductRatingSummary(product=self)
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
@@ -102,3 +174,183 @@ class ProductReview(models.Model):
     
     def __str__(self):
         return f"{self.product.name} - {self.rating} stars by {self.user.username}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the rating summary currently counts for this review
+        if 'product_id' in field_names and 'rating' in field_names:
+            instance._counted_as = (instance.product_id, instance.rating)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        # The summary update in post_save commits (or rolls back) with the review
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            return super().delete(*args, **kwargs)
+
+
+class ProductRatingSummary(models.Model):
+    """Review count, average and 1-5 histogram per product, kept in step with ProductReview writes"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='rating_summary')
+    review_count = models.PositiveIntegerField(default=0)
+    rating_total = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name_plural = "Product rating summaries"
+    
+    def __str__(self):
+        return f"{self.product_id} - {self.average_rating or 0} from {self.review_count} reviews"
+    
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return None
+        return round(self.rating_total / self.review_count, 1)
+    
+    @property
+    def distribution(self):
+        return {stars: getattr(self, f'rating_{stars}') for stars in range(1, 6)}
+    
+    @property
+    def histogram(self):
+        """(stars, count, percent) from 5 stars down, for rating bars"""
+        return [
+            (stars, count, round(count * 100 / self.review_count) if self.review_count else 0)
+            for stars, count in sorted(self.distribution.items(), reverse=True)
+        ]
+    
+    @classmethod
+    def apply_review(cls, product_id, rating, delta, using=None):
+        """Add (delta=1) or remove (delta=-1) one review's rating with a single UPDATE"""
+        manager = cls.objects.db_manager(using)
+        if delta > 0:
+            manager.get_or_create(product_id=product_id)
+        now = timezone.now()
+        manager.filter(product_id=product_id).update(**{
+            'review_count': F('review_count') + delta,
+            'rating_total': F('rating_total') + delta * rating,
+            f'rating_{rating}': F(f'rating_{rating}') + delta,
+            'updated_at': now,
+        })
+        # Cards and pages keyed on the product's updated_at show the rating too
+        Product.objects.db_manager(using).filter(pk=product_id).update(updated_at=now)
+    
+    @classmethod
+    def rebuild(cls, product_ids=None, batch_size=1000):
+        """Recompute summaries from ProductReview in one grouped query; returns rows written"""
+        reviews = ProductReview.objects.all()
+        if product_ids is not None:
+            reviews = reviews.filter(product_id__in=product_ids)
+        histogram = {f'rating_{stars}': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)}
+        rows = reviews.values('product_id').annotate(
+            review_count=Count('id'), rating_total=Sum('rating'), **histogram
+        ).order_by()
+        
+        now = timezone.now()
+        summaries = [cls(updated_at=now, **row) for row in rows]
+        with transaction.atomic():
+            # Products whose reviews are all gone keep no summary
+            stale = cls.objects.filter(~Exists(ProductReview.objects.filter(product_id=OuterRef('product_id'))))
+            if product_ids is not None:
+                stale = stale.filter(product_id__in=product_ids)
+            stale.delete()
+            Product.objects.filter(pk__in=reviews.values('product_id')).update(updated_at=now)
+            cls.objects.bulk_create(
+                summaries,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=['review_count', 'rating_total', *histogram, 'updated_at'],
+            )
+        return len(summaries)
+
+
+class PriceObservation(models.Model):
+    """
+    One run of a product's price history: the price (in pence), original
+    price and stock from ``observed_at`` until the next row. Rows are only
+    written when one of them changes - see products.price_history.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_observations')
+    observed_at = models.DateTimeField()
+    price_pence = models.PositiveIntegerField()
+    original_price_pence = models.PositiveIntegerField(null=True, blank=True)
+    in_stock = models.BooleanField(default=True)
+    
+    class Meta:
+        constraints = [
+            # Also the index charts range-scan: WHERE product_id = ? AND observed_at >= ?
+            models.UniqueConstraint(fields=['product', 'observed_at'], name='products_price_observation_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product_id} @ {self.observed_at:%Y-%m-%d %H:%M}: {self.price_pence}p"
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, raw=False, using=None, **kwargs):
+    """Keep the search index current; saves that don't touch indexed text skip it"""
+    from .search import INDEXED_FIELDS, product_search_index
+    if raw or (update_fields is not None and not INDEXED_FIELDS.intersection(update_fields)):
+        return
+    product_search_index.index_products([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, using=None, **kwargs):
+    from .search import product_search_index
+    product_search_index.remove_products([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_products(sender, instance, created=False, update_fields=None, raw=False, using=None, **kwargs):
+    from .search import product_search_index
+    if raw or created or (update_fields is not None and 'name' not in update_fields):
+        return
+    product_search_index.index_category(instance.pk, using=using)
+    # Cached product cards show the category name
+    Product.objects.db_manager(using).filter(category=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_listing_caches(sender, raw=False, **kwargs):
+    """Facet counts, listing counts and featured products are cached per catalogue version"""
+    from .facets import product_facets
+    if not raw:
+        product_facets.invalidate()
+
+
+@receiver(post_save, sender=ProductReview)
+def count_review(sender, instance, raw=False, using=None, **kwargs):
+    """Move the review's rating between summaries when it's created or edited"""
+    if raw:
+        return
+    previous = getattr(instance, '_counted_as', None)
+    current = (instance.product_id, instance.rating)
+    if previous == current:
+        return
+    if previous:
+        ProductRatingSummary.apply_review(*previous, delta=-1, using=using)
+    ProductRatingSummary.apply_review(*current, delta=1, using=using)
+    instance._counted_as = current
+
+
+@receiver(post_delete, sender=ProductReview)
+def uncount_review(sender, instance, using=None, **kwargs):
+    previous = getattr(instance, '_counted_as', None) or (instance.product_id, instance.rating)
+    ProductRatingSummary.apply_review(*previous, delta=-1, using=using)
+    instance._counted_as = None
+
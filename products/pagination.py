@@ -0,0 +1,179 @@
+"""
+Express Deals - Keyset Pagination
+Cursor pagination over (sort key, id) so deep pages cost the same as the
+first one, plus approximate counts so listings never need COUNT(*) scans
+"""
+
+import base64
+import hashlib
+import json
+import logging
+from typing import Dict, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+logger = logging.getLogger(__name__)
+
+# Below this many rows an exact COUNT(*) is cheap enough
+EXACT_COUNT_THRESHOLD = 10000
+COUNT_CACHE_TIMEOUT = 300
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that can't be decoded or don't match the sort order"""
+
+
+def approximate_count(queryset, cache_key: Optional[str] = None) -> Tuple[int, bool]:
+    """
+    Row count for a filtered queryset as (count, is_estimate). Small tables
+    get an exact count; large PostgreSQL tables use the planner's estimate.
+    Results are cached per cache_key.
+    """
+    if cache_key:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return tuple(cached)
+
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+    result = None
+    if connection.vendor == 'postgresql':
+        try:
+            result = _postgres_estimate(queryset, connection)
+        except Exception as e:
+            logger.warning(f"Falling back to exact count, planner estimate failed: {e}")
+    if result is None:
+        result = (queryset.count(), False)
+
+    if cache_key:
+        cache.set(cache_key, list(result), timeout=COUNT_CACHE_TIMEOUT)
+    return result
+
+
+def _postgres_estimate(queryset, connection) -> Optional[Tuple[int, bool]]:
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        row = cursor.fetchone()
+        if not row or row[0] < EXACT_COUNT_THRESHOLD:
+            # Small (or never analyzed, reltuples = -1) tables count exactly
+            return None
+
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+
+
+def count_cache_key(prefix: str, filters: Dict) -> str:
+    """Stable cache key for a set of normalized filter values"""
+    normalized = json.dumps({k: v for k, v in filters.items() if v not in (None, '')}, sort_keys=True)
+    return f"{prefix}:{hashlib.md5(normalized.encode('utf-8')).hexdigest()}"
+
+
+class CursorPage:
+    """One page of keyset results; quacks enough like Django's Page for templates"""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset ordered by one model field plus ``id`` as tiebreaker.
+    Cursors are opaque tokens holding the boundary row's (value, id).
+    """
+
+    SORT_FIELDS = ('created_at', 'price', 'name')
+
+    def __init__(self, queryset, per_page: int, ordering: str = '-created_at', count_key: Optional[str] = None):
+        self.field_name = ordering.lstrip('-')
+        if self.field_name not in self.SORT_FIELDS:
+            raise ValueError(f"Keyset pagination does not support ordering by {ordering!r}")
+        self.descending = ordering.startswith('-')
+        self.field = queryset.model._meta.get_field(self.field_name)
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_key = count_key
+
+    @cached_property
+    def _count(self) -> Tuple[int, bool]:
+        return approximate_count(self.queryset, self.count_key)
+
+    @property
+    def count(self) -> int:
+        return self._count[0]
+
+    @property
+    def count_is_estimate(self) -> bool:
+        return self._count[1]
+
+    def page(self, cursor: Optional[str] = None) -> CursorPage:
+        """Page after (or, for a "previous" cursor, before) the cursor; None means the first page"""
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            value, pk, backwards = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._seek(value, pk, forwards=not backwards))
+
+        # Walking backwards flips the ordering, so re-reverse the rows afterwards
+        descending = self.descending != backwards
+        prefix = '-' if descending else ''
+        rows = list(queryset.order_by(f'{prefix}{self.field_name}', f'{prefix}id')[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode_cursor(rows[-1])
+            if cursor and (has_more or not backwards):
+                previous_cursor = self.encode_cursor(rows[0], backwards=True)
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def _seek(self, value, pk, forwards: bool) -> Q:
+        after = self.descending != forwards
+        op = 'gt' if after else 'lt'
+        return Q(**{f'{self.field_name}__{op}': value}) | Q(**{self.field_name: value, f'id__{op}': pk})
+
+    def encode_cursor(self, obj, backwards: bool = False) -> str:
+        value = self.field.value_to_string(obj)
+        payload = json.dumps([self.field_name, value, obj.pk, int(backwards)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, cursor: str):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            field_name, value, pk, backwards = json.loads(base64.urlsafe_b64decode(padded))
+            if field_name != self.field_name:
+                raise InvalidCursor("Cursor belongs to a different sort order")
+            return self.field.to_python(value), int(pk), bool(backwards)
+        except InvalidCursor:
+            raise
+        except Exception as e:
+            raise InvalidCursor(f"Malformed cursor: {e}")
@@ -0,0 +1,243 @@
+"""
+Express Deals - Price History
+A narrow, run-length encoded price series per product: a PriceObservation
+row (prices in pence) is written only when the price, original price or
+stock actually changes. Loaders record inside ``price_history.batch()``,
+so a batch costs one lookup of the current runs and one bulk insert.
+Charts read one (product, observed_at) index range and downsample it.
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import PriceObservation
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW_DAYS = 90
+MAX_WINDOW_DAYS = 365
+DEFAULT_POINTS = 200
+MAX_POINTS = 1000
+METHODS = ('lttb', 'minmax')
+OUT_OF_STOCK_WORDS = ('out of stock', 'sold out', 'unavailable')
+
+
+def to_pence(value) -> Optional[int]:
+    """Decimal/float/str pounds to integer pence (None stays None)"""
+    if value is None or value == '':
+        return None
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def is_in_stock(availability) -> bool:
+    """Scraped availability text to a stock flag - anything not saying otherwise is in stock"""
+    text = (availability or '').lower()
+    return not any(words in text for words in OUT_OF_STOCK_WORDS)
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets: indexes of ``threshold`` points that keep
+    the visual shape of the line. First and last points are always kept.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    selected, anchor = [0], 0
+    bucket_size = (n - 2) / (threshold - 2)
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, n)
+        # The next bucket's average is the third corner of every triangle
+        avg_x = sum(xs[end:next_end]) / (next_end - end)
+        avg_y = sum(ys[end:next_end]) / (next_end - end)
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            area = abs(
+                (xs[anchor] - avg_x) * (ys[index] - ys[anchor])
+                - (xs[anchor] - xs[index]) * (avg_y - ys[anchor])
+            )
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        anchor = best
+    selected.append(n - 1)
+    return selected
+
+
+def min_max_buckets(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    Indexes of the lowest and highest point in each of ``threshold // 2``
+    equal time buckets, plus the first and last points - no extreme is lost
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 4:
+        return list(range(n))
+    buckets = (threshold - 2) // 2
+    width = (xs[-1] - xs[0]) / buckets or 1
+    extremes = {}
+    for index in range(1, n - 1):
+        bucket = min(int((xs[index] - xs[0]) / width), buckets - 1)
+        low, high = extremes.get(bucket, (index, index))
+        if ys[index] < ys[low]:
+            low = index
+        if ys[index] > ys[high]:
+            high = index
+        extremes[bucket] = (low, high)
+    chosen = {0, n - 1}
+    for low, high in extremes.values():
+        chosen.update((low, high))
+    return sorted(chosen)
+
+
+DOWNSAMPLERS = {'lttb': lttb, 'minmax': min_max_buckets}
+
+
+@dataclass
+class Observation:
+    product_id: int
+    observed_at: datetime
+    price_pence: int
+    original_price_pence: Optional[int]
+    in_stock: bool
+
+    @property
+    def state(self) -> tuple:
+        return self.price_pence, self.original_price_pence, self.in_stock
+
+
+class PriceHistoryService:
+    """Record price changes in batches and serve downsampled series"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self.stats = {'observed': 0, 'recorded': 0, 'unchanged': 0, 'batches': 0}
+
+    # Writes
+
+    @contextmanager
+    def batch(self):
+        """Buffer record() calls and write them together on exit (nested batches join the outer one)"""
+        if getattr(self._local, 'pending', None) is not None:
+            yield
+            return
+        self._local.pending = []
+        try:
+            yield
+            pending = self._local.pending
+        finally:
+            self._local.pending = None
+        self.write(pending)
+
+    def record(self, product_id: int, price, original_price=None, in_stock: bool = True,
+               observed_at: Optional[datetime] = None):
+        """Note one observed price; written now, or when the surrounding batch() ends"""
+        if price is None:
+            return
+        observation = Observation(
+            product_id, observed_at or timezone.now(), to_pence(price), to_pence(original_price), bool(in_stock)
+        )
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            self.write([observation])
+        else:
+            pending.append(observation)
+
+    def write(self, observations: Iterable[Observation]) -> int:
+        """Insert the observations that start a new run; returns rows written"""
+        observations = sorted(observations, key=lambda observation: (observation.product_id, observation.observed_at))
+        if not observations:
+            return 0
+        current = self.current_runs({observation.product_id for observation in observations})
+
+        rows = []
+        for observation in observations:
+            run = current.get(observation.product_id)
+            # Same as the current run, or older than it (a late or replayed scrape)
+            if run is not None and (run.state == observation.state or observation.observed_at <= run.observed_at):
+                continue
+            current[observation.product_id] = observation
+            rows.append(PriceObservation(
+                product_id=observation.product_id,
+                observed_at=observation.observed_at,
+                price_pence=observation.price_pence,
+                original_price_pence=observation.original_price_pence,
+                in_stock=observation.in_stock,
+            ))
+
+        try:
+            PriceObservation.objects.bulk_create(rows, ignore_conflicts=True)
+        except Exception as e:
+            logger.warning(f"Failed to record {len(rows)} price observations: {e}")
+            return 0
+        self.stats['batches'] += 1
+        self.stats['observed'] += len(observations)
+        self.stats['recorded'] += len(rows)
+        self.stats['unchanged'] += len(observations) - len(rows)
+        return len(rows)
+
+    def current_runs(self, product_ids: Iterable[int]) -> Dict[int, Observation]:
+        """Each product's latest run, in one query"""
+        latest = PriceObservation.objects.filter(product_id__in=list(product_ids)).annotate(
+            rank=Window(RowNumber(), partition_by=F('product_id'), order_by=F('observed_at').desc())
+        ).filter(rank=1).values_list('product_id', 'observed_at', 'price_pence', 'original_price_pence', 'in_stock')
+        return {row[0]: Observation(*row) for row in latest}
+
+    # Reads
+
+    def series(self, product_id: int, days: int = DEFAULT_WINDOW_DAYS, points: int = DEFAULT_POINTS,
+               method: str = 'lttb', now: Optional[datetime] = None) -> Dict:
+        """
+        The product's price over the last ``days``, downsampled to at most
+        ``points`` points, as parallel arrays: t (Unix seconds), price and
+        original (pence), in_stock (0/1). The price in force when the window
+        opens starts the series and the latest price is held to its end.
+        """
+        if method not in DOWNSAMPLERS:
+            raise ValueError(f"Unknown downsampling method {method!r}; use one of {METHODS}")
+        days = min(max(int(days), 1), MAX_WINDOW_DAYS)
+        points = min(max(int(points), 3), MAX_POINTS)
+        end = now or timezone.now()
+        start = end - timedelta(days=days)
+
+        fields = ('observed_at', 'price_pence', 'original_price_pence', 'in_stock')
+        observations = PriceObservation.objects.filter(product_id=product_id)
+        runs = list(observations.filter(observed_at__gte=start, observed_at__lte=end).order_by('observed_at').values_list(*fields))
+        changes = len(runs)
+        opening = observations.filter(observed_at__lt=start).order_by('-observed_at').values_list(*fields).first()
+        if opening is not None:
+            runs.insert(0, (start, *opening[1:]))
+        if runs:
+            runs.append((end, *runs[-1][1:]))
+
+        times = [int(run[0].timestamp()) for run in runs]
+        keep = DOWNSAMPLERS[method](times, [run[1] for run in runs], points)
+        return {
+            'product_id': product_id,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'method': method,
+            'changes': changes,
+            't': [times[index] for index in keep],
+            'price': [runs[index][1] for index in keep],
+            'original': [runs[index][2] for index in keep],
+            'in_stock': [int(runs[index][3]) for index in keep],
+        }
+
+    def get_stats(self) -> Dict:
+        """Observation counts for this process"""
+        return dict(self.stats)
+
+
+# Global price history instance
+price_history = PriceHistoryService()
@@ -0,0 +1,238 @@
+"""
+Express Deals - Product Search Index
+Ranked full-text search over products: a weighted tsvector column with a
+GIN index on PostgreSQL, an FTS5 virtual table on SQLite (local/dev)
+"""
+
+import logging
+import re
+from typing import Iterable, List
+
+from django.db import connections, router
+from django.db.models import F, FloatField, Q, Value
+
+logger = logging.getLogger(__name__)
+
+# Fields that feed the index; saves that touch none of them skip reindexing
+INDEXED_FIELDS = frozenset({'name', 'description', 'category', 'category_id'})
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+
+def search_terms(query: str) -> List[str]:
+    """Split user input into plain word terms - no operators reach the search engine"""
+    return TERM_RE.findall((query or '').lower())[:MAX_TERMS]
+
+
+class BaseSearchBackend:
+    """Substring fallback for databases without a full-text engine"""
+
+    vendor = 'fallback'
+
+    def __init__(self, using: str = 'default'):
+        self.using = using
+
+    @property
+    def connection(self):
+        # Looked up per call - connections are thread-local, backends are shared
+        return connections[self.using]
+
+    def search(self, queryset, terms: List[str]):
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(name__icontains=term) |
+                Q(description__icontains=term) |
+                Q(category__name__icontains=term)
+            )
+        return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_products(self, product_ids: Iterable[int]):
+        pass
+
+    def remove_products(self, product_ids: Iterable[int]):
+        pass
+
+    def index_category(self, category_id: int):
+        pass
+
+    def rebuild(self) -> int:
+        return 0
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Weighted tsvector: name (A), category (B), description (C)"""
+
+    vendor = 'postgresql'
+    CONFIG = 'english'
+
+    VECTOR_SQL = (
+        "setweight(to_tsvector('english', coalesce(p.name, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(c.name, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(p.description, '')), 'C')"
+    )
+    UPDATE_SQL = (
+        f"UPDATE products_product p SET search_vector = {VECTOR_SQL} "
+        "FROM products_category c WHERE c.id = p.category_id"
+    )
+
+    def search(self, queryset, terms: List[str]):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        # Prefix match on every term so results keep up with keystroke-driven queries
+        tsquery = ' & '.join(f"{term}:*" for term in terms)
+        query = SearchQuery(tsquery, config=self.CONFIG, search_type='raw')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+
+    def index_products(self, product_ids: Iterable[int]):
+        product_ids = list(product_ids)
+        if product_ids:
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"{self.UPDATE_SQL} AND p.id = ANY(%s)", [product_ids])
+
+    def index_category(self, category_id: int):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"{self.UPDATE_SQL} AND p.category_id = %s", [category_id])
+
+    def rebuild(self) -> int:
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.UPDATE_SQL)
+            return cursor.rowcount
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """FTS5 table keyed by product id, ranked with column-weighted BM25"""
+
+    vendor = 'sqlite'
+    TABLE = 'products_product_fts'
+    # BM25 weights for (name, category, description)
+    WEIGHTS = (10.0, 4.0, 1.0)
+
+    SELECT_SQL = (
+        "SELECT p.id, p.name, c.name, p.description FROM products_product p "
+        "JOIN products_category c ON c.id = p.category_id"
+    )
+
+    def search(self, queryset, terms: List[str]):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in self.WEIGHTS)
+        table = queryset.model._meta.db_table
+        # Join the FTS table rather than ranking in a correlated subquery: bm25()
+        # statistics are computed once per cursor, so a subquery per row is quadratic.
+        # bm25() is lower-is-better; negate so both backends sort by descending rank
+        return queryset.extra(
+            select={'search_rank': f"-bm25({self.TABLE}, {weights})"},
+            tables=[self.TABLE],
+            where=[f"{self.TABLE} MATCH %s", f"{self.TABLE}.rowid = {table}.id"],
+            params=[match]
+        )
+
+    def index_products(self, product_ids: Iterable[int]):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.TABLE} WHERE rowid IN ({placeholders})", product_ids)
+            cursor.execute(
+                f"INSERT INTO {self.TABLE} (rowid, name, category, description) "
+                f"{self.SELECT_SQL} WHERE p.id IN ({placeholders})",
+                product_ids
+            )
+
+    def remove_products(self, product_ids: Iterable[int]):
+        product_ids = list(product_ids)
+        if product_ids:
+            placeholders = ', '.join(['%s'] * len(product_ids))
+            with self.connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.TABLE} WHERE rowid IN ({placeholders})", product_ids)
+
+    def index_category(self, category_id: int):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.TABLE} WHERE rowid IN "
+                "(SELECT id FROM products_product WHERE category_id = %s)",
+                [category_id]
+            )
+            cursor.execute(
+                f"INSERT INTO {self.TABLE} (rowid, name, category, description) "
+                f"{self.SELECT_SQL} WHERE p.category_id = %s",
+                [category_id]
+            )
+
+    def rebuild(self) -> int:
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.TABLE}")
+            cursor.execute(f"INSERT INTO {self.TABLE} (rowid, name, category, description) {self.SELECT_SQL}")
+            return cursor.rowcount
+
+    @classmethod
+    def is_available(cls, connection) -> bool:
+        """The FTS5 table only exists when this SQLite build was compiled with FTS5"""
+        return cls.TABLE in connection.introspection.table_names()
+
+
+class ProductSearchIndex:
+    """Picks the search backend for a database and keeps its index current"""
+
+    def __init__(self):
+        self._backends = {}
+
+    def backend(self, using: str = 'default') -> BaseSearchBackend:
+        if using not in self._backends:
+            connection = connections[using]
+            if connection.vendor == 'postgresql':
+                backend = PostgresSearchBackend(using)
+            elif connection.vendor == 'sqlite' and SQLiteSearchBackend.is_available(connection):
+                backend = SQLiteSearchBackend(using)
+            else:
+                backend = BaseSearchBackend(using)
+            self._backends[using] = backend
+        return self._backends[using]
+
+    def search(self, queryset, query: str):
+        """Filter a Product queryset to matches annotated with ``search_rank`` (best first)"""
+        terms = search_terms(query)
+        if not terms:
+            return queryset.none()
+        backend = self.backend(queryset.db)
+        return backend.search(queryset, terms).order_by('-search_rank', '-created_at')
+
+    def index_products(self, product_ids: Iterable[int], using: str = None):
+        try:
+            self.backend(using or self._db_for_write()).index_products(product_ids)
+        except Exception as e:
+            # Search freshness must never fail a product save
+            logger.error(f"Failed to update search index for products {product_ids}: {e}")
+
+    def remove_products(self, product_ids: Iterable[int], using: str = None):
+        try:
+            self.backend(using or self._db_for_write()).remove_products(product_ids)
+        except Exception as e:
+            logger.error(f"Failed to remove products {product_ids} from search index: {e}")
+
+    def index_category(self, category_id: int, using: str = None):
+        """Category names are indexed too, so a rename reindexes its products"""
+        try:
+            self.backend(using or self._db_for_write()).index_category(category_id)
+        except Exception as e:
+            logger.error(f"Failed to update search index for category {category_id}: {e}")
+
+    def rebuild(self, using: str = None) -> int:
+        """Reindex every product; returns the number of rows indexed"""
+        return self.backend(using or self._db_for_write()).rebuild()
+
+    def reset(self):
+        """Forget cached backends (e.g. after the test database replaces a connection)"""
+        self._backends = {}
+
+    def _db_for_write(self) -> str:
+        from .models import Product
+        return router.db_for_write(Product)
+
+
+# Global product search index instance
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,130 @@
+"""
+Express Deals - Product Search Benchmark
+Seeds a synthetic catalogue and compares the legacy icontains scan with
+the full-text index for the queries the shop search box sends
+"""
+
+import random
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Category, Product
+from .search import product_search_index
+
+ADJECTIVES = [
+    'wireless', 'organic', 'stainless', 'portable', 'smart', 'vintage', 'compact', 'premium',
+    'waterproof', 'ergonomic', 'cordless', 'digital', 'classic', 'lightweight', 'heated', 'foldable',
+]
+NOUNS = [
+    'headphones', 'kettle', 'blender', 'lamp', 'jacket', 'backpack', 'speaker', 'vacuum',
+    'toaster', 'trainers', 'watch', 'camera', 'bottle', 'duvet', 'monitor', 'keyboard',
+]
+BRANDS = ['Sony', 'Philips', 'Dyson', 'Nike', 'Samsung', 'Bosch', 'Logitech', 'Tefal', 'Ninja', 'Russell']
+FILLER = (
+    'designed for everyday use with a durable finish and easy care instructions '
+    'ideal gift for home office travel kitchen garden fitness family and friends'
+).split()
+CATEGORIES = ['Electronics', 'Home & Kitchen', 'Fashion', 'Sports', 'Garden', 'Toys', 'Beauty', 'Books']
+
+DEFAULT_QUERIES = ['headphones', 'wireless speaker', 'stainless kettle', 'dyson', 'waterproof jacket', 'zzzz']
+
+
+@dataclass
+class SearchBenchmarkResult:
+    """Median latency (ms) of one query through both search paths"""
+    query: str
+    matches: int = 0
+    icontains_ms: float = 0.0
+    fulltext_ms: float = 0.0
+    samples: Dict[str, List[float]] = field(default_factory=dict)
+
+    @property
+    def speedup(self) -> float:
+        return round(self.icontains_ms / self.fulltext_ms, 1) if self.fulltext_ms else 0.0
+
+
+class SearchBenchmark:
+    """Seed N products, rebuild the index, and time first-page search queries"""
+
+    def __init__(self, products: int = 1_000_000, batch_size: int = 5000, repeats: int = 5,
+                 page_size: int = 12, seed: int = 42):
+        self.products = products
+        self.batch_size = batch_size
+        self.repeats = repeats
+        self.page_size = page_size
+        self.random = random.Random(seed)
+
+    def seed(self, progress=None) -> float:
+        """Bulk insert the synthetic catalogue (signals don't fire) then rebuild the index once"""
+        started = time.perf_counter()
+        categories = [
+            Category.objects.get_or_create(name=name, defaults={'slug': slugify(name)})[0]
+            for name in CATEGORIES
+        ]
+        offset = Product.objects.count()
+
+        created = 0
+        while created < self.products:
+            batch = [
+                self._product(offset + created + index, categories)
+                for index in range(min(self.batch_size, self.products - created))
+            ]
+            Product.objects.bulk_create(batch, batch_size=self.batch_size)
+            created += len(batch)
+            if progress:
+                progress(created)
+
+        product_search_index.rebuild()
+        return time.perf_counter() - started
+
+    def run(self, queries: List[str] = None) -> List[SearchBenchmarkResult]:
+        results = []
+        for query in queries or DEFAULT_QUERIES:
+            result = SearchBenchmarkResult(query=query)
+            legacy = Product.objects.filter(is_active=True).filter(
+                Q(name__icontains=query) | Q(description__icontains=query) | Q(category__name__icontains=query)
+            ).order_by('-created_at')
+            result.samples['icontains'] = self._time(legacy)
+            ranked = Product.objects.filter(is_active=True).search(query)
+            result.samples['fulltext'] = self._time(ranked)
+            result.matches = ranked.count()
+            result.icontains_ms = round(statistics.median(result.samples['icontains']), 2)
+            result.fulltext_ms = round(statistics.median(result.samples['fulltext']), 2)
+            results.append(result)
+        return results
+
+    @property
+    def backend(self) -> str:
+        return f"{connection.vendor}/{product_search_index.backend(connection.alias).vendor}"
+
+    def _time(self, queryset) -> List[float]:
+        """Time what a search page costs: the count for the paginator plus the first page"""
+        samples = []
+        for _ in range(self.repeats):
+            started = time.perf_counter()
+            queryset.count()
+            list(queryset[:self.page_size])
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def _product(self, number: int, categories: List[Category]) -> Product:
+        rng = self.random
+        brand = rng.choice(BRANDS)
+        name = f"{brand} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {number}"
+        words = rng.choices(ADJECTIVES + NOUNS + FILLER, k=30)
+        price = rng.randint(300, 50000) / 100
+        return Product(
+            name=name,
+            slug=f"bench-{number}",
+            category=rng.choice(categories),
+            description=f"{brand} {' '.join(words)}",
+            price=price,
+            original_price=round(price * 1.2, 2) if rng.random() < 0.3 else None,
+            stock_quantity=rng.randint(0, 100),
+        )
@@ -0,0 +1,13 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from products.card_cache import product_card_renderer
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products, variant='grid'):
+    """Render a page of product cards from the fragment cache: {% product_cards products 'grid' %}"""
+    html = product_card_renderer.render_many(products, variant, currency=context.get('currency'))
+    return mark_safe(''.join(html))
@@ -1,8 +1,22 @@
 
 
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+
+import cloudinary
+from django.conf import settings
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.contrib.auth.models import User
-from .models import Category, Product, ProductImage, ProductReview
+from django.urls import include, path, reverse
+from django.utils import timezone
+from django.utils.text import slugify
+from .card_cache import ProductCardRenderer
+from .facets import product_facets
+from .models import Category, PriceObservation, Product, ProductImage, ProductRatingSummary, ProductReview
+from .pagination import InvalidCursor, KeysetPaginator, approximate_count, count_cache_key
+from .price_history import lttb, min_max_buckets, price_history
+from .search import search_terms
+from .views import ProductListView, filter_products
 
 class CategoryModelTest(TestCase):
     def test_str(self):
@@ -40,3 +54,492 @@ class ProductReviewModelTest(TestCase):
         prod = Product.objects.create(name='Chess', slug='chess', category=cat, description='A game', price=15)
         review = ProductReview.objects.create(product=prod, user=user, rating=5, title='Great', comment='Loved it!')
         self.assertIn('Chess', str(review))
+
+class ProductSearchTest(TestCase):
+    def setUp(self):
+        self.audio = Category.objects.create(name='Audio', slug='audio')
+        self.kitchen = Category.objects.create(name='Kitchen', slug='kitchen')
+        self.headphones = Product.objects.create(
+            name='Sony Wireless Headphones', slug='sony-headphones', category=self.audio,
+            description='Noise cancelling over-ear headphones', price=199
+        )
+        self.speaker = Product.objects.create(
+            name='Bluetooth Speaker', slug='speaker', category=self.audio,
+            description='Pairs with wireless headphones and phones', price=49
+        )
+        self.kettle = Product.objects.create(
+            name='Stainless Kettle', slug='kettle', category=self.kitchen,
+            description='1.7L fast boil kettle', price=30
+        )
+
+    def test_search_terms_strip_operators(self):
+        self.assertEqual(search_terms('"wireless" OR head*phones -x'), ['wireless', 'or', 'head', 'phones', 'x'])
+        self.assertEqual(search_terms('  '), [])
+
+    def test_search_ranks_name_matches_first(self):
+        results = list(Product.objects.search('headphones'))
+        self.assertEqual(results, [self.headphones, self.speaker])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_search_prefix_and_all_terms(self):
+        self.assertEqual(list(Product.objects.search('headph')), [self.headphones, self.speaker])
+        self.assertEqual(list(Product.objects.search('sony headphones')), [self.headphones])
+        self.assertEqual(list(Product.objects.search('kitchen')), [self.kettle])
+        self.assertFalse(Product.objects.search('').exists())
+
+    def test_index_updates_incrementally(self):
+        self.kettle.name = 'Stainless Headphones Stand'
+        self.kettle.save()
+        self.assertIn(self.kettle, Product.objects.search('headphones'))
+
+        self.audio.name = 'Hi-Fi'
+        self.audio.save()
+        self.assertCountEqual(Product.objects.search('hi fi'), [self.headphones, self.speaker])
+
+        self.headphones.delete()
+        self.assertEqual(list(Product.objects.search('sony')), [])
+
+    def test_product_list_uses_ranked_search(self):
+        # Product cards need Cloudinary config to render, so check the queryset directly
+        view = ProductListView()
+        view.setup(RequestFactory().get(reverse('products:product_list'), {'search': 'headphones'}))
+        self.assertEqual(list(view.get_queryset()), [self.headphones, self.speaker])
+
+        view.setup(RequestFactory().get(reverse('products:product_list'), {'search': 'headphones', 'sort': 'price'}))
+        self.assertEqual(list(view.get_queryset()), [self.speaker, self.headphones])
+
+    def test_product_search_paginates(self):
+        for number in range(15):
+            Product.objects.create(
+                name=f'Travel Kettle {number}', slug=f'travel-kettle-{number}',
+                category=self.kitchen, description='Compact kettle', price=20
+            )
+        response = self.client.get(reverse('products:search'), {'q': 'kettle', 'page': 2}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 16)
+        self.assertEqual(len(response.context['products']), 4)
+
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name='Deals', slug='deals')
+        # Duplicate prices make the id tiebreaker matter
+        self.products = [
+            Product.objects.create(
+                name=f'Deal {number}', slug=f'deal-{number}', category=self.cat,
+                description='A deal', price=10 + number % 3
+            )
+            for number in range(7)
+        ]
+
+    def walk(self, paginator):
+        pages, page = [], paginator.page()
+        while True:
+            pages.append(list(page))
+            if not page.has_next():
+                return pages, page
+            page = paginator.page(page.next_cursor)
+
+    def test_pages_cover_every_row_once_in_order(self):
+        queryset = Product.objects.all()
+        for ordering in ('price', '-price', '-created_at', 'name'):
+            pages, _ = self.walk(KeysetPaginator(queryset, 3, ordering))
+            flat = [product for page in pages for product in page]
+            tiebreaker = '-id' if ordering.startswith('-') else 'id'
+            self.assertEqual(flat, list(queryset.order_by(ordering, tiebreaker)))
+            self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = KeysetPaginator(Product.objects.all(), 3, 'price')
+        first = paginator.page()
+        self.assertFalse(first.has_previous())
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(list(paginator.page(back.previous_cursor)), list(first))
+        self.assertEqual(list(paginator.page(back.next_cursor)), list(third))
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(Product.objects.all(), 3, 'price')
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+        other = KeysetPaginator(Product.objects.all(), 3, 'name').page()
+        with self.assertRaises(InvalidCursor):
+            paginator.page(other.next_cursor)
+
+    def test_count_is_cached_per_filter(self):
+        key = count_cache_key('product_count', {'category': self.cat.id, 'search': ''})
+        self.assertEqual(approximate_count(Product.objects.all(), key), (7, False))
+        Product.objects.filter(id=self.products[0].id).delete()
+        self.assertEqual(approximate_count(Product.objects.all(), key), (7, False))
+
+    def test_api_product_list_follows_cursors(self):
+        url = reverse('products:api_product_list')
+        data = self.client.get(url, {'sort': 'price', 'limit': 4}, secure=True).json()
+        self.assertEqual(data['count'], 7)
+        self.assertEqual(len(data['products']), 4)
+        rest = self.client.get(url, {'sort': 'price', 'limit': 4, 'cursor': data['next_cursor']}, secure=True).json()
+        self.assertEqual(len(rest['products']), 3)
+        self.assertIsNone(rest['next_cursor'])
+        ids = [p['id'] for p in data['products'] + rest['products']]
+        self.assertEqual(ids, list(Product.objects.order_by('price', 'id').values_list('id', flat=True)))
+        # A malformed limit falls back to the default page size
+        self.assertEqual(len(self.client.get(url, {'limit': 'abc'}, secure=True).json()['products']), 7)
+
+
+class ProductFacetTest(TestCase):
+    def setUp(self):
+        self.audio = Category.objects.create(name='Audio', slug='audio')
+        self.kitchen = Category.objects.create(name='Kitchen', slug='kitchen')
+        self.empty = Category.objects.create(name='Garden', slug='garden')
+        for name, category, price in [
+            ('Budget Earbuds', self.audio, '8.99'), ('Wireless Headphones', self.audio, '120.00'),
+            ('Bluetooth Speaker', self.audio, '45.00'), ('Electric Kettle', self.kitchen, '24.99'),
+            ('Toaster', self.kitchen, '30.00'),
+        ]:
+            Product.objects.create(name=name, slug=slugify(name), category=category, description=name, price=price)
+        Product.objects.create(
+            name='Old Radio', slug='old-radio', category=self.audio, description='Radio', price=5, is_active=False
+        )
+
+    def counts(self, facets):
+        return (
+            {category['slug']: category['count'] for category in facets['categories']},
+            [bucket['count'] for bucket in facets['price_buckets']],
+        )
+
+    def test_facets_in_one_grouped_query(self):
+        with self.assertNumQueries(2):  # grouped counts + category names
+            facets = product_facets.compute_facets({})
+        self.assertEqual(facets['total'], 5)
+        self.assertEqual(self.counts(facets), ({'audio': 3, 'kitchen': 2, 'garden': 0}, [1, 1, 2, 0, 1, 0]))
+
+    def test_each_facet_ignores_its_own_filter(self):
+        facets = product_facets.compute_facets({'category': 'audio', 'min_price': '25', 'max_price': '49.99'})
+        categories, buckets = self.counts(facets)
+        # Category counts respect the price filter, price buckets respect the category
+        self.assertEqual(categories, {'audio': 1, 'kitchen': 1, 'garden': 0})
+        self.assertEqual(buckets, [1, 0, 1, 0, 1, 0])
+        self.assertEqual(facets['total'], 1)
+        self.assertTrue(facets['price_buckets'][2]['selected'])
+
+    def test_search_facets(self):
+        facets = product_facets.compute_facets({'search': 'wireless'})
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(self.counts(facets)[0]['audio'], 1)
+
+    def test_cached_until_products_change(self):
+        params = {'category': 'kitchen'}
+        self.assertEqual(product_facets.get_facets(params)['total'], 2)
+        with self.assertNumQueries(2):  # cache version + cached facets
+            product_facets.get_facets(params)
+        Product.objects.create(name='Mixer', slug='mixer', category=self.kitchen, description='Mixer', price=60)
+        self.assertEqual(product_facets.get_facets(params)['total'], 3)
+
+    def test_category_list_counts_active_products(self):
+        response = self.client.get(reverse('products:category_list', kwargs={'slug': 'audio'}), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {category.slug: category.product_count for category in response.context['categories']},
+            {'audio': 3, 'kitchen': 2}
+        )
+
+    def test_filter_by_category_slug(self):
+        queryset, _ = filter_products({'category': 'kitchen'})
+        self.assertEqual(queryset.count(), 2)
+
+
+# Detail pages link to the alert API, whose URLs aren't mounted in the project urlconf yet
+urlpatterns = [
+    path('alerts/', include('scraping.urls')),
+    path('', include('express_deals.urls')),
+]
+
+
+class ProductRatingSummaryTest(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name='Audio', slug='audio')
+        self.product = Product.objects.create(
+            name='Headphones', slug='headphones', category=self.cat, description='Over-ear', price=99
+        )
+        self.other = Product.objects.create(
+            name='Speaker', slug='speaker', category=self.cat, description='Portable', price=49
+        )
+        self.users = [User.objects.create_user(username=f'reviewer{n}') for n in range(3)]
+
+    def review(self, user, rating, product=None):
+        return ProductReview.objects.create(
+            product=product or self.product, user=user, rating=rating, title='Review', comment='Comment'
+        )
+
+    def summary(self, product=None):
+        return ProductRatingSummary.objects.get(product=product or self.product)
+
+    def test_create_edit_delete_keep_summary_in_step(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 2)
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.average_rating), (2, 3.5))
+        self.assertEqual(summary.distribution, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+
+        first = ProductReview.objects.get(pk=first.pk)
+        first.rating = 4
+        first.save()
+        first.save()  # Unchanged rating - no double count
+        summary = self.summary()
+        self.assertEqual((summary.review_count, summary.rating_total, summary.rating_4, summary.rating_5), (2, 6, 1, 0))
+
+        first.product = self.other
+        first.save()
+        self.assertEqual(self.summary().review_count, 1)
+        self.assertEqual(self.summary(self.other).rating_4, 1)
+
+        first.delete()
+        self.assertEqual(self.summary(self.other).review_count, 0)
+        self.assertIsNone(self.summary(self.other).average_rating)
+
+    def test_cascade_delete_uncounts_reviews(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 1)
+        self.users[0].delete()
+        self.assertEqual(self.summary().distribution, {1: 1, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_rebuild_matches_incremental_summary(self):
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 3)
+        self.review(self.users[2], 4, product=self.other)
+        expected = {s.product_id: (s.review_count, s.rating_total, s.distribution) for s in ProductRatingSummary.objects.all()}
+
+        ProductRatingSummary.objects.update(review_count=0, rating_total=0, rating_5=0)
+        ProductRatingSummary.objects.create(product=Product.objects.create(
+            name='Unreviewed', slug='unreviewed', category=self.cat, description='None yet', price=5
+        ), review_count=3)
+        self.assertEqual(ProductRatingSummary.rebuild(), 2)
+        rebuilt = {s.product_id: (s.review_count, s.rating_total, s.distribution) for s in ProductRatingSummary.objects.all()}
+        self.assertEqual(rebuilt, expected)
+
+    @override_settings(ROOT_URLCONF='products.tests')
+    @mock.patch.object(cloudinary.config(), 'cloud_name', 'express-deals-test', create=True)
+    def test_detail_view_query_budget(self):
+        for user, rating in zip(self.users, (5, 4, 4)):
+            self.review(user, rating)
+
+        # Warm the related product card cache
+        self.client.get(self.product.get_absolute_url(), secure=True)
+
+        # Validators (category lookup, catalogue state, MAX(updated_at)), product (+category,
+        # rating summary), gallery images, reviews, related products, card cache get_many
+        with self.assertNumQueries(8):
+            response = self.client.get(self.product.get_absolute_url(), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['avg_rating'], 4.3)
+        self.assertEqual(response.context['review_count'], 3)
+        self.assertEqual(response.context['rating_distribution'][4], 2)
+
+
+@mock.patch.object(cloudinary.config(), 'cloud_name', 'express-deals-test', create=True)
+class ProductCardCacheTest(TestCase):
+    def setUp(self):
+        self.cat = Category.objects.create(name='Audio', slug='audio')
+        self.products = [
+            Product.objects.create(
+                name=f'Speaker {n}', slug=f'speaker-{n}', category=self.cat, description='Loud', price=20 + n
+            )
+            for n in range(3)
+        ]
+        self.renderer = ProductCardRenderer()
+
+    def test_one_get_many_and_only_misses_rendered(self):
+        cold = self.renderer.render_many(self.products)
+        self.assertEqual(self.renderer.render_stats['misses'], 3)
+        self.assertIn('Speaker 0', cold[0])
+
+        with mock.patch('django.template.backends.django.Template.render') as render:
+            warm = self.renderer.render_many(self.products)
+        render.assert_not_called()
+        self.assertEqual(warm, cold)
+        self.assertEqual(self.renderer.render_stats['hits'], 3)
+
+    def test_updated_at_and_currency_invalidate(self):
+        self.renderer.render_many(self.products)
+        self.products[1].price = 99
+        self.products[1].save()
+        html = self.renderer.render_many(self.products)
+        self.assertIn('99', html[1])
+        self.assertEqual(self.renderer.render_stats['misses'], 4)
+
+        self.renderer.render_many(self.products, currency='EUR')
+        self.assertEqual(self.renderer.render_stats['misses'], 7)
+
+    def test_review_bumps_product_updated_at(self):
+        before = self.products[0].updated_at
+        ProductReview.objects.create(
+            product=self.products[0], user=User.objects.create_user(username='fan'),
+            rating=5, title='Great', comment='Great'
+        )
+        self.products[0].refresh_from_db()
+        self.assertGreater(self.products[0].updated_at, before)
+
+
+@override_settings(ROOT_URLCONF='products.tests')
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cloud_name = mock.patch.object(cloudinary.config(), 'cloud_name', 'express-deals-test', create=True)
+        cloud_name.start()
+        self.addCleanup(cloud_name.stop)
+        self.cat = Category.objects.create(name='Audio', slug='audio')
+        self.products = [
+            Product.objects.create(
+                name=f'Speaker {n}', slug=f'speaker-{n}', category=self.cat, description='Loud', price=20 + n
+            )
+            for n in range(3)
+        ]
+        self.list_url = reverse('products:product_list')
+        # The first visit sets the CSRF cookie, which is part of the anonymous ETag
+        self.get(self.list_url)
+
+    def get(self, url, **headers):
+        return self.client.get(url, secure=True, headers=headers)
+
+    def test_unchanged_list_is_304_without_listing_queries(self):
+        response = self.get(self.list_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # Catalogue state from the cache plus the MAX(updated_at) aggregate
+        with self.assertNumQueries(2):
+            cached = self.get(self.list_url, if_none_match=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.get(self.list_url, if_modified_since=response['Last-Modified']).status_code, 304)
+
+        filtered = self.get(f'{self.list_url}?sort=price', if_none_match=response['ETag'])
+        self.assertEqual(filtered.status_code, 200)
+        self.assertNotEqual(filtered['ETag'], response['ETag'])
+
+        searched = self.get(f'{self.list_url}?search=speaker')
+        self.assertEqual(self.get(f'{self.list_url}?search=speaker', if_none_match=searched['ETag']).status_code, 304)
+
+    def test_changes_invalidate_list_etag(self):
+        etag = self.get(self.list_url)['ETag']
+        self.products[0].price = 5
+        self.products[0].save()
+        response = self.get(self.list_url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Deletes don't move MAX(updated_at) but do bump the catalogue version
+        self.products[1].delete()
+        self.assertEqual(self.get(self.list_url, if_none_match=response['ETag']).status_code, 200)
+
+    def test_detail_tracks_reviews_and_related_products(self):
+        url = self.products[0].get_absolute_url()
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, if_none_match=etag).status_code, 304)
+
+        # Related product changed without signals firing
+        Product.objects.filter(pk=self.products[2].pk).update(name='Renamed', updated_at=timezone.now())
+        response = self.get(url, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+
+        ProductReview.objects.create(
+            product=self.products[0], user=User.objects.create_user(username='fan'), rating=5, title='Great', comment='Great'
+        )
+        self.assertEqual(self.get(url, if_none_match=response['ETag']).status_code, 200)
+        self.assertEqual(self.get(reverse('products:product_detail', kwargs={'pk': 999})).status_code, 404)
+
+    def test_signed_in_pages_skip_last_modified(self):
+        self.client.force_login(User.objects.create_user(username='shopper'))
+        response = self.get(self.list_url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self.get(self.list_url, if_none_match=response['ETag']).status_code, 304)
+
+    def test_page_cache_keeps_answering_304s(self):
+        etag = self.get(self.list_url)['ETag']
+        page_cache = settings.MIDDLEWARE[:1] + [
+            'django.middleware.http.ConditionalGetMiddleware',
+            'django.middleware.cache.UpdateCacheMiddleware',
+        ] + settings.MIDDLEWARE[1:] + ['django.middleware.cache.FetchFromCacheMiddleware']
+
+        with self.settings(MIDDLEWARE=page_cache, CACHE_MIDDLEWARE_SECONDS=60):
+            # The test client builds its middleware chain on first use
+            client = Client()
+            client.cookies = self.client.cookies
+            self.assertEqual(client.get(self.list_url, secure=True, headers={'if_none_match': etag}).status_code, 304)
+            response = client.get(self.list_url, secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'Speaker 0', response.content)
+
+            # Served from the page cache (two cache reads) without reaching the view, still revalidated
+            with self.assertNumQueries(2):
+                cached = client.get(self.list_url, secure=True, headers={'if_none_match': response['ETag']})
+            self.assertEqual(cached.status_code, 304)
+
+
+class PriceHistoryTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Audio', slug='audio')
+        self.product = Product.objects.create(
+            name='Speaker', slug='speaker', category=category, description='Loud', price=40
+        )
+        self.now = timezone.now()
+
+    def test_batch_records_only_changes(self):
+        prices = ['40.00', '40.00', '35.50', '35.50', '40.00']
+        with self.assertNumQueries(2):  # Current runs, then one bulk insert
+            with price_history.batch():
+                for hours, price in enumerate(prices):
+                    price_history.record(self.product.pk, price, '60', observed_at=self.now - timedelta(hours=10 - hours))
+        self.assertEqual(
+            list(PriceObservation.objects.order_by('observed_at').values_list('price_pence', 'original_price_pence')),
+            [(4000, 6000), (3550, 6000), (4000, 6000)]
+        )
+
+        # Same state again, or an older scrape arriving late, adds nothing; a stock change does
+        price_history.record(self.product.pk, '40', '60', observed_at=self.now)
+        price_history.record(self.product.pk, '20', '60', observed_at=self.now - timedelta(days=1))
+        price_history.record(self.product.pk, '40', '60', in_stock=False, observed_at=self.now)
+        self.assertEqual(PriceObservation.objects.count(), 4)
+
+    def test_series_is_downsampled_and_holds_prices_to_the_window_edges(self):
+        PriceObservation.objects.bulk_create([
+            PriceObservation(product=self.product, observed_at=self.now - timedelta(days=100), price_pence=5000),
+            *[
+                PriceObservation(product=self.product, observed_at=self.now - timedelta(hours=hour), price_pence=4000 + hour % 7)
+                for hour in range(1, 500)
+            ],
+        ])
+        series = price_history.series(self.product.pk, days=90, points=50, now=self.now)
+        self.assertEqual(series['changes'], 499)
+        self.assertEqual(len(series['t']), 50)
+        self.assertEqual(series['price'][0], 5000)  # In force when the window opened
+        self.assertEqual(series['t'][-1], int(self.now.timestamp()))
+        self.assertEqual(series['t'], sorted(series['t']))
+
+        response = self.client.get(
+            reverse('products:api_price_history', kwargs={'pk': self.product.pk}), {'points': 20, 'method': 'minmax'}, secure=True
+        )
+        self.assertLessEqual(len(response.json()['price']), 20)
+        self.assertEqual(
+            self.client.get(reverse('products:api_price_history', kwargs={'pk': self.product.pk}), {'method': 'mean'}, secure=True).status_code,
+            400
+        )
+        self.assertEqual(
+            self.client.get(reverse('products:api_price_history', kwargs={'pk': self.product.pk}), {'days': 'abc'}, secure=True).status_code,
+            400
+        )
+        self.product.is_active = False
+        self.product.save()
+        self.assertEqual(
+            self.client.get(reverse('products:api_price_history', kwargs={'pk': self.product.pk}), secure=True).status_code,
+            404
+        )
+
+    def test_downsamplers_keep_endpoints_and_extremes(self):
+        xs = list(range(100))
+        ys = [0] * 100
+        ys[37], ys[71] = 10, -10
+        self.assertEqual([0, 37, 71, 99], [index for index in lttb(xs, ys, 4)])
+        kept = min_max_buckets(xs, ys, 6)
+        self.assertTrue({0, 37, 71, 99} <= set(kept))
+        self.assertLessEqual(len(kept), 6)
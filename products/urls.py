@@ -10,6 +10,10 @@ urlpatterns = [
     path('category/<slug:slug>/', views.CategoryListView.as_view(), name='category_list'),
     path('search/', views.search_products, name='search'),
     
+    # Product listing API (cursor paginated)
+    path('api/products/', views.api_product_list, name='api_product_list'),
+    path('api/products/<int:pk>/price-history/', views.api_price_history, name='api_price_history'),
+    
     # URL Tracking API endpoints
     path('api/check-url-tracking/', views.check_url_tracking, name='check_url_tracking'),
     path('api/create-url-alert/', views.create_url_alert, name='create_url_alert'),
@@ -1,16 +1,123 @@
 from django.shortcuts import render, get_object_or_404
 from django.views.generic import ListView, DetailView
 from django.http import JsonResponse
-from django.db.models import Q, Avg, Count
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Q
 from django.contrib import messages
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from express_deals.conditional import conditional_view, latest, make_etag, viewer_state
 from .models import Product, Category, ProductReview
+from .facets import product_facets
+from .pagination import CursorPage, InvalidCursor, KeysetPaginator
+from .price_history import DEFAULT_POINTS, DEFAULT_WINDOW_DAYS, METHODS, price_history
 import logging
 import json
 
 logger = logging.getLogger(__name__)
 
+SEARCH_RESULTS_PER_PAGE = 12
 
+
+LISTING_FILTERS = ('search', 'category', 'min_price', 'max_price', 'sort')
+KEYSET_SORTS = ['price', '-price', 'name', '-name', 'created_at', '-created_at']
+
+
+def filter_products(params):
+    """
+    Active products filtered by the shared listing parameters (search, category,
+    min_price, max_price, sort). Returns (queryset, sort); sort is 'relevance'
+    for searches without an explicit sort, otherwise one of KEYSET_SORTS.
+    """
+    queryset = Product.objects.filter(is_active=True).select_related('category', 'rating_summary')
+    
+    # Search functionality
+    search_query = params.get('search')
+    if search_query:
+        queryset = queryset.search(search_query)
+    
+    # Category filter - the sidebar links by slug, older links by id
+    category = params.get('category')
+    if category:
+        if category.isdigit():
+            queryset = queryset.filter(category_id=category)
+        else:
+            queryset = queryset.filter(category__slug=category)
+    
+    # Price range filter
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+    if min_price:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price:
+        queryset = queryset.filter(price__lte=max_price)
+    
+    # Sorting - searches default to relevance (search() already orders by rank)
+    sort_by = params.get('sort', 'relevance' if search_query else 'created_at')
+    if sort_by in KEYSET_SORTS:
+        queryset = queryset.order_by(sort_by, 'id')
+    elif search_query:
+        sort_by = 'relevance'
+    else:
+        sort_by = '-created_at'
+        queryset = queryset.order_by(sort_by, '-id')
+    
+    return queryset, sort_by
+
+
+def paginate_products(queryset, sort_by, params, per_page):
+    """
+    Cursor-paginate a filtered listing; relevance-ranked searches keep offset
+    pages since rank isn't a seekable column. Returns (paginator, page).
+    """
+    if sort_by == 'relevance':
+        paginator = Paginator(queryset, per_page)
+        return paginator, paginator.get_page(params.get('page'))
+    
+    count_key = product_facets.cache_key('product_count', {
+        name: params.get(name) for name in LISTING_FILTERS if name != 'sort'
+    })
+    paginator = KeysetPaginator(queryset, per_page, sort_by, count_key=count_key)
+    try:
+        page = paginator.page(params.get('cursor'))
+    except InvalidCursor:
+        page = paginator.page()
+    return paginator, page
+
+
+def catalogue_validators(request, products, params):
+    """
+    (etag, last_modified) for a page built from ``products``: their newest
+    updated_at, the catalogue version (deletes and deactivations don't touch
+    updated_at) and the request parameters. Pages that differ per visitor
+    only get an ETag, since the cart count has no timestamp.
+    """
+    viewer = viewer_state(request)
+    if viewer is None:
+        return None
+    version, changed_at = product_facets.catalogue_state()
+    newest = products.order_by().aggregate(newest=Max('updated_at'))['newest']
+    last_modified = latest(newest, changed_at)
+    etag = make_etag(version, newest, params, viewer)
+    return etag, None if request.user.is_authenticated else last_modified
+
+
+def product_list_validators(request, *args, **kwargs):
+    queryset, sort_by = filter_products(request.GET)
+    params = {name: request.GET.get(name) for name in LISTING_FILTERS + ('cursor', 'page')}
+    return catalogue_validators(request, queryset, dict(params, sort=sort_by))
+
+
+def product_detail_validators(request, pk, **kwargs):
+    """The product itself plus the related products shown alongside it"""
+    product = Product.objects.filter(pk=pk, is_active=True).values('category_id').first()
+    if product is None:
+        return None
+    involved = Product.objects.filter(Q(pk=pk) | Q(category_id=product['category_id'], is_active=True))
+    return catalogue_validators(request, involved, {'product': pk})
+
+
+@method_decorator(conditional_view(product_list_validators), name='get')
 class ProductListView(ListView):
     model = Product
     template_name = 'products/product_list.html'
@@ -18,47 +125,21 @@ class ProductListView(ListView):
     paginate_by = 12
     
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True).select_related('category')
-        
-        # Search functionality
-        search_query = self.request.GET.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(category__name__icontains=search_query)
-            )
-        
-        # Category filter
-        category_id = self.request.GET.get('category')
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-        
-        # Price range filter
-        min_price = self.request.GET.get('min_price')
-        max_price = self.request.GET.get('max_price')
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-        
-        # Sorting
-        sort_by = self.request.GET.get('sort', 'created_at')
-        if sort_by in ['price', '-price', 'name', '-name', 'created_at', '-created_at']:
-            queryset = queryset.order_by(sort_by)
-        else:
-            queryset = queryset.order_by('-created_at')
-        
+        queryset, self.sort_by = filter_products(self.request.GET)
         return queryset
     
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page = paginate_products(queryset, self.sort_by, self.request.GET, page_size)
+        return paginator, page, page.object_list, page.has_other_pages()
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Add categories for filtering
-        context['categories'] = Category.objects.all()
-        context['featured_products'] = Product.objects.filter(
-            is_featured=True, is_active=True
-        )[:6]
+        # Facet counts for the sidebar (cached per filter set until products change)
+        facets = product_facets.get_facets(self.request.GET)
+        context['categories'] = facets['categories']
+        context['price_buckets'] = facets['price_buckets']
+        context['featured_products'] = product_facets.featured_products()
         
         # URL tracking functionality
         context['url_tracking_enabled'] = True
@@ -73,24 +154,30 @@ class ProductListView(ListView):
         # Preserve filters in pagination
         context['current_search'] = self.request.GET.get('search', '')
         context['current_category'] = self.request.GET.get('category', '')
-        context['current_sort'] = self.request.GET.get('sort', 'created_at')
+        context['current_sort'] = self.request.GET.get(
+            'sort', 'relevance' if context['current_search'] else 'created_at'
+        )
         context['current_min_price'] = self.request.GET.get('min_price', '')
         context['current_max_price'] = self.request.GET.get('max_price', '')
+        context['cursor_pagination'] = isinstance(context.get('page_obj'), CursorPage)
         
         return context
 
 
+@method_decorator(conditional_view(product_detail_validators), name='get')
 class ProductDetailView(DetailView):
     model = Product
     template_name = 'products/product_detail.html'
     context_object_name = 'product'
     
     def get_queryset(self):
-        return Product.objects.filter(is_active=True).select_related('category')
+        return Product.objects.filter(is_active=True).select_related(
+            'category', 'rating_summary'
+        ).prefetch_related('images')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
+        product = self.object
         
         # Get related products
         related_products = Product.objects.filter(
@@ -101,17 +188,15 @@ class ProductDetailView(DetailView):
         # Get reviews
         reviews = ProductReview.objects.filter(product=product).select_related('user')
         
-        # Calculate average rating
-        avg_rating = reviews.aggregate(Avg('rating'))['rating__avg']
-        
-        # Get rating distribution
-        rating_counts = reviews.values('rating').annotate(count=Count('rating'))
-        context['rating_distribution'] = {r['rating']: r['count'] for r in rating_counts}
+        # Rating stats come from the denormalized summary - no aggregates per view
+        rating = product.rating
+        context['rating_summary'] = rating
+        context['rating_distribution'] = rating.distribution
         
         context['related_products'] = related_products
         context['reviews'] = reviews
-        context['avg_rating'] = avg_rating
-        context['review_count'] = reviews.count()
+        context['avg_rating'] = rating.average_rating
+        context['review_count'] = rating.review_count
         
         return context
 
@@ -122,7 +207,14 @@ class CategoryListView(ListView):
     context_object_name = 'categories'
     
     def get_queryset(self):
-        return Category.objects.filter(is_active=True)
+        return Category.objects.annotate(
+            product_count=Count('products', filter=Q(products__is_active=True))
+        ).filter(product_count__gt=0)
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['current_category'] = self.kwargs.get('slug', '')
+        return context
 
 
 def product_search(request):
@@ -130,19 +222,20 @@ def product_search(request):
     query = request.GET.get('q', '')
     category_id = request.GET.get('category', '')
     
-    products = Product.objects.filter(is_active=True)
+    products = Product.objects.filter(is_active=True).select_related('category')
     
     if query:
-        products = products.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query)
-        )
+        products = products.search(query)
     
     if category_id:
         products = products.filter(category_id=category_id)
     
+    page_obj = Paginator(products, SEARCH_RESULTS_PER_PAGE).get_page(request.GET.get('page'))
+    
     context = {
-        'products': products,
+        'products': page_obj.object_list,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
         'query': query,
         'categories': Category.objects.all(),
         'current_category': category_id
@@ -151,6 +244,65 @@ def product_search(request):
     return render(request, 'products/search_results.html', context)
 
 
+def api_product_list(request):
+    """
+    Product listing as JSON, with the same filters as the list page.
+    Follow next_cursor/previous_cursor to page (or page=N for relevance-ranked searches).
+    """
+    try:
+        per_page = min(max(int(request.GET.get('limit', 24) or 24), 1), 100)
+    except ValueError:
+        per_page = 24
+    queryset, sort_by = filter_products(request.GET)
+    paginator, page = paginate_products(queryset, sort_by, request.GET, per_page)
+    
+    data = {
+        'success': True,
+        'products': [
+            {
+                'id': product.id,
+                'name': product.name,
+                'slug': product.slug,
+                'category': product.category.name,
+                'price': float(product.price),
+                'original_price': float(product.original_price) if product.original_price else None,
+                'discount_percentage': product.discount_percentage,
+                'stock_status': product.stock_status,
+                'url': product.get_absolute_url(),
+            }
+            for product in page.object_list
+        ],
+        'sort': sort_by,
+        'count': paginator.count,
+        'count_is_estimate': getattr(paginator, 'count_is_estimate', False),
+    }
+    if isinstance(page, CursorPage):
+        data['next_cursor'] = page.next_cursor
+        data['previous_cursor'] = page.previous_cursor
+    else:
+        data['page'] = page.number
+        data['num_pages'] = paginator.num_pages
+    
+    return JsonResponse(data)
+
+
+def api_price_history(request, pk):
+    """
+    A product's price history for charts: ?days=90&points=200&method=lttb|minmax.
+    Parallel arrays t (Unix seconds), price and original (pence) and in_stock.
+    """
+    product = get_object_or_404(Product, pk=pk, is_active=True)
+    method = request.GET.get('method', 'lttb')
+    if method not in METHODS:
+        return JsonResponse({'success': False, 'error': f"method must be one of {', '.join(METHODS)}"}, status=400)
+    try:
+        days = int(request.GET.get('days', DEFAULT_WINDOW_DAYS) or DEFAULT_WINDOW_DAYS)
+        points = int(request.GET.get('points', DEFAULT_POINTS) or DEFAULT_POINTS)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'days and points must be whole numbers'}, status=400)
+    return JsonResponse({'success': True, **price_history.series(product.pk, days=days, points=points, method=method)})
+
+
 def get_user_tracking_stats(request):
     """Get user's URL tracking statistics"""
     if not request.user.is_authenticated:
@@ -222,6 +222,8 @@ class LivePriceConsumer(AsyncWebsocketConsumer):
             
             if data.get('type') == 'request_price':
                 await self.send_current_price()
+            elif data.get('type') == 'request_history':
+                await self.send_price_history(data.get('days', 90), data.get('points', 120))
         
         except json.JSONDecodeError:
             pass
@@ -244,6 +246,21 @@ class LivePriceConsumer(AsyncWebsocketConsumer):
         except Exception as e:
             logger.error(f"Error sending current price for product {self.product_id}: {e}")
     
+    async def send_price_history(self, days, points):
+        """
+        Send the product's downsampled price history (pence, Unix seconds)
+        """
+        try:
+            series = await self.get_price_history(days, points)
+            await self.send(text_data=json.dumps({'type': 'price_history', **series}))
+        except Exception as e:
+            logger.error(f"Error sending price history for product {self.product_id}: {e}")
+    
+    @database_sync_to_async
+    def get_price_history(self, days, points):
+        from products.price_history import price_history
+        return price_history.series(int(self.product_id), days=days, points=points)
+    
     @database_sync_to_async
     def get_product(self):
         """
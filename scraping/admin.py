@@ -11,7 +11,7 @@ from django.http import HttpResponseRedirect
 from django.contrib import messages
 from django.utils import timezone
 from .models import (
-    ScrapeTarget, ScrapeJob, ScrapedProduct, 
+    ScrapeTarget, ScrapeJob, ScrapedProduct, RawPage,
     PriceAlert, AlertNotification
 )
 
@@ -153,7 +153,7 @@ class ScrapedProductAdmin(admin.ModelAdmin):
     Admin interface for managing scraped products
     """
     list_display = [
-        'title_truncated', 'price', 'discount_percentage',
+        'title_truncated', 'price', 'discount',
         'job_target', 'is_processed', 'imported_product_link',
         'scraped_at', 'actions_column'
     ]
@@ -199,14 +199,16 @@ class ScrapedProductAdmin(admin.ModelAdmin):
     
     def import_to_catalog(self, request, queryset):
         """Import selected products to catalog"""
+        from products.price_history import price_history
         from .scrapers import ProductScraper
         
         scraper = ProductScraper()
         imported_count = 0
         
-        for scraped_product in queryset.filter(is_processed=False):
-            if scraper.import_to_catalog(scraped_product):
-                imported_count += 1
+        with price_history.batch():
+            for scraped_product in queryset.filter(is_processed=False):
+                if scraper.import_to_catalog(scraped_product):
+                    imported_count += 1
         
         messages.success(request, f"Imported {imported_count} products to catalog")
     
@@ -220,6 +222,20 @@ class ScrapedProductAdmin(admin.ModelAdmin):
     mark_as_processed.short_description = "Mark as processed"
 
 
+@admin.register(RawPage)
+class RawPageAdmin(admin.ModelAdmin):
+    """
+    Admin interface for browsing the raw page archive
+    """
+    list_display = ['url', 'job', 'codec', 'original_size', 'compressed_size', 'fetched_at']
+    list_filter = ['codec', 'job__target__site_type', 'fetched_at']
+    search_fields = ['url', 'content_hash']
+    readonly_fields = [
+        'job', 'url', 'content_hash', 'codec',
+        'original_size', 'compressed_size', 'fetched_at'
+    ]
+
+
 @admin.register(PriceAlert)
 class PriceAlertAdmin(admin.ModelAdmin):
     """
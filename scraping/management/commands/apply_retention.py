@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scraping.services.retention_service import retention_engine
+
+
+class Command(BaseCommand):
+    help = ('Apply the retention policies (what the nightly cleanup_old_data task does): archive and delete '
+            'expired scraped products, raw pages (and their archive blobs), scrape jobs and notifications '
+            'in bounded primary-key batches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--policy', action='append', dest='policies', help='Only apply this policy (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Count expired rows without deleting them')
+        archive = parser.add_mutually_exclusive_group()
+        archive.add_argument('--archive', action='store_true', default=None, help='Archive every policy\'s rows first')
+        archive.add_argument('--no-archive', action='store_false', dest='archive', default=None, help='Delete without archiving')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        for policy in retention_engine.policies():
+            if not options['policies'] or policy.name in options['policies']:
+                archive = policy.archive if options['archive'] is None else options['archive']
+                self.stdout.write(
+                    f"  {policy.name}: {policy.model} older than {policy.keep_days} days by {policy.date_field}, "
+                    f"{policy.batch_size} per batch{', archived' if archive else ''}"
+                )
+
+        try:
+            results = retention_engine.run(
+                names=options['policies'], dry_run=options['dry_run'], archive=options['archive'],
+                progress=self._progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for result in results:
+            if result.dry_run:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{result.policy}: {result.matched} rows older than {result.cutoff:%Y-%m-%d} would be deleted"
+                ))
+                continue
+            cascaded = ', '.join(f"{count} {table}" for table, count in result.cascaded.items() if count)
+            self.stdout.write(self.style.SUCCESS(
+                f"{result.policy}: deleted {result.deleted} rows in {result.batches} batches ({result.seconds}s)"
+                + (f", dropped {len(result.partitions_dropped)} partitions" if result.partitions_dropped else '')
+                + (f", cascaded {cascaded}" if cascaded else '')
+                + (f", archived {result.archived} rows to {len(result.archive_files)} files" if result.archived else '')
+                + (f", deleted {result.blobs_deleted} archive blobs" if result.blobs_deleted else '')
+            ))
+
+    def _progress(self, result):
+        if self.verbosity > 1:
+            self.stdout.write(f"    {result.policy}: batch {result.batches}, {result.deleted} deleted")
@@ -0,0 +1,127 @@
+import argparse
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from scraping.services.benchmark_service import BenchmarkHistory, BenchmarkResult, ScrapingBenchmark
+from scraping.services.fixture_server import FixtureServerConfig
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks the scrapers end-to-end against the local fixture server '
+        'and appends the results to the benchmark history.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenario', action='append', choices=ScrapingBenchmark.SCENARIOS,
+                            help='Scenario to run (repeatable, defaults to all)')
+        parser.add_argument('--fixtures', help='Fixture corpus directory')
+        parser.add_argument('--pages', type=int, default=10)
+        parser.add_argument('--products-per-page', type=int, default=24)
+        parser.add_argument('--latency', type=float, default=0.0)
+        parser.add_argument('--error-rate', action='append', default=[], metavar='STATUS=RATE')
+        parser.add_argument('--throttle', type=float)
+        parser.add_argument('--results', help='JSON lines file the results are appended to')
+        parser.add_argument('--no-save', action='store_true', help='Print results without recording them')
+        # Internal: run the scenarios in this process and print the results as JSON lines
+        parser.add_argument('--json', action='store_true', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        error_rates = {}
+        for spec in options['error_rate']:
+            try:
+                status, rate = spec.split('=')
+                error_rates[int(status)] = float(rate)
+            except ValueError:
+                raise CommandError(f"Invalid --error-rate {spec!r}, expected STATUS=RATE")
+
+        benchmark = ScrapingBenchmark(
+            fixture_dir=options['fixtures'],
+            server_config=FixtureServerConfig(
+                latency=options['latency'],
+                error_rates=error_rates,
+                throttle_rps=options['throttle'],
+                seed=42
+            ),
+            pages=options['pages'],
+            products_per_page=options['products_per_page']
+        )
+
+        if options['json']:
+            for result in self._run_here(benchmark, options['scenario']):
+                self.stdout.write(json.dumps(result.to_dict(), sort_keys=True))
+            return
+
+        # One child process per scenario, so peak RSS is that scenario's alone
+        history = BenchmarkHistory(options['results'])
+        results = [
+            self._run_child(scenario, options)
+            for scenario in options['scenario'] or ScrapingBenchmark.SCENARIOS
+        ]
+
+        for result in results:
+            self._report(result, history.compare(result))
+
+        if not options['no_save']:
+            history.append(results)
+            self.stdout.write(self.style.SUCCESS(f"Results appended to {history.path}"))
+
+    def _run_here(self, benchmark, scenarios):
+        # Run against a throwaway test database so benchmark rows never reach real data
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            return benchmark.run(scenarios)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def _run_child(self, scenario, options):
+        args = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_scraping', '--json',
+            '--scenario', scenario,
+            '--pages', str(options['pages']),
+            '--products-per-page', str(options['products_per_page']),
+            '--latency', str(options['latency']),
+        ]
+        for spec in options['error_rate']:
+            args += ['--error-rate', spec]
+        if options['fixtures']:
+            args += ['--fixtures', options['fixtures']]
+        if options['throttle'] is not None:
+            args += ['--throttle', str(options['throttle'])]
+
+        child = subprocess.run(args, capture_output=True, text=True, cwd=settings.BASE_DIR)
+        lines = child.stdout.strip().splitlines()
+        if child.returncode != 0 or not lines:
+            error = (child.stderr.strip().splitlines() or ['no output'])[-1]
+            return BenchmarkResult(scenario, error=f"Benchmark process exited with {child.returncode}: {error}")
+        return BenchmarkResult.from_dict(json.loads(lines[-1]))
+
+    def _report(self, result, changes):
+        style = self.style.ERROR if result.error else self.style.SUCCESS
+        self.stdout.write(style(f"\n{result.scenario} @ {result.commit or 'unknown commit'}"))
+        if result.error:
+            self.stdout.write(self.style.ERROR(f"  Failed: {result.error}"))
+
+        rows = [
+            ('Pages/sec', result.pages_per_second, 'pages_per_second'),
+            ('Products/sec', result.products_per_second, 'products_per_second'),
+            ('Queries/product', result.queries_per_product, 'queries_per_product'),
+            ('Peak RSS (MB)', result.peak_rss_mb, 'peak_rss_mb'),
+        ]
+        for label, value, metric in rows:
+            change = changes.get(metric)
+            suffix = f"  ({change:+.1f}% vs {changes['baseline_commit']})" if change is not None else ''
+            self.stdout.write(f"  {label:<16} {value if value is not None else '-'}{suffix}")
+
+        self.stdout.write(
+            f"  {result.pages_fetched} pages, {result.products_saved} products, "
+            f"{result.db_queries} queries in {result.elapsed_seconds}s "
+            f"({result.requests} requests, errors {result.errors or 'none'})"
+        )
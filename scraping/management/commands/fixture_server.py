@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scraping.models import RawPage
+from scraping.services.fixture_server import FixtureServer, FixtureServerConfig, FixtureStore
+
+
+class Command(BaseCommand):
+    help = (
+        'Records retailer pages into a local fixture corpus and serves them '
+        'with simulated latency, errors and throttling for offline scraping runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Fixture corpus directory (contains manifest.json)')
+        parser.add_argument('--record-url', action='append', default=[], help='Capture a live page (repeatable)')
+        parser.add_argument('--record-archive', type=int, metavar='N',
+                            help='Capture the N most recent pages from the raw page archive')
+        parser.add_argument('--synthetic', type=int, metavar='PAGES',
+                            help='Generate a synthetic listing corpus with this many pages')
+        parser.add_argument('--serve', action='store_true', help='Serve the corpus until interrupted')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Random +/- seconds on top of latency')
+        parser.add_argument('--error-rate', action='append', default=[], metavar='STATUS=RATE',
+                            help='Inject an error status, e.g. 429=0.05 (repeatable)')
+        parser.add_argument('--throttle', type=float, help='Requests per second before answering 429')
+
+    def handle(self, *args, **options):
+        store = FixtureStore(options['directory'])
+
+        for url in options['record_url']:
+            key = store.record_url(url)
+            if key:
+                self.stdout.write(self.style.SUCCESS(f"Recorded {url} -> {key}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Failed to record {url}"))
+
+        if options['record_archive']:
+            recorded = store.record_from_archive(RawPage.objects.all()[:options['record_archive']])
+            self.stdout.write(self.style.SUCCESS(f"Recorded {recorded} pages from the raw page archive"))
+
+        if options['synthetic']:
+            template = store.generate_synthetic(pages=options['synthetic'])
+            self.stdout.write(self.style.SUCCESS(f"Generated {options['synthetic']} synthetic pages: {template}"))
+
+        store.save()
+        self.stdout.write(f"Corpus has {len(store.pages)} pages")
+
+        if options['serve']:
+            self._serve(store, options)
+
+    def _serve(self, store, options):
+        error_rates = {}
+        for spec in options['error_rate']:
+            try:
+                status, rate = spec.split('=')
+                error_rates[int(status)] = float(rate)
+            except ValueError:
+                raise CommandError(f"Invalid --error-rate {spec!r}, expected STATUS=RATE")
+
+        config = FixtureServerConfig(
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rates=error_rates,
+            throttle_rps=options['throttle']
+        )
+        server = FixtureServer(store, config, port=options['port']).start()
+        self.stdout.write(self.style.SUCCESS(f"Serving {len(store.pages)} pages on {server.base_url} (Ctrl+C to stop)"))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.stop()
+            self.stdout.write(f"Served {server.stats['pages_served']} pages, errors: {server.stats['errors']}")
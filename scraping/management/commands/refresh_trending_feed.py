@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from scraping.services.trending_service import trending_service
+
+
+class Command(BaseCommand):
+    help = 'Refresh the materialized trending deals and categories feed (what the half-hourly task does).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild from the whole 7-day window instead of recent scrapes')
+
+    def handle(self, *args, **options):
+        result = trending_service.refresh(full=options['full'])
+        kind = 'Rebuilt' if result['full'] else 'Refreshed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{kind} trending feed: {result['deals']} deals, {result['categories']} categories "
+            f"({result['scrapes']} scrapes counted)"
+        ))
+        for rank, category in enumerate(trending_service.feed()['categories'][:5], start=1):
+            self.stdout.write(f"  {rank}. {category['name']} ({category['product_count']} scrapes, score {category['score']})")
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraping', '0006_auto_20250718_1812'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RawPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=2000)),
+                ('content_hash', models.CharField(db_index=True, help_text='SHA-256 of the uncompressed body', max_length=64)),
+                ('codec', models.CharField(default='zstd', max_length=10)),
+                ('original_size', models.PositiveIntegerField(default=0)),
+                ('compressed_size', models.PositiveIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField(auto_now_add=True)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='raw_pages', to='scraping.scrapejob')),
+            ],
+            options={
+                'ordering': ['-fetched_at'],
+                'indexes': [models.Index(fields=['job', 'fetched_at'], name='scraping_ra_job_id_9ada71_idx')],
+            },
+        ),
+    ]
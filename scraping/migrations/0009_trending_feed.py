@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_discount'),
+        ('scraping', '0008_discount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deals', models.JSONField(default=list)),
+                ('categories', models.JSONField(default=list)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategoryTrendBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('scrapes', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trend_buckets', to='products.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='scraping_ca_hour_83f68d_idx')],
+                'unique_together': {('category', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.4 on 2026-10-19 20:05
+
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations
+
+
+TABLE = 'scraping_scrapedproduct'
+UNPARTITIONED = 'scraping_scrapedproduct_unpartitioned'
+SEQUENCE = 'scraping_scrapedproduct_pk_seq'
+MONTHS_AHEAD = 3
+
+
+def month_partitions(since, until):
+    """Monthly (name, start, end) ranges from ``since``'s month to ``until``, named as partition_service names them"""
+    since = since.astimezone(dt_timezone.utc)
+    start = datetime(since.year, since.month, 1, tzinfo=dt_timezone.utc)
+    while start < until:
+        end = datetime(start.year + start.month // 12, start.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+        yield f"{TABLE}_p{start:%Y%m%d}_{end:%Y%m%d}", start, end
+        start = end
+
+
+def partition_scraped_products(apps, schema_editor):
+    """
+    Rebuild the table as PARTITION BY RANGE (scraped_at) and copy the rows
+    across. PostgreSQL needs the partition key in every unique constraint,
+    so the primary key becomes (id, scraped_at) and the per-job uniqueness
+    (job, external_id, scraped_at); ids still come from one sequence.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return  # SQLite dev keeps the plain table
+    with schema_editor.connection.cursor() as cursor:
+        # Plain indexes are recreated under their own names; constraints are rebuilt below
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+            "(SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s))", [TABLE, TABLE]
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = %s AND is_generated = 'NEVER' ORDER BY ordinal_position", [TABLE]
+        )
+        columns = ', '.join(schema_editor.quote_name(row[0]) for row in cursor.fetchall())
+        cursor.execute(f"SELECT MIN(scraped_at), COALESCE(MAX(id), 0), NOW() FROM {TABLE}")
+        oldest, max_id, now = cursor.fetchone()
+
+    schema_editor.execute(f"ALTER TABLE {TABLE} RENAME TO {UNPARTITIONED}")
+    schema_editor.execute(f"CREATE SEQUENCE {SEQUENCE}")
+    schema_editor.execute(
+        f"CREATE TABLE {TABLE} (LIKE {UNPARTITIONED} INCLUDING DEFAULTS INCLUDING GENERATED) "
+        f"PARTITION BY RANGE (scraped_at)"
+    )
+    schema_editor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+    schema_editor.execute(f"ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id")
+    schema_editor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, scraped_at)")
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_job_external_scraped_uniq UNIQUE (job_id, external_id, scraped_at)"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_job_id_fk FOREIGN KEY (job_id) "
+        f"REFERENCES scraping_scrapejob (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_imported_product_id_fk FOREIGN KEY (imported_product_id) "
+        f"REFERENCES products_product (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    schema_editor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT")
+    until = now.astimezone(dt_timezone.utc)
+    for _ in range(MONTHS_AHEAD + 1):
+        until = datetime(until.year + until.month // 12, until.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+    for name, start, end in month_partitions(oldest or now, until):
+        schema_editor.execute(
+            f"CREATE TABLE {name} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+
+    schema_editor.execute(f"INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {UNPARTITIONED}")
+    schema_editor.execute(f"SELECT setval('{SEQUENCE}', {max_id + 1}, false)")
+    schema_editor.execute(f"DROP TABLE {UNPARTITIONED}")
+    for definition in index_definitions:
+        schema_editor.execute(re.sub(r' ON (ONLY )?\S+ ', f' ON {TABLE} ', definition, count=1))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraping', '0009_trending_feed'),
+    ]
+
+    operations = [
+        # Reversing leaves the table partitioned - it works unchanged with the earlier schema
+        migrations.RunPython(partition_scraped_products, migrations.RunPython.noop),
+    ]
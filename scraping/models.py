@@ -5,7 +5,7 @@ Defines models for managing scraping targets, rules, and collected data
 
 from django.db import models
 from django.contrib.auth.models import User
-from products.models import Product, Category
+from products.models import Product, Category, discount_expression
 import json
 
 
@@ -128,6 +128,13 @@ class ScrapeJob(models.Model):
 class ScrapedProduct(models.Model):
     """
     Stores raw scraped product data before processing
+
+    On PostgreSQL the table is range-partitioned on scraped_at (migration
+    0010), which forces the partition key into every unique constraint: the
+    database's primary key is (id, scraped_at) and its per-job uniqueness
+    (job, external_id, scraped_at). The model keeps the plain id key and
+    unique_together below, which is what SQLite enforces; ids are still
+    unique on PostgreSQL because they come from one sequence.
     """
     job = models.ForeignKey(ScrapeJob, on_delete=models.CASCADE)
     external_id = models.CharField(max_length=200, help_text="Product ID from source site")
@@ -152,6 +159,12 @@ class ScrapedProduct(models.Model):
     imported_product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     
     scraped_at = models.DateTimeField(auto_now_add=True)
+    # Percentage off original_price, computed by the database on every write
+    discount = models.GeneratedField(
+        expression=discount_expression(),
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        db_persist=True,
+    )
     
     def __str__(self):
         return f"{self.title[:50]}... - ${self.price}"
@@ -164,7 +177,37 @@ class ScrapedProduct(models.Model):
     
     class Meta:
         ordering = ['-scraped_at']
+        # PostgreSQL enforces (job, external_id, scraped_at) instead - see the class docstring.
+        # The partitioning migration rebuilt the constraints under its own names, so changing
+        # this needs a migration that handles PostgreSQL separately.
         unique_together = ['job', 'external_id']
+        indexes = [
+            # Deal queries: recent window, then discount
+            models.Index(fields=['scraped_at', 'discount']),
+        ]
+
+
+class RawPage(models.Model):
+    """
+    Archived HTML for a fetched URL. The compressed body lives in the
+    archive storage once per content hash and can be re-extracted offline.
+    """
+    job = models.ForeignKey(ScrapeJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='raw_pages')
+    url = models.URLField(max_length=2000)
+    content_hash = models.CharField(max_length=64, db_index=True, help_text="SHA-256 of the uncompressed body")
+    codec = models.CharField(max_length=10, default='zstd')
+    original_size = models.PositiveIntegerField(default=0)
+    compressed_size = models.PositiveIntegerField(default=0)
+    fetched_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.url} ({self.content_hash[:12]})"
+    
+    class Meta:
+        ordering = ['-fetched_at']
+        indexes = [
+            models.Index(fields=['job', 'fetched_at']),
+        ]
 
 
 class PriceAlert(models.Model):
@@ -257,3 +300,35 @@ class AlertNotification(models.Model):
     
     class Meta:
         ordering = ['-sent_at']
+
+
+class CategoryTrendBucket(models.Model):
+    """
+    Imported scrapes per category per hour - the compact history the
+    trending-categories ranking is summed from
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='trend_buckets')
+    hour = models.DateTimeField()
+    scrapes = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.category} @ {self.hour:%Y-%m-%d %H:00}: {self.scrapes}"
+    
+    class Meta:
+        unique_together = ['category', 'hour']
+        indexes = [
+            models.Index(fields=['hour']),
+        ]
+
+
+class TrendingFeed(models.Model):
+    """
+    The materialized trending feed (a single row): ranked deals and
+    categories as rendered, refreshed by scraping.tasks.update_trending_deals
+    """
+    deals = models.JSONField(default=list)
+    categories = models.JSONField(default=list)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Trending feed ({len(self.deals)} deals, refreshed {self.refreshed_at})"
@@ -9,6 +9,7 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 import logging
 import requests
+from express_deals.metrics import instrument
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +44,7 @@ class NotificationService:
         if self.whatsapp_enabled and hasattr(user, 'profile') and user.profile.whatsapp_number:
             self.send_whatsapp_notification(user.profile.whatsapp_number, 'price_alert', context)
     
+    @instrument('notify', job='email')
     def send_email_notification(self, email, template_name, context):
         """Send email notification"""
         try:
@@ -58,10 +60,13 @@ class NotificationService:
             )
             
             logger.info(f"Email sent successfully to {email}")
+            return True
             
         except Exception as e:
             logger.error(f"Failed to send email to {email}: {e}")
+            return False
     
+    @instrument('notify', job='sms')
     def send_sms_notification(self, phone_number, template_name, context):
         """Send SMS notification via Twilio"""
         try:
@@ -73,7 +78,7 @@ class NotificationService:
             
             if not all([account_sid, auth_token, from_number]):
                 logger.warning("Twilio credentials not configured")
-                return
+                return False
             
             client = Client(account_sid, auth_token)
             message_body = self._get_sms_message(template_name, context)
@@ -85,10 +90,13 @@ class NotificationService:
             )
             
             logger.info(f"SMS sent successfully to {phone_number}: {message.sid}")
+            return True
             
         except Exception as e:
             logger.error(f"Failed to send SMS to {phone_number}: {e}")
+            return False
     
+    @instrument('notify', job='whatsapp')
     def send_whatsapp_notification(self, whatsapp_number, template_name, context):
         """Send WhatsApp notification via Meta Business API"""
         try:
@@ -97,7 +105,7 @@ class NotificationService:
             
             if not all([access_token, phone_number_id]):
                 logger.warning("WhatsApp credentials not configured")
-                return
+                return False
             
             url = f"https://graph.facebook.com/v18.0/{phone_number_id}/messages"
             headers = {
@@ -120,11 +128,14 @@ class NotificationService:
             
             if response.status_code == 200:
                 logger.info(f"WhatsApp message sent successfully to {whatsapp_number}")
-            else:
-                logger.error(f"Failed to send WhatsApp message: {response.text}")
+                return True
+            
+            logger.error(f"Failed to send WhatsApp message: {response.text}")
+            return False
                 
         except Exception as e:
             logger.error(f"Failed to send WhatsApp message to {whatsapp_number}: {e}")
+            return False
     
     def _get_default_subject(self, template_name, context):
         """Get default email subject"""
@@ -22,6 +22,7 @@ from .models import ScrapeTarget, ScrapeJob, ScrapedProduct
 from .proxy_manager import proxy_manager
 from .performance_optimizer import scraping_optimizer
 from products.models import Product, Category
+from products.price_history import is_in_stock, price_history
 from urllib.parse import urljoin, urlparse
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
@@ -41,6 +42,9 @@ from .services.fetch_service import fetch_service
 from .services.extract_service import extractor
 from .services.transform_service import transformer
 from .services.load_service import loader
+from .services.structured_data import structured_data_extractor
+from .services.archive_service import page_archive
+from express_deals.metrics import proxy_tier_for, retailer_label, stage_timer
 
 logger = logging.getLogger(__name__)
 
@@ -128,7 +132,10 @@ class WorldClassBaseScraper:
                     if self.current_proxy:
                         self.session.proxies.update(self.current_proxy.dict)
                 
-                response = self.session.get(url, timeout=timeout)
+                with stage_timer('fetch', retailer=retailer_label(self.target.name), job='world_class',
+                                 proxy_tier=proxy_tier_for(self.current_proxy, settings['use_premium_proxy'])) as timer:
+                    response = self.session.get(url, timeout=timeout)
+                    timer.outcome = 'success' if response.status_code == 200 else 'failure'
                 response_time = time.time() - start_time
                 
                 self.request_count += 1
@@ -283,26 +290,43 @@ class WorldClassBaseScraper:
         data = {}
         
         try:
+            # Structured data (schema.org microdata) first - selectors only fill gaps
+            structured = structured_data_extractor.extract_element(product_element)
+            if structured.success:
+                data['title'] = structured.data['title']
+                data['price'] = structured.data['price']
+                if structured.data.get('images'):
+                    data['image_url'] = urljoin(self.target.base_url, structured.data['images'][0])
+                for field in ('brand', 'availability', 'description', 'rating', 'review_count'):
+                    if structured.data.get(field):
+                        data[field] = structured.data[field]
+                data['extraction_method'] = structured.method_used
+            else:
+                data['extraction_method'] = 'css_selectors'
+            
             # Title
-            title_elem = product_element.select_one(self.target.title_selector)
-            data['title'] = title_elem.get_text(strip=True) if title_elem else ''
+            if not data.get('title'):
+                title_elem = product_element.select_one(self.target.title_selector)
+                data['title'] = title_elem.get_text(strip=True) if title_elem else ''
             
             # Price
-            price_elem = product_element.select_one(self.target.price_selector)
-            if price_elem:
-                data['price'] = self.parse_price(price_elem.get_text(strip=True))
+            if not data.get('price'):
+                price_elem = product_element.select_one(self.target.price_selector)
+                if price_elem:
+                    data['price'] = self.parse_price(price_elem.get_text(strip=True))
             
             # Image
-            img_elem = product_element.select_one(self.target.image_selector)
-            if img_elem:
-                image_src = img_elem.get('src') or img_elem.get('data-src')
-                if image_src:
-                    data['image_url'] = urljoin(self.target.base_url, image_src)
-            else:
-                # Fallback to Open Graph image
-                og_image = soup.select_one("meta[property='og:image']")
-                if og_image and og_image.get('content'):
-                    data['image_url'] = urljoin(self.target.base_url, og_image['content'])
+            if not data.get('image_url'):
+                img_elem = product_element.select_one(self.target.image_selector)
+                if img_elem:
+                    image_src = img_elem.get('src') or img_elem.get('data-src')
+                    if image_src:
+                        data['image_url'] = urljoin(self.target.base_url, image_src)
+                else:
+                    # Fallback to Open Graph image
+                    og_image = soup.select_one("meta[property='og:image']")
+                    if og_image and og_image.get('content'):
+                        data['image_url'] = urljoin(self.target.base_url, og_image['content'])
 
             # URL
             url_elem = product_element.select_one(self.target.url_selector)
@@ -312,7 +336,7 @@ class WorldClassBaseScraper:
                     data['product_url'] = self.target.base_url + data['product_url']
             
             # Rating (optional)
-            if self.target.rating_selector:
+            if self.target.rating_selector and not data.get('rating'):
                 rating_elem = product_element.select_one(self.target.rating_selector)
                 if rating_elem:
                     rating_text = rating_elem.get_text(strip=True)
@@ -651,31 +675,49 @@ class WorldClassProductScraper:
                     html_content = scraper.get_page_selenium(url, target.product_selector)
                     if not html_content:
                         continue
-                    soup = BeautifulSoup(html_content, 'html.parser')
                 else:
                     response = scraper.get_page(url)
                     if not response:
                         continue
-                    soup = BeautifulSoup(response.content, 'html.parser')
+                    html_content = response.content
                 
-                # Extract products
-                product_elements = soup.select(target.product_selector)
+                # Keep the raw page for offline re-extraction
+                page_archive.store(url, html_content, job_id=job.id)
+                
+                with stage_timer('parse', retailer=retailer_label(target.name), job='world_class') as timer:
+                    soup = BeautifulSoup(html_content, 'html.parser')
+                    product_elements = soup.select(target.product_selector)
+                    timer.add_items(len(product_elements))
                 
                 if not product_elements:
                     logger.warning(f"No products found on page {page}")
                     continue
                 
-                for element in product_elements:
-                    product_data = scraper.extract_product_data(soup, element)
-                    
-                    if self.is_valid_product(product_data, target):
+                # Extract products
+                with stage_timer('extract', retailer=retailer_label(target.name), job='world_class') as timer:
+                    extracted = []
+                    for element in product_elements:
+                        product_data = scraper.extract_product_data(soup, element)
+                        self._record_extraction_method(product_data.get('extraction_method'))
+                        extracted.append(product_data)
+                    timer.add_items(len(extracted))
+                
+                with stage_timer('load', retailer=retailer_label(target.name), job='world_class') as timer, price_history.batch():
+                    for product_data in extracted:
+                        if not self.is_valid_product(product_data, target):
+                            timer.add_items(1, outcome='invalid')
+                            continue
+                        
                         scraped_product = self.save_scraped_product(job, product_data)
                         if scraped_product:
                             products_found += 1
+                            timer.add_items(1)
                             
                             # Try to import as actual product
                             if self.import_to_catalog(scraped_product):
                                 products_imported += 1
+                        else:
+                            timer.add_items(1, outcome='failure')
                 
                 job.pages_scraped = page
                 job.products_found = products_found
@@ -743,6 +785,13 @@ class WorldClassProductScraper:
             logger.error(f"Failed to save scraped product: {e}")
             return None
     
+    def _record_price(self, product, scraped_product):
+        """Add the scrape to the product's price history (a no-op when nothing changed)"""
+        price_history.record(
+            product.pk, scraped_product.price, scraped_product.original_price,
+            is_in_stock(scraped_product.availability), scraped_product.scraped_at
+        )
+    
     def import_to_catalog(self, scraped_product):
         """Import scraped product to main product catalog"""
         try:
@@ -773,6 +822,7 @@ class WorldClassProductScraper:
                 existing_product.original_price = scraped_product.original_price
                 existing_product.description = scraped_product.description or existing_product.description
                 existing_product.save()
+                self._record_price(existing_product, scraped_product)
                 
                 scraped_product.imported_product = existing_product
                 scraped_product.is_processed = True
@@ -793,6 +843,7 @@ class WorldClassProductScraper:
                 is_active=True,
                 is_featured=False  # Will be set manually for featured products
             )
+            self._record_price(product, scraped_product)
             
             # Download and upload image
             if scraped_product.image_url:
@@ -850,6 +901,13 @@ class WorldClassProductScraper:
         
         return None
     
+    def _record_extraction_method(self, method):
+        """Count which extraction stage produced each product"""
+        if not method:
+            return
+        methods = self.performance_stats.setdefault('extraction_methods', {})
+        methods[method] = methods.get(method, 0) + 1
+    
     def get_performance_stats(self):
         """Get scraping performance statistics"""
         stats = {
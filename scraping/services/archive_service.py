@@ -0,0 +1,126 @@
+"""
+Express Deals - Raw Page Archive
+Stores fetched HTML as compressed, content-addressed blobs so pages
+can be re-extracted offline without touching the retailers again
+"""
+
+import hashlib
+import logging
+import zlib
+from typing import Dict, Optional, Union
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils.module_loading import import_string
+
+try:
+    import zstandard
+except ImportError:  # zstandard not installed - fall back to zlib
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+class PageArchive:
+    """Content-addressed archive of raw HTML, one blob per distinct body"""
+
+    EXTENSIONS = {'zstd': 'zst', 'zlib': 'zz'}
+
+    def __init__(self):
+        self.enabled = getattr(settings, 'SCRAPING_ARCHIVE_ENABLED', False)
+        self.level = getattr(settings, 'SCRAPING_ARCHIVE_LEVEL', 10)
+        self.codec = 'zstd' if zstandard is not None else 'zlib'
+        self._storage = None
+        self.archive_stats = {
+            'pages_archived': 0,
+            'blobs_written': 0,
+            'duplicates_skipped': 0,
+            'bytes_in': 0,
+            'bytes_stored': 0,
+        }
+
+    @property
+    def storage(self):
+        """Archive storage - local disk by default, any Django storage backend works"""
+        if self._storage is None:
+            backend = getattr(
+                settings, 'SCRAPING_ARCHIVE_STORAGE', 'django.core.files.storage.FileSystemStorage'
+            )
+            options = getattr(
+                settings, 'SCRAPING_ARCHIVE_OPTIONS', {'location': settings.BASE_DIR / 'scraping_archive'}
+            )
+            self._storage = import_string(backend)(**options)
+        return self._storage
+
+    def store(self, url: str, content: Union[str, bytes], job_id: Optional[int] = None):
+        """Archive a fetched page and return its RawPage record (None when disabled or failed)"""
+        if not self.enabled or not content:
+            return None
+
+        from ..models import RawPage
+
+        body = content.encode('utf-8') if isinstance(content, str) else content
+        content_hash = hashlib.sha256(body).hexdigest()
+
+        try:
+            existing = RawPage.objects.filter(content_hash=content_hash).only('codec', 'compressed_size').first()
+            if existing and self.storage.exists(self.blob_path(content_hash, existing.codec)):
+                codec, compressed_size = existing.codec, existing.compressed_size
+                self.archive_stats['duplicates_skipped'] += 1
+            else:
+                codec = self.codec
+                compressed = self.compress(body, codec)
+                self.storage.save(self.blob_path(content_hash, codec), ContentFile(compressed))
+                compressed_size = len(compressed)
+                self.archive_stats['blobs_written'] += 1
+                self.archive_stats['bytes_stored'] += compressed_size
+
+            self.archive_stats['pages_archived'] += 1
+            self.archive_stats['bytes_in'] += len(body)
+
+            return RawPage.objects.create(
+                job_id=job_id,
+                url=url[:2000],
+                content_hash=content_hash,
+                codec=codec,
+                original_size=len(body),
+                compressed_size=compressed_size
+            )
+
+        except Exception as e:
+            logger.warning(f"Failed to archive {url}: {e}")
+            return None
+
+    def load(self, raw_page) -> bytes:
+        """Return the uncompressed body of an archived page"""
+        return self.read_blob(raw_page.content_hash, raw_page.codec)
+
+    def read_blob(self, content_hash: str, codec: str) -> bytes:
+        with self.storage.open(self.blob_path(content_hash, codec), 'rb') as blob:
+            return self.decompress(blob.read(), codec)
+
+    def blob_path(self, content_hash: str, codec: str) -> str:
+        """Fan blobs out over 256 directories: ab/abcdef....zst"""
+        return f"{content_hash[:2]}/{content_hash}.{self.EXTENSIONS[codec]}"
+
+    def compress(self, body: bytes, codec: str) -> bytes:
+        if codec == 'zstd':
+            return zstandard.ZstdCompressor(level=self.level).compress(body)
+        return zlib.compress(body, 9)
+
+    def decompress(self, data: bytes, codec: str) -> bytes:
+        if codec == 'zstd':
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd archive blobs")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def get_archive_stats(self) -> Dict:
+        """Get archive statistics for this process"""
+        stats = dict(self.archive_stats)
+        if stats['bytes_stored']:
+            stats['compression_ratio'] = round(stats['bytes_in'] / stats['bytes_stored'], 2)
+        return stats
+
+
+# Global page archive instance
+page_archive = PageArchive()
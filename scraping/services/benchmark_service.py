@@ -0,0 +1,299 @@
+"""
+Express Deals - Scraping Benchmark Suite
+Runs the scrapers end-to-end against the local fixture server and
+records throughput, query counts and memory per commit
+"""
+
+import asyncio
+import json
+import logging
+import os
+import resource
+import subprocess
+import tempfile
+import time
+import types
+from contextlib import ExitStack, contextmanager
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+
+from ..models import ScrapeTarget, ScrapedProduct
+from .fixture_server import FixtureServer, FixtureServerConfig, FixtureStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BenchmarkResult:
+    """Metrics for one benchmark scenario"""
+    scenario: str
+    pages_fetched: int = 0
+    products_saved: int = 0
+    elapsed_seconds: float = 0.0
+    db_queries: int = 0
+    peak_rss_mb: float = 0.0
+    requests: int = 0
+    errors: Dict = field(default_factory=dict)
+    error: str = ""
+    commit: str = ""
+    recorded_at: str = ""
+    config: Dict = field(default_factory=dict)
+
+    @property
+    def pages_per_second(self) -> float:
+        return round(self.pages_fetched / self.elapsed_seconds, 2) if self.elapsed_seconds else 0.0
+
+    @property
+    def products_per_second(self) -> float:
+        return round(self.products_saved / self.elapsed_seconds, 2) if self.elapsed_seconds else 0.0
+
+    @property
+    def queries_per_product(self) -> Optional[float]:
+        return round(self.db_queries / self.products_saved, 2) if self.products_saved else None
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data.update({
+            'pages_per_second': self.pages_per_second,
+            'products_per_second': self.products_per_second,
+            'queries_per_product': self.queries_per_product,
+        })
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'BenchmarkResult':
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+
+class QueryCounter:
+    """
+    Counts queries on every database connection, including the ones the
+    async pipeline opens in other threads/contexts (CaptureQueriesContext
+    only sees the calling thread's connection).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._wrapped = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def _install(self, conn):
+        if self not in conn.execute_wrappers:
+            conn.execute_wrappers.append(self)
+            self._wrapped.append(conn)
+
+    def _on_connection_created(self, sender, connection, **kwargs):
+        self._install(connection)
+
+    def __enter__(self):
+        for conn in connections.all():
+            self._install(conn)
+        connection_created.connect(self._on_connection_created)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self._on_connection_created)
+        for conn in self._wrapped:
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+        self._wrapped = []
+
+
+@contextmanager
+def offline_scraping():
+    """
+    Point the scrapers at the fixture server only: no politeness sleeps,
+    no proxies. Delays are what the fixture server latency is for.
+    """
+    from django.core.files.storage import FileSystemStorage
+    from .archive_service import page_archive
+    from .fetch_service import fetch_service
+    from ..proxy_manager import proxy_manager
+
+    async def no_delay(*args, **kwargs):
+        return None
+
+    with ExitStack() as stack:
+        # Archive fixture pages as usual, but into a scratch directory
+        archive_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        stack.enter_context(mock.patch.object(page_archive, '_storage', FileSystemStorage(location=archive_dir)))
+        stack.enter_context(mock.patch.object(fetch_service, '_apply_smart_delay', no_delay))
+        stack.enter_context(mock.patch.object(proxy_manager, 'get_proxy', return_value=None))
+        try:
+            from .. import scrapers
+        except ImportError as e:  # selenium / undetected_chromedriver missing
+            logger.info(f"Catalogue scraper unavailable: {e}")
+        else:
+            shim = types.SimpleNamespace(time=time.time, sleep=lambda seconds: None)
+            stack.enter_context(mock.patch.object(scrapers, 'time', shim))
+        yield
+
+
+class ScrapingBenchmark:
+    """End-to-end scraping benchmark against a FixtureServer"""
+
+    SCENARIOS = ('world_class_scraper', 'commercial_pipeline')
+
+    def __init__(self, fixture_dir=None, server_config: Optional[FixtureServerConfig] = None,
+                 pages: int = 10, products_per_page: int = 24):
+        self.fixture_dir = Path(fixture_dir or getattr(
+            settings, 'SCRAPING_BENCHMARK_FIXTURES', settings.BASE_DIR / 'benchmarks' / 'fixtures'
+        ))
+        self.server_config = server_config or FixtureServerConfig(seed=42)
+        self.pages = pages
+        self.products_per_page = products_per_page
+
+    def run(self, scenarios: Optional[List[str]] = None) -> List[BenchmarkResult]:
+        store = FixtureStore(self.fixture_dir)
+        template = self._listing_template(store)
+        results = []
+
+        with offline_scraping():
+            for scenario in scenarios or self.SCENARIOS:
+                with FixtureServer(store, self.server_config) as server:
+                    target = self._create_target(server, template)
+                    runner = getattr(self, f'_run_{scenario}')
+                    results.append(self._measure(scenario, server, lambda: runner(target)))
+        return results
+
+    def _listing_template(self, store: FixtureStore) -> str:
+        """Use the recorded corpus if it has a listing template, else generate one"""
+        template_file = self.fixture_dir / 'listing_template.txt'
+        if store.pages and template_file.exists():
+            return template_file.read_text(encoding='utf-8').strip()
+
+        template = store.generate_synthetic(pages=self.pages, products_per_page=self.products_per_page)
+        template_file.write_text(template, encoding='utf-8')
+        return template
+
+    def _create_target(self, server: FixtureServer, template: str) -> ScrapeTarget:
+        return ScrapeTarget.objects.create(
+            name='Benchmark Fixture Shop',
+            site_type='custom',
+            base_url=server.base_url,
+            search_url_template=server.url(template),
+            max_pages=self.pages,
+            product_selector='.product-card',
+            title_selector='h3',
+            price_selector='.price',
+            image_selector='img',
+            url_selector='a',
+        )
+
+    def _measure(self, scenario: str, server: FixtureServer, run: Callable) -> BenchmarkResult:
+        result = BenchmarkResult(
+            scenario=scenario,
+            commit=self._git_commit(),
+            recorded_at=datetime.now().isoformat(timespec='seconds'),
+            config={
+                'pages': self.pages,
+                'products_per_page': self.products_per_page,
+                'latency': self.server_config.latency,
+                'error_rates': {str(k): v for k, v in self.server_config.error_rates.items()},
+                'throttle_rps': self.server_config.throttle_rps,
+                'database': connection.vendor,
+            }
+        )
+        products_before = ScrapedProduct.objects.count()
+
+        started = time.perf_counter()
+        with QueryCounter() as queries:
+            try:
+                run()
+            except Exception as e:
+                logger.error(f"Benchmark scenario {scenario} failed: {e}")
+                result.error = str(e)
+        result.elapsed_seconds = round(time.perf_counter() - started, 3)
+
+        result.db_queries = queries.count
+        result.products_saved = ScrapedProduct.objects.count() - products_before
+        result.pages_fetched = server.stats['pages_served']
+        result.requests = server.stats['requests']
+        result.errors = {str(status): count for status, count in server.stats['errors'].items()}
+        # ru_maxrss (kilobytes on Linux) is the process's lifetime peak, so it is
+        # only this scenario's when the scenario has a process to itself - the
+        # benchmark_scraping command runs each one in a child process
+        result.peak_rss_mb = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        return result
+
+    def _run_world_class_scraper(self, target: ScrapeTarget):
+        from ..scrapers import WorldClassProductScraper
+        WorldClassProductScraper().scrape_target(target, max_pages=self.pages)
+
+    def _run_commercial_pipeline(self, target: ScrapeTarget):
+        from .commercial_pipeline import CommercialScrapingPipeline
+        from .fetch_service import fetch_service
+
+        async def run_job():
+            try:
+                return await CommercialScrapingPipeline().execute_scraping_job(target, max_pages=self.pages)
+            finally:
+                await fetch_service.cleanup()
+
+        # The pipeline drives the ORM from its event loop; allow it for this harness run
+        with mock.patch.dict(os.environ, {'DJANGO_ALLOW_ASYNC_UNSAFE': 'true'}):
+            asyncio.run(run_job())
+
+    def _git_commit(self) -> str:
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=10
+            ).stdout.strip()
+        except Exception:
+            return ''
+
+
+class BenchmarkHistory:
+    """Append-only JSON lines log of benchmark results, one line per scenario run"""
+
+    COMPARED_METRICS = ('pages_per_second', 'products_per_second', 'queries_per_product', 'peak_rss_mb')
+
+    def __init__(self, path=None):
+        self.path = Path(path or getattr(
+            settings, 'SCRAPING_BENCHMARK_RESULTS', settings.BASE_DIR / 'benchmarks' / 'scraping_results.jsonl'
+        ))
+
+    def load(self) -> List[Dict]:
+        if not self.path.exists():
+            return []
+        with self.path.open(encoding='utf-8') as handle:
+            return [json.loads(line) for line in handle if line.strip()]
+
+    def append(self, results: List[BenchmarkResult]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open('a', encoding='utf-8') as handle:
+            for result in results:
+                handle.write(json.dumps(result.to_dict(), sort_keys=True) + '\n')
+
+    def compare(self, result: BenchmarkResult) -> Dict:
+        """Change against the latest run of the same scenario and config from another commit"""
+        previous = [
+            entry for entry in self.load()
+            if entry['scenario'] == result.scenario
+            and entry.get('config') == result.config
+            and entry.get('commit') != result.commit
+            and not entry.get('error')
+        ]
+        if not previous:
+            return {}
+
+        baseline = previous[-1]
+        current = result.to_dict()
+        changes = {'baseline_commit': baseline.get('commit', '')}
+        for metric in self.COMPARED_METRICS:
+            before, after = baseline.get(metric), current.get(metric)
+            if before and after is not None:
+                changes[metric] = round((after - before) / before * 100, 1)
+        return changes
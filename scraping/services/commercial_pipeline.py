@@ -5,10 +5,15 @@ Orchestrated ETL pipeline using all commercial services
 
 import asyncio
 import logging
+import re
 from typing import List, Dict, Optional
 from datetime import datetime
+from asgiref.sync import sync_to_async
+from bs4 import BeautifulSoup
 from django.utils import timezone
+from express_deals.metrics import retailer_label, stage_timer
 from ..models import ScrapeTarget, ScrapeJob
+from .archive_service import page_archive
 from .fetch_service import fetch_service
 from .extract_service import extractor
 from .transform_service import transformer
@@ -80,8 +85,9 @@ class CommercialScrapingPipeline:
         """Generate URLs to scrape based on target configuration"""
         
         urls = []
+        target_type = getattr(target, 'target_type', '')
         
-        if target.target_type == 'category':
+        if target_type == 'category':
             # Generate category page URLs
             for page in range(1, max_pages + 1):
                 if '?' in target.base_url:
@@ -90,7 +96,7 @@ class CommercialScrapingPipeline:
                     url = f"{target.base_url}?page={page}"
                 urls.append(url)
         
-        elif target.target_type == 'search':
+        elif target_type == 'search':
             # Generate search result URLs
             search_terms = target.search_terms.split(',') if target.search_terms else ['deals']
             
@@ -102,10 +108,15 @@ class CommercialScrapingPipeline:
                         url = f"{target.base_url}?q={term.strip()}&page={page}"
                     urls.append(url)
         
-        elif target.target_type == 'product_list':
+        elif target_type == 'product_list':
             # Direct product list URL
             urls.append(target.base_url)
         
+        elif '{page}' in target.search_url_template and '{query}' not in target.search_url_template:
+            # ScrapeTarget listing template - one URL per page
+            for page in range(1, max_pages + 1):
+                urls.append(target.search_url_template.format(page=page))
+        
         else:
             # Fallback to base URL
             urls.append(target.base_url)
@@ -120,14 +131,7 @@ class CommercialScrapingPipeline:
         transformed_data = []
         total_errors = 0
         
-        # Site configuration
-        site_config = {
-            'site_id': target.id,
-            'base_url': target.base_url,
-            'currency': 'GBP',
-            'target_geo': 'UK',
-            'category_mapping': self._get_site_category_mapping(target.name)
-        }
+        site_config = self.build_site_config(target)
         
         # Process URLs in batches
         batch_size = 5
@@ -136,7 +140,7 @@ class CommercialScrapingPipeline:
             
             # Process batch concurrently
             batch_tasks = [
-                self._process_single_url(url, target, site_config)
+                self._process_single_url(url, target, site_config, job_id)
                 for url in batch_urls
             ]
             
@@ -155,31 +159,39 @@ class CommercialScrapingPipeline:
                     total_errors += result['errors']
         
         # Transform all extracted data
-        for raw_product in extracted_data:
-            try:
-                transform_result = transformer.transform_product_data(raw_product, site_config)
-                
-                if transform_result.success and transform_result.quality_score >= 0.6:
-                    transformed_data.append(transform_result.data)
-                else:
-                    total_errors += 1
-                    logger.warning(f"Transform failed: {transform_result.validation_errors}")
+        with stage_timer('transform', retailer=retailer_label(target.name), job='commercial_pipeline') as timer:
+            for raw_product in extracted_data:
+                try:
+                    transform_result = transformer.transform_product_data(raw_product, site_config)
                     
-            except Exception as e:
-                logger.error(f"Transform error: {e}")
-                total_errors += 1
+                    if transform_result.success and transform_result.quality_score >= 0.6:
+                        transformed_data.append(transform_result.data)
+                        timer.add_items(1)
+                    else:
+                        total_errors += 1
+                        timer.add_items(1, outcome='failure')
+                        logger.warning(f"Transform failed: {transform_result.validation_errors}")
+                        
+                except Exception as e:
+                    logger.error(f"Transform error: {e}")
+                    total_errors += 1
+                    timer.add_items(1, outcome='error')
         
         # Load transformed data
         products_loaded = 0
         if transformed_data:
-            try:
-                load_result = await loader.bulk_load_products(transformed_data, job_id)
-                products_loaded = load_result.get('loaded', 0)
-                total_errors += load_result.get('failed', 0)
-                
-            except Exception as e:
-                logger.error(f"Load error: {e}")
-                total_errors += len(transformed_data)
+            with stage_timer('load', retailer=retailer_label(target.name), job='commercial_pipeline') as timer:
+                try:
+                    load_result = await loader.bulk_load_products(transformed_data, job_id)
+                    products_loaded = load_result.get('loaded', 0)
+                    total_errors += load_result.get('failed', 0)
+                    timer.add_items(products_loaded)
+                    timer.add_items(load_result.get('failed', 0), outcome='failure')
+                    
+                except Exception as e:
+                    logger.error(f"Load error: {e}")
+                    total_errors += len(transformed_data)
+                    timer.outcome = 'error'
         
         return {
             'success': products_loaded > 0,
@@ -189,7 +201,18 @@ class CommercialScrapingPipeline:
             'total_errors': total_errors
         }
     
-    async def _process_single_url(self, url: str, target: ScrapeTarget, site_config: Dict) -> Dict:
+    def build_site_config(self, target: ScrapeTarget) -> Dict:
+        """Site configuration shared by the transform stage"""
+        return {
+            'site_id': target.id,
+            'base_url': target.base_url,
+            'currency': 'GBP',
+            'target_geo': 'UK',
+            'category_mapping': self._get_site_category_mapping(target.name)
+        }
+    
+    async def _process_single_url(self, url: str, target: ScrapeTarget, site_config: Dict,
+                                  job_id: Optional[int] = None) -> Dict:
         """Process a single URL through the pipeline"""
         
         try:
@@ -198,33 +221,19 @@ class CommercialScrapingPipeline:
                 'base_delay': 3.0,
                 'anti_bot_level': 'medium',
                 'target_geo': 'UK'
-            })
+            }, retailer=target.name)
             
             if not fetch_result.success:
                 return {'errors': 1, 'extracted_products': []}
             
-            # EXTRACT: Parse product data
-            extract_result = extractor.extract_product_data(
-                fetch_result.content, 
-                str(target.id), 
-                url
-            )
+            # ARCHIVE: Keep the raw page for offline re-extraction
+            await sync_to_async(page_archive.store)(url, fetch_result.content, job_id)
             
-            if not extract_result.success:
+            # EXTRACT: Parse product data
+            products = self.extract_page_products(fetch_result.content, str(target.id), url, retailer=target.name)
+            if products is None:
                 return {'errors': 1, 'extracted_products': []}
             
-            # Find multiple products on the page
-            products = self._find_multiple_products(fetch_result.content, url)
-            
-            # Add extraction metadata
-            for product in products:
-                product.update({
-                    'source_url': url,
-                    'scraped_at': datetime.now().isoformat(),
-                    'extraction_confidence': extract_result.confidence,
-                    'extraction_method': extract_result.method_used
-                })
-            
             return {
                 'errors': 0,
                 'extracted_products': products
@@ -234,10 +243,35 @@ class CommercialScrapingPipeline:
             logger.error(f"URL processing failed for {url}: {e}")
             return {'errors': 1, 'extracted_products': []}
     
+    def extract_page_products(self, html: str, site_id: str, url: str, retailer: str = '',
+                              job: str = 'commercial_pipeline') -> Optional[List[Dict]]:
+        """Extract stage for one page - shared by live scraping and archive replay"""
+        
+        with stage_timer('extract', retailer=retailer_label(retailer or site_id), job=job) as timer:
+            extract_result = extractor.extract_product_data(html, site_id, url)
+            
+            if not extract_result.success:
+                timer.outcome = 'failure'
+                return None
+            
+            # Find multiple products on the page
+            products = self._find_multiple_products(html, url)
+            timer.add_items(len(products))
+        
+        # Add extraction metadata
+        for product in products:
+            product.update({
+                'source_url': url,
+                'scraped_at': datetime.now().isoformat(),
+                'extraction_confidence': extract_result.confidence,
+                'extraction_method': extract_result.method_used
+            })
+        
+        return products
+    
     def _find_multiple_products(self, html: str, url: str) -> List[Dict]:
         """Find multiple products on a page (for category/search pages)"""
         
-        from bs4 import BeautifulSoup
         soup = BeautifulSoup(html, 'html.parser')
         products = []
         
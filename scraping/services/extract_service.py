@@ -13,12 +13,16 @@ from sklearn.model_selection import train_test_split
 from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 import logging
-from django.core.cache import cache
+from express_deals.cache import CacheNamespace
 from django.conf import settings
 import numpy as np
+from .structured_data import structured_data_extractor
 
 logger = logging.getLogger(__name__)
 
+structure_cache = CacheNamespace('html_structure')
+selector_cache = CacheNamespace('selectors')
+
 
 @dataclass 
 class ExtractionResult:
@@ -68,6 +72,11 @@ class SelfHealingExtractor:
         """Extract using ML-predicted selectors with fallbacks"""
         
         try:
+            # 0. Structured data (JSON-LD, microdata, OpenGraph) - skips DOM and ML work
+            structured_result = self._structured_data_extraction(html)
+            if structured_result:
+                return structured_result
+            
             # 1. Check for significant layout changes
             if self._layout_changed_significantly(html, site_id):
                 logger.warning(f"Layout change detected for {site_id}")
@@ -96,10 +105,26 @@ class SelfHealingExtractor:
                 error=str(e)
             )
     
+    def _structured_data_extraction(self, html: str) -> Optional[ExtractionResult]:
+        """Use embedded schema.org / OpenGraph product data when present"""
+        structured = structured_data_extractor.extract(html)
+        if not structured.success:
+            return None
+        
+        data = dict(structured.data)
+        data['price'] = float(data['price'])
+        return ExtractionResult(
+            success=True,
+            data=data,
+            confidence=0.95,
+            method_used=structured.method_used,
+            fallback_used=False
+        )
+    
     def _layout_changed_significantly(self, html: str, site_id: str) -> bool:
         """Detect layout changes using HTML diff analysis"""
         
-        cached_html = cache.get(f'html_structure_{site_id}')
+        cached_html = structure_cache.get(site_id)
         if not cached_html:
             # First time seeing this site - cache structure
             self._cache_html_structure(html, site_id)
@@ -133,11 +158,11 @@ class SelfHealingExtractor:
     
     def _cache_html_structure(self, html: str, site_id: str):
         """Cache HTML structure for diff detection"""
-        cache.set(f'html_structure_{site_id}', html[:10000], timeout=86400)  # 24 hours
+        structure_cache.set(site_id, html[:10000], timeout=86400)  # 24 hours
     
     def _try_cached_selectors(self, html: str, site_id: str) -> Optional[ExtractionResult]:
         """Try previously successful selectors"""
-        cached_selectors = cache.get(f'selectors_{site_id}')
+        cached_selectors = selector_cache.get(site_id)
         if not cached_selectors:
             return None
         
@@ -271,7 +296,7 @@ class SelfHealingExtractor:
                 has_price_pattern=any(pattern.search(text) for pattern in self.price_patterns),
                 position_in_dom=len(list(elem.parents)),
                 parent_tag=elem.parent.name if elem.parent else '',
-                sibling_count=len(elem.find_siblings())
+                sibling_count=len(elem.find_previous_siblings()) + len(elem.find_next_siblings())
             )
             
             candidates.append((elem, features))
@@ -360,7 +385,7 @@ class SelfHealingExtractor:
         if result.success and not result.fallback_used:
             # This would need to be implemented based on how selectors are determined
             # For now, we'll cache the fact that ML worked
-            cache.set(f'ml_success_{site_id}', True, timeout=3600)
+            selector_cache.set(f'ml_success:{site_id}', True, timeout=3600)
     
     def _trigger_layout_alert(self, site_id: str):
         """Trigger alert for layout changes"""
@@ -13,13 +13,17 @@ from typing import List, Dict, Optional, Tuple
 from urllib.parse import urlparse
 import logging
 from django.conf import settings
-from django.core.cache import cache
+from express_deals.cache import CacheNamespace
 import cloudscraper
 from fake_useragent import UserAgent
+from express_deals.metrics import retailer_label, stage_timer
 from ..proxy_manager import proxy_manager
 
 logger = logging.getLogger(__name__)
 
+# Every worker must see the same counts, so these skip the in-process tier
+request_counters = CacheNamespace('recent_requests', alias='default')
+
 
 @dataclass
 class SiteConfig:
@@ -75,7 +79,8 @@ class CommercialFetchService:
             # Add more as needed
         }
     
-    async def fetch_with_intelligence(self, url: str, custom_config: Optional[Dict] = None) -> RequestResult:
+    async def fetch_with_intelligence(self, url: str, custom_config: Optional[Dict] = None,
+                                      retailer: str = '') -> RequestResult:
         """Intelligent fetching with all anti-detection measures"""
         start_time = time.time()
         domain = urlparse(url).netloc
@@ -87,11 +92,15 @@ class CommercialFetchService:
             # Apply pre-request delays
             await self._apply_smart_delay(domain, site_config)
             
-            # Choose optimal session
-            session = await self._get_optimal_session(domain, site_config)
-            
-            # Execute request with protection
-            result = await self._protected_request(session, url, site_config)
+            with stage_timer('fetch', retailer=retailer_label(retailer), job='commercial_pipeline') as timer:
+                # Choose optimal session
+                session = await self._get_optimal_session(domain, site_config)
+                
+                # Execute request with protection
+                result = await self._protected_request(session, url, site_config)
+                timer.set_label(proxy_tier=result.proxy_used and 'proxy')
+                timer.outcome = 'success' if result.success else 'failure'
+                timer.add_items(1, outcome=timer.outcome)
             
             # Update statistics
             self._update_stats(result.success)
@@ -122,7 +131,7 @@ class CommercialFetchService:
     async def _apply_smart_delay(self, domain: str, config: SiteConfig):
         """Apply intelligent delay based on domain and recent activity"""
         # Check recent requests to this domain
-        recent_requests = cache.get(f'recent_requests_{domain}', 0)
+        recent_requests = request_counters.get(domain, 0)
         
         # Calculate delay based on recent activity
         base_delay = config.base_delay
@@ -141,7 +150,7 @@ class CommercialFetchService:
         await asyncio.sleep(delay)
         
         # Update request counter
-        cache.set(f'recent_requests_{domain}', recent_requests + 1, timeout=300)
+        request_counters.incr(domain, timeout=300)
     
     async def _get_optimal_session(self, domain: str, config: SiteConfig) -> aiohttp.ClientSession:
         """Get optimal session for domain"""
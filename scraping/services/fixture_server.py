@@ -0,0 +1,259 @@
+"""
+Express Deals - Record/Replay Fixture Server
+Serves captured retailer pages locally with configurable latency,
+error injection and throttling so scraping can be measured offline
+"""
+
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from .archive_service import page_archive
+
+logger = logging.getLogger(__name__)
+
+
+class FixtureStore:
+    """
+    Directory of captured pages plus a manifest.json index.
+    Pages are keyed by "/<host><path>?<query>" so several retailers
+    can share one server.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.pages = {}
+        manifest = self.directory / self.MANIFEST
+        if manifest.exists():
+            self.pages = json.loads(manifest.read_text(encoding='utf-8')).get('pages', {})
+
+    @staticmethod
+    def key_for(url: str) -> str:
+        parts = urlsplit(url)
+        key = f"/{parts.netloc}{parts.path or '/'}"
+        return f"{key}?{parts.query}" if parts.query else key
+
+    def add(self, url: str, body: bytes, status: int = 200,
+            content_type: str = 'text/html; charset=utf-8') -> str:
+        """Store one page body and return its key"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        filename = f"{hashlib.sha1(body).hexdigest()}.html"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / filename).write_bytes(body)
+
+        key = self.key_for(url)
+        self.pages[key] = {'file': filename, 'status': status, 'content_type': content_type}
+        return key
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Look up a page by exact key, falling back to the path without a query"""
+        entry = self.pages.get(key) or self.pages.get(key.split('?', 1)[0])
+        if not entry:
+            return None
+        return dict(entry, body=(self.directory / entry['file']).read_bytes())
+
+    def save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / self.MANIFEST).write_text(
+            json.dumps({'pages': self.pages}, indent=2, sort_keys=True), encoding='utf-8'
+        )
+
+    # ===== Recording =====
+
+    def record_url(self, url: str, timeout: int = 30) -> Optional[str]:
+        """Capture a live page"""
+        try:
+            response = requests.get(url, timeout=timeout, headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            })
+        except requests.RequestException as e:
+            logger.warning(f"Failed to record {url}: {e}")
+            return None
+        return self.add(
+            url, response.content, response.status_code,
+            response.headers.get('Content-Type', 'text/html; charset=utf-8')
+        )
+
+    def record_from_archive(self, raw_pages) -> int:
+        """Capture pages from the raw page archive (no network needed)"""
+        recorded = 0
+        for raw_page in raw_pages:
+            try:
+                self.add(raw_page.url, page_archive.load(raw_page))
+                recorded += 1
+            except Exception as e:
+                logger.warning(f"Failed to record archived page {raw_page.id}: {e}")
+        return recorded
+
+    def generate_synthetic(self, host: str = 'shop.fixture', pages: int = 10,
+                           products_per_page: int = 24, padding_kb: int = 64) -> str:
+        """
+        Build a retailer-like listing corpus when no captures are available.
+        Returns the search URL template (with a {page} placeholder) relative to the server.
+        """
+        rng = random.Random(pages * 1000 + products_per_page)
+        padding = '<p class="seo-copy">' + 'Great deals on home and tech. ' * 32 + '</p>'
+        padding_blocks = max(1, (padding_kb * 1024) // len(padding))
+
+        for page in range(1, pages + 1):
+            cards = []
+            for index in range(products_per_page):
+                product_id = (page - 1) * products_per_page + index + 1
+                price = rng.randint(5, 400) + 0.99
+                cards.append(
+                    f'<div class="product-card" data-product-id="{product_id}">'
+                    f'<a href="/{host}/product/{product_id}"><h3 class="title">Fixture Product {product_id} '
+                    f'{rng.choice(["Kettle", "Air Fryer", "Headphones", "Blender", "Vacuum"])}</h3></a>'
+                    f'<img src="/{host}/images/{product_id}.jpg" alt="">'
+                    f'<span class="price">&pound;{price:.2f}</span>'
+                    f'<span class="was-price">&pound;{price * 1.25:.2f}</span>'
+                    f'</div>'
+                )
+            body = (
+                f'<html><head><title>Deals page {page}</title></head><body>'
+                f'<div class="results">{"".join(cards)}</div>{padding * padding_blocks}</body></html>'
+            )
+            self.add(f'http://{host}/deals?page={page}', body)
+
+        self.save()
+        return f'/{host}/deals?page={{page}}'
+
+
+@dataclass
+class FixtureServerConfig:
+    """Network conditions the fixture server simulates"""
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rates: Dict[int, float] = field(default_factory=dict)
+    throttle_rps: Optional[float] = None
+    seed: Optional[int] = None
+
+
+class FixtureServer:
+    """Threaded HTTP server replaying a FixtureStore"""
+
+    def __init__(self, store: FixtureStore, config: Optional[FixtureServerConfig] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.store = store
+        self.config = config or FixtureServerConfig()
+        self.random = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'pages_served': 0, 'bytes_served': 0, 'not_found': 0, 'errors': {}}
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}{key}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _choose_response(self) -> Optional[int]:
+        """Pick an injected status (throttling first, then random errors) or None to serve the page"""
+        with self.lock:
+            self.stats['requests'] += 1
+
+            if self.config.throttle_rps:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start, self._window_requests = now, 0
+                self._window_requests += 1
+                if self._window_requests > self.config.throttle_rps:
+                    return 429
+
+            roll = self.random.random()
+            for status, rate in sorted(self.config.error_rates.items()):
+                if roll < rate:
+                    return status
+                roll -= rate
+        return None
+
+    def _delay(self) -> float:
+        with self.lock:
+            jitter = self.random.uniform(-self.config.jitter, self.config.jitter) if self.config.jitter else 0.0
+        return max(self.config.latency + jitter, 0.0)
+
+    def _record(self, status: int, size: int = 0):
+        with self.lock:
+            if status == 200:
+                self.stats['pages_served'] += 1
+                self.stats['bytes_served'] += size
+            elif status == 404:
+                self.stats['not_found'] += 1
+            else:
+                self.stats['errors'][status] = self.stats['errors'].get(status, 0) + 1
+
+    def _make_handler(self):
+        server = self
+
+        class FixtureRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                delay = server._delay()
+                if delay:
+                    time.sleep(delay)
+
+                injected = server._choose_response()
+                if injected:
+                    server._record(injected)
+                    self._send(injected, b'', 'text/plain', retry_after=1 if injected in (429, 503) else None)
+                    return
+
+                page = server.store.get(self.path)
+                if page is None:
+                    server._record(404)
+                    self._send(404, b'Not found', 'text/plain')
+                    return
+
+                server._record(page['status'], len(page['body']))
+                self._send(page['status'], page['body'], page['content_type'])
+
+            def _send(self, status, body, content_type, retry_after=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if retry_after:
+                    self.send_header('Retry-After', str(retry_after))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Fixture server: {format % args}")
+
+        return FixtureRequestHandler
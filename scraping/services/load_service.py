@@ -3,17 +3,30 @@ Express Deals - Load Service
 High-performance bulk loading with multiple storage backends
 """
 
-import asyncio
+import hashlib
 import logging
+import random
 from typing import List, Dict, Optional
 from datetime import datetime
+from asgiref.sync import sync_to_async
 from django.db import transaction
-from django.core.cache import cache
+from django.utils.text import slugify
+from express_deals.cache import CacheNamespace
 from products.models import Product, Category
+from products.price_history import is_in_stock, price_history
 from scraping.models import ScrapedProduct, ScrapeJob
 
 logger = logging.getLogger(__name__)
 
+category_cache = CacheNamespace('categories')
+
+# Transformed availability -> Product.stock_status ('unknown' counts as in stock)
+STOCK_STATUSES = {
+    'in_stock': 'in_stock',
+    'limited_stock': 'low_stock',
+    'out_of_stock': 'out_of_stock',
+}
+
 
 class HighPerformanceLoader:
     """Optimized bulk loading with error handling and validation"""
@@ -24,6 +37,10 @@ class HighPerformanceLoader:
         self.load_stats = {'loaded': 0, 'failed': 0, 'duplicates': 0}
     
     async def bulk_load_products(self, products_data: List[Dict], job_id: int) -> Dict:
+        """Bulk load validated product data from async code (the ORM work runs in a sync thread)"""
+        return await sync_to_async(self.load_products)(products_data, job_id)
+    
+    def load_products(self, products_data: List[Dict], job_id: int) -> Dict:
         """Bulk load validated product data"""
         
         try:
@@ -35,14 +52,14 @@ class HighPerformanceLoader:
             total_failed = 0
             
             for category_name, products in categorized_data.items():
-                batch_result = await self._load_category_batch(
+                batch_result = self._load_category_batch(
                     products, category_name, job_id
                 )
                 total_loaded += batch_result['loaded']
                 total_failed += batch_result['failed']
             
             # Update job statistics
-            await self._update_job_stats(job_id, total_loaded, total_failed)
+            self._update_job_stats(job_id, total_loaded, total_failed)
             
             return {
                 'success': True,
@@ -73,7 +90,7 @@ class HighPerformanceLoader:
         
         return categorized
     
-    async def _load_category_batch(self, products: List[Dict], category_name: str, job_id: int) -> Dict:
+    def _load_category_batch(self, products: List[Dict], category_name: str, job_id: int) -> Dict:
         """Load a batch of products for a specific category"""
         
         loaded_count = 0
@@ -81,13 +98,13 @@ class HighPerformanceLoader:
         
         try:
             # Get or create category
-            category, created = await self._get_or_create_category(category_name)
+            category, created = self._get_or_create_category(category_name)
             
             # Process products in smaller batches
             for i in range(0, len(products), self.batch_size):
                 batch = products[i:i + self.batch_size]
                 
-                batch_result = await self._process_product_batch(
+                batch_result = self._process_product_batch(
                     batch, category, job_id
                 )
                 
@@ -100,10 +117,9 @@ class HighPerformanceLoader:
         
         return {'loaded': loaded_count, 'failed': failed_count}
     
-    async def _get_or_create_category(self, category_name: str) -> tuple:
+    def _get_or_create_category(self, category_name: str) -> tuple:
         """Get or create category with caching"""
-        cache_key = f'category_{category_name}'
-        cached_category = cache.get(cache_key)
+        cached_category = category_cache.get(category_name)
         
         if cached_category:
             return cached_category, False
@@ -111,11 +127,14 @@ class HighPerformanceLoader:
         try:
             category, created = Category.objects.get_or_create(
                 name=category_name,
-                defaults={'description': f'Products in {category_name} category'}
+                defaults={
+                    'slug': slugify(category_name),
+                    'description': f'Products in {category_name} category'
+                }
             )
             
             # Cache for 1 hour
-            cache.set(cache_key, category, timeout=3600)
+            category_cache.set(category_name, category, timeout=3600)
             
             return category, created
             
@@ -124,22 +143,23 @@ class HighPerformanceLoader:
             # Fallback to default category
             default_category, _ = Category.objects.get_or_create(
                 name='Other',
-                defaults={'description': 'Miscellaneous products'}
+                defaults={'slug': 'other', 'description': 'Miscellaneous products'}
             )
             return default_category, False
     
-    async def _process_product_batch(self, batch: List[Dict], category, job_id: int) -> Dict:
+    def _process_product_batch(self, batch: List[Dict], category, job_id: int) -> Dict:
         """Process a batch of products with transaction safety"""
         
         loaded_count = 0
         failed_count = 0
         
         try:
-            with transaction.atomic():
+            # Price changes in the batch go in with one bulk insert at the end
+            with price_history.batch(), transaction.atomic():
                 for product_data in batch:
                     try:
                         # Create or update product
-                        success = await self._create_or_update_product(
+                        success = self._create_or_update_product(
                             product_data, category, job_id
                         )
                         
@@ -158,63 +178,52 @@ class HighPerformanceLoader:
         
         return {'loaded': loaded_count, 'failed': failed_count}
     
-    async def _create_or_update_product(self, data: Dict, category, job_id: int) -> bool:
+    def _create_or_update_product(self, data: Dict, category, job_id: int) -> bool:
         """Create or update individual product"""
         
         try:
             # Extract required fields
-            title = data.get('title', '').strip()
+            title = data.get('title', '').strip()[:200]
             price = data.get('price')
-            source_url = data.get('source_url', '')
             
-            if not title or not price or not source_url:
+            if not title or not price:
                 logger.warning(f"Missing required fields: {data}")
                 return False
             
-            # Check for existing product by URL or title
-            existing_product = None
-            try:
-                existing_product = Product.objects.filter(
-                    source_url=source_url
-                ).first()
+            # Each product gets its own savepoint so one bad row doesn't poison the batch
+            with transaction.atomic():
+                # Same lookup as the catalogue importer: one product per name
+                product = Product.objects.filter(name=title).first()
                 
-                if not existing_product:
-                    # Try to find by similar title
-                    existing_product = Product.objects.filter(
-                        title__iexact=title,
-                        category=category
-                    ).first()
-                    
-            except Exception as e:
-                logger.debug(f"Error checking existing product: {e}")
-            
-            # Prepare product data
-            product_data = {
-                'title': title,
-                'description': data.get('description', '')[:1000],  # Limit description
-                'price': float(price),
-                'category': category,
-                'availability': data.get('availability', 'unknown'),
-                'brand': data.get('brand', ''),
-                'source_url': source_url,
-                'image_url': self._get_primary_image(data.get('images', [])),
-                'is_active': True,
-                'updated_at': datetime.now()
-            }
-            
-            if existing_product:
-                # Update existing product
-                for field, value in product_data.items():
-                    if field != 'category':  # Don't overwrite category
-                        setattr(existing_product, field, value)
-                existing_product.save()
-                product = existing_product
-            else:
-                # Create new product
-                product = Product.objects.create(**product_data)
-            
-            # Create scraped product record
-            await self._create_scraped_product_record(data, product, job_id)
+                stock_status = self._stock_status(data.get('availability'))
+                if product:
+                    # Update existing product (category stays as curated)
+                    product.price = price
+                    product.original_price = data.get('original_price')
+                    # Keep the quantity checkout reserves against unless it contradicts the retailer
+                    if (stock_status == 'out_of_stock') != (product.stock_quantity == 0):
+                        product.stock_quantity = self._stock_quantity(stock_status)
+                    product.stock_status = stock_status
+                    product.description = data.get('description') or product.description
+                    product.is_active = True
+                    product.save()
+                else:
+                    product = Product.objects.create(
+                        name=title,
+                        slug=self._unique_slug(title),
+                        category=category,
+                        description=data.get('description') or f"{title} from {data.get('brand') or category.name}",
+                        price=price,
+                        original_price=data.get('original_price'),
+                        stock_quantity=self._stock_quantity(stock_status),
+                        stock_status=stock_status,
+                        is_active=True
+                    )
+                
+                price_history.record(product.pk, price, data.get('original_price'), is_in_stock(data.get('availability')))
+                
+                # Create scraped product record
+                self._create_scraped_product_record(data, product, job_id)
             
             return True
             
@@ -222,6 +231,31 @@ class HighPerformanceLoader:
             logger.error(f"Failed to create/update product: {e}")
             return False
     
+    def _unique_slug(self, title: str) -> str:
+        """Slug for a new product, suffixed until it is free"""
+        base_slug = slugify(title)[:190] or 'product'
+        slug = base_slug
+        counter = 1
+        while Product.objects.filter(slug=slug).exists():
+            slug = f"{base_slug}-{counter}"
+            counter += 1
+        return slug
+    
+    def _stock_status(self, availability: Optional[str]) -> str:
+        """Transformed availability to the catalogue's stock status"""
+        return STOCK_STATUSES.get(availability, 'in_stock')
+    
+    def _stock_quantity(self, stock_status: str) -> int:
+        """
+        Retailers don't publish quantities, so (like the catalogue importer)
+        give stocked products an allocation checkout can reserve against
+        """
+        if stock_status == 'out_of_stock':
+            return 0
+        if stock_status == 'low_stock':
+            return random.randint(1, 5)
+        return random.randint(6, 50)
+    
     def _get_primary_image(self, images: List[str]) -> str:
         """Get the primary image URL from list"""
         if not images:
@@ -234,29 +268,36 @@ class HighPerformanceLoader:
         
         return ''
     
-    async def _create_scraped_product_record(self, data: Dict, product, job_id: int):
+    def _create_scraped_product_record(self, data: Dict, product, job_id: int):
         """Create record in scraped products table"""
         
-        try:
-            ScrapedProduct.objects.create(
-                job_id=job_id,
-                product=product,
-                external_id=data.get('external_id', ''),
-                raw_data=data,
-                quality_score=data.get('quality_score', 0.0),
-                scraped_at=data.get('scraped_at', datetime.now())
-            )
-        except Exception as e:
-            logger.warning(f"Failed to create scraped product record: {e}")
+        product_url = data.get('product_url') or data.get('source_url') or ''
+        external_id = data.get('external_id') or hashlib.md5(
+            f"{product_url}|{data.get('title', '')}".encode()
+        ).hexdigest()
+        
+        ScrapedProduct.objects.update_or_create(
+            job_id=job_id,
+            external_id=external_id,
+            defaults={
+                'title': data.get('title', ''),
+                'price': data.get('price'),
+                'original_price': data.get('original_price'),
+                'image_url': self._get_primary_image(data.get('images', [])),
+                'product_url': product_url,
+                'description': data.get('description') or '',
+                'brand': (data.get('brand') or '')[:200],
+                'availability': (data.get('availability') or '')[:100],
+                'is_processed': True,
+                'imported_product': product
+            }
+        )
     
-    async def _update_job_stats(self, job_id: int, loaded: int, failed: int):
+    def _update_job_stats(self, job_id: int, loaded: int, failed: int):
         """Update scrape job statistics"""
         
         try:
-            job = ScrapeJob.objects.get(id=job_id)
-            job.products_imported = loaded
-            job.errors_count = failed
-            job.save()
+            ScrapeJob.objects.filter(id=job_id).update(products_imported=loaded)
         except Exception as e:
             logger.error(f"Failed to update job stats: {e}")
     
@@ -0,0 +1,164 @@
+"""
+Express Deals - Table Partitioning
+On PostgreSQL, ScrapedProduct is range-partitioned on scraped_at: one
+partition per month (or week), created ahead of time by a daily task,
+plus a DEFAULT partition for anything outside them. Queries bounding
+scraped_at only scan the matching partitions, and retention drops whole
+partitions rather than deleting rows. On SQLite the table stays a plain
+table and everything here is a no-op.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+INTERVALS = ('month', 'week')
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: datetime
+    end: datetime
+
+
+class RangePartitions:
+    """Monthly or weekly range partitions of one table, named <table>_pYYYYMMDD_YYYYMMDD"""
+
+    def __init__(self, table: str, column: str):
+        self.table = table
+        self.column = column
+        self.name_pattern = re.compile(rf'^{re.escape(table)}_p(\d{{8}})_(\d{{8}})$')
+        self.stats = {'created': 0, 'dropped': 0}
+
+    @property
+    def interval(self) -> str:
+        interval = getattr(settings, 'SCRAPING_PARTITION_INTERVAL', 'month')
+        if interval not in INTERVALS:
+            raise ValueError(f"SCRAPING_PARTITION_INTERVAL must be one of {INTERVALS}, not {interval!r}")
+        return interval
+
+    @property
+    def ahead(self) -> int:
+        return getattr(settings, 'SCRAPING_PARTITIONS_AHEAD', 3)
+
+    @property
+    def default_partition(self) -> str:
+        return f"{self.table}_default"
+
+    # Ranges
+
+    def bounds(self, moment: datetime) -> tuple:
+        """The (start, end) of the interval containing ``moment``, in UTC"""
+        moment = moment.astimezone(dt_timezone.utc)
+        if self.interval == 'week':
+            start = datetime.combine(moment.date() - timedelta(days=moment.weekday()), datetime.min.time(), dt_timezone.utc)
+            return start, start + timedelta(days=7)
+        start = datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+        end = datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+        return start, end
+
+    def span(self, since: datetime, until: datetime) -> List[Partition]:
+        """Consecutive partitions from the one holding ``since`` up to ``until``"""
+        partitions, start = [], self.bounds(since)[0]
+        while start < until:
+            start, end = self.bounds(start)
+            partitions.append(Partition(self.partition_name(start, end), start, end))
+            start = end
+        return partitions
+
+    def partition_name(self, start: datetime, end: datetime) -> str:
+        return f"{self.table}_p{start:%Y%m%d}_{end:%Y%m%d}"
+
+    def parse(self, name: str) -> Optional[Partition]:
+        match = self.name_pattern.match(name)
+        if match is None:
+            return None
+        start, end = (datetime.strptime(value, '%Y%m%d').replace(tzinfo=dt_timezone.utc) for value in match.groups())
+        return Partition(name, start, end)
+
+    # Catalog
+
+    def is_partitioned(self, using: str = 'default') -> bool:
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [self.table])
+            return cursor.fetchone() is not None
+
+    def partitions(self, using: str = 'default') -> List[Partition]:
+        """The range partitions that exist, oldest first (not the DEFAULT one)"""
+        if not self.is_partitioned(using):
+            return []
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(%s)", [self.table]
+            )
+            found = [self.parse(name) for name, in cursor.fetchall()]
+        return sorted((partition for partition in found if partition), key=lambda partition: partition.start)
+
+    # Maintenance
+
+    def ensure(self, now: Optional[datetime] = None, since: Optional[datetime] = None, using: str = 'default') -> List[str]:
+        """
+        Create any missing partitions from ``since`` (default: now) to
+        SCRAPING_PARTITIONS_AHEAD intervals past now; returns the new names
+        """
+        if not self.is_partitioned(using):
+            return []
+        now = now or timezone.now()
+        until = self.bounds(now)[1]
+        for _ in range(self.ahead):
+            until = self.bounds(until)[1]
+        existing = self.partitions(using)
+        quote = connections[using].ops.quote_name
+
+        created = []
+        with connections[using].cursor() as cursor:
+            for partition in self.span(since or now, until):
+                if any(partition.start < other.end and other.start < partition.end for other in existing):
+                    continue  # Already covered, possibly by partitions of the other interval
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(partition.name)} PARTITION OF {quote(self.table)} "
+                    f"FOR VALUES FROM ('{partition.start.isoformat()}') TO ('{partition.end.isoformat()}')"
+                )
+                created.append(partition.name)
+        if created:
+            logger.info(f"Created {self.table} partitions: {', '.join(created)}")
+        self.stats['created'] += len(created)
+        return created
+
+    def expired(self, cutoff: datetime, using: str = 'default') -> List[Partition]:
+        """Partitions holding nothing newer than ``cutoff``"""
+        return [partition for partition in self.partitions(using) if partition.end <= cutoff]
+
+    def drop(self, partition: Partition, using: str = 'default') -> int:
+        """Detach and drop one partition; returns the planner's row estimate for it"""
+        quote = connections[using].ops.quote_name
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)", [partition.name])
+            row = cursor.fetchone()
+            cursor.execute(f"ALTER TABLE {quote(self.table)} DETACH PARTITION {quote(partition.name)}")
+            cursor.execute(f"DROP TABLE {quote(partition.name)}")
+        logger.info(f"Dropped partition {partition.name}")
+        self.stats['dropped'] += 1
+        return max(int(row[0]), 0) if row else 0
+
+    def get_stats(self) -> Dict:
+        """Partitions created and dropped by this process"""
+        return dict(self.stats)
+
+
+# Global partition managers, by model label
+scraped_product_partitions = RangePartitions('scraping_scrapedproduct', 'scraped_at')
+partitioned_tables = {'scraping.ScrapedProduct': scraped_product_partitions}
@@ -0,0 +1,176 @@
+"""
+Express Deals - Archive Replay Service
+Re-runs archived raw pages through the current extract/transform/load
+stages without touching the network
+"""
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+from django.db import connections
+from django.utils import timezone
+from express_deals.metrics import retailer_label, stage_timer
+from ..models import ScrapeJob
+from .archive_service import page_archive
+from .commercial_pipeline import commercial_pipeline
+from .transform_service import transformer
+from .load_service import loader
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplayResult:
+    """Summary of one archive replay run"""
+    pages_replayed: int = 0
+    pages_failed: int = 0
+    products_extracted: int = 0
+    products_transformed: int = 0
+    products_loaded: int = 0
+    bytes_replayed: int = 0
+    elapsed_seconds: float = 0.0
+    jobs_created: List[int] = field(default_factory=list)
+
+    @property
+    def pages_per_second(self) -> float:
+        if not self.elapsed_seconds:
+            return 0.0
+        return round(self.pages_replayed / self.elapsed_seconds, 2)
+
+
+def replay_page(task: Dict) -> Dict:
+    """
+    Extract and transform one archived page. Runs in a worker process and
+    never writes models; the extractor's selector and structure caches may
+    still reach the database through the cache backend.
+    """
+    result = {'raw_page_id': task['raw_page_id'], 'products': [], 'extracted': 0, 'error': ''}
+    try:
+        body = page_archive.read_blob(task['content_hash'], task['codec'])
+        html = body.decode('utf-8', errors='replace')
+        site_config = task['site_config']
+
+        products = commercial_pipeline.extract_page_products(
+            html, str(site_config['site_id']), task['url'], retailer=task['retailer'], job='reextract'
+        )
+        if products is None:
+            result['error'] = 'extraction failed'
+            return result
+
+        result['extracted'] = len(products)
+        with stage_timer('transform', retailer=retailer_label(task['retailer']), job='reextract') as timer:
+            for raw_product in products:
+                transform_result = transformer.transform_product_data(raw_product, site_config)
+                if transform_result.success and transform_result.quality_score >= 0.6:
+                    result['products'].append(transform_result.data)
+                    timer.add_items(1)
+                else:
+                    timer.add_items(1, outcome='failure')
+        result['bytes'] = len(body)
+
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+class ArchiveReplayer:
+    """Fans archived pages out over a process pool and loads the results per source job"""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers
+
+    def replay(self, raw_pages, load: bool = True) -> ReplayResult:
+        """Replay the given RawPage queryset; returns a ReplayResult"""
+        result = ReplayResult()
+        started = time.monotonic()
+
+        tasks = self._build_tasks(raw_pages)
+        if not tasks:
+            return result
+        source_jobs = {task['raw_page_id']: task['job_id'] for task in tasks}
+
+        # Forked workers must not inherit open database connections
+        connections.close_all()
+
+        products_by_job = {}
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for page_result in pool.map(replay_page, tasks, chunksize=self._chunksize(len(tasks))):
+                if page_result['error']:
+                    result.pages_failed += 1
+                    logger.warning(f"Replay of raw page {page_result['raw_page_id']} failed: {page_result['error']}")
+                    continue
+
+                result.pages_replayed += 1
+                result.bytes_replayed += page_result.get('bytes', 0)
+                result.products_extracted += page_result['extracted']
+                result.products_transformed += len(page_result['products'])
+                job_id = source_jobs[page_result['raw_page_id']]
+                products_by_job.setdefault(job_id, []).extend(page_result['products'])
+
+        if load:
+            for source_job_id, products in products_by_job.items():
+                if not products:
+                    continue
+                if source_job_id is None:
+                    logger.warning(f"Skipping load of {len(products)} products from pages without a scrape job")
+                    continue
+                replay_job = self._create_replay_job(source_job_id)
+                with stage_timer('load', retailer=retailer_label(replay_job.target.name), job='reextract') as timer:
+                    load_result = loader.load_products(products, replay_job.id)
+                    timer.add_items(load_result.get('loaded', 0))
+                result.products_loaded += load_result.get('loaded', 0)
+                result.jobs_created.append(replay_job.id)
+                self._complete_replay_job(replay_job, load_result)
+
+        result.elapsed_seconds = time.monotonic() - started
+        return result
+
+    def _build_tasks(self, raw_pages) -> List[Dict]:
+        """Plain-dict tasks so workers never query models"""
+        site_configs = {}
+        tasks = []
+        for page in raw_pages.select_related('job__target'):
+            target = page.job.target if page.job else None
+            key = target.id if target else urlparse(page.url).netloc
+            if key not in site_configs:
+                site_configs[key] = commercial_pipeline.build_site_config(target) if target else {
+                    'site_id': key,
+                    'base_url': f"{urlparse(page.url).scheme}://{key}",
+                    'currency': 'GBP',
+                    'target_geo': 'UK',
+                    'category_mapping': {}
+                }
+            tasks.append({
+                'raw_page_id': page.id,
+                'job_id': page.job_id,
+                'retailer': target.name if target else key,
+                'url': page.url,
+                'content_hash': page.content_hash,
+                'codec': page.codec,
+                'site_config': site_configs[key],
+            })
+        return tasks
+
+    def _chunksize(self, task_count: int) -> int:
+        workers = self.workers or 4
+        return max(1, min(32, task_count // (workers * 4)))
+
+    def _create_replay_job(self, source_job_id: int) -> ScrapeJob:
+        source = ScrapeJob.objects.select_related('target').get(id=source_job_id)
+        return ScrapeJob.objects.create(
+            target=source.target,
+            search_query=f"reextract of job #{source.id}",
+            status='running',
+            started_at=timezone.now()
+        )
+
+    def _complete_replay_job(self, job: ScrapeJob, load_result: Dict):
+        job.status = 'completed' if load_result.get('success') else 'failed'
+        job.products_found = load_result.get('total_processed', 0)
+        job.products_imported = load_result.get('loaded', 0)
+        job.error_message = load_result.get('error', '')
+        job.completed_at = timezone.now()
+        job.save()
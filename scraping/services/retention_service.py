@@ -0,0 +1,373 @@
+"""
+Express Deals - Retention Engine
+Prunes old scraping and notification history in bounded primary-key
+ranges. Every batch is a few set-based statements: dependents are
+cleared with DELETE/UPDATE ... WHERE fk IN (batch), then the batch itself
+goes in one raw DELETE - no rows are collected in Python and no
+transaction holds its locks for longer than one batch. Partitions of a
+partitioned table that are wholly expired are dropped instead. Rows can
+be archived to compressed JSON-lines files first, and expired raw pages
+take their archive blobs with them once nothing else references them.
+"""
+
+import json
+import logging
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, models, transaction
+from django.utils import timezone
+
+from .archive_service import page_archive, zstandard
+from .partition_service import partitioned_tables
+
+try:
+    from prometheus_client import Counter, Histogram
+except ImportError:  # prometheus_client not installed - counters stay in-process only
+    Counter = Histogram = None
+
+logger = logging.getLogger(__name__)
+
+if Counter is not None:
+    RETENTION_ROWS = Counter(
+        'express_deals_retention_rows_total',
+        'Rows handled by retention policies, by table and action (deleted, nulled, archived)',
+        ['policy', 'table', 'action']
+    )
+    RETENTION_BATCH_SECONDS = Histogram(
+        'express_deals_retention_batch_seconds',
+        'Time to archive and delete one retention batch',
+        ['policy'],
+        buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    )
+
+ARCHIVE_PREFIX = 'retention'
+ARCHIVE_CHUNK_SIZE = 2000
+ARCHIVE_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+@dataclass
+class RetentionPolicy:
+    """Delete ``model`` rows whose ``date_field`` is older than ``keep_days``"""
+    name: str
+    model: str  # 'app_label.ModelName'
+    date_field: str
+    keep_days: int = 30
+    batch_size: int = 1000
+    archive: bool = False
+    prune_blobs: bool = False  # RawPage rows: delete archive blobs no remaining row references
+    pause: float = 0.0  # Seconds to sleep between batches, to let replicas and writers catch up
+
+    @property
+    def model_class(self):
+        return apps.get_model(self.model)
+
+
+# Children before parents, so a job's products are archived under their own policy first
+DEFAULT_POLICIES = [
+    RetentionPolicy('scraped_products', 'scraping.ScrapedProduct', 'scraped_at', batch_size=2000, archive=True),
+    RetentionPolicy('raw_pages', 'scraping.RawPage', 'fetched_at', keep_days=90, batch_size=2000, prune_blobs=True),
+    RetentionPolicy('scrape_jobs', 'scraping.ScrapeJob', 'completed_at', batch_size=200, archive=True),
+    RetentionPolicy('alert_notifications', 'scraping.AlertNotification', 'sent_at', batch_size=5000),
+]
+
+
+@dataclass
+class RetentionResult:
+    policy: str
+    cutoff: datetime
+    dry_run: bool = False
+    matched: int = 0  # Dry runs only
+    batches: int = 0
+    deleted: int = 0
+    cascaded: Dict[str, int] = field(default_factory=dict)
+    nulled: Dict[str, int] = field(default_factory=dict)
+    archived: int = 0
+    archive_files: List[str] = field(default_factory=list)
+    blobs_deleted: int = 0
+    partitions_dropped: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+class ArchiveWriter:
+    """Streams rows into one compressed JSON-lines file: {"table": ..., "row": {...}} per line"""
+
+    def __init__(self, codec: str, level: int):
+        self.codec = codec
+        self.buffer = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_BYTES)
+        if codec == 'zstd':
+            self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            self.compressor = zlib.compressobj(9)
+        self.rows = 0
+
+    def write(self, queryset) -> int:
+        table, written = queryset.model._meta.db_table, 0
+        for row in queryset.values().iterator(chunk_size=ARCHIVE_CHUNK_SIZE):
+            line = json.dumps({'table': table, 'row': row}, cls=DjangoJSONEncoder) + '\n'
+            self.buffer.write(self.compressor.compress(line.encode('utf-8')))
+            written += 1
+        self.rows += written
+        return written
+
+    def save(self, storage, path: str) -> str:
+        """Flush into ``storage``; returns the name it was stored under"""
+        self.buffer.write(self.compressor.flush())
+        self.buffer.seek(0)
+        try:
+            return storage.save(path, File(self.buffer))
+        finally:
+            self.buffer.close()
+
+
+class RetentionEngine:
+    """Apply retention policies batch by batch"""
+
+    def __init__(self, archive=None):
+        # Archive files share the raw page archive's storage and codec
+        self.archive = archive or page_archive
+        self.stats = {
+            'runs': 0, 'batches': 0, 'rows_deleted': 0, 'rows_nulled': 0, 'rows_archived': 0,
+            'files_written': 0, 'blobs_deleted': 0,
+        }
+
+    def policies(self) -> List[RetentionPolicy]:
+        """The default policies with SCRAPING_RETENTION_POLICIES overrides applied"""
+        overrides = getattr(settings, 'SCRAPING_RETENTION_POLICIES', {})
+        return [replace(policy, **overrides.get(policy.name, {})) for policy in DEFAULT_POLICIES]
+
+    def run(self, names: Optional[List[str]] = None, dry_run: bool = False, archive: Optional[bool] = None,
+            progress: Optional[Callable[[RetentionResult], None]] = None) -> List[RetentionResult]:
+        """Apply every policy (or just ``names``) in order"""
+        policies = self.policies()
+        unknown = set(names or []) - {policy.name for policy in policies}
+        if unknown:
+            raise ValueError(f"Unknown retention policies: {', '.join(sorted(unknown))}")
+        self.stats['runs'] += 1
+        return [
+            self.apply(policy, dry_run=dry_run, archive=archive, progress=progress)
+            for policy in policies if not names or policy.name in names
+        ]
+
+    def apply(self, policy: RetentionPolicy, dry_run: bool = False, archive: Optional[bool] = None,
+              now: Optional[datetime] = None,
+              progress: Optional[Callable[[RetentionResult], None]] = None) -> RetentionResult:
+        """
+        Delete the policy's expired rows, ``batch_size`` primary keys at a time.
+        On a partitioned table, partitions wholly past the cutoff are dropped
+        first. ``archive`` overrides the policy's own setting.
+        """
+        model = policy.model_class
+        cutoff = (now or timezone.now()) - timedelta(days=policy.keep_days)
+        expired = model._base_manager.filter(**{f'{policy.date_field}__lt': cutoff}).order_by('pk')
+        archive = policy.archive if archive is None else archive
+        result = RetentionResult(policy.name, cutoff, dry_run=dry_run)
+        started = time.monotonic()
+
+        if dry_run:
+            result.matched = expired.count()
+            return result
+
+        self._drop_partitions(policy, model, expired, cutoff, archive, result, progress)
+
+        last_pk = None
+        while True:
+            remaining = expired if last_pk is None else expired.filter(pk__gt=last_pk)
+            # Only the upper bound of the range (and whether a row follows it) comes back to Python
+            bounds = list(remaining.values_list('pk', flat=True)[policy.batch_size - 1:policy.batch_size + 1])
+            upper = bounds[0] if bounds else None
+            batch = remaining if upper is None else remaining.filter(pk__lte=upper)
+
+            batch_started = time.monotonic()
+            blobs = set(batch.values_list('content_hash', 'codec')) if policy.prune_blobs else set()
+            with transaction.atomic(using=batch.db):
+                writer = ArchiveWriter(self.archive.codec, self.archive.level) if archive else None
+                self._clear_dependents(model, batch, policy, result, writer)
+                if writer is not None:
+                    writer.write(batch)
+                    result.archived += writer.rows
+                deleted = self._delete(batch)
+                if writer is not None and writer.rows:
+                    result.archive_files.append(
+                        writer.save(self.archive.storage, self._archive_path(policy, cutoff, self._range_name(last_pk, upper)))
+                    )
+                    self.stats['files_written'] += 1
+                    self._count(policy, model, 'archived', writer.rows)
+            if not deleted and upper is None:
+                break  # Nothing (left) to delete
+            if blobs:
+                result.blobs_deleted += self._prune_blobs(model, blobs)
+
+            result.batches += 1
+            result.deleted += deleted
+            self.stats['batches'] += 1
+            self.stats['rows_deleted'] += deleted
+            self._count(policy, model, 'deleted', deleted)
+            if Histogram is not None:
+                RETENTION_BATCH_SECONDS.labels(policy=policy.name).observe(time.monotonic() - batch_started)
+            logger.info(f"Retention {policy.name}: batch {result.batches}, {result.deleted} rows deleted so far")
+            if progress is not None:
+                progress(result)
+
+            if len(bounds) < 2:
+                break  # This batch was short or exactly full - nothing follows it
+            last_pk = upper
+            if policy.pause:
+                time.sleep(policy.pause)
+
+        result.seconds = round(time.monotonic() - started, 3)
+        self.stats['rows_archived'] += result.archived
+        return result
+
+    def read_archive(self, name: str) -> Iterator[Dict]:
+        """Yield the {"table", "row"} records of an archive file"""
+        with self.archive.storage.open(name, 'rb') as archive_file:
+            data = archive_file.read()
+        if name.endswith(f".{self.archive.EXTENSIONS['zstd']}"):
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd retention archives")
+            data = zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        else:
+            data = zlib.decompress(data)
+        for line in data.decode('utf-8').splitlines():
+            yield json.loads(line)
+
+    def get_stats(self) -> Dict:
+        """Retention counters for this process"""
+        return dict(self.stats)
+
+    # Internals
+
+    def _drop_partitions(self, policy: RetentionPolicy, model, expired, cutoff: datetime, archive: bool,
+                         result: RetentionResult, progress: Optional[Callable[[RetentionResult], None]]):
+        """Drop the partitions holding only expired rows - one DROP TABLE each instead of row deletes"""
+        partitions = partitioned_tables.get(policy.model)
+        if partitions is None or partitions.column != policy.date_field or model._meta.related_objects:
+            return  # Not partitioned on the policy's date, or rows elsewhere point at these
+        for partition in partitions.expired(cutoff, using=expired.db):
+            writer = ArchiveWriter(self.archive.codec, self.archive.level) if archive else None
+            if writer is not None:
+                writer.write(expired.filter(**{
+                    f'{policy.date_field}__gte': partition.start, f'{policy.date_field}__lt': partition.end,
+                }))
+                if writer.rows:
+                    result.archive_files.append(
+                        writer.save(self.archive.storage, self._archive_path(policy, cutoff, partition.name))
+                    )
+                    self.stats['files_written'] += 1
+                    self._count(policy, model, 'archived', writer.rows)
+                result.archived += writer.rows
+            estimate = partitions.drop(partition, using=expired.db)
+            deleted = writer.rows if writer is not None else estimate
+
+            result.deleted += deleted
+            result.partitions_dropped.append(partition.name)
+            self.stats['rows_deleted'] += deleted
+            self._count(policy, model, 'deleted', deleted)
+            logger.info(f"Retention {policy.name}: dropped partition {partition.name} (~{deleted} rows)")
+            if progress is not None:
+                progress(result)
+
+    def _clear_dependents(self, model, batch, policy: RetentionPolicy, result: RetentionResult,
+                          writer: Optional[ArchiveWriter]):
+        """Apply each reverse relation's on_delete to the rows pointing at ``batch``, set-wise"""
+        for relation in model._meta.related_objects:
+            if relation.many_to_many:
+                through = relation.through
+                if through._meta.auto_created:
+                    self._delete_through_rows(through, model, batch)
+                continue
+
+            related_model, fk = relation.related_model, relation.field
+            dependents = related_model._base_manager.filter(
+                **{f'{fk.attname}__in': batch.values(fk.target_field.attname)}
+            )
+            on_delete = relation.on_delete
+            if on_delete is models.CASCADE:
+                self._clear_dependents(related_model, dependents, policy, result, writer)
+                if writer is not None:
+                    writer.write(dependents)
+                count = self._delete(dependents)
+                self._tally(result.cascaded, policy, related_model, 'deleted', count)
+            elif on_delete is models.SET_NULL:
+                count = dependents.update(**{fk.name: None})
+                self._tally(result.nulled, policy, related_model, 'nulled', count)
+            elif on_delete is models.SET_DEFAULT:
+                count = dependents.update(**{fk.name: fk.get_default()})
+                self._tally(result.nulled, policy, related_model, 'nulled', count)
+            elif on_delete is not models.DO_NOTHING:
+                raise ValueError(
+                    f"{related_model._meta.label}.{fk.name} uses {on_delete.__name__}, "
+                    f"which retention can't apply set-wise"
+                )
+
+        for m2m in model._meta.many_to_many:
+            if m2m.remote_field.through._meta.auto_created:
+                self._delete_through_rows(m2m.remote_field.through, model, batch)
+
+    def _prune_blobs(self, model, blobs) -> int:
+        """Delete the archive blobs of ``blobs`` (content_hash, codec) that no remaining row references"""
+        referenced = set(model._base_manager.filter(
+            content_hash__in={content_hash for content_hash, _ in blobs}
+        ).values_list('content_hash', flat=True))
+        deleted = 0
+        for content_hash, codec in blobs:
+            if content_hash in referenced:
+                continue
+            try:
+                self.archive.storage.delete(self.archive.blob_path(content_hash, codec))
+                deleted += 1
+            except Exception as e:
+                logger.warning(f"Failed to delete archive blob {content_hash}: {e}")
+        self.stats['blobs_deleted'] += deleted
+        return deleted
+
+    def _delete_through_rows(self, through, model, batch):
+        for fk in through._meta.get_fields():
+            if fk.many_to_one and fk.related_model is model:
+                self._delete(through._base_manager.filter(**{f'{fk.attname}__in': batch.values('pk')}))
+
+    def _delete(self, queryset) -> int:
+        """One raw DELETE ... WHERE pk IN (<queryset>): no collector, no signals, no cascades"""
+        model = queryset.model
+        connection = connections[queryset.db]
+        quote = connection.ops.quote_name
+        sql, params = queryset.order_by().values('pk').query.get_compiler(queryset.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({sql})", params
+            )
+            return cursor.rowcount
+
+    def _tally(self, totals: Dict[str, int], policy: RetentionPolicy, model, action: str, count: int):
+        totals[model._meta.db_table] = totals.get(model._meta.db_table, 0) + count
+        if action == 'nulled':
+            self.stats['rows_nulled'] += count
+        else:
+            self.stats['rows_deleted'] += count
+        self._count(policy, model, action, count)
+
+    def _count(self, policy: RetentionPolicy, model, action: str, count: int):
+        if Counter is not None and count:
+            RETENTION_ROWS.labels(policy=policy.name, table=model._meta.db_table, action=action).inc(count)
+
+    def _range_name(self, after_pk, upper_pk) -> str:
+        first = f"{(after_pk or 0) + 1:010d}"
+        return f"{first}-{upper_pk:010d}" if upper_pk is not None else f"{first}-end"
+
+    def _archive_path(self, policy: RetentionPolicy, cutoff: datetime, stem: str) -> str:
+        """retention/scraped_products/20260919/0000001001-0000003000.jsonl.zst"""
+        extension = self.archive.EXTENSIONS[self.archive.codec]
+        return f"{ARCHIVE_PREFIX}/{policy.name}/{cutoff:%Y%m%d}/{stem}.jsonl.{extension}"
+
+
+# Global retention engine instance
+retention_engine = RetentionEngine()
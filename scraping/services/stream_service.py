@@ -0,0 +1,157 @@
+"""
+Express Deals - Streaming Fetch Service
+Incremental download and parse with early exit for single product pages
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from django.conf import settings
+from lxml import etree
+from .structured_data import structured_data_extractor
+
+try:
+    from lxml.cssselect import CSSSelector
+except ImportError:  # cssselect not installed - JSON-LD early exit only
+    CSSSelector = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamResult:
+    """Result of a streaming page read"""
+    content: bytes = b""
+    stopped_early: bool = False
+    stop_reason: str = ""
+    bytes_read: int = 0
+    content_length: Optional[int] = None
+    structured_data: Dict = field(default_factory=dict)
+
+    @property
+    def bytes_saved(self) -> int:
+        """Bytes of the response body that were never downloaded"""
+        if self.content_length is None or not self.stopped_early:
+            return 0
+        return max(self.content_length - self.bytes_read, 0)
+
+
+class StreamingPageReader:
+    """Reads a streamed response and stops once the product fields are parsed"""
+
+    CHUNK_SIZE = getattr(settings, 'SCRAPING_STREAM_CHUNK_SIZE', 32 * 1024)
+    SELECTOR_KEYS = ('title_selector', 'price_selector', 'availability_selector')
+
+    def __init__(self):
+        self._selector_cache = {}
+
+    def read(self, response, retailer_config: Dict) -> StreamResult:
+        """Consume a ``stream=True`` response, stopping early when possible"""
+        result = StreamResult(content_length=self._get_content_length(response))
+        parser = etree.HTMLPullParser(
+            events=('end',),
+            encoding=self._get_declared_encoding(response)
+        )
+        selectors = self._compile_selectors(retailer_config)
+        chunks = []
+        root = None
+
+        try:
+            for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                if not chunk:
+                    continue
+                chunks.append(chunk)
+                parser.feed(chunk)
+
+                for _, element in parser.read_events():
+                    if root is None:
+                        root = element.getroottree().getroot()
+                    if element.tag == 'script' and not result.structured_data:
+                        result.structured_data = self._parse_json_ld_offer(element)
+
+                if result.structured_data:
+                    result.stopped_early = True
+                    result.stop_reason = 'json_ld_offer'
+                    break
+
+                if root is not None and selectors and self._selectors_complete(root, selectors):
+                    result.stopped_early = True
+                    result.stop_reason = 'selectors'
+                    break
+        finally:
+            result.bytes_read = self._get_bytes_read(response, chunks)
+            response.close()
+
+        result.content = b''.join(chunks)
+        return result
+
+    def _compile_selectors(self, retailer_config: Dict) -> List:
+        """Compile the retailer's CSS selectors to lxml XPath selectors"""
+        if CSSSelector is None:
+            return []
+
+        compiled = []
+        for key in self.SELECTOR_KEYS:
+            css = retailer_config.get(key)
+            if not css:
+                continue
+            if css not in self._selector_cache:
+                try:
+                    self._selector_cache[css] = CSSSelector(css)
+                except Exception as e:
+                    logger.debug(f"Cannot compile selector {css!r} for streaming: {e}")
+                    self._selector_cache[css] = None
+            if self._selector_cache[css] is None:
+                # An untranslatable selector means we can never stop early on selectors
+                return []
+            compiled.append(self._selector_cache[css])
+        return compiled
+
+    def _selectors_complete(self, root, selectors: List) -> bool:
+        """Check that every selector matches an element that has been fully parsed"""
+        for selector in selectors:
+            if not any(self._is_closed(element) for element in selector(root)):
+                return False
+        return True
+
+    def _is_closed(self, element) -> bool:
+        """
+        An element is closed once it or one of its ancestors has a following
+        sibling - anything still open sits on the parser's right-most path.
+        """
+        while element is not None:
+            if element.getnext() is not None:
+                return True
+            element = element.getparent()
+        return False
+
+    def _parse_json_ld_offer(self, script) -> Dict:
+        """Return product fields from a closed JSON-LD script containing an Offer"""
+        if 'ld+json' not in (script.get('type') or ''):
+            return {}
+        return structured_data_extractor.parse_json_ld(script.text)
+
+    def _get_content_length(self, response) -> Optional[int]:
+        """Content-Length of the encoded body, if the server sent one"""
+        try:
+            return int(response.headers.get('Content-Length'))
+        except (TypeError, ValueError):
+            return None
+
+    def _get_bytes_read(self, response, chunks: List[bytes]) -> int:
+        """Encoded bytes pulled off the wire (falls back to decoded size)"""
+        try:
+            return int(response.raw.tell())
+        except Exception:
+            return sum(len(chunk) for chunk in chunks)
+
+    def _get_declared_encoding(self, response) -> Optional[str]:
+        """Only trust an explicit charset - lxml sniffs <meta charset> otherwise"""
+        content_type = response.headers.get('Content-Type', '')
+        if 'charset=' in content_type.lower():
+            return content_type.lower().split('charset=')[-1].split(';')[0].strip() or None
+        return None
+
+
+# Global streaming reader instance
+stream_reader = StreamingPageReader()
@@ -0,0 +1,306 @@
+"""
+Express Deals - Structured Data Extraction
+Fast scan for schema.org Product data (JSON-LD, microdata, OpenGraph)
+before falling back to DOM selectors and the ML classifier
+"""
+
+import html
+import itertools
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StructuredDataResult:
+    """Result of structured data extraction"""
+    success: bool
+    data: Dict = field(default_factory=dict)
+    method_used: str = ""
+
+
+class StructuredDataExtractor:
+    """Pulls product fields out of embedded schema.org / OpenGraph markup"""
+
+    METHODS = ('json_ld', 'microdata', 'opengraph')
+
+    JSON_LD_PATTERN = re.compile(
+        r'<script[^>]+type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+        re.IGNORECASE | re.DOTALL
+    )
+    META_PATTERN = re.compile(r'<meta\s[^>]*>', re.IGNORECASE)
+    PRODUCT_SCOPE_PATTERN = re.compile(
+        r'<\w+\s[^>]*\bitemtype\s*=\s*["\'][^"\']*schema\.org/Product["\'][^>]*>',
+        re.IGNORECASE
+    )
+    TAG_PATTERN = re.compile(r'<(/?)([a-zA-Z][\w:-]*)([^>]*)>([^<]*)')
+    ITEMSCOPE_PATTERN = re.compile(r'\bitemscope\b', re.IGNORECASE)
+    VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'wbr'))
+    # Nested itemscopes of the Product whose properties belong to it
+    PRODUCT_SUBSCOPES = ('offers', 'aggregateRating', 'brand')
+    ATTRIBUTE_PATTERN = re.compile(r'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+    GTIN_KEYS = ('gtin13', 'gtin', 'gtin12', 'gtin14', 'gtin8', 'ean')
+
+    OPENGRAPH_FIELDS = {
+        'og:title': 'title',
+        'og:description': 'description',
+        'og:image': 'image',
+        'product:price:amount': 'price',
+        'og:price:amount': 'price',
+        'product:price:currency': 'currency',
+        'og:price:currency': 'currency',
+        'product:availability': 'availability',
+        'og:availability': 'availability',
+        'product:brand': 'brand',
+        'product:ean': 'gtin',
+    }
+
+    def extract(self, page) -> StructuredDataResult:
+        """
+        Extract product data from a full page (str or bytes).
+        The first method that yields a title and price wins; later
+        methods only fill in fields it did not provide.
+        """
+        if isinstance(page, bytes):
+            page = page.decode('utf-8', errors='replace')
+        if not page:
+            return StructuredDataResult(success=False)
+
+        merged = {}
+        method_used = ''
+        for method in self.METHODS:
+            try:
+                data = getattr(self, f'_extract_{method}')(page)
+            except Exception as e:
+                logger.debug(f"Structured data method {method} failed: {e}")
+                continue
+
+            is_primary = not method_used and data.get('title') and data.get('price') is not None
+            if is_primary:
+                method_used = method
+            for key, value in data.items():
+                if value and (is_primary or not merged.get(key)):
+                    merged[key] = value
+
+        return StructuredDataResult(
+            success=bool(method_used),
+            data=merged if method_used else {},
+            method_used=method_used
+        )
+
+    def extract_element(self, element) -> StructuredDataResult:
+        """Extract microdata from a parsed product container (BeautifulSoup tag)"""
+        properties = {}
+        for tag in element.find_all(attrs={'itemprop': True}):
+            name = tag.get('itemprop')
+            if name in properties:
+                continue
+            properties[name] = (
+                tag.get('content') or tag.get('href') or tag.get('src')
+                or tag.get_text(strip=True)
+            )
+
+        data = self._product_from_properties(properties)
+        success = bool(data.get('title') and data.get('price') is not None)
+        return StructuredDataResult(
+            success=success,
+            data=data if success else {},
+            method_used='microdata' if success else ''
+        )
+
+    def parse_json_ld(self, text: str) -> Dict:
+        """Parse one JSON-LD block and return the first Product/Offer found"""
+        try:
+            payload = json.loads(text or '')
+        except (TypeError, ValueError):
+            return {}
+
+        for node in self._iter_json_ld_nodes(payload):
+            product = self._product_from_json_ld(node)
+            if product.get('price') is not None:
+                return product
+        return {}
+
+    # ===== JSON-LD =====
+
+    def _extract_json_ld(self, page: str) -> Dict:
+        for match in self.JSON_LD_PATTERN.finditer(page):
+            product = self.parse_json_ld(match.group(1).strip())
+            if product:
+                return product
+        return {}
+
+    def _iter_json_ld_nodes(self, payload) -> Iterator[Dict]:
+        """Yield every dict node of a JSON-LD payload, including @graph members"""
+        if isinstance(payload, list):
+            for item in payload:
+                yield from self._iter_json_ld_nodes(item)
+        elif isinstance(payload, dict):
+            yield payload
+            if isinstance(payload.get('@graph'), list):
+                yield from self._iter_json_ld_nodes(payload['@graph'])
+
+    def _product_from_json_ld(self, node: Dict) -> Dict:
+        offers = node.get('offers')
+        if isinstance(offers, list):
+            offers = offers[0] if offers else None
+        if not isinstance(offers, dict):
+            return {}
+
+        brand = node.get('brand')
+        if isinstance(brand, dict):
+            brand = brand.get('name')
+
+        images = node.get('image') or []
+        if isinstance(images, (str, dict)):
+            images = [images]
+        images = [img.get('url') if isinstance(img, dict) else img for img in images]
+
+        rating = node.get('aggregateRating') or {}
+
+        return {
+            'title': self._clean_text(node.get('name')),
+            'price': self._to_decimal(offers.get('price') or offers.get('lowPrice')),
+            'currency': offers.get('priceCurrency') or 'GBP',
+            'availability': self._normalize_availability(offers.get('availability')),
+            'brand': self._clean_text(brand),
+            'gtin': next((str(node[key]) for key in self.GTIN_KEYS if node.get(key)), ''),
+            'images': [img for img in images if img],
+            'description': self._clean_text(node.get('description')),
+            'rating': self._to_decimal(rating.get('ratingValue')) if isinstance(rating, dict) else None,
+            'review_count': self._to_int(rating.get('reviewCount')) if isinstance(rating, dict) else None,
+        }
+
+    # ===== Microdata =====
+
+    def _extract_microdata(self, page: str) -> Dict:
+        """
+        Properties of the page's one Product itemscope (and its offers,
+        rating and brand). Breadcrumbs and other items outside it are
+        ignored; with no Product scope, or several (listings, related
+        products), this yields nothing and the DOM selectors decide.
+        """
+        if 'itemprop' not in page:
+            return {}
+        scopes = list(itertools.islice(self.PRODUCT_SCOPE_PATTERN.finditer(page), 2))
+        if len(scopes) != 1:
+            return {}
+
+        properties = {}
+        stack = []  # (tag, scope): '' is the Product itself, else the sub-scope's property, None for unrelated items
+        for match in self.TAG_PATTERN.finditer(page, scopes[0].start()):
+            closing, tag, attrs_text, text = match.groups()
+            tag = tag.lower()
+            if closing:
+                depth = next((i for i in range(len(stack) - 1, -1, -1) if stack[i][0] == tag), None)
+                if depth is not None:
+                    del stack[depth:]
+                    if not stack:
+                        break  # End of the Product element
+                continue
+
+            parent = stack[-1][1] if stack else ''
+            attrs = self._parse_attributes(attrs_text) if 'item' in attrs_text.lower() else {}
+            name = attrs.get('itemprop')
+            is_scope = bool(attrs) and self.ITEMSCOPE_PATTERN.search(attrs_text) is not None
+            if not stack:
+                scope = ''
+            elif is_scope:
+                scope = name if parent == '' and name in self.PRODUCT_SUBSCOPES else None
+            else:
+                scope = parent
+
+            if name and parent is not None and not is_scope:
+                key = 'brand' if parent == 'brand' and name == 'name' else name
+                if key not in properties and (parent != 'brand' or key == 'brand'):
+                    properties[key] = (
+                        attrs.get('content') or attrs.get('href') or attrs.get('src')
+                        or html.unescape(text).strip()
+                    )
+            if tag not in self.VOID_TAGS and not attrs_text.rstrip().endswith('/'):
+                stack.append((tag, scope))
+        return self._product_from_properties(properties)
+
+    def _product_from_properties(self, properties: Dict) -> Dict:
+        if not properties:
+            return {}
+        return {
+            'title': self._clean_text(properties.get('name')),
+            'price': self._to_decimal(properties.get('price') or properties.get('lowPrice')),
+            'currency': properties.get('priceCurrency') or 'GBP',
+            'availability': self._normalize_availability(properties.get('availability')),
+            'brand': self._clean_text(properties.get('brand')),
+            'gtin': next((properties[key] for key in self.GTIN_KEYS if properties.get(key)), ''),
+            'images': [properties['image']] if properties.get('image') else [],
+            'description': self._clean_text(properties.get('description')),
+            'rating': self._to_decimal(properties.get('ratingValue')),
+            'review_count': self._to_int(properties.get('reviewCount')),
+        }
+
+    # ===== OpenGraph =====
+
+    def _extract_opengraph(self, page: str) -> Dict:
+        values = {}
+        for match in self.META_PATTERN.finditer(page):
+            attrs = self._parse_attributes(match.group(0))
+            key = (attrs.get('property') or attrs.get('name') or '').lower()
+            field_name = self.OPENGRAPH_FIELDS.get(key)
+            if field_name and field_name not in values and attrs.get('content'):
+                values[field_name] = html.unescape(attrs['content']).strip()
+
+        if not values:
+            return {}
+        return {
+            'title': values.get('title', ''),
+            'price': self._to_decimal(values.get('price')),
+            'currency': values.get('currency') or 'GBP',
+            'availability': self._normalize_availability(values.get('availability')),
+            'brand': values.get('brand', ''),
+            'gtin': values.get('gtin', ''),
+            'images': [values['image']] if values.get('image') else [],
+            'description': values.get('description', ''),
+        }
+
+    # ===== Helpers =====
+
+    def _parse_attributes(self, tag_text: str) -> Dict:
+        return {
+            name.lower(): html.unescape(double if double is not None else single)
+            for name, double, single in self.ATTRIBUTE_PATTERN.findall(tag_text)
+        }
+
+    def _normalize_availability(self, value) -> str:
+        """'https://schema.org/InStock' -> 'In Stock'"""
+        if not value:
+            return ''
+        value = str(value).rsplit('/', 1)[-1]
+        return re.sub(r'(?<=[a-z])(?=[A-Z])', ' ', value).replace('_', ' ').strip()
+
+    def _clean_text(self, value) -> str:
+        if not isinstance(value, str):
+            return ''
+        return re.sub(r'\s+', ' ', html.unescape(value)).strip()
+
+    def _to_decimal(self, value) -> Optional[Decimal]:
+        if value in (None, ''):
+            return None
+        cleaned = re.sub(r'[^\d.]', '', str(value).replace(',', ''))
+        try:
+            return Decimal(cleaned) if cleaned else None
+        except InvalidOperation:
+            return None
+
+    def _to_int(self, value) -> Optional[int]:
+        try:
+            return int(str(value).replace(',', ''))
+        except (TypeError, ValueError):
+            return None
+
+
+# Global structured data extractor instance
+structured_data_extractor = StructuredDataExtractor()
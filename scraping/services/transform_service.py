@@ -151,6 +151,7 @@ class CommercialDataTransformer:
             transformed.update({
                 'scraped_at': raw_data.get('scraped_at'),
                 'source_url': raw_data.get('source_url'),
+                'product_url': raw_data.get('product_url'),
                 'site_id': site_config.get('site_id'),
                 'quality_score': quality_score
             })
@@ -180,14 +181,21 @@ class CommercialDataTransformer:
         # Convert to string if not already
         price_str = str(price_text).strip()
         
-        # Try each pattern
-        for pattern in self.price_patterns:
-            match = pattern.search(price_str)
-            if match:
+        # Extractors already hand over numeric prices without a currency symbol
+        if isinstance(price_text, (int, float, Decimal)):
+            candidates = [price_str]
+        else:
+            candidates = [
+                match.group(1) for match in
+                (pattern.search(price_str) for pattern in self.price_patterns) if match
+            ]
+        
+        # Try each candidate
+        for price_value in candidates:
+            if price_value:
                 try:
                     # Clean and convert to decimal
-                    price_value = match.group(1).replace(',', '')
-                    decimal_price = Decimal(price_value)
+                    decimal_price = Decimal(price_value.replace(',', ''))
                     
                     # Validation
                     rules = self.validation_rules['price']
@@ -0,0 +1,194 @@
+"""
+Express Deals - Trending Service
+Materializes the trending feed: top deals scored by discount, recency and
+retailer popularity, and categories ranked by recency-weighted scrape
+volume. Each refresh reads only the scrapes since the previous one (plus
+a lookback for late imports); pages read the stored feed through the
+tiered cache, so they cost one lookup however much has been scraped.
+"""
+
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from express_deals.cache import CacheNamespace
+from scraping.models import CategoryTrendBucket, ScrapedProduct, TrendingFeed
+
+logger = logging.getLogger(__name__)
+
+trending_cache = CacheNamespace('trending')
+
+CATEGORY_WINDOW = timedelta(days=7)
+DEAL_WINDOW = timedelta(hours=24)
+# Scrapes are imported some time after they are scraped - recount this much before the last refresh
+IMPORT_LOOKBACK = timedelta(hours=6)
+DEAL_HALF_LIFE_HOURS = 6
+CATEGORY_HALF_LIFE_HOURS = 48
+MIN_DEAL_DISCOUNT = 10
+TOP_DEALS = 50
+TOP_CATEGORIES = 10
+FEED_CACHE_TIMEOUT = 60 * 60
+EMPTY_FEED = {'deals': [], 'categories': [], 'refreshed_at': None}
+
+
+class TrendingService:
+    """Refresh and serve the materialized trending feed"""
+
+    def __init__(self):
+        self.stats = {'refreshes': 0, 'full_refreshes': 0, 'scrapes_counted': 0, 'deals_scored': 0}
+
+    # Reads
+
+    def feed(self) -> Dict:
+        """The current feed: {'deals', 'categories', 'refreshed_at'}"""
+        try:
+            payload = trending_cache.get('feed')
+        except Exception as e:
+            logger.warning(f"Failed to read trending feed from cache: {e}")
+            payload = None
+        if payload is None:
+            row = TrendingFeed.objects.filter(pk=1).first()
+            if row is None:
+                return EMPTY_FEED
+            payload = self._payload(row)
+            self._cache(payload)
+        return payload
+
+    # Refresh - runs in the Celery beat task
+
+    def refresh(self, full: bool = False) -> Dict:
+        """
+        Recount recent hours, re-rank categories and merge new deals into the
+        stored top deals. ``full`` (or a feed older than the category window)
+        rebuilds everything from the windows instead.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            feed, _ = TrendingFeed.objects.select_for_update().get_or_create(pk=1)
+            full = full or feed.refreshed_at is None or now - feed.refreshed_at > CATEGORY_WINDOW
+            since = now - CATEGORY_WINDOW if full else feed.refreshed_at - IMPORT_LOOKBACK
+
+            scrapes = self._recount_buckets(since, now)
+            categories = self._rank_categories(now)
+            deals = self._rank_deals(
+                [] if full else feed.deals, max(since, now - DEAL_WINDOW), now
+            )
+
+            feed.deals, feed.categories, feed.refreshed_at = deals, categories, now
+            feed.save()
+            payload = self._payload(feed)
+            transaction.on_commit(lambda: self._cache(payload))
+
+        self.stats['refreshes'] += 1
+        self.stats['full_refreshes'] += int(full)
+        self.stats['scrapes_counted'] += scrapes
+        return {'full': full, 'scrapes': scrapes, 'deals': len(deals), 'categories': len(categories)}
+
+    def get_stats(self) -> Dict:
+        """Refresh counters for this process"""
+        return dict(self.stats)
+
+    # Internals
+
+    def _recount_buckets(self, since: datetime, now: datetime) -> int:
+        """Replace the hourly buckets from ``since``'s hour on; drop buckets past the window"""
+        since_hour = since.replace(minute=0, second=0, microsecond=0)
+        counts = (
+            ScrapedProduct.objects.filter(scraped_at__gte=since_hour, imported_product__category__isnull=False)
+            .annotate(hour=TruncHour('scraped_at'))
+            .values('imported_product__category_id', 'hour').order_by()
+            .annotate(scrapes=Count('id'))
+        )
+        buckets = [
+            CategoryTrendBucket(category_id=row['imported_product__category_id'], hour=row['hour'], scrapes=row['scrapes'])
+            for row in counts
+        ]
+        CategoryTrendBucket.objects.filter(hour__gte=since_hour).delete()
+        CategoryTrendBucket.objects.filter(hour__lt=now - CATEGORY_WINDOW).delete()
+        CategoryTrendBucket.objects.bulk_create(buckets)
+        return sum(bucket.scrapes for bucket in buckets)
+
+    def _rank_categories(self, now: datetime) -> List[Dict]:
+        """Categories by scrapes, each hour weighted down by its age"""
+        totals = {}
+        rows = CategoryTrendBucket.objects.filter(hour__gte=now - CATEGORY_WINDOW).values_list(
+            'category_id', 'category__name', 'category__slug', 'hour', 'scrapes'
+        )
+        for category_id, name, slug, hour, scrapes in rows:
+            entry = totals.setdefault(
+                category_id, {'id': category_id, 'name': name, 'slug': slug, 'product_count': 0, 'score': 0.0}
+            )
+            entry['product_count'] += scrapes
+            entry['score'] += scrapes * self._decay(now - hour, CATEGORY_HALF_LIFE_HOURS)
+
+        ranked = sorted(totals.values(), key=lambda entry: entry['score'], reverse=True)[:TOP_CATEGORIES]
+        for entry in ranked:
+            entry['score'] = round(entry['score'], 3)
+        return ranked
+
+    def _rank_deals(self, previous: List[Dict], since: datetime, now: datetime) -> List[Dict]:
+        """Merge newly imported deals into the previous top deals, rescore, keep the best per product"""
+        candidates = {
+            deal['id']: deal for deal in previous
+            if datetime.fromisoformat(deal['scraped_at']) >= now - DEAL_WINDOW
+        }
+        fresh = ScrapedProduct.objects.filter(
+            scraped_at__gte=since,
+            is_processed=True,
+            imported_product__isnull=False,
+            discount__gte=MIN_DEAL_DISCOUNT,
+        ).values(
+            'id', 'title', 'price', 'original_price', 'discount', 'image_url', 'product_url',
+            'scraped_at', 'review_count', 'imported_product_id', 'imported_product__category__name',
+        )
+        for row in fresh:
+            candidates[row['id']] = {
+                'id': row['id'],
+                'title': row['title'],
+                'price': float(row['price']),
+                'original_price': float(row['original_price']) if row['original_price'] else None,
+                'discount_percentage': str(row['discount']),
+                'image_url': row['image_url'],
+                'product_url': row['product_url'],
+                'scraped_at': row['scraped_at'].isoformat(),
+                'review_count': row['review_count'] or 0,
+                'product_id': row['imported_product_id'],
+                'category': row['imported_product__category__name'],
+            }
+        self.stats['deals_scored'] += len(candidates)
+
+        best = {}
+        for deal in candidates.values():
+            deal['score'] = round(self._deal_score(deal, now), 3)
+            current = best.get(deal['product_id'])
+            if current is None or deal['score'] > current['score']:
+                best[deal['product_id']] = deal
+        return sorted(best.values(), key=lambda deal: deal['score'], reverse=True)[:TOP_DEALS]
+
+    def _deal_score(self, deal: Dict, now: datetime) -> float:
+        """Discount, halved every DEAL_HALF_LIFE_HOURS, lifted by how many reviews the retailer shows"""
+        age = now - datetime.fromisoformat(deal['scraped_at'])
+        popularity = 1 + math.log1p(deal['review_count']) / 5
+        return float(deal['discount_percentage']) * self._decay(age, DEAL_HALF_LIFE_HOURS) * popularity
+
+    def _decay(self, age: timedelta, half_life_hours: float) -> float:
+        return 0.5 ** (max(age.total_seconds(), 0) / 3600 / half_life_hours)
+
+    def _payload(self, feed: TrendingFeed) -> Dict:
+        return {'deals': feed.deals, 'categories': feed.categories, 'refreshed_at': feed.refreshed_at}
+
+    def _cache(self, payload: Dict):
+        try:
+            trending_cache.set('feed', payload, FEED_CACHE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Failed to cache trending feed: {e}")
+
+
+# Global trending service instance
+trending_service = TrendingService()
@@ -5,16 +5,21 @@ Celery tasks for web scraping, price monitoring, and notifications
 
 from celery import shared_task
 from django.utils import timezone
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.core.mail import send_mail
 from django.conf import settings
 import logging
 from datetime import timedelta
 
-from .models import ScrapeTarget, ScrapeJob, PriceAlert, AlertNotification, ScrapedProduct
+from .models import ScrapeTarget, PriceAlert, AlertNotification, ScrapedProduct
 from .scrapers import ProductScraper
 from .notifications import NotificationService
+from .services.partition_service import scraped_product_partitions
+from .services.retention_service import retention_engine
+from .services.trending_service import trending_service
 from products.models import Product
+from products.price_history import price_history
 
 logger = logging.getLogger(__name__)
 
@@ -117,13 +122,13 @@ def check_product_alert(alert):
     
     elif alert.alert_type == 'percentage' and alert.percentage_threshold:
         # Check recent scraped products for price drops
-        recent_scraped = ScrapedProduct.objects.filter(
+        discount = ScrapedProduct.objects.filter(
             imported_product=product,
             scraped_at__gte=timezone.now() - timedelta(hours=24)
-        ).order_by('-scraped_at').first()
+        ).order_by('-scraped_at').values_list('discount', flat=True).first()
         
-        if recent_scraped and recent_scraped.original_price:
-            discount = recent_scraped.discount_percentage
+        # Zero when the latest scrape had no original price
+        if discount is not None:
             should_trigger = discount >= alert.percentage_threshold
     
     if should_trigger:
@@ -139,35 +144,31 @@ def check_keyword_alert(alert):
     """
     keywords = alert.search_keywords.lower().split()
     
-    # Find recent products matching keywords
+    # Each alert type's trigger condition, evaluated in SQL on the stored discount
+    if alert.alert_type == 'below' and alert.target_price:
+        condition = Q(price__lte=alert.target_price)
+    elif alert.alert_type == 'percentage' and alert.percentage_threshold:
+        condition = Q(discount__gte=alert.percentage_threshold)
+    elif alert.alert_type == 'deal':
+        # Trigger for significant discounts or low prices
+        condition = Q(discount__gte=20) | Q(price__lte=50)
+    else:
+        return False
+    
+    # Find recent products matching every keyword and the condition
     recent_products = ScrapedProduct.objects.filter(
+        condition,
         scraped_at__gte=timezone.now() - timedelta(hours=24),
         is_processed=True
-    )
+    ).select_related('imported_product').only('id', 'price', 'imported_product')
+    for keyword in keywords:
+        recent_products = recent_products.filter(title__icontains=keyword)
     
     triggered = False
     
     for product in recent_products:
-        title_lower = product.title.lower()
-        
-        # Check if all keywords match
-        if all(keyword in title_lower for keyword in keywords):
-            
-            should_trigger = False
-            
-            if alert.alert_type == 'below' and alert.target_price:
-                should_trigger = product.price <= alert.target_price
-            
-            elif alert.alert_type == 'percentage' and alert.percentage_threshold:
-                should_trigger = product.discount_percentage >= alert.percentage_threshold
-            
-            elif alert.alert_type == 'deal':
-                # Trigger for significant discounts or low prices
-                should_trigger = product.discount_percentage >= 20 or product.price <= 50
-            
-            if should_trigger:
-                trigger_alert(alert, product.imported_product, product.price)
-                triggered = True
+        trigger_alert(alert, product.imported_product, product.price)
+        triggered = True
     
     return triggered
 
@@ -358,22 +359,38 @@ def send_push_notification(user_id, alert_id, message):
 @shared_task
 def cleanup_old_data():
     """
-    Clean up old scraping data and notifications
+    Apply the retention policies: archive and delete old scraped products,
+    raw pages, scrape jobs and notifications in bounded batches
     """
-    cutoff_date = timezone.now() - timedelta(days=30)
-    
-    # Delete old scrape jobs and related data
-    old_jobs = ScrapeJob.objects.filter(completed_at__lt=cutoff_date)
-    jobs_deleted = old_jobs.count()
-    old_jobs.delete()
-    
-    # Delete old notifications
-    old_notifications = AlertNotification.objects.filter(sent_at__lt=cutoff_date)
-    notifications_deleted = old_notifications.count()
-    old_notifications.delete()
-    
-    logger.info(f"Cleanup completed: {jobs_deleted} jobs, {notifications_deleted} notifications deleted")
-    return {'jobs_deleted': jobs_deleted, 'notifications_deleted': notifications_deleted}
+    results = retention_engine.run()
+    summary = {result.policy: result.deleted for result in results}
+    logger.info(f"Cleanup completed: {summary}")
+    return summary
+
+
+@shared_task
+def maintain_partitions():
+    """
+    Create the ScrapedProduct partitions for the coming months (or weeks)
+    ahead of time; a no-op unless the table is partitioned (PostgreSQL)
+    """
+    created = scraped_product_partitions.ensure()
+    return {'created': created}
+
+
+@shared_task
+def update_trending_deals():
+    """
+    Refresh the materialized trending deals and categories feed
+    """
+    try:
+        result = trending_service.refresh()
+        logger.info(f"Trending feed refreshed: {result['deals']} deals, {result['categories']} categories "
+                    f"from {result['scrapes']} recent scrapes")
+        return result
+    except Exception as e:
+        logger.error(f"Error refreshing trending feed: {e}")
+        return {'error': str(e)}
 
 
 @shared_task
@@ -386,9 +403,10 @@ def import_scraped_products():
     scraper = ProductScraper()
     imported_count = 0
     
-    for scraped_product in unprocessed:
-        if scraper.import_to_catalog(scraped_product):
-            imported_count += 1
+    with price_history.batch():
+        for scraped_product in unprocessed:
+            if scraper.import_to_catalog(scraped_product):
+                imported_count += 1
     
     logger.info(f"Imported {imported_count} scraped products")
     return {'processed': len(unprocessed), 'imported': imported_count}
@@ -0,0 +1,633 @@
+import json
+
+
+import tempfile
+import threading
+import time
+import requests
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+from express_deals.cache import CacheNamespace, TieredCache
+from express_deals.metrics import instrument, retailer_label, stage_timer
+from products.models import Category, PriceObservation, Product
+from .models import AlertNotification, PriceAlert, RawPage, ScrapedProduct, ScrapeJob, ScrapeTarget
+from .services.archive_service import PageArchive
+from .services.benchmark_service import BenchmarkHistory, BenchmarkResult, ScrapingBenchmark
+from .services.fixture_server import FixtureServer, FixtureServerConfig, FixtureStore
+from .services.partition_service import RangePartitions, scraped_product_partitions
+from .services.replay_service import replay_page
+from .services.retention_service import RetentionEngine
+from .services.stream_service import StreamingPageReader
+from .services.trending_service import trending_cache, trending_service
+from .services.structured_data import StructuredDataExtractor
+from .url_tracking_service import url_tracking_service
+
+try:
+    from prometheus_client import REGISTRY
+except ImportError:  # prometheus_client not installed - the metrics tests are skipped
+    REGISTRY = None
+
+
+class FakeStreamResponse:
+    """Minimal stand-in for a ``stream=True`` requests response"""
+
+    def __init__(self, body, chunk_size=64, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {'Content-Length': str(len(body)), 'Content-Type': 'text/html; charset=utf-8'}
+        self.chunk_size = chunk_size
+        self.served = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size=None):
+        while self.served < len(self.body):
+            chunk = self.body[self.served:self.served + self.chunk_size]
+            self.served += len(chunk)
+            yield chunk
+
+    @property
+    def raw(self):
+        raise AttributeError('no raw stream')
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.exceptions.HTTPError(f'{self.status_code} Error', response=self)
+
+
+class StreamingPageReaderTest(SimpleTestCase):
+    config = {
+        'title_selector': '#productTitle',
+        'price_selector': '.a-price-whole',
+        'availability_selector': '#availability span',
+    }
+    padding = b'<div class="reviews">' + b'<p>review text</p>' * 500 + b'</div>'
+
+    def test_stops_once_selectors_are_parsed(self):
+        body = (
+            b'<html><body><h1 id="productTitle">Kettle</h1>'
+            b'<span class="a-price-whole">24.99</span>'
+            b'<div id="availability"><span>In stock</span></div>'
+            + self.padding + b'</body></html>'
+        )
+        response = FakeStreamResponse(body)
+        result = StreamingPageReader().read(response, self.config)
+        self.assertTrue(result.stopped_early)
+        self.assertEqual(result.stop_reason, 'selectors')
+        self.assertGreater(result.bytes_saved, 0)
+        self.assertTrue(response.closed)
+
+    def test_stops_on_json_ld_offer(self):
+        body = (
+            b'<html><head><script type="application/ld+json">'
+            b'{"@type": "Product", "name": "Kettle", "offers": {"@type": "Offer", '
+            b'"price": "19.99", "priceCurrency": "GBP", "availability": "https://schema.org/InStock"}}'
+            b'</script></head><body>' + self.padding + b'</body></html>'
+        )
+        result = StreamingPageReader().read(FakeStreamResponse(body), self.config)
+        self.assertEqual(result.stop_reason, 'json_ld_offer')
+        self.assertEqual(result.structured_data['price'], Decimal('19.99'))
+        self.assertEqual(result.structured_data['availability'], 'In Stock')
+
+    def test_reads_whole_page_when_nothing_found(self):
+        body = b'<html><body>' + self.padding + b'</body></html>'
+        result = StreamingPageReader().read(FakeStreamResponse(body), self.config)
+        self.assertFalse(result.stopped_early)
+        self.assertEqual(result.content, body)
+        self.assertEqual(result.bytes_saved, 0)
+
+    def test_url_tracking_retries_close_the_throttled_response(self):
+        throttled = FakeStreamResponse(b'', status_code=429)
+        page = FakeStreamResponse(
+            b'<html><head><script type="application/ld+json">'
+            b'{"@type": "Product", "name": "Kettle", "offers": {"@type": "Offer", "price": "19.99"}}'
+            b'</script></head><body>' + self.padding + b'</body></html>'
+        )
+        with mock.patch('requests.Session.get', side_effect=[throttled, page]), mock.patch('time.sleep'), \
+                mock.patch.object(StructuredDataExtractor, 'extract') as extract:
+            result = url_tracking_service.check_product_availability('https://www.argos.co.uk/product/123')
+        self.assertTrue(throttled.closed)
+        self.assertTrue(page.closed)
+        self.assertEqual(result['price'], Decimal('19.99'))
+        self.assertEqual(result['extraction_method'], 'json_ld')
+        # The offer the stream stopped on is not parsed a second time
+        extract.assert_not_called()
+
+
+class StructuredDataExtractorTest(SimpleTestCase):
+
+    def setUp(self):
+        self.extractor = StructuredDataExtractor()
+
+    def test_json_ld_product(self):
+        page = (
+            '<html><head><script type="application/ld+json">'
+            '{"@context": "https://schema.org", "@graph": [{"@type": "Product", "name": "Air Fryer", '
+            '"brand": {"name": "Ninja"}, "gtin13": "5055977712345", "image": "https://x.test/a.jpg", '
+            '"offers": {"price": "89.99", "priceCurrency": "GBP", "availability": "https://schema.org/OutOfStock"}}]}'
+            '</script></head></html>'
+        )
+        result = self.extractor.extract(page)
+        self.assertEqual(result.method_used, 'json_ld')
+        self.assertEqual(result.data['price'], Decimal('89.99'))
+        self.assertEqual(result.data['brand'], 'Ninja')
+        self.assertEqual(result.data['gtin'], '5055977712345')
+        self.assertEqual(result.data['availability'], 'Out Of Stock')
+
+    def test_microdata_product(self):
+        page = (
+            '<div itemscope itemtype="https://schema.org/Product">'
+            '<h1 itemprop="name">Toaster</h1>'
+            '<span itemprop="price" content="24.50">&pound;24.50</span>'
+            '<link itemprop="availability" href="https://schema.org/InStock"></div>'
+        )
+        result = self.extractor.extract(page)
+        self.assertEqual(result.method_used, 'microdata')
+        self.assertEqual(result.data['title'], 'Toaster')
+        self.assertEqual(result.data['price'], Decimal('24.50'))
+        self.assertEqual(result.data['availability'], 'In Stock')
+
+    def test_microdata_ignores_items_outside_the_product(self):
+        page = (
+            '<ol itemscope itemtype="https://schema.org/BreadcrumbList">'
+            '<li itemprop="itemListElement" itemscope itemtype="https://schema.org/ListItem">'
+            '<span itemprop="name">Home</span></li></ol>'
+            '<div itemscope itemtype="https://schema.org/Product">'
+            '<h1 itemprop="name">Toaster</h1>'
+            '<div itemprop="brand" itemscope itemtype="https://schema.org/Brand"><span itemprop="name">Acme</span></div>'
+            '<div itemprop="offers" itemscope itemtype="https://schema.org/Offer">'
+            '<span itemprop="price" content="24.50">&pound;24.50</span></div>'
+            '<div itemprop="isRelatedTo" itemscope itemtype="https://schema.org/Thing">'
+            '<span itemprop="name">Kettle</span><span itemprop="price" content="9.99"></span></div></div>'
+        )
+        result = self.extractor.extract(page)
+        self.assertEqual(result.data['title'], 'Toaster')
+        self.assertEqual(result.data['brand'], 'Acme')
+        self.assertEqual(result.data['price'], Decimal('24.50'))
+
+    def test_microdata_skipped_with_several_products(self):
+        card = (
+            '<div itemscope itemtype="https://schema.org/Product">'
+            '<span itemprop="name">%s</span><span itemprop="price" content="%s"></span></div>'
+        )
+        result = self.extractor.extract(card % ('Toaster', '24.50') + card % ('Kettle', '9.99'))
+        self.assertFalse(result.success)
+
+    def test_opengraph_fills_missing_fields(self):
+        page = (
+            '<meta property="og:title" content="Kettle">'
+            '<meta property="product:price:amount" content="19.00">'
+            '<meta property="og:image" content="https://x.test/k.jpg">'
+            '<div itemscope itemtype="https://schema.org/Product">'
+            '<span itemprop="name">Kettle 1.7L</span><span itemprop="price" content="18.00"></span></div>'
+        )
+        result = self.extractor.extract(page)
+        self.assertEqual(result.method_used, 'microdata')
+        self.assertEqual(result.data['price'], Decimal('18.00'))
+        self.assertEqual(result.data['images'], ['https://x.test/k.jpg'])
+
+    def test_no_structured_data(self):
+        self.assertFalse(self.extractor.extract('<html><body><h1>Nothing</h1></body></html>').success)
+
+
+class PageArchiveTest(TestCase):
+    page = '<html><body><h1>Kettle</h1><span class="price">&pound;24.99</span></body></html>' * 20
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        with override_settings(SCRAPING_ARCHIVE_ENABLED=True, SCRAPING_ARCHIVE_OPTIONS={'location': self.tmpdir.name}):
+            self.archive = PageArchive()
+            self.archive.storage
+
+    def test_store_and_load_round_trip(self):
+        raw_page = self.archive.store('https://shop.test/kettle', self.page)
+        self.assertLess(raw_page.compressed_size, raw_page.original_size)
+        self.assertEqual(self.archive.load(raw_page).decode('utf-8'), self.page)
+
+    def test_identical_bodies_share_one_blob(self):
+        first = self.archive.store('https://shop.test/kettle?page=1', self.page)
+        second = self.archive.store('https://shop.test/kettle?page=2', self.page.encode('utf-8'))
+        self.assertEqual(first.content_hash, second.content_hash)
+        self.assertEqual(RawPage.objects.count(), 2)
+        self.assertEqual(self.archive.get_archive_stats()['blobs_written'], 1)
+        self.assertEqual(self.archive.get_archive_stats()['duplicates_skipped'], 1)
+
+    def test_replay_page_extracts_and_transforms(self):
+        raw_page = self.archive.store('https://shop.test/kettle', self.page)
+        task = {
+            'raw_page_id': raw_page.id,
+            'job_id': None,
+            'retailer': 'shop.test',
+            'url': raw_page.url,
+            'content_hash': raw_page.content_hash,
+            'codec': raw_page.codec,
+            'site_config': {'site_id': 'shop.test', 'base_url': 'https://shop.test', 'currency': 'GBP'},
+        }
+        with mock.patch('scraping.services.replay_service.page_archive', self.archive):
+            result = replay_page(task)
+        self.assertEqual(result['error'], '')
+        self.assertEqual(result['bytes'], raw_page.original_size)
+        self.assertGreaterEqual(result['extracted'], 1)
+
+
+@override_settings(SCRAPING_RETENTION_POLICIES={
+    'scraped_products': {'batch_size': 1}, 'raw_pages': {'batch_size': 1}, 'scrape_jobs': {'batch_size': 1},
+    'alert_notifications': {'batch_size': 1},
+})
+class RetentionEngineTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        with override_settings(SCRAPING_ARCHIVE_ENABLED=True, SCRAPING_ARCHIVE_OPTIONS={'location': self.tmpdir.name}):
+            self.engine = RetentionEngine(archive=PageArchive())
+            self.engine.archive.storage
+
+        target = ScrapeTarget.objects.create(
+            name='Test Shop', site_type='argos', base_url='https://shop.test', search_url_template='{query}',
+            product_selector='.p', title_selector='.t', price_selector='.pr', image_selector='img', url_selector='a'
+        )
+        long_ago = timezone.now() - timedelta(days=40)
+        self.old_job = ScrapeJob.objects.create(target=target, status='completed', completed_at=long_ago)
+        self.new_job = ScrapeJob.objects.create(target=target, status='completed', completed_at=timezone.now())
+        for external_id, job in [('old-1', self.old_job), ('old-2', self.old_job), ('late', self.old_job), ('new', self.new_job)]:
+            ScrapedProduct.objects.create(
+                job=job, external_id=external_id, title='Kettle', price=20,
+                image_url='https://shop.test/i.jpg', product_url='https://shop.test/p'
+            )
+        ScrapedProduct.objects.filter(external_id__startswith='old').update(scraped_at=long_ago)
+        self.raw_page = RawPage.objects.create(
+            job=self.old_job, url='https://shop.test/p', content_hash='a' * 64, original_size=1, compressed_size=1
+        )
+
+        alert = PriceAlert.objects.create(user=User.objects.create_user(username='saver'), alert_type='price_drop')
+        for message in ['old', 'new']:
+            AlertNotification.objects.create(alert=alert, channel='email', status='sent', message=message)
+        AlertNotification.objects.filter(message='old').update(sent_at=long_ago)
+
+    def test_policies_archive_then_delete_in_batches(self):
+        products, raw_pages, jobs, notifications = self.engine.run()
+
+        self.assertEqual((products.deleted, products.archived), (2, 2))
+        self.assertEqual(products.batches, 2)  # Two full batches of one, no trailing empty one
+        archived = [record for name in products.archive_files for record in self.engine.read_archive(name)]
+        self.assertEqual(sorted(record['row']['external_id'] for record in archived), ['old-1', 'old-2'])
+
+        # The job's later scrape goes with it (and into its archive); its raw page is kept, unlinked
+        self.assertEqual(jobs.deleted, 1)
+        self.assertEqual(jobs.cascaded, {ScrapedProduct._meta.db_table: 1})
+        self.assertEqual(jobs.nulled, {RawPage._meta.db_table: 1})
+        tables = [record['table'] for name in jobs.archive_files for record in self.engine.read_archive(name)]
+        self.assertEqual(sorted(tables), [ScrapedProduct._meta.db_table, ScrapeJob._meta.db_table])
+        self.raw_page.refresh_from_db()
+        self.assertIsNone(self.raw_page.job_id)
+
+        self.assertEqual((raw_pages.deleted, raw_pages.blobs_deleted, raw_pages.batches), (0, 0, 0))
+        self.assertEqual((notifications.deleted, notifications.archive_files), (1, []))
+        self.assertEqual(list(ScrapeJob.objects.all()), [self.new_job])
+        self.assertEqual(list(ScrapedProduct.objects.values_list('external_id', flat=True)), ['new'])
+        self.assertEqual(list(AlertNotification.objects.values_list('message', flat=True)), ['new'])
+
+    def test_dry_run_only_counts(self):
+        results = self.engine.run(names=['scrape_jobs', 'alert_notifications'], dry_run=True)
+        self.assertEqual([(result.policy, result.matched) for result in results], [('scrape_jobs', 1), ('alert_notifications', 1)])
+        self.assertEqual(ScrapedProduct.objects.count(), 4)
+        with self.assertRaises(ValueError):
+            self.engine.run(names=['sessions'])
+
+    def test_raw_pages_take_unreferenced_blobs_with_them(self):
+        archive = self.engine.archive
+        shared = archive.store('https://shop.test/a', '<html>shared</html>')
+        archive.store('https://shop.test/b', '<html>shared</html>')
+        expired = archive.store('https://shop.test/c', '<html>gone</html>')
+        RawPage.objects.filter(pk__in=[shared.pk, expired.pk]).update(fetched_at=timezone.now() - timedelta(days=100))
+
+        raw_pages, = self.engine.run(names=['raw_pages'])
+
+        self.assertEqual((raw_pages.deleted, raw_pages.blobs_deleted), (2, 1))
+        self.assertFalse(archive.storage.exists(archive.blob_path(expired.content_hash, expired.codec)))
+        self.assertTrue(archive.storage.exists(archive.blob_path(shared.content_hash, shared.codec)))
+        self.assertEqual(RawPage.objects.filter(content_hash=shared.content_hash).count(), 1)
+
+
+class RangePartitionsTest(SimpleTestCase):
+    def setUp(self):
+        self.partitions = RangePartitions('scraping_scrapedproduct', 'scraped_at')
+        self.moment = datetime(2026, 12, 17, 15, 30, tzinfo=dt_timezone.utc)
+
+    @override_settings(SCRAPING_PARTITION_INTERVAL='month')
+    def test_monthly_ranges_roll_over_the_year(self):
+        span = self.partitions.span(self.moment, datetime(2027, 2, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(
+            [partition.name for partition in span],
+            ['scraping_scrapedproduct_p20261201_20270101', 'scraping_scrapedproduct_p20270101_20270201']
+        )
+        self.assertEqual(self.partitions.parse(span[0].name), span[0])
+        self.assertIsNone(self.partitions.parse('scraping_scrapedproduct_default'))
+
+    @override_settings(SCRAPING_PARTITION_INTERVAL='week')
+    def test_weekly_ranges_start_on_monday(self):
+        start, end = self.partitions.bounds(self.moment)
+        self.assertEqual((start.date().isoformat(), end.date().isoformat()), ('2026-12-14', '2026-12-21'))
+
+    def test_sqlite_keeps_a_plain_table(self):
+        self.assertFalse(scraped_product_partitions.is_partitioned())
+        self.assertEqual(scraped_product_partitions.ensure(), [])
+        self.assertEqual(scraped_product_partitions.expired(self.moment), [])
+
+
+class FixtureServerTest(SimpleTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = FixtureStore(self.tmpdir.name)
+        self.template = self.store.generate_synthetic(pages=2, products_per_page=3, padding_kb=1)
+
+    def test_serves_recorded_pages(self):
+        with FixtureServer(self.store) as server:
+            response = requests.get(server.url(self.template.format(page=2)), timeout=5)
+            missing = requests.get(server.url('/shop.fixture/nowhere'), timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text.count('class="product-card"'), 3)
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(server.stats['pages_served'], 1)
+
+    def test_injects_errors_and_throttles(self):
+        config = FixtureServerConfig(error_rates={503: 1.0})
+        with FixtureServer(self.store, config) as server:
+            response = requests.get(server.url(self.template.format(page=1)), timeout=5)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+        with FixtureServer(self.store, FixtureServerConfig(throttle_rps=1)) as server:
+            statuses = [requests.get(server.url(self.template.format(page=1)), timeout=5).status_code for _ in range(3)]
+        self.assertEqual(statuses[0], 200)
+        self.assertIn(429, statuses[1:])
+
+    def test_store_round_trip(self):
+        self.store.save()
+        reloaded = FixtureStore(self.tmpdir.name)
+        self.assertEqual(set(reloaded.pages), set(self.store.pages))
+        self.assertIn(b'Fixture Product 1 ', reloaded.get('/shop.fixture/deals?page=1')['body'])
+
+
+class BenchmarkHistoryTest(SimpleTestCase):
+
+    def test_compares_against_previous_commit(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = BenchmarkHistory(f'{tmpdir}/results.jsonl')
+            baseline = BenchmarkResult('commercial_pipeline', pages_fetched=10, products_saved=100,
+                                       elapsed_seconds=10.0, db_queries=400, commit='aaa111')
+            history.append([baseline])
+
+            current = BenchmarkResult('commercial_pipeline', pages_fetched=10, products_saved=100,
+                                      elapsed_seconds=5.0, db_queries=200, commit='bbb222')
+            changes = history.compare(current)
+
+        self.assertEqual(changes['baseline_commit'], 'aaa111')
+        self.assertEqual(changes['pages_per_second'], 100.0)
+        self.assertEqual(changes['queries_per_product'], -50.0)
+
+    def test_result_round_trips_through_json(self):
+        # The benchmark command reads each scenario's result back from its child process
+        result = BenchmarkResult('commercial_pipeline', pages_fetched=10, products_saved=100,
+                                 elapsed_seconds=5.0, peak_rss_mb=210.5, errors={'503': 2})
+        self.assertEqual(BenchmarkResult.from_dict(json.loads(json.dumps(result.to_dict()))), result)
+
+
+class ScrapingBenchmarkTest(TransactionTestCase):
+    # The pipeline writes from worker threads, which can't see a TestCase's open transaction
+    def test_commercial_pipeline_saves_products(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            benchmark = ScrapingBenchmark(fixture_dir=tmpdir, pages=2, products_per_page=5)
+            result, = benchmark.run(['commercial_pipeline'])
+
+        self.assertEqual(result.pages_fetched, 2)
+        self.assertGreater(result.products_saved, 0)
+        scraped = ScrapedProduct.objects.filter(imported_product__isnull=False)
+        self.assertEqual(scraped.count(), result.products_saved)
+        self.assertTrue(Product.objects.filter(is_active=True, slug__gt='').exists())
+        # Stocked products get a quantity checkout can reserve
+        self.assertFalse(Product.objects.exclude(stock_status='out_of_stock').filter(stock_quantity=0).exists())
+        # The loader's price history hook ran for every saved product
+        self.assertEqual(PriceObservation.objects.values('product').distinct().count(), Product.objects.count())
+
+
+@skipUnless(REGISTRY is not None, 'prometheus_client is not installed')
+class StageInstrumentationTest(SimpleTestCase):
+    labels = {'stage': 'parse', 'retailer': 'test-shop', 'job': 'unit_test', 'proxy_tier': 'direct'}
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, dict(self.labels, **labels)) or 0
+
+    def test_stage_timer_records_latency_and_items(self):
+        count_before = self.sample('express_deals_stage_duration_seconds_count')
+        items_before = self.sample('express_deals_stage_items_total', outcome='success')
+
+        with stage_timer('parse', retailer=retailer_label('Test Shop'), job='unit_test') as timer:
+            timer.add_items(3)
+
+        self.assertEqual(self.sample('express_deals_stage_duration_seconds_count'), count_before + 1)
+        self.assertEqual(self.sample('express_deals_stage_items_total', outcome='success'), items_before + 3)
+
+    def test_instrument_counts_errors_and_failures(self):
+        @instrument('parse', job='unit_test', labels=lambda shop, ok: {'retailer': shop})
+        def parse(shop, ok):
+            if ok is None:
+                raise ValueError('broken page')
+            return ok
+
+        errors_before = self.sample('express_deals_stage_calls_total', outcome='error')
+        failures_before = self.sample('express_deals_stage_calls_total', outcome='failure')
+
+        parse('test-shop', True)
+        parse('test-shop', False)
+        with self.assertRaises(ValueError):
+            parse('test-shop', None)
+
+        self.assertEqual(self.sample('express_deals_stage_calls_total', outcome='error'), errors_before + 1)
+        self.assertEqual(self.sample('express_deals_stage_calls_total', outcome='failure'), failures_before + 1)
+
+    @override_settings(METRICS_AUTH_TOKEN='s3cret')
+    def test_metrics_endpoint(self):
+        with stage_timer('parse', retailer='test-shop', job='unit_test'):
+            pass
+
+        self.assertEqual(self.client.get(reverse('metrics'), secure=True).status_code, 401)
+        response = self.client.get(reverse('metrics'), secure=True, HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'express_deals_stage_duration_seconds_bucket', response.content)
+
+    @override_settings(METRICS_AUTH_TOKEN='', DEBUG=False)
+    def test_metrics_endpoint_is_closed_without_a_token(self):
+        self.assertEqual(self.client.get(reverse('metrics'), secure=True).status_code, 404)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics'), secure=True).status_code, 200)
+
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-test-shared'},
+})
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.tier_name = f'tiered-test-{self.id()}'
+        self.cache = self.tiered(LOCAL_MAX_ENTRIES=2)
+        self.shared = self.cache.shared
+        self.shared.clear()
+
+    def tiered(self, **options):
+        return TieredCache(self.tier_name, {'OPTIONS': dict({'SHARED_ALIAS': 'default'}, **options)})
+
+    def test_reads_through_and_serves_hot_keys_locally(self):
+        self.shared.set('selectors:argos', ['.price'])
+        self.assertEqual(self.cache.get('selectors:argos'), ['.price'])
+        with mock.patch.object(self.shared, 'get') as shared_get:
+            self.assertEqual(self.cache.get('selectors:argos'), ['.price'])
+        shared_get.assert_not_called()
+
+        self.assertIsNone(self.cache.get('selectors:currys'))
+        stats = self.cache.get_stats()['selectors']
+        self.assertEqual((stats['local_hits'], stats['shared_hits'], stats['misses']), (1, 1, 1))
+
+    def test_lru_eviction_and_local_ttl(self):
+        for site in ('a', 'b', 'c'):
+            self.cache.set(f'html_structure:{site}', site)
+        self.assertEqual(self.cache.get_stats()['html_structure']['evictions'], 1)
+        self.assertEqual(len(self.cache.local.entries), 2)
+        self.assertEqual(self.cache.get('html_structure:a'), 'a')  # Still in the shared tier
+
+        # Another process's write shows up once the local copy expires
+        self.shared.set('html_structure:a', 'changed')
+        self.assertEqual(self.cache.get('html_structure:a'), 'a')
+        with mock.patch('express_deals.cache.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertEqual(self.cache.get('html_structure:a'), 'changed')
+
+    def test_get_or_set_computes_once_under_concurrency(self):
+        calls, results = [], []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'rendered'
+
+        def worker():
+            # Each thread gets its own backend instance, like Django's per-thread caches
+            results.append(self.tiered().get_or_set('categories:audio', compute, timeout=60))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['rendered'] * 8)
+        self.assertIsNone(self.shared.get('categories:audio:lease'))
+
+    def test_namespace_counters_are_shared(self):
+        counters = CacheNamespace('recent_requests', alias='default')
+        self.assertEqual(counters.incr('shop.test', timeout=300), 1)
+        self.assertEqual(counters.incr('shop.test', timeout=300), 2)
+        self.assertEqual(self.shared.get('recent_requests:shop.test'), 2)
+
+# The alert URLs aren't mounted in the project urlconf yet
+urlpatterns = [
+    path('alerts/', include('scraping.urls')),
+    path('', include('express_deals.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF='scraping.tests')
+class RecentDealsConditionalGetTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Audio', slug='audio')
+        self.product = Product.objects.create(
+            name='Speaker', slug='speaker', category=category, description='Loud', price=40
+        )
+        target = ScrapeTarget.objects.create(
+            name='Test Shop', site_type='argos', base_url='https://shop.test', search_url_template='{query}',
+            product_selector='.p', title_selector='.t', price_selector='.pr', image_selector='img', url_selector='a'
+        )
+        self.job = ScrapeJob.objects.create(target=target)
+        trending_cache.delete('feed')
+        self.deal('1')
+        self.refresh()
+        self.client.force_login(User.objects.create_user(username='shopper'))
+        self.url = reverse('alerts:api_deals')
+
+    def refresh(self, full=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            return trending_service.refresh(full=full)
+
+    def deal(self, external_id, price=40, product=None):
+        return ScrapedProduct.objects.create(
+            job=self.job, external_id=external_id, title='Speaker', price=price, original_price=60,
+            image_url='https://shop.test/i.jpg', product_url='https://shop.test/p', is_processed=True,
+            imported_product=product or self.product
+        )
+
+    def other_product(self, slug, category=None):
+        return Product.objects.create(
+            name=slug, slug=slug, category=category or self.product.category, description='Loud', price=40
+        )
+
+    def test_unchanged_deals_are_304(self):
+        response = self.client.get(self.url, secure=True)
+        self.assertEqual(len(response.json()['deals']), 1)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        # Session and user only - the feed comes from the cache
+        with self.assertNumQueries(2):
+            cached = self.client.get(self.url, secure=True, headers={'if_none_match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+        limited = self.client.get(f'{self.url}?limit=5', secure=True, headers={'if_none_match': response['ETag']})
+        self.assertEqual(limited.status_code, 200)
+
+    def test_new_and_expired_deals_change_etag(self):
+        etag = self.client.get(self.url, secure=True)['ETag']
+        self.deal('2', price=30, product=self.other_product('speaker-2'))
+        self.refresh()
+        response = self.client.get(self.url, secure=True, headers={'if_none_match': etag})
+        self.assertEqual(len(response.json()['deals']), 2)
+
+        ScrapedProduct.objects.filter(external_id='1').update(scraped_at=timezone.now() - timedelta(days=2))
+        self.refresh(full=True)
+        response = self.client.get(self.url, secure=True, headers={'if_none_match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['deals']), 1)
+
+    def test_limit_applies_after_the_discount_filter(self):
+        # Newer scrapes with under 10% off must not crowd out real deals
+        for number in range(3):
+            self.deal(f"shallow-{number}", price=58)
+        self.refresh()
+        response = self.client.get(f'{self.url}?limit=1', secure=True)
+        self.assertEqual([deal['discount_percentage'] for deal in response.json()['deals']], ['33.33'])
+        self.assertEqual(ScrapedProduct.objects.filter(discount__lt=10).count(), 3)
+
+    def test_trending_feed_ranks_deals_and_categories(self):
+        kitchen = Category.objects.create(name='Kitchen', slug='kitchen')
+        self.deal('repeat', price=20)  # Same product again, deeper discount: replaces deal 1
+        self.deal('kettle', price=50, product=self.other_product('kettle', kitchen))
+        result = self.refresh()
+
+        feed = trending_service.feed()
+        self.assertEqual([deal['product_id'] for deal in feed['deals']], [self.product.pk, Product.objects.get(slug='kettle').pk])
+        self.assertEqual(feed['deals'][0]['discount_percentage'], '66.67')
+        self.assertEqual([(c['name'], c['product_count']) for c in feed['categories']], [('Audio', 2), ('Kitchen', 1)])
+        self.assertEqual(result['scrapes'], 3)
+
+        # A later refresh recounts recent hours rather than adding to them
+        self.refresh()
+        self.assertEqual(trending_service.feed()['categories'][0]['product_count'], 2)
@@ -12,6 +12,9 @@ from datetime import timedelta
 from typing import Tuple, Optional, Dict, Any  # Add type hints
 import re
 from decimal import Decimal
+from express_deals.metrics import retailer_label, stage_timer
+from .services.stream_service import stream_reader
+from .services.structured_data import StructuredDataResult, structured_data_extractor
 
 logger = logging.getLogger(__name__)
 
@@ -224,6 +227,7 @@ class URLTrackingService:
             'Sec-Fetch-Site': 'none',
             'Cache-Control': 'max-age=0'
         }
+        self.streaming_stats = {}
     
     def validate_url(self, url) -> ValidationResult:
         """
@@ -295,9 +299,11 @@ class URLTrackingService:
                 domain = domain[4:]
             
             retailer_config = None
+            retailer_domain = None
             for supported_domain, config in self.SUPPORTED_RETAILERS.items():
                 if domain == supported_domain or domain.endswith('.' + supported_domain):
                     retailer_config = config
+                    retailer_domain = supported_domain
                     break
             
             if not retailer_config:
@@ -321,8 +327,13 @@ class URLTrackingService:
             for attempt in range(max_retries + 1):
                 try:
                     start_time = time.time()
-                    response = session.get(url, timeout=timeout, allow_redirects=True)
+                    with stage_timer('fetch', retailer=retailer_label(retailer_name), job='url_tracking') as timer:
+                        response = session.get(url, timeout=timeout, allow_redirects=True, stream=True)
+                        timer.outcome = 'success' if response.ok else 'failure'
                     response_time = time.time() - start_time
+                    if not response.ok:
+                        # Release the streamed connection before retrying or giving up
+                        response.close()
                     response.raise_for_status()
                     
                     # Success - break out of retry loop
@@ -330,7 +341,7 @@ class URLTrackingService:
                     
                 except requests.exceptions.HTTPError as e:
                     last_error = e
-                    if e.response and e.response.status_code in [429, 503, 502]:
+                    if e.response is not None and e.response.status_code in [429, 503, 502]:
                         # Rate limited or server error - retry with delay
                         if attempt < max_retries:
                             wait_time = (attempt + 1) * 2  # 2s, 4s delays
@@ -349,20 +360,45 @@ class URLTrackingService:
                     # Max retries reached
                     raise e
             
-            # Parse the page
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Extract product information
-            result = {
-                'available': True,
-                'title': self._extract_title(soup, retailer_config),
-                'price': self._extract_price(soup, retailer_config),
-                'currency': 'GBP',
-                'stock_status': self._extract_stock_status(soup, retailer_config),
-                'retailer': retailer_name,
-                'error': None,
-                'response_time': response_time
-            }
+            # Stream the page, stopping once the product fields have been parsed
+            with stage_timer('parse', retailer=retailer_label(retailer_name), job='url_tracking') as timer:
+                stream_result = stream_reader.read(response, retailer_config)
+                timer.add_items(1, outcome='early_exit' if stream_result.stopped_early else 'full_read')
+            self._record_streaming_stats(retailer_domain, stream_result)
+            
+            with stage_timer('extract', retailer=retailer_label(retailer_name), job='url_tracking') as timer:
+                # Structured data (JSON-LD, microdata, OpenGraph) first - no DOM needed.
+                # A JSON-LD offer the stream stopped on is already parsed.
+                early = stream_result.structured_data
+                if early.get('title') and early.get('price') is not None:
+                    structured = StructuredDataResult(success=True, data=early, method_used='json_ld')
+                else:
+                    structured = structured_data_extractor.extract(stream_result.content)
+                result = {
+                    'available': True,
+                    'title': structured.data.get('title'),
+                    'price': structured.data.get('price'),
+                    'currency': structured.data.get('currency', 'GBP'),
+                    'stock_status': structured.data.get('availability') or 'Unknown',
+                    'retailer': retailer_name,
+                    'error': None,
+                    'response_time': response_time,
+                    'bytes_saved': stream_result.bytes_saved,
+                    'extraction_method': structured.method_used
+                }
+                
+                # Fall back to CSS selectors for anything structured data did not provide
+                if not result['title'] or not result['price'] or result['stock_status'] == 'Unknown':
+                    soup = BeautifulSoup(stream_result.content, 'html.parser')
+                    if not result['title']:
+                        result['title'] = self._extract_title(soup, retailer_config)
+                    if not result['price']:
+                        result['price'] = self._extract_price(soup, retailer_config)
+                    if result['stock_status'] == 'Unknown':
+                        result['stock_status'] = self._extract_stock_status(soup, retailer_config)
+                    if not structured.success:
+                        result['extraction_method'] = 'css_selectors'
+                timer.add_items(1, outcome='success' if result['title'] else 'failure')
             
             # Validate that we found at least a title
             if not result['title']:
@@ -492,6 +528,39 @@ class URLTrackingService:
             logger.error(f"Stock status extraction error: {e}")
             return 'Unknown'
     
+    def _record_streaming_stats(self, retailer_domain, stream_result):
+        """Accumulate download savings for a retailer"""
+        stats = self.streaming_stats.setdefault(retailer_domain, {
+            'requests': 0,
+            'early_exits': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0,
+        })
+        stats['requests'] += 1
+        stats['bytes_downloaded'] += stream_result.bytes_read
+        if stream_result.stopped_early:
+            stats['early_exits'] += 1
+            stats['bytes_saved'] += stream_result.bytes_saved
+    
+    def get_streaming_report(self) -> dict:
+        """
+        Bytes saved by streaming early exit, per supported retailer
+        
+        Returns:
+            {domain: {'name', 'requests', 'early_exits', 'bytes_downloaded', 'bytes_saved'}}
+        """
+        report = {}
+        for domain, retailer_info in self.SUPPORTED_RETAILERS.items():
+            stats = self.streaming_stats.get(domain, {})
+            report[domain] = {
+                'name': retailer_info['name'],
+                'requests': stats.get('requests', 0),
+                'early_exits': stats.get('early_exits', 0),
+                'bytes_downloaded': stats.get('bytes_downloaded', 0),
+                'bytes_saved': stats.get('bytes_saved', 0),
+            }
+        return report
+    
     def _parse_price(self, price_text):
         """Parse price from text"""
         try:
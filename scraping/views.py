@@ -9,15 +9,26 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Q, Sum
 from django.utils import timezone
 from datetime import timedelta
 from urllib.parse import urlparse
 
+from accounts.user_stats import alert_savings_expression, user_stats
+from express_deals.conditional import conditional_view, make_etag
+
 from .models import PriceAlert, AlertNotification, ScrapedProduct
 from .forms import PriceAlertForm
 from products.models import Product
 from .url_tracking_service import url_tracking_service
+from .services.trending_service import trending_service
+
+GOOD_DEAL_DISCOUNT = 20
+# Columns the deal cards render - skips availability, brand and the job link
+DEAL_CARD_FIELDS = (
+    'id', 'title', 'price', 'original_price', 'discount', 'image_url', 'product_url',
+    'description', 'rating', 'review_count', 'shipping_info', 'scraped_at',
+)
 
 
 @login_required
@@ -54,15 +65,16 @@ def alert_dashboard(request):
         alert__user=request.user
     ).order_by('-sent_at')[:5]
     
-    # Enhanced statistics with URL tracking
+    # Enhanced statistics with URL tracking, from the user's stats rollup
+    rollup = user_stats.for_user(request.user)
     stats = {
-        'total_alerts': alerts.count(),
-        'active_alerts': PriceAlert.objects.filter(user=request.user, status='active').count(),
-        'triggered_today': AlertNotification.objects.filter(
-            alert__user=request.user,
-            sent_at__date=timezone.now().date()
-        ).count(),
-        'savings_this_month': calculate_user_savings(request.user),
+        'total_alerts': alerts.count() if status_filter or category_filter else rollup.alerts_total,
+        'active_alerts': rollup.alerts_active,
+        'triggered_today': rollup.triggered_today,
+        'savings_this_month': rollup.savings_month_to_date,
+        'url_alerts_count': rollup.alerts_url,
+        'product_alerts_count': rollup.alerts_product,
+        'keyword_alerts_count': rollup.alerts_keyword,
     }
     
     # URL tracking specific stats
@@ -71,21 +83,9 @@ def alert_dashboard(request):
         product_url__isnull=False
     ).exclude(product_url='')
     
-    stats.update({
-        'url_alerts_count': url_alerts.count(),
-        'product_alerts_count': PriceAlert.objects.filter(
-            user=request.user, 
-            product__isnull=False
-        ).count(),
-        'keyword_alerts_count': PriceAlert.objects.filter(
-            user=request.user,
-            search_keywords__isnull=False
-        ).exclude(search_keywords='').count(),
-    })
-    
     # URL tracking effectiveness data for charts
     url_tracking_data = []
-    if url_alerts.exists():
+    if rollup.alerts_url:
         for alert in url_alerts[:10]:  # Limit to avoid performance issues
             try:
                 score, error = url_tracking_service.get_tracking_effectiveness_score(alert.product_url)
@@ -252,23 +252,18 @@ def discover_deals(request):
     """
     Discover current deals and trending products
     """
-    # Get recent products with significant discounts
-    recent_deals = ScrapedProduct.objects.filter(
-        scraped_at__gte=timezone.now() - timedelta(hours=24),
-        is_processed=True,
-        imported_product__isnull=False
-    ).exclude(
-        original_price__isnull=True
-    ).order_by('-scraped_at')
-    
-    # Filter for good deals (20%+ discount)
-    good_deals = [
-        product for product in recent_deals 
-        if product.discount_percentage >= 20
-    ][:20]
-    
-    # Get trending categories
-    trending_categories = get_trending_categories()
+    # Good deals (20%+ discount) from the last 24 hours, filtered in SQL
+    good_deals = recent_deals_queryset().filter(
+        discount__gte=GOOD_DEAL_DISCOUNT
+    ).only(*DEAL_CARD_FIELDS).order_by('-scraped_at')[:20]
+    
+    # Trending categories and deals from the materialized feed
+    trending = trending_service.feed()
+    trending_categories = trending['categories']
+    trending_deals = [
+        {**deal, 'name': deal['title'], 'current_price': deal['price']}
+        for deal in trending['deals'][:6]
+    ]
     
     # Search functionality
     search_query = request.GET.get('q', '').strip()
@@ -285,6 +280,8 @@ def discover_deals(request):
     context = {
         'good_deals': good_deals,
         'trending_categories': trending_categories,
+        'trending_deals': trending_deals,
+        'categories': trending_categories,
         'search_results': search_results,
         'search_query': search_query,
     }
@@ -327,41 +324,23 @@ def calculate_user_savings(user):
     """
     start_of_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
-    # Get triggered alerts this month
-    triggered_alerts = PriceAlert.objects.filter(
+    # Estimate savings based on target vs current price, in one aggregate
+    total_savings = PriceAlert.objects.filter(
         user=user,
         status='triggered',
-        last_triggered__gte=start_of_month
-    )
-    
-    total_savings = 0
-    for alert in triggered_alerts:
-        if alert.product and alert.target_price:
-            # Estimate savings based on target vs current price
-            potential_savings = float(alert.product.price) - float(alert.target_price)
-            if potential_savings > 0:
-                total_savings += potential_savings
+        last_triggered__gte=start_of_month,
+        product__isnull=False,
+        target_price__isnull=False,
+    ).aggregate(total=Sum(alert_savings_expression()))['total']
     
-    return total_savings
+    return float(total_savings or 0)
 
 
 def get_trending_categories():
     """
     Get trending product categories based on recent scraping activity
     """
-    from products.models import Category
-    from django.db.models import Count
-    
-    trending = ScrapedProduct.objects.filter(
-        scraped_at__gte=timezone.now() - timedelta(days=7),
-        imported_product__category__isnull=False
-    ).values(
-        'imported_product__category__name'
-    ).annotate(
-        product_count=Count('id')
-    ).order_by('-product_count')[:10]
-    
-    return trending
+    return trending_service.feed()['categories']
 
 
 # API endpoints for AJAX requests
@@ -371,43 +350,57 @@ def api_alert_count(request):
     """
     API endpoint to get user's alert counts
     """
+    stats = user_stats.for_user(request.user)
     counts = {
-        'total': PriceAlert.objects.filter(user=request.user).count(),
-        'active': PriceAlert.objects.filter(user=request.user, status='active').count(),
-        'triggered': PriceAlert.objects.filter(user=request.user, status='triggered').count(),
+        'total': stats.alerts_total,
+        'active': stats.alerts_active,
+        'triggered': stats.alerts_triggered,
     }
     
     return JsonResponse(counts)
 
 
+def recent_deals_queryset():
+    return ScrapedProduct.objects.filter(
+        scraped_at__gte=timezone.now() - timedelta(hours=24),
+        is_processed=True,
+        imported_product__isnull=False
+    ).exclude(
+        original_price__isnull=True
+    )
+
+
+def recent_deals_validators(request):
+    """
+    The trending feed's refresh time - the deals only change when it is
+    rebuilt, so this costs a cache lookup rather than a query.
+    """
+    refreshed_at = trending_service.feed()['refreshed_at']
+    etag = make_etag(refreshed_at, request.GET.get('limit', ''))
+    return etag, refreshed_at
+
+
 @login_required
+@conditional_view(recent_deals_validators)
 def api_recent_deals(request):
     """
-    API endpoint to get recent deals
+    API endpoint to get recent deals, best first, from the trending feed
     """
     limit = min(int(request.GET.get('limit', 10)), 50)
     
-    deals = ScrapedProduct.objects.filter(
-        scraped_at__gte=timezone.now() - timedelta(hours=24),
-        is_processed=True,
-        imported_product__isnull=False
-    ).exclude(
-        original_price__isnull=True
-    ).order_by('-scraped_at')[:limit]
-    
-    deals_data = []
-    for deal in deals:
-        if deal.discount_percentage >= 10:  # Only include meaningful discounts
-            deals_data.append({
-                'id': deal.id,
-                'title': deal.title,
-                'price': float(deal.price),
-                'original_price': float(deal.original_price) if deal.original_price else None,
-                'discount_percentage': deal.discount_percentage,
-                'image_url': deal.image_url,
-                'product_url': deal.product_url,
-                'scraped_at': deal.scraped_at.isoformat(),
-            })
+    deals_data = [
+        {
+            'id': deal['id'],
+            'title': deal['title'],
+            'price': deal['price'],
+            'original_price': deal['original_price'],
+            'discount_percentage': deal['discount_percentage'],
+            'image_url': deal['image_url'],
+            'product_url': deal['product_url'],
+            'scraped_at': deal['scraped_at'],
+        }
+        for deal in trending_service.feed()['deals'][:limit]
+    ]
     
     return JsonResponse({'deals': deals_data})
 
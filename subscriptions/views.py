@@ -8,7 +8,7 @@ import stripe
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.utils.decorators import method_decorator
@@ -17,6 +17,7 @@ from django.conf import settings
 from django.contrib import messages
 from django.utils import timezone
 from decimal import Decimal
+from payments.webhooks import receive_stripe_webhook
 from .models import (
     SubscriptionPlan, CustomerSubscription, PaymentIntent, 
     StripeCustomer, PaymentHistory
@@ -222,162 +223,5 @@ def payment_success(request):
 
 @csrf_exempt
 def stripe_webhook(request):
-    """Handle Stripe webhooks"""
-    payload = request.body
-    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
-    endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
-    
-    try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, endpoint_secret
-        )
-    except ValueError:
-        # Invalid payload
-        return HttpResponse(status=400)
-    except stripe.error.SignatureVerificationError:
-        # Invalid signature
-        return HttpResponse(status=400)
-    
-    # Handle the event
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-        handle_payment_intent_succeeded(payment_intent)
-    
-    elif event['type'] == 'subscription.created':
-        subscription = event['data']['object']
-        handle_subscription_created(subscription)
-    
-    elif event['type'] == 'subscription.updated':
-        subscription = event['data']['object']
-        handle_subscription_updated(subscription)
-    
-    elif event['type'] == 'subscription.deleted':
-        subscription = event['data']['object']
-        handle_subscription_deleted(subscription)
-    
-    elif event['type'] == 'invoice.payment_succeeded':
-        invoice = event['data']['object']
-        handle_invoice_payment_succeeded(invoice)
-    
-    elif event['type'] == 'invoice.payment_failed':
-        invoice = event['data']['object']
-        handle_invoice_payment_failed(invoice)
-    
-    return HttpResponse(status=200)
-
-def handle_payment_intent_succeeded(payment_intent):
-    """Handle successful payment intent"""
-    try:
-        pi = PaymentIntent.objects.get(
-            stripe_payment_intent_id=payment_intent['id']
-        )
-        pi.status = 'succeeded'
-        pi.save()
-        
-        # Create payment history record
-        PaymentHistory.objects.create(
-            user=pi.user,
-            stripe_payment_id=payment_intent['id'],
-            payment_type='one_time',
-            amount=Decimal(str(payment_intent['amount'])) / 100,
-            currency=payment_intent['currency'],
-            status='succeeded',
-            description=pi.description,
-            payment_intent=pi
-        )
-    except PaymentIntent.DoesNotExist:
-        pass
-
-def handle_subscription_updated(subscription):
-    """Handle subscription updates"""
-    try:
-        sub = CustomerSubscription.objects.get(
-            stripe_subscription_id=subscription['id']
-        )
-        sub.status = subscription['status']
-        sub.current_period_start = timezone.datetime.fromtimestamp(
-            subscription['current_period_start'], tz=timezone.utc
-        )
-        sub.current_period_end = timezone.datetime.fromtimestamp(
-            subscription['current_period_end'], tz=timezone.utc
-        )
-        
-        if subscription.get('canceled_at'):
-            sub.canceled_at = timezone.datetime.fromtimestamp(
-                subscription['canceled_at'], tz=timezone.utc
-            )
-        
-        if subscription.get('ended_at'):
-            sub.ended_at = timezone.datetime.fromtimestamp(
-                subscription['ended_at'], tz=timezone.utc
-            )
-        
-        sub.save()
-    except CustomerSubscription.DoesNotExist:
-        pass
-
-def handle_subscription_created(subscription):
-    """Handle new subscription creation from webhook"""
-    # This is typically handled in the create_subscription view
-    pass
-
-def handle_subscription_deleted(subscription):
-    """Handle subscription deletion"""
-    try:
-        sub = CustomerSubscription.objects.get(
-            stripe_subscription_id=subscription['id']
-        )
-        sub.status = 'canceled'
-        sub.ended_at = timezone.now()
-        sub.save()
-    except CustomerSubscription.DoesNotExist:
-        pass
-
-def handle_invoice_payment_succeeded(invoice):
-    """Handle successful invoice payment (recurring subscription)"""
-    try:
-        subscription_id = invoice.get('subscription')
-        if subscription_id:
-            sub = CustomerSubscription.objects.get(
-                stripe_subscription_id=subscription_id
-            )
-            
-            # Create payment history record
-            PaymentHistory.objects.create(
-                user=sub.user,
-                stripe_payment_id=invoice['id'],
-                payment_type='subscription',
-                amount=Decimal(str(invoice['amount_paid'])) / 100,
-                currency=invoice['currency'],
-                status='succeeded',
-                description=f"Subscription payment for {sub.plan.name}",
-                subscription=sub
-            )
-    except CustomerSubscription.DoesNotExist:
-        pass
-
-def handle_invoice_payment_failed(invoice):
-    """Handle failed invoice payment"""
-    try:
-        subscription_id = invoice.get('subscription')
-        if subscription_id:
-            sub = CustomerSubscription.objects.get(
-                stripe_subscription_id=subscription_id
-            )
-            
-            # Create payment history record
-            PaymentHistory.objects.create(
-                user=sub.user,
-                stripe_payment_id=invoice['id'],
-                payment_type='subscription',
-                amount=Decimal(str(invoice['amount_due'])) / 100,
-                currency=invoice['currency'],
-                status='failed',
-                description=f"Failed subscription payment for {sub.plan.name}",
-                subscription=sub
-            )
-            
-            # Optionally send notification to user about failed payment
-            # send_payment_failed_notification(sub.user, sub)
-    except CustomerSubscription.DoesNotExist:
-        pass
+    """Handle Stripe webhooks: stored and answered at once, applied by subscriptions.webhooks"""
+    return receive_stripe_webhook(request)
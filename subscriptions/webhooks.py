@@ -0,0 +1,147 @@
+"""
+Express Deals - Subscription Webhook Handlers
+Registered with the Stripe webhook queue (payments.webhooks), which calls
+them from a Celery worker in event order per Stripe object
+"""
+
+from decimal import Decimal
+
+from django.utils import timezone
+
+from payments.webhooks import stripe_webhook_queue
+from .models import CustomerSubscription, PaymentHistory, PaymentIntent
+
+
+@stripe_webhook_queue.register('payment_intent.succeeded')
+def handle_payment_intent_succeeded(payment_intent):
+    """Handle successful payment intent"""
+    try:
+        pi = PaymentIntent.objects.get(
+            stripe_payment_intent_id=payment_intent['id']
+        )
+        pi.status = 'succeeded'
+        pi.save()
+        
+        # Create payment history record (once, however often the event is delivered)
+        PaymentHistory.objects.get_or_create(
+            stripe_payment_id=payment_intent['id'],
+            status='succeeded',
+            defaults={
+                'user': pi.user,
+                'payment_type': 'one_time',
+                'amount': Decimal(str(payment_intent['amount'])) / 100,
+                'currency': payment_intent['currency'],
+                'description': pi.description,
+                'payment_intent': pi,
+            }
+        )
+    except PaymentIntent.DoesNotExist:
+        pass
+
+
+@stripe_webhook_queue.register('subscription.updated')
+def handle_subscription_updated(subscription):
+    """Handle subscription updates"""
+    try:
+        sub = CustomerSubscription.objects.get(
+            stripe_subscription_id=subscription['id']
+        )
+        sub.status = subscription['status']
+        sub.current_period_start = timezone.datetime.fromtimestamp(
+            subscription['current_period_start'], tz=timezone.utc
+        )
+        sub.current_period_end = timezone.datetime.fromtimestamp(
+            subscription['current_period_end'], tz=timezone.utc
+        )
+        
+        if subscription.get('canceled_at'):
+            sub.canceled_at = timezone.datetime.fromtimestamp(
+                subscription['canceled_at'], tz=timezone.utc
+            )
+        
+        if subscription.get('ended_at'):
+            sub.ended_at = timezone.datetime.fromtimestamp(
+                subscription['ended_at'], tz=timezone.utc
+            )
+        
+        sub.save()
+    except CustomerSubscription.DoesNotExist:
+        pass
+
+
+@stripe_webhook_queue.register('subscription.created')
+def handle_subscription_created(subscription):
+    """Handle new subscription creation from webhook"""
+    # This is typically handled in the create_subscription view
+    pass
+
+
+@stripe_webhook_queue.register('subscription.deleted')
+def handle_subscription_deleted(subscription):
+    """Handle subscription deletion"""
+    try:
+        sub = CustomerSubscription.objects.get(
+            stripe_subscription_id=subscription['id']
+        )
+        sub.status = 'canceled'
+        sub.ended_at = timezone.now()
+        sub.save()
+    except CustomerSubscription.DoesNotExist:
+        pass
+
+
+@stripe_webhook_queue.register('invoice.payment_succeeded')
+def handle_invoice_payment_succeeded(invoice):
+    """Handle successful invoice payment (recurring subscription)"""
+    try:
+        subscription_id = invoice.get('subscription')
+        if subscription_id:
+            sub = CustomerSubscription.objects.get(
+                stripe_subscription_id=subscription_id
+            )
+            
+            # Create payment history record (once per invoice outcome)
+            PaymentHistory.objects.get_or_create(
+                stripe_payment_id=invoice['id'],
+                status='succeeded',
+                defaults={
+                    'user': sub.user,
+                    'payment_type': 'subscription',
+                    'amount': Decimal(str(invoice['amount_paid'])) / 100,
+                    'currency': invoice['currency'],
+                    'description': f"Subscription payment for {sub.plan.name}",
+                    'subscription': sub,
+                }
+            )
+    except CustomerSubscription.DoesNotExist:
+        pass
+
+
+@stripe_webhook_queue.register('invoice.payment_failed')
+def handle_invoice_payment_failed(invoice):
+    """Handle failed invoice payment"""
+    try:
+        subscription_id = invoice.get('subscription')
+        if subscription_id:
+            sub = CustomerSubscription.objects.get(
+                stripe_subscription_id=subscription_id
+            )
+            
+            # Create payment history record (once per invoice outcome)
+            PaymentHistory.objects.get_or_create(
+                stripe_payment_id=invoice['id'],
+                status='failed',
+                defaults={
+                    'user': sub.user,
+                    'payment_type': 'subscription',
+                    'amount': Decimal(str(invoice['amount_due'])) / 100,
+                    'currency': invoice['currency'],
+                    'description': f"Failed subscription payment for {sub.plan.name}",
+                    'subscription': sub,
+                }
+            )
+            
+            # Optionally send notification to user about failed payment
+            # send_payment_failed_notification(sub.user, sub)
+    except CustomerSubscription.DoesNotExist:
+        pass